@@ -0,0 +1,50 @@
+"""
+圆弧拟合基准测试
+
+对由很短的G01程序段组成的螺旋轮廓，比较拟合前后的切削运动段数、程序行数和拟合耗时。
+
+用法:
+  python benchmarks/bench_arc_fitting.py [--segments 300000] [--per-turn 1000] [--tolerance 0.01]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.modules.arc_fitting import fit_arcs
+
+
+def spiral_program(segments: int, per_turn: int) -> str:
+    """半径100mm、每圈外扩0.1mm的螺旋，坐标取整到0.001mm"""
+    angles = np.arange(segments + 1) * (2 * np.pi / per_turn)
+    radius = 100.0 + angles * (0.1 / (2 * np.pi))
+    x, y = np.round(radius * np.cos(angles), 3), np.round(radius * np.sin(angles), 3)
+    lines = ["O0001 (SPIRAL)", "G21 G90 G17 G40 G80", "G54", "T1 M06", "M03 S3000",
+             f"G00 X{x[0]:.3f} Y{y[0]:.3f}", "Z2.", "G01 Z-2. F200.", f"X{x[1]:.3f} Y{y[1]:.3f} F600."]
+    lines.extend(f"X{a:.3f} Y{b:.3f}" for a, b in zip(x[2:], y[2:]))
+    lines.extend(["G00 Z50.", "M05", "M30"])
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="圆弧拟合基准测试")
+    parser.add_argument('--segments', type=int, default=300000, help='G01程序段数')
+    parser.add_argument('--per-turn', type=int, default=1000, help='每圈程序段数')
+    parser.add_argument('--tolerance', type=float, default=0.01, help='拟合公差mm')
+    args = parser.parse_args()
+
+    program = spiral_program(args.segments, args.per_turn)
+    for arc_format in ('ij', 'r'):
+        result, report = fit_arcs(program, {'tolerance': args.tolerance, 'arc_format': arc_format})
+        print(f"{arc_format}: 运动段 {report['segments_before']} -> {report['segments_after']} "
+              f"（{report['arcs']} 段圆弧，减少 {report['reduction'] * 100:.2f}%），"
+              f"行数 {report['lines_before']} -> {report['lines_after']}，"
+              f"最大偏差 {report['max_deviation']:.4f} mm，校验 {report['verified']}，{report['seconds']:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+加工时间估算基准测试
+
+生成同一组孔位按不同顺序排列的候选钻孔程序（中心钻G82 + 啄钻G83 + 攻丝G84），
+分别报告：从程序文本开始批量估算（含分词和解释）的速度、对已展开运动段批量打分的速度，
+以及与逐段Python循环计算的对照，并打印一个候选程序按工序的时间分解。
+
+用法:
+  python benchmarks/bench_cycle_time.py [--candidates 2000] [--holes 12]
+"""
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config import CYCLE_TIME_CONFIG
+from src.modules.cycle_time_estimator import cycle_time_estimator
+from src.modules.nc_interpreter import KIND_RAPID, interpret_nc_program
+
+OPERATIONS = (
+    ("PILOT DRILLING", 1, 1000, "G82 {xy} Z-1.0 R2.0 P1000 F50.0"),
+    ("DRILLING", 2, 800, "G83 {xy} Z-18.0 R2.0 Q3.0 F100.0"),
+    ("TAPPING", 3, 300, "G84 {xy} Z-14.0 R2.0 F450.0"),
+)
+
+
+def candidate_program(holes: np.ndarray) -> str:
+    """按给定孔位顺序生成三工序的钻孔程序"""
+    lines = ["O0001", "G21 G90 G40 G49 G80", "G54", "G00 Z100.0"]
+    for step, (name, tool, speed, cycle) in enumerate(OPERATIONS, 1):
+        lines += [f"(STEP {step}: {name} OPERATION)", f"T{tool} M06", f"M03 S{speed}", "G04 P1000",
+                  f"G43 H{tool} Z100.", "M08"]
+        xy = [f"X{x:.3f} Y{y:.3f}" for x, y in holes]
+        lines.append(cycle.format(xy=xy[0]))
+        lines += xy[1:]
+        lines += ["G80", "M09", "G00 Z100.0", "G49"]
+    lines += ["M05", "G00 X0 Y0", "M30"]
+    return "\n".join(lines)
+
+
+def python_loop_total(segments: np.ndarray) -> float:
+    """逐段Python循环的对照实现（与向量化实现使用相同模型）"""
+    config = CYCLE_TIME_CONFIG
+    total, spindle, tool = 0.0, 0.0, 0
+    for segment in segments:
+        delta = [abs(e - s) for s, e in zip(segment['start'], segment['end'])]
+        chord = math.sqrt(sum(d * d for d in delta))
+        length = float(segment['length'])
+        if length > 0 and segment['kind'] <= 1 and chord > 0:
+            speed = min(r / 60 / (d / chord) for r, d in zip(config['rapid_rates'], delta) if d > 1e-12 * chord)
+            acceleration = min(a / (d / chord) for a, d in zip(config['accelerations'], delta) if d > 1e-12 * chord)
+            if segment['kind'] != KIND_RAPID:
+                speed = min(segment['feed'] * config['feed_override'], config['max_cutting_feed']) / 60
+            else:
+                speed *= config['rapid_override']
+            if speed > 0:
+                if length >= speed * speed / acceleration:
+                    total += length / speed + speed / acceleration
+                else:
+                    total += 2 * math.sqrt(length / acceleration)
+        total += float(segment['dwell'])
+        total += abs(float(segment['spindle']) - spindle) / config['spindle_acceleration']
+        if segment['tool'] != tool:
+            total += config['tool_change_seconds']
+        spindle, tool = float(segment['spindle']), int(segment['tool'])
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="加工时间估算基准测试")
+    parser.add_argument('--candidates', type=int, default=2000, help='候选程序数')
+    parser.add_argument('--holes', type=int, default=12, help='每个程序的孔数')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    holes = rng.uniform(0, 200, size=(args.holes, 2)).round(3)
+    programs = [candidate_program(holes[rng.permutation(args.holes)]) for _ in range(args.candidates)]
+
+    start = time.perf_counter()
+    totals = cycle_time_estimator.estimate_batch(programs)
+    elapsed = time.perf_counter() - start
+    print(f"{args.candidates} 个候选程序（{args.holes} 孔 × 3 工序）")
+    print(f"从文本批量估算:     {elapsed:7.3f} s  {args.candidates / elapsed:10.0f} 个/秒")
+
+    segments = [interpret_nc_program(program)['segments'] for program in programs]
+    start = time.perf_counter()
+    scored = cycle_time_estimator.estimate_batch(segments)
+    elapsed = time.perf_counter() - start
+    print(f"对运动段批量打分:   {elapsed:7.3f} s  {args.candidates / elapsed:10.0f} 个/秒  "
+          f"（每个程序 {segments[0].size} 段）")
+
+    sample = segments[:max(1, args.candidates // 20)]
+    start = time.perf_counter()
+    looped = [python_loop_total(part) for part in sample]
+    elapsed = time.perf_counter() - start
+    print(f"逐段Python循环对照: {elapsed:7.3f} s  {len(sample) / elapsed:10.0f} 个/秒  "
+          f"最大差异 {np.abs(np.array(looped) - scored[:len(sample)]).max():.2e} s")
+
+    best = int(np.argmin(totals))
+    print(f"最短 {totals.min():.1f} s / 最长 {totals.max():.1f} s，最短候选按工序分解:")
+    for operation in cycle_time_estimator.estimate(programs[best])['by_operation']:
+        parts = "  ".join(f"{name} {seconds:.1f}" for name, seconds in operation['breakdown'].items())
+        print(f"  {operation['name']:<15} T{operation['tool']}  {operation['seconds']:6.1f} s  ({parts})")
+
+
+if __name__ == '__main__':
+    main()
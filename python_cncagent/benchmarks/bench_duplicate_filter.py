@@ -0,0 +1,125 @@
+"""
+重复特征过滤基准测试
+
+在合成图纸（大量剖面线/小轮廓，含一定比例的重复检测）上对比
+逐对比较的参考实现与基于网格空间索引的 filter_duplicate_features_advanced，
+验证两者输出一致，并给出随轮廓数量增长的耗时。
+
+用法:
+  python benchmarks/bench_duplicate_filter.py [--sizes 1000 10000 50000] [--reference-limit 10000]
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config import IMAGE_PROCESSING_CONFIG
+from src.modules.feature_definition import filter_duplicate_features_advanced
+
+
+SHAPES = ("circle", "rectangle", "square", "triangle", "irregular")
+
+
+def build_synthetic_features(count: int, seed: int = 0, duplicate_ratio: float = 0.3):
+    """
+    生成合成轮廓特征：轮廓密度固定（图纸面积随数量增长），
+    尺寸对数正态分布，并混入少量大尺寸轮廓（图框、外形轮廓）和带抖动的重复检测
+    """
+    rng = random.Random(seed)
+    side = math.sqrt(count) * 40.0
+    features = []
+    while len(features) < count:
+        if features and rng.random() < duplicate_ratio:
+            base = rng.choice(features)
+            x, y, w, h = base["bounding_box"]
+            dx, dy = rng.uniform(-2, 2), rng.uniform(-2, 2)
+            w, h = max(1.0, w + rng.uniform(-2, 2)), max(1.0, h + rng.uniform(-2, 2))
+            shape = base["shape"]
+            x, y = x + dx, y + dy
+        else:
+            if rng.random() < 0.002:
+                w, h = rng.uniform(side * 0.2, side), rng.uniform(side * 0.2, side)
+            else:
+                w, h = rng.lognormvariate(2.5, 0.6), rng.lognormvariate(2.5, 0.6)
+            x, y = rng.uniform(0, side), rng.uniform(0, side)
+            shape = rng.choice(SHAPES)
+        features.append({
+            "shape": shape,
+            "center": (x + w / 2, y + h / 2),
+            "bounding_box": (x, y, w, h),
+            "dimensions": (w, h),
+            "confidence": round(rng.random(), 3),
+        })
+    return features
+
+
+def reference_filter(features):
+    """逐对比较的参考实现（修正了并集面积误用curr_h、替换分支不生效的问题）"""
+    iou_threshold = IMAGE_PROCESSING_CONFIG.get('iou_threshold', 0.3)
+    filtered = []
+    for current in features:
+        match_idx = -1
+        for i, existing in enumerate(filtered):
+            curr_center, exist_center = current["center"], existing["center"]
+            distance = math.sqrt((curr_center[0] - exist_center[0]) ** 2 + (curr_center[1] - exist_center[1]) ** 2)
+            curr_x, curr_y, curr_w, curr_h = current["bounding_box"]
+            exist_x, exist_y, exist_w, exist_h = existing["bounding_box"]
+            x_overlap = max(0, min(curr_x + curr_w, exist_x + exist_w) - max(curr_x, exist_x))
+            y_overlap = max(0, min(curr_y + curr_h, exist_y + exist_h) - max(curr_y, exist_y))
+            overlap_area = x_overlap * y_overlap
+            union_area = curr_w * curr_h + exist_w * exist_h - overlap_area
+            iou = overlap_area / union_area if union_area > 0 else 0
+            position_threshold = (max(current["dimensions"]) + max(existing["dimensions"])) / 2 * 0.5
+            if distance < position_threshold and current["shape"] == existing["shape"] and iou > iou_threshold:
+                match_idx = i
+                break
+        if match_idx < 0:
+            filtered.append(current)
+        elif current.get("confidence", 0) > filtered[match_idx].get("confidence", 0):
+            filtered[match_idx] = current
+    return filtered
+
+
+def timed(func, features):
+    start = time.perf_counter()
+    result = func(features)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重复特征过滤基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='合成轮廓数量')
+    parser.add_argument('--reference-limit', type=int, default=10000,
+                        help='超过该数量时跳过O(n^2)参考实现')
+    args = parser.parse_args()
+
+    print(f"{'轮廓数':>8} {'保留数':>8} {'空间索引(s)':>12} {'参考实现(s)':>12} {'加速比':>8} {'输出一致':>8}")
+    previous = None
+    for count in args.sizes:
+        features = build_synthetic_features(count)
+        result, indexed_time = timed(filter_duplicate_features_advanced, features)
+
+        if count <= args.reference_limit:
+            expected, reference_time = timed(reference_filter, features)
+            identical = [id(f) for f in result] == [id(f) for f in expected]
+            reference_col = f"{reference_time:12.3f}"
+            speedup_col = f"{reference_time / max(indexed_time, 1e-9):7.1f}x"
+            identical_col = "是" if identical else "否"
+        else:
+            reference_col, speedup_col, identical_col = f"{'跳过':>12}", f"{'-':>8}", "-"
+
+        print(f"{count:>8} {len(result):>8} {indexed_time:12.3f} {reference_col} {speedup_col} {identical_col:>8}")
+        if previous is not None:
+            prev_count, prev_time = previous
+            exponent = math.log(indexed_time / max(prev_time, 1e-9)) / math.log(count / prev_count)
+            print(f"{'':>8} 相对上一规模的经验复杂度指数: {exponent:.2f}")
+        previous = (count, indexed_time)
+
+
+if __name__ == '__main__':
+    main()
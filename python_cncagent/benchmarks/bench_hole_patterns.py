@@ -0,0 +1,62 @@
+"""
+孔阵列紧凑输出基准测试
+
+对矩形阵列的钻孔程序和螺栓孔圆的攻丝程序，比较逐孔输出（含孔加工顺序优化）与
+宏程序循环 / G16极坐标输出的程序行数、字节数和生成耗时。
+
+用法:
+  python benchmarks/bench_hole_patterns.py [--columns 40] [--rows 25] [--circle 36] [--repeat 5]
+"""
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.modules.gcode_generation import generate_fanuc_nc
+
+
+def features(positions):
+    return [{'shape': 'circle', 'center': position, 'radius': 3.0, 'dimensions': (6.0, 6.0)}
+            for position in positions]
+
+
+def timed(feature_list, analysis, repeat):
+    """多次生成取最短耗时"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        program = generate_fanuc_nc(feature_list, analysis)
+        best = min(best, time.perf_counter() - start)
+    return program, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="孔阵列紧凑输出基准测试")
+    parser.add_argument('--columns', type=int, default=40, help='矩形阵列列数')
+    parser.add_argument('--rows', type=int, default=25, help='矩形阵列行数')
+    parser.add_argument('--circle', type=int, default=36, help='螺栓孔圆孔数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复生成次数')
+    args = parser.parse_args()
+
+    grid = [(10.0 * i, 12.0 * j) for i in range(args.columns) for j in range(args.rows)]
+    circle = [(100.0 + 80.0 * math.cos(math.radians(k * 360.0 / args.circle)),
+               100.0 + 80.0 * math.sin(math.radians(k * 360.0 / args.circle))) for k in range(args.circle)]
+    cases = (("矩形阵列钻孔", grid, {'processing_type': 'drilling', 'depth': 10.0}, 'macro'),
+             ("螺栓孔圆攻丝", circle, {'processing_type': 'tapping', 'thread_size': 'M8', 'depth': 12.0}, 'polar'))
+
+    for label, positions, analysis, mode in cases:
+        expanded, expanded_time = timed(features(positions), analysis, args.repeat)
+        compact, compact_time = timed(features(positions), dict(analysis, pattern_mode=mode), args.repeat)
+        print(f"{label}: {len(positions)} 个孔")
+        for name, program, elapsed in (("逐孔输出", expanded, expanded_time), (mode, compact, compact_time)):
+            print(f"  {name:<10}{len(program.splitlines()):8d} 行 {len(program.encode()):10d} 字节  {elapsed:7.3f} s")
+        print(f"  行数减少 {(1 - len(compact.splitlines()) / len(expanded.splitlines())) * 100:.1f}%，"
+              f"生成耗时 {expanded_time / compact_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
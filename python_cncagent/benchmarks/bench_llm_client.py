@@ -0,0 +1,118 @@
+"""
+大模型客户端基准测试
+
+对本地OpenAI兼容模拟服务并发发起请求，对比每次调用新建客户端（旧实现）
+与进程级客户端池（连接复用 + 并发限制），报告总耗时、延迟分位数、
+服务端看到的连接数和峰值并发；再对比流式生成的首行NC代码到达时间与完整回复耗时，
+以及开头缺少初始化指令的程序被增量验证提前中止时节省的输出。
+
+用法:
+  python benchmarks/bench_llm_client.py [--requests 200] [--threads 16] [--latency 0.02] [--max-concurrency 4]
+                                        [--program-lines 300] [--chunk-delay 0.002]
+"""
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.mock_openai_server import MockOpenAIServer
+from src.modules.llm_client import HAS_OPENAI, LLMClientPool
+
+MESSAGES = [{"role": "user", "content": "加工4个φ10通孔"}]
+
+
+def run(label: str, call, requests: int, threads: int, server: MockOpenAIServer) -> None:
+    latencies = []
+
+    def timed_call(_):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+
+    connections_before = server.connections
+    server.peak_in_flight = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed_call, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<14} 总耗时 {elapsed:7.2f} s  p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+          f"p95 {p95 * 1000:7.1f} ms  连接数 {server.connections - connections_before:5d}  "
+          f"服务端峰值并发 {server.peak_in_flight}")
+
+
+def bench_streaming(program_lines: int, chunk_delay: float) -> None:
+    """流式生成：首行到达时间、完整耗时，以及严重问题时的提前中止"""
+    import os
+
+    import src.modules.ai_driven_generator as ai_driven_generator
+
+    header = "O0001\nG21 G90 G40 G49 G80\nG54\nM03 S1000\nG00 Z100.0"
+    body = "\n".join(f"G01 X{i % 100}.0 Y{i // 100}.0 F300.0" for i in range(program_lines))
+    good = f"```gcode\n{header}\n{body}\nG00 Z100.0\nM05\nM30\n```"
+    bad = f"```gcode\nO0001\nG54\n{body}\nM30\n```"
+
+    for label, reply in (("完整程序", good), ("缺少初始化", bad)):
+        with MockOpenAIServer(reply=reply, chunk_size=16, chunk_delay=chunk_delay) as server:
+            os.environ["DEEPSEEK_API_BASE"] = server.base_url
+            pool = LLMClientPool()
+            ai_driven_generator.llm_client_pool = pool
+            generator = ai_driven_generator.AIDrivenCNCGenerator(api_key="bench", model="deepseek-chat")
+            first_line = []
+            ai_driven_generator.report_output = lambda line: first_line or first_line.append(time.perf_counter())
+            start = time.perf_counter()
+            generator._call_large_language_model("加工")
+            elapsed = time.perf_counter() - start
+            total_chunks = -(-len(reply) // 16) + 1  # 含结束事件
+            ttfl = (first_line[0] - start) * 1000 if first_line else float('nan')
+            print(f"流式/{label:<6} 首行 {ttfl:7.1f} ms  结束 {elapsed * 1000:8.1f} ms  "
+                  f"服务端发送分片 {server.stream_chunks}/{total_chunks}")
+            pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大模型客户端基准测试")
+    parser.add_argument('--requests', type=int, default=200, help='请求总数')
+    parser.add_argument('--threads', type=int, default=16, help='调用方线程数')
+    parser.add_argument('--latency', type=float, default=0.02, help='模拟服务的响应延迟（秒）')
+    parser.add_argument('--max-concurrency', type=int, default=4, help='客户端池的并发上限')
+    parser.add_argument('--program-lines', type=int, default=300, help='流式测试中模拟程序的行数')
+    parser.add_argument('--chunk-delay', type=float, default=0.002, help='流式测试中分片间隔（秒）')
+    args = parser.parse_args()
+
+    if not HAS_OPENAI:
+        print("未安装openai库，跳过基准测试")
+        return
+
+    from openai import OpenAI
+
+    with MockOpenAIServer(latency=args.latency) as server:
+        def fresh_client_call():
+            client = OpenAI(api_key="bench", base_url=server.base_url)
+            client.chat.completions.create(model="mock", messages=MESSAGES)
+
+        pool = LLMClientPool(max_concurrency=args.max_concurrency)
+
+        def pooled_call():
+            pool.chat_completion(api_key="bench", base_url=server.base_url, model="mock", messages=MESSAGES)
+
+        print(f"{args.requests} 个请求，{args.threads} 个调用线程，服务延迟 {args.latency * 1000:.0f} ms")
+        run("每次新建客户端", fresh_client_call, args.requests, args.threads, server)
+        run("客户端池", pooled_call, args.requests, args.threads, server)
+        stats = pool.stats()['models']['mock']
+        print(f"客户端池延迟直方图: p50≤{stats['p50_seconds']} s, p95≤{stats['p95_seconds']} s, "
+              f"共 {stats['count']} 次")
+        pool.close()
+
+    bench_streaming(args.program_lines, args.chunk_delay)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+NC程序解释器基准测试
+
+生成指定行数的直线/圆弧铣削程序和固定循环钻孔程序，切分后用FANUC解释器执行，
+报告分词和解释的耗时、输出的运动段数以及每百万行的解释时间。
+
+用法:
+  python benchmarks/bench_nc_interpreter.py [--lines 2000000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.modules.nc_interpreter import interpret_nc_program
+from src.modules.nc_tokenizer import tokenize
+
+HEADER = "O0001\nG21 G90 G17 G40 G49 G80\nG54\nT1 M06\nG43 H1 Z100.0\nM03 S1200\nG00 X0 Y0 Z5.0"
+
+
+def milling_program(lines: int) -> str:
+    """直线和整圆交替的铣削程序"""
+    body = "\n".join(f"G01 X{i % 500}.5 Y{i // 500}.25 Z-1.0 F300.0" if i % 4
+                     else "G02 I-5.0 J0 F300.0" for i in range(lines))
+    return f"{HEADER}\n{body}\nG00 Z100.0\nM05\nG91 G28 Z0\nM30"
+
+
+def drilling_program(lines: int) -> str:
+    """每200个孔换一次循环的G83啄钻程序"""
+    body = "\n".join(f"G99 G83 X{i % 500}.0 Y{i // 500}.0 Z-12.0 R2.0 Q3.0 F80.0" if i % 200 == 0
+                     else (f"X{i % 500}.0 Y{i // 500}.0\nG80" if i % 200 == 199 else f"X{i % 500}.0 Y{i // 500}.0")
+                     for i in range(lines))
+    return f"{HEADER}\n{body}\nG80\nM05\nG91 G28 Z0\nM30"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NC程序解释器基准测试")
+    parser.add_argument('--lines', type=int, default=2_000_000, help='铣削程序的行数（钻孔程序为其十分之一）')
+    args = parser.parse_args()
+
+    for label, program in (("铣削", milling_program(args.lines)), ("啄钻", drilling_program(args.lines // 10))):
+        start = time.perf_counter()
+        table = tokenize(program)
+        tokenized = time.perf_counter()
+        result = interpret_nc_program(table)
+        finished = time.perf_counter()
+        per_million = (finished - tokenized) / table.n_lines * 1e6
+        print(f"{label}: {table.n_lines} 行  分词 {tokenized - start:6.2f} s  解释 {finished - tokenized:6.2f} s "
+              f"({per_million:.2f} s/百万行)  运动段 {result['segments'].size}  报警 {len(result['alarms'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+NC程序流式输出基准测试
+
+对矩形阵列的钻孔程序，比较先生成完整程序再写文件（generate_fanuc_nc）与边生成边写文件
+（write_fanuc_nc）的耗时和峰值内存（tracemalloc）。孔位规划（加工顺序、阵列识别）的内存两者相同，
+差别在于程序文本：流式输出时文本内存不随程序长度增长。默认关闭孔加工顺序优化，只比较程序文本的内存。
+
+用法:
+  python benchmarks/bench_nc_streaming.py [--columns 300] [--rows 300] [--sequencing]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.modules.gcode_generation import generate_fanuc_nc, write_fanuc_nc
+from src.modules.hole_sequencing import hole_sequencer
+
+
+def measure(function):
+    """返回 (耗时, 峰值内存MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        function()
+        return time.perf_counter() - start, tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NC程序流式输出基准测试")
+    parser.add_argument('--columns', type=int, default=300, help='矩形阵列列数')
+    parser.add_argument('--rows', type=int, default=300, help='矩形阵列行数')
+    parser.add_argument('--sequencing', action='store_true', help='保留孔加工顺序优化')
+    args = parser.parse_args()
+    hole_sequencer.config['enabled'] = args.sequencing
+
+    features = [{'shape': 'circle', 'center': (5.0 * i, 7.0 * j), 'radius': 1.0, 'dimensions': (2.0, 2.0)}
+                for i in range(args.columns) for j in range(args.rows)]
+    analysis = {'processing_type': 'drilling', 'depth': 5.0}
+
+    with tempfile.TemporaryDirectory() as directory:
+        full_path = os.path.join(directory, "full.nc")
+        stream_path = os.path.join(directory, "stream.nc")
+
+        def full():
+            with open(full_path, "w", encoding="utf-8") as f:
+                f.write(generate_fanuc_nc(features, analysis))
+
+        full_time, full_peak = measure(full)
+        stream_time, stream_peak = measure(lambda: write_fanuc_nc(features, analysis, stream_path))
+        size = os.path.getsize(stream_path) / 1e6
+
+    print(f"{len(features)} 个孔，程序 {size:.1f} MB")
+    print(f"  完整生成后写入 {full_time:7.2f} s  峰值内存 {full_peak:7.1f} MB")
+    print(f"  流式写入       {stream_time:7.2f} s  峰值内存 {stream_peak:7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
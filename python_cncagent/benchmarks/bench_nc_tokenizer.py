@@ -0,0 +1,74 @@
+"""
+NC程序分词器基准测试
+
+生成指定行数的NC程序，先一次切分为地址字表，再让NCCodeValidator、NCValidator、
+validation.validate_nc_program、模拟报告统计和NCOptimizer共用这张表，
+报告分词和各验证/优化步骤的耗时；加 --separate 时各步骤分别从文本重新切分，作为对比。
+
+用法:
+  python benchmarks/bench_nc_tokenizer.py [--lines 1000000] [--separate]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.modules.nc_code_validator import NCCodeValidator
+from src.modules.nc_tokenizer import tokenize
+from src.modules.nc_validator_optimizer import NCOptimizer, NCValidator
+from src.modules.simulation_output import generate_simulation_report
+from src.modules.validation import validate_nc_program
+
+
+def make_program(lines: int) -> str:
+    """生成含快速移动、带注释的切削移动和程序头尾的测试程序"""
+    header = "O0001 (BENCH)\nG21 G90 G40 G49 G80\nG54\nT1 M06\nG43 H1 Z100.0\nM03 S1200\nG00 Z100.0"
+    body = "\n".join(f"G01 X{i % 500}.5 Y{i // 500}.25 F300.0 (CUT {i})" if i % 4
+                     else f"G00 X{i % 500}.0 Y{i // 500}.0" for i in range(lines))
+    return f"{header}\n{body}\nG00 Z100.0\nM05\nG28 G91 Z0\nM30"
+
+
+def timed(label: str, call) -> float:
+    start = time.perf_counter()
+    call()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<24} {elapsed:7.2f} s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NC程序分词器基准测试")
+    parser.add_argument('--lines', type=int, default=1_000_000, help='测试程序的行数')
+    parser.add_argument('--separate', action='store_true', help='各步骤分别从文本切分，不共用地址字表')
+    args = parser.parse_args()
+
+    program = make_program(args.lines)
+    print(f"测试程序: {program.count(chr(10)) + 1} 行, {len(program) / 1e6:.1f} MB")
+
+    report_path = os.path.join(tempfile.mkdtemp(), "simulation_report.txt")
+    analysis = {'processing_type': 'milling', 'tool_required': 'end_mill'}
+    total = 0.0
+    if args.separate:
+        print("各步骤分别切分:")
+        source = program
+    else:
+        print("共用一张地址字表:")
+        holder = {}
+        total += timed("分词", lambda: holder.setdefault('table', tokenize(program)))
+        source = holder['table']
+
+    total += timed("NCCodeValidator", lambda: NCCodeValidator().validate_nc_code(source))
+    total += timed("NCValidator", lambda: NCValidator().validate_nc_program(source))
+    total += timed("validate_nc_program", lambda: validate_nc_program(source))
+    total += timed("模拟报告统计", lambda: generate_simulation_report([], analysis, source, report_path))
+    total += timed("NCOptimizer", lambda: NCOptimizer().optimize_nc_program(source))
+    print(f"  {'合计':<24} {total:7.2f} s")
+
+
+if __name__ == '__main__':
+    main()
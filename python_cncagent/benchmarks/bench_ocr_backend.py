@@ -0,0 +1,103 @@
+"""
+OCR输入路径基准测试
+
+对比旧路径（灰度 -> PNG临时文件 -> 重新读取 -> pytesseract）与
+新路径（原始像素缓冲区 -> PNM头 -> stdin / tesserocr）的单页开销。
+
+用法:
+  python benchmarks/bench_ocr_backend.py [--pages 10] [--dpi 150]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import fitz
+import pytesseract
+from PIL import Image
+
+from src.modules.pdf_parsing_process import _encode_pnm, ocr_buffer, preprocess_image
+
+
+def build_sample_page(dpi: int) -> Image.Image:
+    """生成一页A3尺寸、带尺寸标注文字和几何图形的测试图纸"""
+    doc = fitz.open()
+    page = doc.new_page(width=1191, height=842)
+    for i in range(40):
+        page.insert_text((40 + (i % 5) * 220, 60 + (i // 5) * 90), f"PHI{10 + i}.5 H7 DEPTH {i + 3}", fontsize=11)
+        page.draw_circle((120 + (i % 8) * 130, 120 + (i // 8) * 140), 25, width=1)
+    zoom = dpi / 72
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    doc.close()
+    return image
+
+
+def legacy_overhead(image: Image.Image) -> Image.Image:
+    """旧路径中OCR之前的全部开销：PNG编码、写盘、解码、删除"""
+    processed = preprocess_image(image)
+    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
+        temp_path = temp_file.name
+    try:
+        processed.save(temp_path)
+        reopened = Image.open(temp_path)
+        reopened.load()
+        return reopened
+    finally:
+        os.unlink(temp_path)
+
+
+def buffer_overhead(image: Image.Image) -> bytes:
+    """新路径中OCR之前的全部开销：灰度转换和PNM头拼接"""
+    processed = preprocess_image(image)
+    width, height = processed.size
+    return _encode_pnm(processed.tobytes(), width, height, 1)
+
+
+def time_per_call(func, image, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func(image)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR输入路径基准测试")
+    parser.add_argument('--pages', type=int, default=10, help='每种路径重复的页数')
+    parser.add_argument('--dpi', type=int, default=150, help='渲染DPI')
+    args = parser.parse_args()
+
+    image = build_sample_page(args.dpi)
+    print(f"测试页面: {image.size[0]}x{image.size[1]} 像素 @ {args.dpi} DPI")
+
+    legacy_ms = time_per_call(legacy_overhead, image, args.pages)
+    buffer_ms = time_per_call(buffer_overhead, image, args.pages)
+    print(f"OCR前置开销  旧路径(PNG临时文件): {legacy_ms:8.2f} ms/页")
+    print(f"OCR前置开销  新路径(原始缓冲区):   {buffer_ms:8.2f} ms/页")
+    print(f"单页节省: {legacy_ms - buffer_ms:.2f} ms ({legacy_ms / max(buffer_ms, 1e-6):.1f}x)")
+
+    if not shutil.which(pytesseract.pytesseract.tesseract_cmd):
+        print("未找到tesseract可执行文件，跳过端到端OCR计时")
+        return
+
+    def legacy_ocr(img):
+        return pytesseract.image_to_string(legacy_overhead(img), lang='eng')
+
+    def buffer_ocr(img):
+        processed = preprocess_image(img)
+        return ocr_buffer(processed.tobytes(), processed.size[0], processed.size[1], 1, lang='eng')
+
+    legacy_ms = time_per_call(legacy_ocr, image, args.pages)
+    buffer_ms = time_per_call(buffer_ocr, image, args.pages)
+    print(f"端到端OCR    旧路径: {legacy_ms:8.2f} ms/页")
+    print(f"端到端OCR    新路径: {buffer_ms:8.2f} ms/页")
+
+
+if __name__ == '__main__':
+    main()
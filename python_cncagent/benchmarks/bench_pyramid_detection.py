@@ -0,0 +1,132 @@
+"""
+金字塔特征检测基准测试
+
+生成一张A1图纸（三个视图、孔阵列含小孔、腔槽、剖面线、尺寸线、标注文字和标题栏）按给定DPI渲染为
+灰度位图，比较整图边缘检测与由粗到精的金字塔检测两种方式的耗时、轮廓数和孔召回率
+（找到外接框中心与孔心相距不超过2像素的轮廓的孔数 / 孔总数）。金字塔检测分别给出首次调用
+（包含生成金字塔）和复用同一页面金字塔时的耗时。
+
+用法:
+  python benchmarks/bench_pyramid_detection.py [--dpi 300] [--noise 0] [--repeat 3]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import fitz
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.modules.feature_definition import detect_edges
+from src.modules.pyramid_detection import find_edge_contours_pyramid
+
+EDGE_PARAMS = (50, 150, (5, 5), (2, 2))
+
+
+def build_drawing(dpi, noise=0.0, seed=0):
+    """A1幅面图纸渲染为灰度位图，返回 (图像, 孔数组[(x, y, r)]，像素)"""
+    rng = random.Random(seed)
+    document = fitz.open()
+    page = document.new_page(width=2384, height=1684)
+    shape = page.new_shape()
+    shape.draw_rect(fitz.Rect(20, 20, 2364, 1664))
+    holes = []
+    for vx, vy, vw, vh in ((120, 120, 900, 600), (1150, 120, 900, 600), (120, 850, 900, 550)):
+        shape.draw_rect(fitz.Rect(vx, vy, vx + vw, vy + vh))
+        for column in range(8):
+            for row in range(5):
+                center = (vx + 60 + column * 110, vy + 60 + row * 110)
+                radius = rng.choice([2.1, 3, 4.5, 6, 9])
+                shape.draw_circle(center, radius)
+                holes.append((center[0], center[1], radius))
+        shape.draw_rect(fitz.Rect(vx + vw - 200, vy + vh - 150, vx + vw - 40, vy + vh - 40))
+    # 剖面线
+    for k in range(40):
+        shape.draw_line((1150 + k * 10, 850), (1150 + k * 10 + 100, 950))
+    # 尺寸线
+    for k in range(30):
+        x, y = 120 + k * 60, 760 + (k % 3) * 20
+        shape.draw_line((x, y), (x + 50, y))
+        shape.draw_line((x, y - 5), (x, y + 5))
+    # 标题栏
+    for k in range(7):
+        shape.draw_line((1804, 1484 + k * 30), (2364, 1484 + k * 30))
+    for x in (1804, 1944, 2084, 2224):
+        shape.draw_line((x, 1484), (x, 1664))
+    shape.finish(color=(0, 0, 0), width=0.5)
+    shape.commit()
+    for k in range(80):
+        page.insert_text((130 + (k % 20) * 110, 740), f"Φ{rng.choice([3, 6, 9, 12])} H7", fontsize=8)
+    for k in range(40):
+        page.insert_text((1160 + (k % 8) * 110, 1000 + (k // 8) * 60), "M8x1.25 DEPTH 12", fontsize=9)
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    image = np.frombuffer(pixmap.samples, np.uint8).reshape(pixmap.height, pixmap.width).copy()
+    document.close()
+    if noise:
+        generator = np.random.default_rng(seed)
+        count = int(image.size * noise)
+        image[generator.integers(0, image.shape[0], count), generator.integers(0, image.shape[1], count)] = 0
+    return image, np.array(holes) * dpi / 72
+
+
+def hole_recall(contours, holes):
+    """找到对应轮廓的孔的比例"""
+    boxes = np.array([cv2.boundingRect(contour) for contour in contours], dtype=np.float64)
+    centers = boxes[:, :2] + boxes[:, 2:] / 2
+    hits = 0
+    for x, y, _ in holes:
+        hits += bool((np.abs(centers - (x, y)).max(axis=1) <= 2).any())
+    return hits / len(holes)
+
+
+def best_of(repeat, function):
+    """重复执行，返回 (最短耗时, 最后一次结果)"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="金字塔特征检测基准测试")
+    parser.add_argument('--dpi', type=int, default=300, help='渲染分辨率')
+    parser.add_argument('--noise', type=float, default=0.0, help='扫描噪点占像素的比例')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，取最短耗时')
+    args = parser.parse_args()
+
+    image, holes = build_drawing(args.dpi, args.noise)
+    print(f"A1图纸 {image.shape[1]}x{image.shape[0]} px, {len(holes)} 个孔（最小半径 {holes[:, 2].min():.1f} px）")
+
+    def whole():
+        contours, _ = cv2.findContours(detect_edges(image, *EDGE_PARAMS), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        return contours
+
+    def pyramid(page):
+        return find_edge_contours_pyramid(page, *EDGE_PARAMS, min_area=100, config={'mode': 'always'})
+
+    whole_time, expected = best_of(args.repeat, whole)
+    # 每次传入新的数组对象，金字塔不命中缓存（复制不计入耗时）
+    pages = [image.copy() for _ in range(args.repeat)]
+    first_time, _ = best_of(args.repeat, lambda: pyramid(pages.pop()))
+    del pages
+    cached_time, contours = best_of(args.repeat, lambda: pyramid(image))
+    if contours is None:
+        print(f"  整图检测         {whole_time:6.3f} s  {len(expected):5d} 个轮廓")
+        print("  细化区域超过 max_refine_fraction，金字塔检测回退整图检测")
+        return
+
+    print(f"  整图检测         {whole_time:6.3f} s  {len(expected):5d} 个轮廓  孔召回率 {hole_recall(expected, holes):.1%}")
+    print(f"  金字塔（首次）   {first_time:6.3f} s")
+    print(f"  金字塔（已缓存） {cached_time:6.3f} s  {len(contours):5d} 个轮廓  孔召回率 {hole_recall(contours, holes):.1%}")
+    print(f"  加速比 {whole_time / first_time:.1f}x（首次） / {whole_time / cached_time:.1f}x（已缓存）")
+
+
+if __name__ == '__main__':
+    main()
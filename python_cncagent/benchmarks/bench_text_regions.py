@@ -0,0 +1,115 @@
+"""
+文字区域OCR基准测试
+
+生成一张扫描件式的A1图纸（孔阵列、尺寸线、尺寸标注、技术要求和标题栏，整页为位图），比较
+整页OCR与只识别检测出的文字区域两种方式的耗时和标注召回率（识别文本中找到的标注数 / 标注总数）。
+没有安装Tesseract时只报告文字区域检测的耗时、区域召回率和裁剪面积占比。
+
+用法:
+  python benchmarks/bench_text_regions.py [--labels 120] [--dpi 200] [--workers 0]
+"""
+import argparse
+import random
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import fitz
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.modules.pdf_parsing_process import HAS_TESSEROCR, ocr_buffer_lines
+from src.modules.text_regions import detect_text_regions, ocr_text_regions
+
+TITLE_BLOCK = (1804, 1484, 2364, 1664)
+
+
+def build_drawing(label_count, dpi, seed=0):
+    """A1幅面图纸渲染为灰度位图，返回 (图像, 标注列表[(文本, 外接框pt)])"""
+    rng = random.Random(seed)
+    document = fitz.open()
+    page = document.new_page(width=2384, height=1684)
+    page.draw_rect(fitz.Rect(20, 20, 2364, 1664), color=(0, 0, 0), width=1.5)
+    labels = []
+    for k in range(label_count):
+        column, row = k % 12, k // 12
+        x, y = 120 + column * 180, 120 + row * 130
+        radius = rng.choice([6, 8, 10, 12.5, 15])
+        page.draw_circle((x, y), radius, color=(0, 0, 0))
+        page.draw_line((x - radius, y + 30), (x + radius, y + 30), color=(0, 0, 0), width=0.5)
+        text = rng.choice([f"Φ{2 * radius:g} H7", f"R{radius:g}", f"{2 * radius:g}±0.05", f"M{int(radius)}x1.25"])
+        page.insert_text((x - radius, y + 26), text, fontsize=10)
+        labels.append((text, fitz.Rect(x - radius, y + 18, x - radius + fitz.get_text_length(text, fontsize=10), y + 26)))
+    page.insert_text((60, 1500), "技术要求：未注倒角C1，锐边倒钝", fontsize=12, fontname="china-s")
+    x0, y0, x1, y1 = TITLE_BLOCK
+    for k in range(7):
+        page.draw_line((x0, y0 + k * 30), (x1, y0 + k * 30), color=(0, 0, 0), width=1)
+    for x in (x0, 1944, 2084, 2224, x1):
+        page.draw_line((x, y0), (x, y1), color=(0, 0, 0), width=1)
+    for k, text in enumerate(["材料 45钢", "比例 1:1", "图号 CNC-001", "数量 2"]):
+        page.insert_text((x0 + 8 + (k % 4) * 140, y0 + 20), text, fontsize=10, fontname="china-s")
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    image = np.frombuffer(pixmap.samples, np.uint8).reshape(pixmap.height, pixmap.width)
+    document.close()
+    return image, labels
+
+
+def normalize(text):
+    return "".join(text.split()).replace("φ", "Φ").replace("Ø", "Φ").upper()
+
+
+def text_recall(labels, texts):
+    """在识别文本中找到的标注比例"""
+    found = normalize(" ".join(texts))
+    return sum(normalize(text) in found for text, _ in labels) / len(labels)
+
+
+def region_recall(labels, regions, dpi):
+    """标注中心落在检测区域内的比例"""
+    scale = dpi / 72
+    boxes = np.array([region["bbox"] for region in regions], dtype=np.float64) / scale
+    hits = 0
+    for _, rect in labels:
+        x, y = (rect.x0 + rect.x1) / 2, (rect.y0 + rect.y1) / 2
+        hits += bool(((boxes[:, 0] <= x) & (x <= boxes[:, 2]) & (boxes[:, 1] <= y) & (y <= boxes[:, 3])).any())
+    return hits / len(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字区域OCR基准测试")
+    parser.add_argument('--labels', type=int, default=120, help='尺寸标注数量')
+    parser.add_argument('--dpi', type=int, default=200, help='扫描分辨率')
+    parser.add_argument('--workers', type=int, default=0, help='区域OCR线程数，0表示按CPU核数')
+    args = parser.parse_args()
+
+    image, labels = build_drawing(args.labels, args.dpi)
+    print(f"A1扫描图纸 {image.shape[1]}x{image.shape[0]} px, {len(labels)} 个尺寸标注")
+
+    start = time.perf_counter()
+    regions = detect_text_regions(image, args.dpi)
+    detect_time = time.perf_counter() - start
+    crop_area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in (r["bbox"] for r in regions))
+    print(f"文字区域检测 {detect_time:.3f} s, {len(regions)} 个区域, 区域召回率 "
+          f"{region_recall(labels, regions, args.dpi):.1%}, 裁剪面积占整页 {crop_area / image.size:.1%}")
+
+    if not (HAS_TESSEROCR or shutil.which('tesseract')):
+        print("未安装Tesseract，跳过OCR耗时和识别召回率对比")
+        return
+
+    start = time.perf_counter()
+    full_page = ocr_buffer_lines(image.tobytes(), image.shape[1], image.shape[0], 1)
+    full_time = time.perf_counter() - start
+    start = time.perf_counter()
+    roi = ocr_text_regions(image, args.dpi, max_workers=args.workers)
+    roi_time = time.perf_counter() - start
+    for name, lines, elapsed in (("整页OCR", full_page, full_time), ("文字区域OCR", roi, roi_time)):
+        print(f"  {name:<8}{elapsed:8.2f} s  {len(lines):5d} 行  标注召回率 "
+              f"{text_recall(labels, [line['text'] for line in lines]):.1%}")
+    print(f"  加速比 {full_time / roi_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+分块特征检测基准测试
+
+分别在独立子进程中运行整图检测和分块检测（边缘检测 + 轮廓查找），
+报告耗时、峰值常驻内存相对输入图像之外的增量，以及两种方式轮廓的一致程度。
+
+用法:
+  python benchmarks/bench_tiled_detection.py [--paper A1] [--dpi 600] [--budget 512]
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（Linux下ru_maxrss单位为KB）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode: str, paper: str, dpi: int, budget: float) -> None:
+    """子进程入口：生成图纸、记录基线内存、执行检测并输出JSON结果"""
+    import hashlib
+
+    import cv2
+
+    from benchmarks.bench_contour_descriptors import build_synthetic_scan
+    from src.config import IMAGE_PROCESSING_CONFIG
+    from src.modules.feature_definition import detect_edges
+    from src.modules.tiled_detection import find_contours_tiled
+
+    image = build_synthetic_scan(paper, dpi)
+    cv2.rectangle(image, (20, 20), (image.shape[1] - 20, image.shape[0] - 20), 0, 3)  # 图框
+    baseline = peak_rss_mb()
+
+    params = (IMAGE_PROCESSING_CONFIG['default_canny_low'], IMAGE_PROCESSING_CONFIG['default_canny_high'],
+              IMAGE_PROCESSING_CONFIG['default_gaussian_kernel'], IMAGE_PROCESSING_CONFIG['default_morph_kernel'])
+    start = time.perf_counter()
+    if mode == 'whole':
+        contours, _ = cv2.findContours(detect_edges(image, *params), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    else:
+        contours = find_contours_tiled(image, *params, memory_budget_mb=budget)
+    elapsed = time.perf_counter() - start
+
+    digests = sorted(hashlib.sha1(contour.tobytes()).hexdigest() for contour in contours)
+    print(json.dumps({
+        'shape': list(image.shape),
+        'seconds': elapsed,
+        'working_mb': peak_rss_mb() - baseline,
+        'contours': digests,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分块特征检测基准测试")
+    parser.add_argument('--paper', default='A1', help='图幅（A0-A3）')
+    parser.add_argument('--dpi', type=int, default=600, help='扫描DPI')
+    parser.add_argument('--budget', type=float, default=512, help='分块检测的内存预算（MB）')
+    parser.add_argument('--mode', choices=['whole', 'tiled'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.paper, args.dpi, args.budget)
+        return
+
+    results = {}
+    for mode in ('whole', 'tiled'):
+        output = subprocess.run([sys.executable, __file__, '--mode', mode, '--paper', args.paper,
+                                 '--dpi', str(args.dpi), '--budget', str(args.budget)],
+                                capture_output=True, text=True)
+        if output.returncode != 0:
+            print(f"{mode}: 失败（可能内存不足）\n{output.stderr[-500:]}")
+            continue
+        results[mode] = json.loads(output.stdout.strip().splitlines()[-1])
+
+    for mode, result in results.items():
+        height, width = result['shape']
+        print(f"{mode:>6}: {width}x{height} 像素, {len(result['contours'])} 个轮廓, "
+              f"{result['seconds']:.2f} s, 工作内存峰值 {result['working_mb']:.0f} MB")
+    if len(results) == 2:
+        whole, tiled = set(results['whole']['contours']), set(results['tiled']['contours'])
+        print(f"轮廓一致: {len(whole & tiled)}，仅整图: {len(whole - tiled)}，仅分块: {len(tiled - whole)}")
+
+
+if __name__ == '__main__':
+    main()
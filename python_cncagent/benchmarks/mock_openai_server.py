@@ -0,0 +1,173 @@
+"""
+本地OpenAI兼容模拟服务
+
+实现 POST /v1/chat/completions（含 stream=true 的SSE流式响应），可配置响应延迟、
+流式分片间隔和按顺序返回的错误状态码，并统计连接数、请求数、峰值并发、
+已发送的流式分片数和被客户端提前断开的流，供大模型客户端的测试和基准测试使用。
+
+用法（在代码中）:
+  with MockOpenAIServer(latency=0.05, failures=[429, 503]) as server:
+      client = OpenAI(api_key="test", base_url=server.base_url)
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+DEFAULT_REPLY = "```gcode\nO0001\nG21 G90 G40\nM30\n```"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 支持连接保持
+
+    def setup(self):
+        super().setup()
+        with self.server.mock.lock:
+            self.server.mock.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        mock = self.server.mock
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send(404, {"error": {"message": "not found"}})
+            return
+
+        with mock.lock:
+            mock.requests += 1
+            mock.in_flight += 1
+            mock.peak_in_flight = max(mock.peak_in_flight, mock.in_flight)
+            status = mock.failures.pop(0) if mock.failures else 200
+        try:
+            time.sleep(mock.latency)
+            if status != 200:
+                self._send(status, {"error": {"message": f"mock error {status}", "type": "mock"}},
+                           {'Retry-After': str(mock.retry_after)} if mock.retry_after is not None else None)
+                return
+            request = json.loads(body or b'{}')
+            if request.get('stream'):
+                self._stream(request.get("model", "mock"))
+                return
+            self._send(200, {
+                "id": f"chatcmpl-mock-{mock.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": mock.reply},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+            })
+        finally:
+            with mock.lock:
+                mock.in_flight -= 1
+
+    def _stream(self, model: str):
+        """按chunk_size切分回复，以分块传输编码逐个发送SSE事件"""
+        mock = self.server.mock
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        pieces = [mock.reply[i:i + mock.chunk_size] for i in range(0, len(mock.reply), mock.chunk_size)]
+        events = [{"choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}]}
+                  for piece in pieces]
+        events.append({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        try:
+            for event in events:
+                event.update({"id": "chatcmpl-mock-stream", "object": "chat.completion.chunk",
+                              "created": int(time.time()), "model": model})
+                self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+                with mock.lock:
+                    mock.stream_chunks += 1
+                time.sleep(mock.chunk_delay)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            with mock.lock:
+                mock.aborted_streams += 1
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send(self, status: int, payload: dict, headers: Optional[dict] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # 客户端提前断开流属于预期情况，不打印异常
+
+
+class MockOpenAIServer:
+    """
+    在后台线程中运行的模拟服务
+
+    Args:
+        latency: 每个请求的处理延迟（秒）
+        failures: 依次返回的错误状态码，用完后返回200
+        reply: 成功时的回复内容
+        retry_after: 错误响应中的Retry-After头（秒），None表示不带
+        chunk_size: 流式响应每个分片的字符数
+        chunk_delay: 流式响应分片之间的间隔（秒）
+    """
+
+    def __init__(self, latency: float = 0.0, failures: Optional[List[int]] = None,
+                 reply: str = DEFAULT_REPLY, retry_after: Optional[float] = None,
+                 chunk_size: int = 8, chunk_delay: float = 0.0):
+        self.latency = latency
+        self.failures = list(failures or [])
+        self.reply = reply
+        self.retry_after = retry_after
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.stream_chunks = 0
+        self.aborted_streams = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'MockOpenAIServer':
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.mock = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> 'MockOpenAIServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -78,6 +78,11 @@ class ConfigManager:
                 'approach_height': 2.0,
                 'dwell_time': 1000,  # 毫秒
                 'delay_time': 1000   # 毫秒
+            },
+            
+            # 流式输出参数（stream_fanuc_nc / write_nc_program / /generate_nc?stream=1 和 mode=features）
+            'streaming': {
+                'chunk_size': 65536  # 每次写出的字符数
             }
         }
 
@@ -92,6 +97,17 @@ class ConfigManager:
             "M12": 1.75
         }
 
+        # 螺纹底孔直径（粗牙）
+        self.TAP_DRILL_MAP: Dict[str, float] = {
+            "M3": 2.5,
+            "M4": 3.3,
+            "M5": 4.2,
+            "M6": 5.0,
+            "M8": 6.8,
+            "M10": 8.5,
+            "M12": 10.2
+        }
+
         # 刀具映射
         self.TOOL_MAPPING: Dict[str, int] = {
             "center_drill": 1,
@@ -123,7 +139,210 @@ class ConfigManager:
         self.OCR_CONFIG = {
             'default_hole_count': 3,
             'text_extraction_timeout': 30,  # 秒
-            'confidence_threshold': 0.8
+            'confidence_threshold': 0.8,
+            'backend': 'auto'  # auto: 有tesserocr时使用常驻引擎，否则通过stdin调用tesseract命令行
+        }
+
+        # PDF页面流水线参数
+        self.PDF_PROCESSING_CONFIG = {
+            'default_dpi': 150,
+            'max_workers': 0,          # 0表示按CPU核数自动确定
+            'max_pending_pages': 2     # 每个工作进程最多缓存的已渲染页数，限制峰值内存
+        }
+
+        # 图纸文本获取参数（优先读取PDF文本层，只对缺少文本层的页面或位图区域OCR）
+        self.TEXT_ACQUISITION_CONFIG = {
+            'min_page_chars': 20,          # 文本层非空白字符少于该数量的页面整页OCR（扫描件、文字转曲的图纸）
+            'min_region_area': 0.02,       # 面积小于页面该比例的位图（标志、印章）不单独OCR
+            'min_region_chars': 5,         # 位图区域内文本层字符少于该数量时对该区域OCR
+            'dpi': None,                   # OCR渲染DPI，None表示使用PDF_PROCESSING_CONFIG['default_dpi']
+            'refine_dpi': 400,             # 置信度低于OCR_CONFIG['confidence_threshold']的单词按该DPI重新渲染识别，0表示关闭
+            'refine_padding': 1.5,         # 重新渲染单词时外接框四周的留白（pt）
+            'refine_psm': 7                # 未做文字区域检测时重新识别单词的页面分割模式（单行）
+        }
+
+        # 文字区域OCR参数（扫描图纸只识别尺寸标注、注释和标题栏区域，不整页OCR）
+        self.TEXT_REGION_CONFIG = {
+            'enabled': True,
+            'min_char_height': 1.2,        # 字符高度下限（mm），更小的连通域视为噪点
+            'max_char_height': 12.0,       # 字符高度上限（mm），更大的连通域视为图形
+            'merge_gap': 0.8,              # 相邻字符间距不超过字高的该倍数时合并为一行
+            'padding': 0.4,                # 裁剪时四周留白（字高的倍数）
+            'note_aspect': 0.85,           # 字符宽高比中位数不小于该值的文本行按汉字注释识别
+            'note_height_variation': 0.2,  # 连通域高度变异系数不小于该值（汉字部首高低不一）的文本行按注释识别
+            'dimension_min_confidence': 0.6,  # 按尺寸识别的置信度低于该值时改按注释重新识别
+            'dimension_lang': 'eng',
+            'dimension_whitelist': '0123456789.,+-±°×xX*/()φΦØ⌀RMHhCSTa ',
+            'dimension_psm': 7,            # 单行文本
+            'title_block_psm': 6,          # 统一文本块
+            'title_line_length': 15.0,     # 标题栏表格线的最短长度（mm）
+            'title_cell_max_height': 20.0, # 标题栏单元格的最大高度（mm）
+            'max_workers': 0               # OCR线程数，0表示按CPU核数自动确定
+        }
+
+        # 矢量几何特征提取参数（CAD导出的PDF直接读取矢量路径，不经渲染和边缘检测）
+        self.VECTOR_GEOMETRY_CONFIG = {
+            'enabled': True,               # 矢量页面优先使用矢量路径，扫描页面回退到栅格识别
+            'min_drawing_items': 1,        # 页面矢量绘图元素（直线、曲线、矩形）少于该数量时视为扫描件
+            'max_image_coverage': 0.5,     # 位图覆盖页面面积的比例超过该值时视为扫描件
+            'snap_tolerance': 0.05,        # 端点合并的网格大小（PDF单位pt）
+            'curve_samples': 8,            # 每段贝塞尔曲线展开的点数
+            'circle_tolerance': 0.01,      # 顶点和边中点到拟合圆的最大偏差（相对半径）
+            'min_circle_vertices': 8       # 判为圆的轮廓至少包含的顶点数
+        }
+
+        # 分块特征检测参数（超大图纸栅格）
+        self.TILED_DETECTION_CONFIG = {
+            'mode': 'auto',            # auto: 整图处理预计超出内存预算时分块; always / never
+            'memory_budget_mb': 512,   # 边缘检测与轮廓查找的工作内存上限（不含输入图像本身）
+            'tile_overlap': 128,       # 相邻分块的重叠宽度（像素）
+            'edge_halo': 16,           # 在卷积核所需边距之外额外读取的像素，减小Canny滞后阈值的分块差异
+            'min_tile_size': 512,
+            'bytes_per_pixel': 10,     # 每像素工作内存估计：模糊、边缘、形态学、轮廓查找副本及连通域标签
+            'max_workers': 0           # 0表示按CPU核数自动确定（OpenCV释放GIL，使用线程池）
+        }
+
+        # 金字塔特征检测参数（大幅面图纸先在降采样层上找候选轮廓，只在候选区域按原分辨率细化）
+        self.PYRAMID_DETECTION_CONFIG = {
+            'mode': 'auto',                 # auto: 像素数不少于min_pixels时使用; always / never
+            'min_pixels': 16000000,         # 约A3幅面300 DPI
+            'level': 2,                     # 查找候选的金字塔层级，每层边长减半（2为1/4分辨率）
+            'coarse_threshold_scale': 0.5,  # 降采样后细线对比度降低，候选层的Canny阈值乘以该系数
+            'merge_margin': 2,              # 候选外接框在候选层上向四周扩展的像素，相交的候选合并为一个细化区域
+            'max_refine_size': 2048,        # 外接框边长（原分辨率像素）超过该值的候选不细化，直接放大候选层轮廓
+            'max_refine_fraction': 0.5,     # 细化区域面积超过图像该比例时放弃金字塔，回退整图检测
+            'cache_size': 2,                # 缓存最近几张页面图像的金字塔，0表示不缓存
+            'max_workers': 0                # 细化区域的并发线程数，0表示按CPU核数
+        }
+
+        # 结果缓存参数
+        self.RESULT_CACHE_CONFIG = {
+            'enabled': True,
+            'cache_dir': '',           # 为空时使用CNC_AGENT_CACHE_DIR环境变量或用户缓存目录（~/.cache/cnc_agent），只允许当前用户访问
+            'max_size_mb': 512,        # 超过后按最近最少使用淘汰
+            'version': 1               # 流水线输出格式变化时递增，使旧条目失效
+        }
+
+        # 大模型API客户端参数
+        self.LLM_CLIENT_CONFIG = {
+            'max_concurrency': 4,          # 进程内同时进行的API请求上限
+            'timeout_seconds': 120,        # 单次请求超时
+            'max_retries': 3,              # 429/5xx/连接错误的重试次数
+            'backoff_base_seconds': 0.5,   # 指数退避基数（全抖动）
+            'backoff_max_seconds': 20,     # 单次退避上限（也限制服务端Retry-After）
+            'stream': False,               # 流式生成：逐行验证并上报中间输出（开头窗口规则未通过时提前中止并改用备用程序）
+            'stream_abort_severities': ['critical'],  # 增量验证中这些严重程度的规则未通过时提前中止
+            'latency_buckets': [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120]  # 延迟直方图桶上界（秒）
+        }
+
+        # 大模型回复缓存参数（条目存放在结果缓存目录，与其共用大小上限和LRU淘汰）
+        self.LLM_RESPONSE_CACHE_CONFIG = {
+            'enabled': True,
+            'ttl_hours': 168,          # 条目有效期，过期后重新调用大模型
+            'number_precision': 3,     # 规范化提示词时数值保留的小数位
+            'template_mode': False,    # 仅数值不同的提示词复用缓存程序并替换坐标/深度（需人工确认后开启）
+            'reject_severities': ['critical', 'high'],  # validate_nc_code中这些严重程度的规则未通过的程序不缓存
+        }
+
+        # 异步作业队列参数
+        self.JOB_QUEUE_CONFIG = {
+            'max_workers': 2,          # 同时执行的作业数
+            'max_queued': 16,          # 等待中的作业上限，超过后拒绝提交（HTTP 429）
+            'db_path': '',             # 为空时使用CNC_AGENT_JOB_DB环境变量或系统临时目录
+            'retention_hours': 24,     # 已结束作业的保留时间
+            'retry_after_seconds': 30, # 队列已满时建议客户端的重试间隔
+            'event_poll_seconds': 15   # 状态流无变化时发送心跳的间隔
+        }
+
+        # NC程序解释器参数（FANUC 0i-MD）
+        self.NC_INTERPRETER_CONFIG = {
+            'start_position': [0.0, 0.0, 0.0],      # 程序开始时的机床坐标
+            'reference_position': [0.0, 0.0, 0.0],  # G28返回的参考点（机床坐标）
+            'work_offsets': {},            # 工件坐标系偏置，如 {'G54': [-300.0, -200.0, -400.0]}，未设置的为0
+            'tool_lengths': {},            # 刀具长度补偿值，如 {1: 120.5}（键为H号）
+            'default_motion': 0,           # 上电时的01组模态（参数3402#0）
+            'peck_retract': 0.1,           # G73每次啄钻的回退量（参数5114）
+            'peck_clearance': 0.1,         # G83快速下降时距上次深度的间隙（参数5115）
+            'arc_radius_tolerance': 0.01,  # 圆弧起点与终点半径之差的允许值（参数3410）
+            'cycle_repeat_address': 'K'    # 固定循环重复次数的地址：FS0i为K，旧格式为L（解释器两者都接受，生成程序按此输出）
+        }
+
+        # NC程序压缩参数
+        self.NC_COMPACTION_CONFIG = {
+            'comments': 'keep',            # 注释处理：keep保留 / shorten截短 / strip删除
+            'max_comment_length': 24,      # shorten时注释保留的最多字符数
+            'decimal_places': 3,           # 小数位数（最小设定单位0.001mm）
+            'short_codes': False,          # G/M代码去掉前导零（G01 -> G1）
+            'word_separator': ' ',         # 地址字之间的分隔符，''时不留空格
+            'drop_blank_lines': True,      # 删除空行
+            'verify': True                 # 用解释器重放压缩前后的程序，运动不一致时返回原程序
+        }
+
+        # 加工时间估算参数（按机床参数设置，默认值对应常见立式加工中心）
+        self.CYCLE_TIME_CONFIG = {
+            'rapid_rates': [30000.0, 30000.0, 24000.0],  # X/Y/Z快速移动速度 mm/min（参数1420）
+            'accelerations': [2500.0, 2500.0, 2000.0],   # X/Y/Z加速度 mm/s²
+            'max_cutting_feed': 10000.0,   # 最大切削进给速度 mm/min（参数1430）
+            'feed_override': 1.0,          # 进给倍率
+            'rapid_override': 1.0,         # 快速移动倍率（F0/25%/50%/100%）
+            'tool_change_seconds': 5.0,    # 换刀时间（刀到刀）秒
+            'spindle_acceleration': 2000.0  # 主轴加减速 rpm/s，正反转切换按两段转速差计算
+        }
+
+        # 孔加工顺序优化参数
+        self.HOLE_SEQUENCING_CONFIG = {
+            'enabled': True,
+            'start_position': None,        # 刀具起点XY，None表示不限定起点
+            'min_holes': 3,                # 少于该孔数时保持原顺序
+            'neighbors': 8,                # 局部改进时每个孔考虑的近邻数
+            'or_opt_segment': 3,           # Or-opt一次移动的最多连续孔数
+            'time_limit_seconds': 0.5,     # 近邻表和局部改进的时间上限
+            'grid_serpentine': True,       # 规则阵列按蛇形顺序排列
+            'grid_tolerance': 0.01,        # 判断孔位同行/同列的坐标容差mm
+            'grid_min_fill': 0.8           # 阵列的最低填充率（孔数/行数×列数）
+        }
+
+        # 孔阵列紧凑输出参数（矩形阵列、螺栓孔圆用循环代替逐孔程序段）
+        self.HOLE_PATTERN_CONFIG = {
+            'mode': 'off',                 # off逐孔输出 / macro用户宏程序B的WHILE循环 / polar螺栓孔圆用G16极坐标（矩形阵列仍用宏程序）
+            'min_holes': 8,                # 少于该孔数时逐孔输出
+            'tolerance': 0.01,             # 孔位与阵列理论位置的最大偏差mm
+            'first_variable': 100          # 宏程序使用的公共变量起始号（#100-#199断电清零）
+        }
+
+        # 工序调度参数（混合零件按刀具合并工序，减少换刀）
+        self.OPERATION_SCHEDULER_CONFIG = {
+            'stage_order': ['spot_drill', 'drill', 'tap', 'counterbore', 'mill'],  # 同时可加工时优先的工序
+            'extra_tool_start': 11,        # 同类刀具有多种规格时，第二种起使用的刀号
+            'sequence_holes': True,        # 每把刀内按快速移动距离最短排列孔位
+            'default_thread_size': 'M10'
+        }
+
+        # 重复程序段提取为增量子程序的参数（M98 P... L...调用）
+        self.SUBPROGRAM_CONFIG = {
+            'enabled': False,              # generate_fanuc_nc 生成后自动提取子程序
+            'first_program_number': 1001,  # 第一个子程序号（O1001起依次编号）
+            'max_subprograms': 50,
+            'min_block_lines': 3,          # 子程序至少包含的程序段数
+            'max_block_lines': 2000,       # 搜索的最长重复程序段数
+            'min_saved_lines': 4,          # 提取后程序至少减少的行数
+            'decimal_places': 3,           # 增量坐标的小数位数（最小设定单位0.001mm）
+            'ignore_comments': True,       # 比较程序段时忽略注释（提取出的程序段不保留注释）
+            'verify': True                 # 展开子程序后用解释器重放，运动不一致时返回原程序
+        }
+
+        # 圆弧拟合参数（连续的短G01程序段改写为G02/G03）
+        self.ARC_FITTING_CONFIG = {
+            'enabled': False,              # generate_fanuc_nc 生成后自动拟合圆弧
+            'tolerance': 0.01,             # 原直线段与拟合圆弧的最大偏差mm（含弦高误差）
+            'min_segments': 3,             # 一段圆弧至少替换的G01程序段数
+            'min_radius': 0.5,             # 圆弧半径范围mm，超出时保留直线
+            'max_radius': 2000.0,
+            'arc_format': 'ij',            # ij用I/J给出圆心 / r用R给出半径（只拟合不超过180度的圆弧）
+            'decimal_places': 3,           # 输出坐标的小数位数（最小设定单位0.001mm）
+            'cutter_comp': False,          # 是否拟合刀具半径补偿（G41/G42）中的程序段
+            'keep_comments': True,         # 圆弧程序段保留被替换的第一个程序段的注释
+            'verify': True                 # 用解释器重放改写后的程序，出现新报警或终点改变时返回原程序
         }
 
         # 验证参数
@@ -228,7 +447,26 @@ IMAGE_PROCESSING_CONFIG = config_manager.IMAGE_PROCESSING_CONFIG
 FEATURE_RECOGNITION_CONFIG = config_manager.FEATURE_RECOGNITION_CONFIG
 GCODE_GENERATION_CONFIG = config_manager.GCODE_GENERATION_CONFIG
 THREAD_PITCH_MAP = config_manager.THREAD_PITCH_MAP
+TAP_DRILL_MAP = config_manager.TAP_DRILL_MAP
 TOOL_MAPPING = config_manager.TOOL_MAPPING
 COORDINATE_CONFIG = config_manager.COORDINATE_CONFIG
 OCR_CONFIG = config_manager.OCR_CONFIG
+PDF_PROCESSING_CONFIG = config_manager.PDF_PROCESSING_CONFIG
+VECTOR_GEOMETRY_CONFIG = config_manager.VECTOR_GEOMETRY_CONFIG
+TEXT_ACQUISITION_CONFIG = config_manager.TEXT_ACQUISITION_CONFIG
+TEXT_REGION_CONFIG = config_manager.TEXT_REGION_CONFIG
+TILED_DETECTION_CONFIG = config_manager.TILED_DETECTION_CONFIG
+PYRAMID_DETECTION_CONFIG = config_manager.PYRAMID_DETECTION_CONFIG
+RESULT_CACHE_CONFIG = config_manager.RESULT_CACHE_CONFIG
+JOB_QUEUE_CONFIG = config_manager.JOB_QUEUE_CONFIG
+LLM_CLIENT_CONFIG = config_manager.LLM_CLIENT_CONFIG
+LLM_RESPONSE_CACHE_CONFIG = config_manager.LLM_RESPONSE_CACHE_CONFIG
+NC_INTERPRETER_CONFIG = config_manager.NC_INTERPRETER_CONFIG
+NC_COMPACTION_CONFIG = config_manager.NC_COMPACTION_CONFIG
+CYCLE_TIME_CONFIG = config_manager.CYCLE_TIME_CONFIG
+HOLE_SEQUENCING_CONFIG = config_manager.HOLE_SEQUENCING_CONFIG
+HOLE_PATTERN_CONFIG = config_manager.HOLE_PATTERN_CONFIG
+OPERATION_SCHEDULER_CONFIG = config_manager.OPERATION_SCHEDULER_CONFIG
+SUBPROGRAM_CONFIG = config_manager.SUBPROGRAM_CONFIG
+ARC_FITTING_CONFIG = config_manager.ARC_FITTING_CONFIG
 VALIDATION_CONFIG = config_manager.VALIDATION_CONFIG
\ No newline at end of file
@@ -114,7 +114,10 @@ class ConfigValidator:
         
         if safety_config['delay_time'] < 0:
             errors.append("safety.delay_time 不能为负")
-        
+
+        if config['streaming']['chunk_size'] <= 0:
+            errors.append("streaming.chunk_size 必须大于0")
+
         return errors
     
     def validate_coordinate_config(self) -> List[str]:
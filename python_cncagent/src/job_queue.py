@@ -0,0 +1,436 @@
+"""
+异步作业队列
+将耗时的NC生成流水线放到有界工作线程池中执行，作业状态持久化在本地SQLite中，
+客户端提交后拿到作业ID，再轮询或订阅状态流、获取结果或取消作业
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config import JOB_QUEUE_CONFIG
+
+
+# 流水线进度阶段（按执行顺序）
+STAGES = ('render', 'ocr', 'detect', 'llm', 'validate')
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    """等待中的作业已达上限"""
+    pass
+
+
+class JobCancelledError(BaseException):
+    """
+    作业被取消
+
+    继承BaseException而不是Exception，使其能穿过流水线中大量的 except Exception 兜底处理，
+    一直传播到作业执行入口
+    """
+    pass
+
+
+# 当前线程正在执行的作业（流水线各阶段通过report_progress上报进度）
+_current = threading.local()
+
+
+def report_progress(stage: str, **detail: Any) -> None:
+    """
+    上报当前作业的进度阶段，并在作业已被请求取消时抛出JobCancelledError
+
+    不在作业线程中调用时不做任何事，流水线在命令行和同步接口中照常运行。
+
+    Args:
+        stage: 进度阶段，取值见STAGES
+        **detail: 阶段细节（如页码），必须可JSON序列化
+    """
+    job = getattr(_current, 'job', None)
+    if job is None:
+        return
+    queue, job_id = job
+    queue._set_stage(job_id, stage, detail)
+    check_cancelled()
+
+
+def report_output(line: str) -> None:
+    """
+    追加当前作业的一行中间输出（如流式生成中的NC代码行），供状态流实时推送
+
+    不在作业线程中调用时不做任何事。
+
+    Args:
+        line: 输出行
+    """
+    job = getattr(_current, 'job', None)
+    if job is not None:
+        job[0]._append_output(job[1], line)
+
+
+def with_current_job(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    包装要提交到其他线程池的函数，使其在执行时沿用调用线程所属的作业，
+    从而能在工作线程中上报进度和响应取消
+
+    Args:
+        func: 要包装的函数
+
+    Returns:
+        Callable: 包装后的函数；调用线程不属于任何作业时原样返回func
+    """
+    job = getattr(_current, 'job', None)
+    if job is None:
+        return func
+
+    def run(*args, **kwargs):
+        previous = getattr(_current, 'job', None)
+        _current.job = job
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.job = previous
+    return run
+
+
+def check_cancelled() -> None:
+    """当前作业已被请求取消时抛出JobCancelledError（协作式取消点）"""
+    job = getattr(_current, 'job', None)
+    if job is not None and job[0].is_cancel_requested(job[1]):
+        raise JobCancelledError(job[1])
+
+
+class JobQueue:
+    """
+    有界工作线程池 + SQLite作业存储
+
+    等待中的作业数超过max_queued时提交被拒绝（QueueFullError）；
+    排队中的作业取消后直接结束，运行中的作业在下一个进度上报点结束。
+    进程重启后，上次未结束的作业被标记为失败。
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_workers: Optional[int] = None,
+                 max_queued: Optional[int] = None, retention_hours: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        if db_path is None:
+            db_path = (os.getenv('CNC_AGENT_JOB_DB') or JOB_QUEUE_CONFIG['db_path']
+                       or os.path.join(tempfile.gettempdir(), 'cnc_agent_jobs.sqlite3'))
+        self.db_path = db_path
+        self.max_workers = max_workers or JOB_QUEUE_CONFIG['max_workers']
+        self.max_queued = max_queued if max_queued is not None else JOB_QUEUE_CONFIG['max_queued']
+        self.retention_seconds = (retention_hours if retention_hours is not None
+                                  else JOB_QUEUE_CONFIG['retention_hours']) * 3600
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._conn = None
+        self._executor = None
+        self._futures: Dict[str, Future] = {}
+        self._cleanups: Dict[str, Callable[[], None]] = {}
+        self._cancel_requested = set()
+        self._queued = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """延迟打开数据库（调用方须持有锁），首次打开时把上次进程遗留的未结束作业标记为失败"""
+        if self._conn is None:
+            if self.db_path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    detail TEXT,
+                    params TEXT,
+                    result TEXT,
+                    error TEXT,
+                    output_lines INTEGER NOT NULL DEFAULT 0,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            # 中间输出每行一条记录，追加和增量读取都只涉及新行
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_output (
+                    job_id TEXT NOT NULL,
+                    line_no INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    PRIMARY KEY (job_id, line_no)
+                )
+            """)
+            # 兼容没有中间输出行数列的旧数据库
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'output_lines' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN output_lines INTEGER NOT NULL DEFAULT 0")
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, version = version + 1 "
+                "WHERE status IN (?, ?)",
+                (FAILED, "服务重启，作业中断", time.time(), QUEUED, RUNNING)
+            )
+            self._conn = conn
+        return self._conn
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        """更新作业字段并唤醒等待状态变化的订阅者（调用方须持有锁）"""
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._connection().execute(
+            f"UPDATE jobs SET {assignments}, version = version + 1 WHERE id = ?",
+            (*fields.values(), job_id)
+        )
+        self._changed.notify_all()
+
+    def submit(self, func: Callable[..., Any], params: Optional[Dict[str, Any]] = None,
+               cleanup: Optional[Callable[[], None]] = None) -> str:
+        """
+        提交作业
+
+        Args:
+            func: 作业函数，以params为关键字参数调用，返回值须可JSON序列化
+            params: 作业参数，同时记录到作业存储中（不要放入密钥等敏感信息）
+            cleanup: 作业结束（成功、失败或取消）后调用，用于删除上传的临时文件
+
+        Returns:
+            str: 作业ID
+
+        Raises:
+            QueueFullError: 等待中的作业已达上限
+        """
+        params = params or {}
+        with self._lock:
+            if self._queued >= self.max_queued:
+                raise QueueFullError(f"作业队列已满（{self._queued}个等待中）")
+            self._purge_expired()
+            job_id = uuid.uuid4().hex
+            self._connection().execute(
+                "INSERT INTO jobs (id, status, params, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params, ensure_ascii=False, default=str), time.time())
+            )
+            self._queued += 1
+            if cleanup is not None:
+                self._cleanups[job_id] = cleanup
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='cnc-job')
+            self._futures[job_id] = self._executor.submit(self._run, job_id, func, params)
+        self.logger.info(f"作业已提交: {job_id}")
+        return job_id
+
+    def _run(self, job_id: str, func: Callable[..., Any], params: Dict[str, Any]) -> None:
+        """工作线程入口：执行作业并记录结果"""
+        with self._lock:
+            self._queued -= 1
+            if self._row(job_id)['status'] != QUEUED:
+                return  # 排队期间已取消，状态已在cancel中更新
+            self._update(job_id, status=RUNNING, started_at=time.time())
+
+        _current.job = (self, job_id)
+        try:
+            result = func(**params)
+            outcome = dict(status=SUCCEEDED, result=json.dumps(result, ensure_ascii=False, default=str))
+        except JobCancelledError:
+            self.logger.info(f"作业已取消: {job_id}")
+            outcome = dict(status=CANCELLED)
+        except Exception as e:
+            self.logger.error(f"作业执行失败 {job_id}: {str(e)}", exc_info=True)
+            outcome = dict(status=FAILED, error=str(e))
+        finally:
+            _current.job = None
+
+        with self._lock:
+            self._update(job_id, finished_at=time.time(), **outcome)
+            self._finish(job_id)
+
+    def _finish(self, job_id: str) -> None:
+        """释放作业的内存状态并执行清理回调（调用方须持有锁）"""
+        self._futures.pop(job_id, None)
+        self._cancel_requested.discard(job_id)
+        cleanup = self._cleanups.pop(job_id, None)
+        if cleanup is not None:
+            try:
+                cleanup()
+            except Exception as e:
+                self.logger.warning(f"作业清理失败 {job_id}: {str(e)}")
+
+    def _set_stage(self, job_id: str, stage: str, detail: Dict[str, Any]) -> None:
+        with self._lock:
+            self._update(job_id, stage=stage, detail=json.dumps(detail, ensure_ascii=False, default=str))
+
+    def _append_output(self, job_id: str, line: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO job_output (job_id, line_no, text) "
+                "SELECT id, output_lines, ? FROM jobs WHERE id = ?",
+                (line, job_id)
+            )
+            conn.execute(
+                "UPDATE jobs SET output_lines = output_lines + 1, version = version + 1 WHERE id = ?",
+                (job_id,)
+            )
+            self._changed.notify_all()
+
+    def output(self, job_id: str, start: int = 0) -> List[str]:
+        """
+        获取作业的中间输出行
+
+        Args:
+            job_id: 作业ID
+            start: 起始行号（跳过已取得的行）
+
+        Returns:
+            List[str]: 输出行，作业不存在时为空列表
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT text FROM job_output WHERE job_id = ? AND line_no >= ? ORDER BY line_no",
+                (job_id, start)
+            ).fetchall()
+        return [row['text'] for row in rows]
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._cancel_requested
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        取消作业
+
+        排队中的作业立即结束；运行中的作业在下一个进度上报点结束；已结束的作业不受影响。
+
+        Args:
+            job_id: 作业ID
+
+        Returns:
+            Dict: 取消请求后的作业状态，作业不存在时为None
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+            if future is not None and job_id not in self._cancel_requested:
+                self._cancel_requested.add(job_id)
+                if self._row(job_id)['status'] == QUEUED:
+                    if future.cancel():
+                        self._queued -= 1
+                    self._update(job_id, status=CANCELLED, finished_at=time.time())
+                    self._finish(job_id)
+                else:
+                    self._changed.notify_all()
+            row = self._row(job_id)
+            return self._to_dict(row) if row is not None else None
+
+    def _row(self, job_id: str) -> Optional[sqlite3.Row]:
+        return self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def _to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        status = row['status']
+        return {
+            'id': row['id'],
+            'status': status,
+            'stage': row['stage'],
+            'detail': json.loads(row['detail']) if row['detail'] else {},
+            'params': json.loads(row['params']) if row['params'] else {},
+            'error': row['error'],
+            'output_lines': row['output_lines'],
+            'cancel_requested': status == RUNNING and row['id'] in self._cancel_requested,
+            'version': row['version'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+        }
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取作业状态
+
+        Args:
+            job_id: 作业ID
+
+        Returns:
+            Dict: 状态、当前阶段、阶段细节和时间戳，作业不存在时为None
+        """
+        with self._lock:
+            row = self._row(job_id)
+            return self._to_dict(row) if row is not None else None
+
+    def result(self, job_id: str) -> Any:
+        """
+        获取成功作业的结果
+
+        Returns:
+            作业函数的返回值；作业不存在或尚未成功时为None
+        """
+        with self._lock:
+            row = self._row(job_id)
+        if row is None or row['status'] != SUCCEEDED:
+            return None
+        return json.loads(row['result'])
+
+    def wait_for_change(self, job_id: str, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        阻塞到作业状态版本号大于version或超时
+
+        Args:
+            job_id: 作业ID
+            version: 调用方已知的版本号
+            timeout: 最长等待秒数
+
+        Returns:
+            Dict: 最新作业状态（超时则为未变化的状态），作业不存在时为None
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                row = self._row(job_id)
+                remaining = deadline - time.monotonic()
+                if row is None or row['version'] > version or remaining <= 0:
+                    return self._to_dict(row) if row is not None else None
+                self._changed.wait(remaining)
+
+    def _purge_expired(self) -> None:
+        """删除超过保留时间的已结束作业（调用方须持有锁）"""
+        expired = f"status IN ({', '.join('?' * len(FINISHED_STATES))}) AND finished_at < ?"
+        params = (*FINISHED_STATES, time.time() - self.retention_seconds)
+        conn = self._connection()
+        conn.execute(f"DELETE FROM job_output WHERE job_id IN (SELECT id FROM jobs WHERE {expired})", params)
+        conn.execute(f"DELETE FROM jobs WHERE {expired}", params)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取队列统计信息
+
+        Returns:
+            Dict: 工作线程数、等待上限和各状态作业数
+        """
+        with self._lock:
+            counts = dict(self._connection().execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            return {
+                'max_workers': self.max_workers,
+                'max_queued': self.max_queued,
+                'queued': self._queued,
+                'jobs': {state: counts.get(state, 0) for state in (QUEUED, RUNNING) + FINISHED_STATES}
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """停止工作线程池，排队中的作业被取消"""
+        with self._lock:
+            pending = [job_id for job_id in self._futures if self._row(job_id)['status'] == QUEUED]
+        for job_id in pending:
+            self.cancel(job_id)
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+# 创建全局作业队列实例
+job_queue = JobQueue()
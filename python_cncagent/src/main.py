@@ -20,17 +20,18 @@ except ImportError:
 import os
 import sys
 from pathlib import Path
-from typing import Tuple, Optional, Dict, Any
+from typing import Tuple, Optional, Dict, Any, Iterator, List
 from .modules.unified_generator import generate_cnc_with_unified_approach
-from .modules.pdf_parsing_process import pdf_to_images, ocr_image, extract_text_from_pdf
+from .modules.pdf_parsing_process import pdf_to_images, ocr_image, extract_text_from_pdf, process_pdf_pages
 from .modules.feature_definition import identify_features, extract_dimensions, extract_highest_y_center_point, adjust_coordinate_system, select_coordinate_reference
 from .modules.material_tool_matcher import analyze_user_description
-from .modules.gcode_generation import generate_fanuc_nc, validate_nc_code
+from .modules.gcode_generation import generate_fanuc_nc, stream_fanuc_nc, validate_nc_code, write_nc_program
 from .modules.validation import validate_features, validate_user_description, validate_parameters
 from .modules.simulation_output import generate_simulation_report, visualize_features
 from .modules.mechanical_drawing_expert import MechanicalDrawingExpert
 from .modules.ai_nc_helper import AI_NC_Helper
 from .modules.simple_nc_gui import run_gui
+from .result_cache import result_cache
 import logging
 import numpy as np
 
@@ -172,10 +173,17 @@ def _select_and_adjust_coordinate_system(features: List[Dict], drawing_info: Any
     return adjusted_features, origin_point
 
 
+def _is_cacheable_program(nc_program: str) -> bool:
+    """备用程序和错误程序不写入缓存，避免API故障的结果被重复返回"""
+    return bool(nc_program and nc_program.strip()) and \
+        "FALLBACK MODE" not in nc_program and "(ERROR PROGRAM)" not in nc_program
+
+
 def generate_nc_from_pdf(pdf_path: str, user_description: str, scale: float = 1.0,
                         coordinate_strategy: str = "highest_y", custom_origin: Optional[Tuple[float, float]] = None,
                         api_key: Optional[str] = None, model: str = "gpt-3.5-turbo",
-                        model_3d_path: Optional[str] = None, material: str = "Aluminum") -> str:
+                        model_3d_path: Optional[str] = None, material: str = "Aluminum",
+                        use_cache: bool = True) -> str:
     """
     完整流程：从PDF图纸、3D模型和用户描述生成NC程序（重构版）
     直接使用大模型生成，PDF/图像/3D模型特征仅作为辅助参考
@@ -189,6 +197,8 @@ def generate_nc_from_pdf(pdf_path: str, user_description: str, scale: float = 1.
         api_key (str): 大模型API密钥
         model (str): 使用的模型名称
         model_3d_path (str): 3D模型文件路径（可选）
+        material (str): 材料类型
+        use_cache (bool): 是否使用结果缓存（按文件内容和规范化参数寻址）
     
     Returns:
         str: 生成的NC程序代码
@@ -196,16 +206,40 @@ def generate_nc_from_pdf(pdf_path: str, user_description: str, scale: float = 1.
     import logging
     logging.info("开始处理输入文件...")
     
-    # 使用重构后的AI优先生成器，直接调用大模型生成NC代码
-    logging.info("使用大模型直接生成NC程序，PDF/3D模型特征仅作为辅助参考...")
-    nc_program = generate_cnc_with_unified_approach(
-        user_prompt=user_description, 
-        pdf_path=pdf_path,
-        model_3d_path=model_3d_path,  # 新增3D模型路径参数
-        api_key=api_key,
-        model=model,
-        material=material  # 添加材料参数
-    )
+    nc_program = None
+    cache_key = None
+    if use_cache:
+        try:
+            cache_key = result_cache.make_key(
+                'nc_program',
+                [result_cache.file_digest(pdf_path), result_cache.file_digest(model_3d_path)],
+                description=result_cache.normalize_text(user_description),
+                material=result_cache.normalize_text(material),
+                scale=round(float(scale), 6),
+                coordinate_strategy=coordinate_strategy,
+                custom_origin=custom_origin,
+                model=model
+            )
+            nc_program = result_cache.get('nc_program', cache_key)
+        except OSError as e:
+            logging.warning(f"计算缓存键失败，跳过缓存: {str(e)}")
+            cache_key = None
+    
+    if nc_program is not None:
+        logging.info("命中NC程序缓存，跳过生成流程")
+    else:
+        # 使用重构后的AI优先生成器，直接调用大模型生成NC代码
+        logging.info("使用大模型直接生成NC程序，PDF/3D模型特征仅作为辅助参考...")
+        nc_program = generate_cnc_with_unified_approach(
+            user_prompt=user_description, 
+            pdf_path=pdf_path,
+            model_3d_path=model_3d_path,  # 新增3D模型路径参数
+            api_key=api_key,
+            model=model,
+            material=material  # 添加材料参数
+        )
+        if cache_key and _is_cacheable_program(nc_program):
+            result_cache.put('nc_program', cache_key, nc_program)
     
     # 生成模拟报告和可视化
     logging.info("正在生成模拟报告...")
@@ -219,6 +253,41 @@ def generate_nc_from_pdf(pdf_path: str, user_description: str, scale: float = 1.
     
     return nc_program
 
+
+def stream_nc_from_pdf(pdf_path: str, user_description: str, scale: float = 1.0,
+                       coordinate_strategy: str = "highest_y",
+                       custom_origin: Optional[Tuple[float, float]] = None) -> Iterator[str]:
+    """
+    特征驱动的流式生成：从PDF识别几何特征，再由 stream_fanuc_nc 逐行生成NC程序（不调用大模型）
+    
+    特征识别、坐标调整和参数校验在返回之前完成，出错时立即抛出；返回的迭代器直接交给
+    分块HTTP响应或 write_nc_program，程序文本不在内存中累积，适合上千个孔的大程序
+    
+    Args:
+        pdf_path (str): PDF图纸路径
+        user_description (str): 用户加工描述
+        scale (float): 比例尺因子
+        coordinate_strategy (str): 坐标基准策略
+        custom_origin (Tuple[float, float]): 自定义原点坐标
+    
+    Returns:
+        Iterator[str]: NC程序的各行（不含换行符）
+    """
+    import logging
+    _validate_inputs(user_description)
+    drawing_text = extract_text_from_pdf(pdf_path)
+    features = []
+    for page in process_pdf_pages(pdf_path, run_ocr=False, drawing_text=drawing_text):
+        # 与 _identify_features_from_images 相同，只保留置信度较高的特征
+        features.extend(f for f in page.get('features') or [] if f.get('confidence', 0) > 0.7)
+    logging.info(f"流式生成：识别到 {len(features)} 个高置信度特征")
+    
+    description_analysis, features = _analyze_and_validate_features(features, user_description)
+    features, _ = _select_and_adjust_coordinate_system(features, None, description_analysis,
+                                                       coordinate_strategy, custom_origin)
+    return stream_fanuc_nc(features, description_analysis, scale)
+
+
 def preprocess_image(image):
     """
     预处理图像以提高特征识别准确性
@@ -354,6 +423,7 @@ if __name__ == "__main__":
         print("命令选项:")
         print("  gui          启动AI辅助NC编程工具图形界面")
         print("  process      处理PDF并生成NC程序")
+        print("  stream       按图纸识别的特征流式生成NC程序并直接写入output.nc（不调用大模型，适合大程序）")
         print("  help         显示帮助信息")
         print("")
         print("处理PDF参数:")
@@ -386,8 +456,9 @@ if __name__ == "__main__":
         print("可用命令:")
         print("  gui    - 启动图形界面")
         print("  process - 处理PDF并生成NC程序")
+        print("  stream - 按图纸特征流式生成NC程序，直接写入output.nc")
         print("  help   - 显示帮助信息")
-    elif command == "process":
+    elif command in ("process", "stream"):
         if len(sys.argv) < 3:
             print("错误: 需要提供PDF路径和用户描述")
             print("用法: python main.py process <pdf_path> [model_3d_path] <user_description> [scale] [coordinate_strategy] [custom_origin_x] [custom_origin_y]")
@@ -473,36 +544,44 @@ if __name__ == "__main__":
         if custom_origin:
             print(f"自定义原点: {custom_origin}")
         
+        # 确保输出路径安全
+        output_path = "output.nc"
+        output_file = Path(output_path).resolve()
+        if not output_file.is_relative_to(base_path):
+            print("错误: 输出路径超出允许范围")
+            sys.exit(1)
+        
         try:
-            # 检查是否提供了API密钥（优先使用DeepSeek，然后是OpenAI）
-            import os
-            api_key = os.getenv('DEEPSEEK_API_KEY') or os.getenv('OPENAI_API_KEY')  # 优先使用DeepSeek API密钥
-            model = os.getenv('DEEPSEEK_MODEL', os.getenv('OPENAI_MODEL', 'deepseek-chat'))  # 优先使用DeepSeek模型，默认deepseek-chat
-            
-            nc_program = generate_nc_from_pdf(
-                pdf_path, 
-                user_description, 
-                scale, 
-                coordinate_strategy, 
-                custom_origin,
-                api_key=api_key,
-                model=model,
-                model_3d_path=model_3d_path  # 传递3D模型路径
-            )
-            print("\n生成的NC程序:")
-            print(nc_program)
-            
-            # 保存NC程序到文件
-            output_path = "output.nc"
-            # 确保输出路径安全
-            output_file = Path(output_path).resolve()
-            base_path = Path.cwd().resolve()
-            if not output_file.is_relative_to(base_path):
-                print("错误: 输出路径超出允许范围")
-                sys.exit(1)
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(nc_program)
-            print(f"\nNC程序已保存到: {output_path}")
+            if command == "stream":
+                if model_3d_path:
+                    print("流式生成只使用PDF图纸特征，忽略3D模型")
+                # 程序逐行生成、分块写入文件，不在内存中保留整个程序
+                lines = stream_nc_from_pdf(pdf_path, user_description, scale, coordinate_strategy, custom_origin)
+                written = write_nc_program(lines, output_path)
+                print(f"\nNC程序已保存到: {output_path}（{written} 字符）")
+            else:
+                # 检查是否提供了API密钥（优先使用DeepSeek，然后是OpenAI）
+                import os
+                api_key = os.getenv('DEEPSEEK_API_KEY') or os.getenv('OPENAI_API_KEY')  # 优先使用DeepSeek API密钥
+                model = os.getenv('DEEPSEEK_MODEL', os.getenv('OPENAI_MODEL', 'deepseek-chat'))  # 优先使用DeepSeek模型，默认deepseek-chat
+                
+                # 大模型生成的程序本身是完整文本，打印、缓存校验都需要完整程序
+                nc_program = generate_nc_from_pdf(
+                    pdf_path, 
+                    user_description, 
+                    scale, 
+                    coordinate_strategy, 
+                    custom_origin,
+                    api_key=api_key,
+                    model=model,
+                    model_3d_path=model_3d_path  # 传递3D模型路径
+                )
+                print("\n生成的NC程序:")
+                print(nc_program)
+                
+                # 保存NC程序到文件
+                write_nc_program(nc_program, output_path)
+                print(f"\nNC程序已保存到: {output_path}")
             
         except Exception as e:
             print(f"处理过程中出现错误: {str(e)}")
@@ -4,9 +4,11 @@ AI驱动的NC程序生成模块
 """
 import json
 import logging
+import threading
 import time
 import os
 import re
+import unicodedata
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from pathlib import Path
@@ -31,6 +33,11 @@ except ImportError:
 
 # 不再导入OpenCV和numpy，因为我们现在使用大模型进行特征识别
 from .prompt_builder import prompt_builder
+from .llm_client import llm_client_pool
+from src.config import LLM_CLIENT_CONFIG, LLM_RESPONSE_CACHE_CONFIG
+from src.exceptions import NCGenerationError
+from src.job_queue import report_output, report_progress
+from src.result_cache import result_cache
 
 @dataclass
 class ProcessingRequirements:
@@ -51,6 +58,291 @@ class ProcessingRequirements:
         if self.special_requirements is None:
             self.special_requirements = []
 
+
+class NCLineStream:
+    """
+    把大模型流式输出的文本增量切分成行，并挑出其中的NC代码行
+
+    出现代码块（```）后只取代码块内的行；在此之前取看起来像NC代码的行
+    （以程序号、段号、G/M/T/S/F或坐标字开头，或为注释、%、宏语句）。
+    """
+
+    NC_LINE_PATTERN = re.compile(r'^(?:[NOGMTSFXYZIJKR]\d|[%(#])', re.IGNORECASE)
+
+    def __init__(self):
+        self.buffer = ""
+        self.in_code_block = False
+        self.seen_code_block = False
+
+    def feed(self, delta: str) -> List[str]:
+        """
+        接收一段文本增量
+
+        Returns:
+            List[str]: 本次凑成完整行的NC代码行
+        """
+        self.buffer += delta
+        *complete, self.buffer = self.buffer.split('\n')
+        return [line for line in map(self._accept, complete) if line]
+
+    def flush(self) -> List[str]:
+        """流结束时处理最后一行（没有换行符结尾）"""
+        line, self.buffer = self._accept(self.buffer), ""
+        return [line] if line else []
+
+    def _accept(self, line: str) -> Optional[str]:
+        line = line.strip()
+        if line.startswith('```'):
+            self.in_code_block = not self.in_code_block
+            self.seen_code_block = True
+            return None
+        if self.in_code_block:
+            return line or None
+        if not self.seen_code_block and self.NC_LINE_PATTERN.match(line):
+            return line
+        return None
+
+
+PROMPT_NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+FEATURE_LINE_PATTERN = re.compile(r'^(?:特征\d+:\s*|- )')
+
+
+def canonicalize_prompt(prompt: str, precision: Optional[int] = None, stable: bool = False) -> str:
+    """
+    规范化提示词，作为大模型回复缓存的键
+
+    全角转半角、合并行内空白并删除空行，数值按precision位小数舍入，
+    连续的特征列表行（"特征N: ..." 或 "- ..."）去掉序号后排序，使特征顺序不影响缓存键
+
+    Args:
+        prompt: build_optimized_prompt生成的提示词
+        precision: 数值保留的小数位，None时使用配置
+        stable: 特征行只按去掉数值后的文本排序（形状相同的行保持原顺序），
+            供模板模式按位置对应新旧数值
+
+    Returns:
+        str: 规范化后的提示词
+    """
+    if precision is None:
+        precision = LLM_RESPONSE_CACHE_CONFIG['number_precision']
+
+    def round_number(match):
+        text = f"{round(float(match.group()), precision):.{precision}f}"
+        return text.rstrip('0').rstrip('.') if '.' in text else text
+
+    def masked(line):
+        return PROMPT_NUMBER_PATTERN.sub('#', line)
+
+    lines, run = [], []
+
+    def flush_run():
+        lines.extend(sorted(run, key=masked if stable else (lambda line: (masked(line), line))))
+        run.clear()
+
+    for raw_line in unicodedata.normalize('NFKC', prompt).split('\n'):
+        line = " ".join(raw_line.split())
+        if not line:
+            continue
+        line = PROMPT_NUMBER_PATTERN.sub(round_number, line)
+        match = FEATURE_LINE_PATTERN.match(line)
+        if match:
+            run.append("- " + line[match.end():])
+        else:
+            flush_run()
+            lines.append(line)
+    flush_run()
+    return "\n".join(lines)
+
+
+class LLMResponseCache:
+    """
+    大模型回复缓存
+
+    以规范化提示词（连同模型、API地址和系统提示词）为键缓存提取出的NC程序。
+    条目持久化在结果缓存目录中，重启后仍然有效；超过有效期视为未命中，
+    占用空间计入结果缓存的大小上限，按最近最少使用淘汰。
+
+    模板模式下另存一个把数值换成占位符的键：提示词只有数值不同时，
+    把缓存程序中与旧数值相等的坐标/深度字（X/Y/Z/I/J/K/R/Q）替换为新数值，
+    替换有歧义、找不到对应字或替换后验证出严重问题时放弃，按未命中处理。
+    """
+
+    ADDRESS_PATTERN = re.compile(r'([XYZIJKRQ])(-?)(\d+\.?\d*|\.\d+)', re.IGNORECASE)
+    COUNTERS = ('exact_hits', 'template_hits', 'template_rejected', 'expired', 'misses', 'stores', 'invalid')
+
+    def __init__(self, cache=None, ttl_hours: Optional[float] = None, template_mode: Optional[bool] = None,
+                 enabled: Optional[bool] = None):
+        self.logger = logging.getLogger(__name__)
+        self.cache = cache or result_cache
+        self.ttl_seconds = (ttl_hours if ttl_hours is not None else LLM_RESPONSE_CACHE_CONFIG['ttl_hours']) * 3600
+        self.template_mode = (template_mode if template_mode is not None
+                              else LLM_RESPONSE_CACHE_CONFIG['template_mode'])
+        self.enabled = enabled if enabled is not None else LLM_RESPONSE_CACHE_CONFIG['enabled']
+        self._lock = threading.Lock()
+        self.counters = {name: 0 for name in self.COUNTERS}
+
+    def get(self, prompt: str, **context) -> Optional[str]:
+        """
+        查找提示词对应的缓存程序
+
+        Args:
+            prompt: 提示词
+            **context: 影响回复的其他参数（模型、API地址、系统提示词等）
+
+        Returns:
+            Optional[str]: 缓存（或重新参数化）的NC程序，未命中时为None
+        """
+        if not self.enabled:
+            return None
+        exact_key = self.cache.make_key('llm_response', [], prompt=canonicalize_prompt(prompt), **context)
+        entry = self._load('llm_response', exact_key)
+        if entry is not None:
+            self._count('exact_hits')
+            self.logger.info("大模型回复缓存命中（精确匹配）")
+            return entry['program']
+
+        if self.template_mode:
+            template, numbers = self._template(prompt)
+            entry = self._load('llm_template', self.cache.make_key('llm_template', [], template=template, **context))
+            if entry is not None:
+                program = self._reparameterize(entry['program'], entry['numbers'], numbers)
+                if program is not None:
+                    self._count('template_hits')
+                    self.logger.info("大模型回复缓存命中（模板匹配，已替换数值）")
+                    return program
+                self._count('template_rejected')
+                self.logger.info("大模型回复缓存的模板无法安全替换数值，重新调用大模型")
+
+        self._count('misses')
+        return None
+
+    def put(self, prompt: str, program: str, **context) -> None:
+        """
+        缓存提示词对应的NC程序
+
+        只缓存通过 validate_nc_code 的程序（没有 reject_severities 中严重程度的规则未通过），
+        有问题的回复不会对之后相同的请求重复返回
+
+        Args:
+            prompt: 提示词
+            program: 从大模型回复中提取的NC程序
+            **context: 与get相同的其他参数
+        """
+        if not self.enabled or not program:
+            return
+        failed = self._failed_rules(program)
+        if failed:
+            self._count('invalid')
+            self.logger.info(f"大模型回复未通过验证，不缓存: {', '.join(failed)}")
+            return
+        created = time.time()
+        exact_key = self.cache.make_key('llm_response', [], prompt=canonicalize_prompt(prompt), **context)
+        self.cache.put('llm_response', exact_key, {'program': program, 'created': created})
+        if self.template_mode:
+            template, numbers = self._template(prompt)
+            self.cache.put('llm_template', self.cache.make_key('llm_template', [], template=template, **context),
+                           {'program': program, 'numbers': numbers, 'created': created})
+        self._count('stores')
+
+    @staticmethod
+    def _failed_rules(program: str) -> List[str]:
+        """程序未通过的、严重程度在 reject_severities 中的规则名"""
+        from .nc_code_validator import nc_validator
+        severities = set(LLM_RESPONSE_CACHE_CONFIG['reject_severities'])
+        validation = nc_validator.validate_nc_code(program)
+        return [result['rule'] for result in validation['safety_results'] + validation['correctness_results']
+                if not result['passed'] and result.get('severity', 'medium') in severities]
+
+    def _load(self, layer: str, key: str) -> Optional[Dict]:
+        """读取条目，过期的条目删除后按未命中处理"""
+        entry = self.cache.get(layer, key)
+        if entry is None:
+            return None
+        if time.time() - entry['created'] > self.ttl_seconds:
+            self.cache.delete(layer, key)
+            self._count('expired')
+            return None
+        return entry
+
+    @staticmethod
+    def _template(prompt: str) -> Tuple[str, List[str]]:
+        """把规范化提示词中的数值换成占位符，返回 (模板, 按出现顺序的数值列表)"""
+        canonical = canonicalize_prompt(prompt, stable=True)
+        return PROMPT_NUMBER_PATTERN.sub('#', canonical), PROMPT_NUMBER_PATTERN.findall(canonical)
+
+    def _reparameterize(self, program: str, old_numbers: List[str], new_numbers: List[str]) -> Optional[str]:
+        """
+        把程序中与旧数值相等的坐标/深度字替换为对应的新数值（保留符号和小数位数）
+
+        Returns:
+            Optional[str]: 替换后的程序；旧数值对应多个新值、同时出现在未变化的位置、
+                程序中找不到对应的字，或替换后的程序有严重问题时返回None
+        """
+        mapping, unchanged = {}, set()
+        for old, new in zip(old_numbers, new_numbers):
+            if old == new:
+                unchanged.add(float(old))
+            elif mapping.setdefault(float(old), float(new)) != float(new):
+                return None
+        if not mapping:
+            return program
+        if unchanged & mapping.keys():
+            return None
+
+        replaced = set()
+
+        def replace(match):
+            value = float(match.group(3))
+            if value not in mapping:
+                return match.group(0)
+            replaced.add(value)
+            return match.group(1) + match.group(2) + self._format_like(match.group(3), mapping[value])
+
+        result = self.ADDRESS_PATTERN.sub(replace, program)
+        if replaced != mapping.keys():
+            return None
+
+        from .nc_code_validator import nc_validator
+        if nc_validator.validate_nc_code(result)['has_critical_issues']:
+            return None
+        return result
+
+    @staticmethod
+    def _format_like(token: str, value: float) -> str:
+        """按原数值字的写法格式化新数值：保留小数点风格，小数位数不少于原值"""
+        needed = format(value, '.6f').rstrip('0').split('.')[1]
+        if '.' not in token and not needed:
+            return f"{value:.0f}"
+        decimals = max(len(token.partition('.')[2]), len(needed))
+        return f"{value:.{decimals}f}" if decimals else f"{value:.0f}."
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> Dict[str, object]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            Dict: 精确/模板命中、模板放弃、过期、未命中、写入和未通过验证不缓存的次数，以及命中率
+        """
+        with self._lock:
+            counters = dict(self.counters)
+        hits = counters['exact_hits'] + counters['template_hits']
+        lookups = hits + counters['misses']
+        counters.update({
+            'enabled': self.enabled,
+            'template_mode': self.template_mode,
+            'hit_rate': hits / lookups if lookups else 0.0
+        })
+        return counters
+
+
+# 创建全局大模型回复缓存实例
+llm_response_cache = LLMResponseCache()
+
+
 class AIDrivenCNCGenerator:
     """
     AI驱动的CNC程序生成器
@@ -545,82 +837,54 @@ class AIDrivenCNCGenerator:
                 import os
                 deepseek_api_base = os.getenv('DEEPSEEK_API_BASE', 'https://api.deepseek.com')
                 
-                # 使用OpenAI兼容接口
-                from openai import OpenAI
-                
                 # 根据模型名称或API基础URL判断是否使用DeepSeek
                 is_deepseek = ('deepseek' in self.model.lower()) or ('deepseek' in deepseek_api_base.lower())
                 
                 if is_deepseek:
                     # 使用DeepSeek API配置
                     self.logger.info(f"使用DeepSeek API: {deepseek_api_base}")
-                    client = OpenAI(
-                        api_key=self.api_key,
-                        base_url=deepseek_api_base
-                    )
+                    base_url = deepseek_api_base
                 else:
                     # 使用标准OpenAI API
                     self.logger.info("使用标准OpenAI API")
-                    client = OpenAI(api_key=self.api_key)
+                    base_url = None
                 
-                response = client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": "你是一个专业的FANUC数控机床编程专家，专门生成符合FANUC标准的NC程序代码。"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.1,  # 低温度以获得更一致的结果
-                    max_tokens=4000  # 增加输出长度限制，以支持更复杂的NC程序
-                )
+                messages = [
+                    {"role": "system", "content": "你是一个专业的FANUC数控机床编程专家，专门生成符合FANUC标准的NC程序代码。"},
+                    {"role": "user", "content": prompt}
+                ]
                 
-                generated_code = response.choices[0].message.content
-                self.logger.info(f"API调用成功，响应长度: {len(generated_code)}")
-                
-                # 提取代码块（如果有的话）
-                if "```" in generated_code:
-                    import re
-                    # 尝试多种代码块提取模式
-                    code_patterns = [
-                        r'```(?:nc|gcode|fanuc)?\n(.*?)\n```',  # 标准代码块
-                        r'```(?:nc|gcode|fanuc)?\n(.*?)(?=```|$)',  # 开放式代码块（不强制闭合）
-                        r'```\n(.*?)\n```',  # 通用代码块
-                        r'```\n(.*?)(?=```|$)'  # 开放式通用代码块
-                    ]
-                    
-                    for pattern in code_patterns:
-                        code_blocks = re.findall(pattern, generated_code, re.DOTALL)
-                        if code_blocks:
-                            self.logger.info(f"使用模式 '{pattern}' 提取到 {len(code_blocks)} 个代码块")
-                            # 返回最大的代码块（通常是最完整的）
-                            largest_block = max(code_blocks, key=len)
-                            return largest_block.strip()
+                # 仅坐标或深度不同的重复作业直接复用缓存的程序
+                cache_context = {"model": self.model, "base_url": base_url, "system_prompt": messages[0]["content"]}
+                cached_program = llm_response_cache.get(prompt, **cache_context)
+                if cached_program is not None:
+                    return cached_program
                 
-                # 如果没有找到代码块，检查是否以G代码开头或包含G/M代码
-                import re
-                if re.search(r'(?:^|\n)\s*G\d+|M\d+', generated_code):
-                    # 从第一个G/M代码开始提取
-                    start_match = re.search(r'(?:^|\n)\s*(?:G|M)\d+', generated_code)
-                    if start_match:
-                        start_pos = start_match.start()
-                        # 找到最后一个G代码或M代码
-                        end_matches = list(re.finditer(r'(?:^|\n)\s*M30', generated_code))  # 程序结束
-                        if end_matches:
-                            end_pos = end_matches[-1].end()
-                            return generated_code[start_pos:end_pos].strip()
-                        else:
-                            # 找到其他结束指令
-                            end_matches = list(re.finditer(r'(?:^|\n)\s*M0[25]|%', generated_code))
-                            if end_matches:
-                                end_pos = end_matches[-1].end()
-                                return generated_code[start_pos:end_pos].strip()
-                            else:
-                                return generated_code[start_pos:].strip()
+                if LLM_CLIENT_CONFIG['stream']:
+                    # 流式生成：逐行验证，严重问题提前中止
+                    generated_code = self._stream_large_language_model(messages, base_url)
+                else:
+                    # 使用进程内共享的OpenAI兼容客户端（连接复用、并发限制、退避重试）
+                    generated_code = llm_client_pool.chat_completion(
+                        api_key=self.api_key,
+                        base_url=base_url,
+                        model=self.model,
+                        messages=messages,
+                        temperature=0.1,  # 低温度以获得更一致的结果
+                        max_tokens=4000  # 增加输出长度限制，以支持更复杂的NC程序
+                    )
+                self.logger.info(f"API调用成功，响应长度: {len(generated_code)}")
                 
-                return generated_code.strip()
+                nc_code = self._extract_nc_code(generated_code)
+                llm_response_cache.put(prompt, nc_code, **cache_context)
+                return nc_code
             else:
                 # 没有API密钥，记录警告
                 self.logger.warning("未提供API密钥，使用模拟生成。请检查DEEPSEEK_API_KEY或OPENAI_API_KEY环境变量是否正确设置。")
                 return self._generate_fallback_code(prompt)
+        except NCGenerationError as e:
+            self.logger.warning(f"大模型生成的代码未通过增量验证: {str(e)}")
+            return self._generate_fallback_code(prompt)
         except Exception as e:
             self.logger.error(f"调用大模型API时出错: {str(e)}")
             # 详细错误信息，帮助诊断问题
@@ -633,6 +897,109 @@ class AIDrivenCNCGenerator:
             self.logger.error(f"调用大模型API时出错: {str(e)}")
             return self._generate_fallback_code(prompt)
     
+    def _extract_nc_code(self, generated_code: str) -> str:
+        """
+        从大模型回复中提取NC代码
+        
+        Args:
+            generated_code: 模型的完整回复文本
+            
+        Returns:
+            str: 提取出的NC代码
+        """
+        # 提取代码块（如果有的话）
+        if "```" in generated_code:
+            # 尝试多种代码块提取模式
+            code_patterns = [
+                r'```(?:nc|gcode|fanuc)?\n(.*?)\n```',  # 标准代码块
+                r'```(?:nc|gcode|fanuc)?\n(.*?)(?=```|$)',  # 开放式代码块（不强制闭合）
+                r'```\n(.*?)\n```',  # 通用代码块
+                r'```\n(.*?)(?=```|$)'  # 开放式通用代码块
+            ]
+            
+            for pattern in code_patterns:
+                code_blocks = re.findall(pattern, generated_code, re.DOTALL)
+                if code_blocks:
+                    self.logger.info(f"使用模式 '{pattern}' 提取到 {len(code_blocks)} 个代码块")
+                    # 返回最大的代码块（通常是最完整的）
+                    largest_block = max(code_blocks, key=len)
+                    return largest_block.strip()
+        
+        # 如果没有找到代码块，检查是否以G代码开头或包含G/M代码
+        if re.search(r'(?:^|\n)\s*G\d+|M\d+', generated_code):
+            # 从第一个G/M代码开始提取
+            start_match = re.search(r'(?:^|\n)\s*(?:G|M)\d+', generated_code)
+            if start_match:
+                start_pos = start_match.start()
+                # 找到最后一个G代码或M代码
+                end_matches = list(re.finditer(r'(?:^|\n)\s*M30', generated_code))  # 程序结束
+                if end_matches:
+                    end_pos = end_matches[-1].end()
+                    return generated_code[start_pos:end_pos].strip()
+                else:
+                    # 找到其他结束指令
+                    end_matches = list(re.finditer(r'(?:^|\n)\s*M0[25]|%', generated_code))
+                    if end_matches:
+                        end_pos = end_matches[-1].end()
+                        return generated_code[start_pos:end_pos].strip()
+                    else:
+                        return generated_code[start_pos:].strip()
+        
+        return generated_code.strip()
+    
+    def _stream_large_language_model(self, messages: List[Dict[str, str]], base_url: Optional[str] = None) -> str:
+        """
+        流式调用大语言模型，NC代码行一到达即上报并做增量验证
+        
+        开头窗口内的规则一旦确定未通过且严重程度在中止范围内，立即断开流，
+        不再等待（也不再支付）剩余的输出。
+        
+        Args:
+            messages: 对话消息列表
+            base_url: API基础地址
+            
+        Returns:
+            str: 模型的完整回复文本
+            
+        Raises:
+            NCGenerationError: 增量验证发现严重问题，生成被提前中止
+        """
+        from .nc_code_validator import nc_validator
+        
+        abort_severities = set(LLM_CLIENT_CONFIG['stream_abort_severities'])
+        splitter = NCLineStream()
+        validation = nc_validator.start_incremental()
+        chunks = []
+        start = time.perf_counter()
+        stream = llm_client_pool.stream_chat_completion(
+            api_key=self.api_key,
+            base_url=base_url,
+            model=self.model,
+            messages=messages,
+            temperature=0.1,
+            max_tokens=4000
+        )
+        
+        def accept(lines: List[str]) -> None:
+            for line in lines:
+                if not validation.lines:
+                    self.logger.info(f"收到第一行NC代码，用时 {time.perf_counter() - start:.2f} 秒")
+                report_output(line)
+                failed = [result for result in validation.add_line(line)
+                          if result['severity'] in abort_severities]
+                if failed:
+                    details = "; ".join(f"{result['rule']}: {result['details']}" for result in failed)
+                    raise NCGenerationError(f"流式生成在第{len(validation.lines)}行提前中止: {details}")
+        
+        try:
+            for delta in stream:
+                chunks.append(delta)
+                accept(splitter.feed(delta))
+            accept(splitter.flush())
+        finally:
+            stream.close()  # 提前中止时断开HTTP流
+        return "".join(chunks)
+    
     def _generate_fallback_code(self, prompt: str) -> str:
         """
         生成备用代码（当API调用失败时）
@@ -890,10 +1257,12 @@ class AIDrivenCNCGenerator:
             
             # 步骤4: 调用大模型生成NC程序
             self.logger.info("使用大模型生成NC程序...")
+            report_progress('llm')
             nc_program = self._call_large_language_model(full_prompt)
             
             # 步骤5: 验证和优化
             self.logger.info("验证和优化NC程序...")
+            report_progress('validate')
             validated_program = self.validate_and_optimize(nc_program)
             
             self.logger.info("NC程序生成完成")
@@ -20,6 +20,7 @@ class QuickFeatureDetector:
         self.min_perimeter = 10
         self.canny_low = 50
         self.canny_high = 150
+        self.pyramid = None  # None表示按图像尺寸自动决定是否由粗到精检测
 
     def detect_features(self, drawing_input: np.ndarray, drawing_text: str = "") -> Dict:
         """
@@ -39,7 +40,8 @@ class QuickFeatureDetector:
             min_perimeter=self.min_perimeter,
             canny_low=self.canny_low,
             canny_high=self.canny_high,
-            drawing_text=drawing_text
+            drawing_text=drawing_text,
+            pyramid=self.pyramid
         )
         
         # 分类特征
@@ -0,0 +1,380 @@
+"""
+圆弧拟合模块
+由轮廓近似（cv2.approxPolyDP）和3D模型生成的曲线轮廓是一串很短的G01程序段，程序段太密时
+数控系统的预读缓冲区跟不上，实际进给速度下降。本模块用解释器得到每个程序段的起点和终点，
+在首尾相接、没有拐角的连续程序段中贪心地取偏差不超过公差的最长圆弧，改写为G02/G03；
+校验按组整体计算，所有连续段同时推进，几十万个程序段也只需要几百次数组运算
+"""
+import logging
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import ARC_FITTING_CONFIG
+from .nc_interpreter import KIND_ARC_CCW, KIND_ARC_CW, KIND_LINEAR, FANUCInterpreter
+from .nc_tokenizer import NCProgramTable, ProgramLike, as_table
+
+_G, _F = ord('G'), ord('F')
+# 可以拟合的程序段中允许出现的地址（G只能是G01，Z不能改变）
+_ALLOWED_LETTERS = [ord(letter) for letter in 'GXYZF']
+# 含有这些指令的程序段自己确定01组模态，圆弧之后不需要补G01
+_MOTION_CODES = ['G00', 'G01', 'G02', 'G03', 'G73', 'G74', 'G76', 'G80', 'G81', 'G82', 'G83', 'G84',
+                 'G85', 'G86', 'G87', 'G88', 'G89']
+# 相邻程序段的转角超过该值（弧度）时视为轮廓的拐角，圆弧不跨过拐角
+_MAX_TURN = np.radians(45.0)
+# 很长的连续段按此长度分块并行拟合，块边界处的相邻圆弧最后再尝试合并
+_BLOCK = 4096
+
+
+def _cross(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    return u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+
+
+def _circumcenters(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """三点外接圆的圆心（三点共线时为NaN）"""
+    ab, ac = b - a, c - a
+    d = 2.0 * _cross(ab, ac)
+    ab2, ac2 = np.square(ab).sum(axis=1), np.square(ac).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        center = a + np.column_stack([(ac[:, 1] * ab2 - ab[:, 1] * ac2) / d,
+                                      (ab[:, 0] * ac2 - ac[:, 0] * ab2) / d])
+    center[d == 0] = np.nan
+    return center
+
+
+class ArcFitter:
+    """
+    G01程序段的圆弧拟合器
+
+    只拟合G17平面、绝对坐标、不在固定循环中、Z不变、只含G01/X/Y/Z/F地址（可带注释）的相邻直线程序段。
+    每段圆弧经过组内第一个程序段的起点、最后一个程序段的终点和中间一个顶点；
+    组内各程序段的弦高加上端点到圆弧的半径偏差都不超过 tolerance，且沿同一方向单调前进时才改写
+
+    Args:
+        config: 覆盖 ARC_FITTING_CONFIG 中的部分参数
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(ARC_FITTING_CONFIG)
+        self.config.update(config or {})
+        self.logger = logging.getLogger(__name__)
+
+    def fit(self, nc_program: ProgramLike) -> Tuple[str, Dict]:
+        """
+        把连续的短直线程序段拟合为圆弧
+
+        Args:
+            nc_program: NC程序（文本或已切分好的地址字表）
+
+        Returns:
+            Tuple[str, Dict]: 改写后的程序，以及统计信息
+                segments_before、segments_after（切削进给的运动段数）、arcs、replaced_segments、reduction、
+                max_deviation、lines_before、lines_after、verified、seconds
+        """
+        began = time.perf_counter()
+        table = as_table(nc_program)
+        # 不加工件坐标系偏置和刀具长度补偿，运动段坐标即程序坐标
+        interpreter = FANUCInterpreter({'work_offsets': {}, 'tool_lengths': {}})
+        before = interpreter.run(table)
+        segments = before['segments']
+
+        rows = self._candidates(table, segments)
+        start = segments['start'][rows, :2]
+        end = segments['end'][rows, :2]
+        lines = segments['line'][rows]
+        arcs = self._fit_runs(start, end, self._links(segments, rows))
+        result = self._emit(table, lines, start, end, arcs) if arcs['first'].size else table.text
+
+        cutting = np.isin(segments['kind'], (KIND_LINEAR, KIND_ARC_CW, KIND_ARC_CCW)) & (segments['length'] > 0)
+        segments_before = int(np.count_nonzero(cutting))
+        replaced = int((arcs['last'] - arcs['first'] + 1).sum())
+        expected = segments_before - replaced + int(arcs['first'].size)
+
+        verified = None
+        if arcs['first'].size and self.config['verify']:
+            try:
+                verified = self._consistent(before, interpreter.run(result), expected)
+            except Exception as e:
+                self.logger.warning(f"重放NC程序失败: {str(e)}")
+                verified = False
+            if not verified:
+                self.logger.warning("圆弧拟合后的程序出现新报警或终点改变，返回原程序")
+                result = table.text
+                arcs = {name: values[:0] for name, values in arcs.items()}
+                replaced, expected = 0, segments_before
+
+        report = {
+            'segments_before': segments_before,
+            'segments_after': expected,
+            'arcs': int(arcs['first'].size),
+            'replaced_segments': replaced,
+            'reduction': (segments_before - expected) / segments_before if segments_before else 0.0,
+            'max_deviation': float(arcs['deviation'].max(initial=0.0)),
+            'lines_before': table.n_lines,
+            'lines_after': result.count('\n') + 1,
+            'verified': verified,
+            'seconds': time.perf_counter() - began
+        }
+        self.logger.debug(f"圆弧拟合: {replaced} 个直线程序段 -> {report['arcs']} 段圆弧")
+        return result, report
+
+    # ---- 候选程序段 ----
+
+    def _candidates(self, table: NCProgramTable, segments: np.ndarray) -> np.ndarray:
+        """可以参与拟合的运动段下标（每行只有一个运动段、地址和模态都满足条件的G01）"""
+        n = table.n_lines
+        if not segments.size or table.present_codes(['G20']):
+            return np.empty(0, dtype=np.intp)
+        letters, values = table.word_letter, table.word_value
+        bad_word = ~np.isin(letters, _ALLOWED_LETTERS) | ((letters == _G) & (values != 1))
+        bad_line = np.bincount(table.word_line[bad_word], minlength=n) > 0
+
+        index = np.arange(n)
+        last_absolute = np.maximum.accumulate(np.where(table.lines_with(['G90']), index, -1))
+        last_incremental = np.maximum.accumulate(np.where(table.lines_with(['G91']), index, -1))
+        absolute = last_incremental < last_absolute
+        absolute |= last_incremental < 0
+
+        line = segments['line']
+        once = np.bincount(line, minlength=n) == 1
+        mask = ((segments['kind'] == KIND_LINEAR) & (segments['cycle'] == 0) & (segments['plane'] == 17)
+                & (segments['length'] > 0) & (segments['start'][:, 2] == segments['end'][:, 2])
+                & once[line] & ~bad_line[line] & absolute[line] & ~table.invalid[line])
+        if not self.config['cutter_comp']:
+            mask &= segments['cutter_comp'] == 40
+        return np.flatnonzero(mask)
+
+    @staticmethod
+    def _links(segments: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """相邻候选程序段是否首尾相接（相邻行、相邻运动段、进给相同）"""
+        line = segments['line'][rows]
+        return ((np.diff(rows) == 1) & (np.diff(line) == 1)
+                & (segments['feed'][rows[1:]] == segments['feed'][rows[:-1]]))
+
+    # ---- 分段拟合 ----
+
+    def _runs(self, start: np.ndarray, end: np.ndarray, linked: np.ndarray) -> np.ndarray:
+        """每个候选程序段所在连续段的最后一个程序段下标（首尾不相接、转角超过 _MAX_TURN 或到达分块边界处断开）"""
+        u, v = end[:-1] - start[:-1], end[1:] - start[1:]
+        turn = np.abs(np.arctan2(_cross(u, v), (u * v).sum(axis=1)))
+        block_end = np.arange(start.shape[0] - 1) % _BLOCK == _BLOCK - 1
+        breaks = np.flatnonzero(~(linked & (turn <= _MAX_TURN)) | block_end)
+        run_end = np.append(breaks, start.shape[0] - 1)
+        return run_end[np.searchsorted(run_end, np.arange(start.shape[0]))]
+
+    def _fit_runs(self, start: np.ndarray, end: np.ndarray, linked: np.ndarray) -> Dict:
+        """
+        在每个连续段中从前往后贪心地取最长的圆弧
+
+        所有连续段同时推进：先整体校验以每个程序段开头、min_segments 个程序段的圆弧，找出可以作为起点的位置；
+        每一轮对各段当前起点按倍增再二分的方式求出能通过校验的最长圆弧，之后跳到同一连续段中下一个可作为起点的位置
+        """
+        min_segments = int(self.config['min_segments'])
+        count = start.shape[0]
+        none = np.empty(0, dtype=np.intp)
+        if count < max(min_segments, 1):
+            return self._accepted([self._check(start, end, none, none)])
+        run_end = self._runs(start, end, linked)
+        index = np.arange(count)
+        seeds = np.zeros(count + 1, dtype=bool)
+        fits = index + min_segments - 1 <= run_end
+        seeds[:count][fits] = self._check(start, end, index[fits], index[fits] + min_segments - 1)['ok']
+        # next_seed[i]: i之后（含）第一个可以作为起点的程序段，没有时为count
+        next_seed = np.minimum.accumulate(np.where(seeds, np.arange(count + 1), count)[::-1])[::-1]
+
+        def advance(position: np.ndarray, stop: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            """各连续段下一个起点（不超过该连续段的最后一个程序段）"""
+            following = next_seed[position]
+            keep = following <= stop
+            return following[keep], stop[keep]
+
+        run_starts = np.flatnonzero(np.concatenate(([True], run_end[1:] != run_end[:-1])))
+        cursor, stop = advance(run_starts, run_end[run_starts])
+        accepted = [self._check(start, end, none, none)]
+        while cursor.size:
+            limit = stop - cursor + 1
+            low = np.full(cursor.size, min_segments)       # 已知能通过校验的程序段数
+            high = limit + 1                                # 已知不能通过校验（或超出连续段）的程序段数
+            probing = low < limit
+            while probing.any():
+                rows = np.flatnonzero(probing)
+                probe = np.minimum(low[rows] * 2, limit[rows])
+                ok = self._check(start, end, cursor[rows], cursor[rows] + probe - 1)['ok']
+                low[rows[ok]] = probe[ok]
+                high[rows[~ok]] = probe[~ok]
+                probing[rows[~ok]] = False
+                probing &= low < limit
+            rows = np.flatnonzero(high - low > 1)
+            while rows.size:
+                middle = (low[rows] + high[rows]) // 2
+                ok = self._check(start, end, cursor[rows], cursor[rows] + middle - 1)['ok']
+                low[rows[ok]] = middle[ok]
+                high[rows[~ok]] = middle[~ok]
+                rows = rows[high[rows] - low[rows] > 1]
+            accepted.append(self._check(start, end, cursor, cursor + low - 1))
+            cursor, stop = advance(cursor + low, stop)
+        return self._merge_blocks(start, end, linked, self._accepted(accepted))
+
+    def _merge_blocks(self, start: np.ndarray, end: np.ndarray, linked: np.ndarray, arcs: Dict) -> Dict:
+        """分块边界两侧首尾相接的两段圆弧如果合起来仍能通过校验，合并为一段"""
+        first, last = arcs['first'], arcs['last']
+        pair = np.flatnonzero((last[:-1] % _BLOCK == _BLOCK - 1) & (first[1:] == last[:-1] + 1))
+        pair = pair[linked[last[pair]]]
+        # 连续多个块边界都可合并时只合并不重叠的一对
+        pair = pair[np.concatenate(([True], np.diff(pair) > 1))] if pair.size else pair
+        merged = self._check(start, end, first[pair], last[pair + 1])
+        pair, keep = pair[merged['ok']], merged['ok']
+        if not pair.size:
+            return arcs
+        result = {name: values.copy() for name, values in arcs.items()}
+        for name in result:
+            result[name][pair] = merged[name][keep]
+        return {name: np.delete(values, pair + 1, axis=0) for name, values in result.items()}
+
+    @staticmethod
+    def _accepted(parts: List[Dict]) -> Dict:
+        """合并各轮得到的圆弧，按第一个程序段排序"""
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in parts[0] if name != 'ok'}
+        order = np.argsort(merged['first'], kind='stable')
+        return {name: values[order] for name, values in merged.items()}
+
+    def _check(self, start: np.ndarray, end: np.ndarray, first: np.ndarray, last: np.ndarray) -> Dict:
+        """一次校验所有组：圆心取整到输出精度后计算每个程序段与圆弧的最大偏差、前进方向和总角度"""
+        places = int(self.config['decimal_places'])
+        count = last - first + 1
+        p0, p1, p2 = start[first], start[first + count // 2], end[last]
+        direction = np.sign(_cross(p1 - p0, p2 - p1))
+        offset = np.round(_circumcenters(p0, p1, p2) - p0, places)
+        radius = np.hypot(offset[:, 0], offset[:, 1])
+        use_r = self.config['arc_format'] == 'r'
+        if use_r:
+            # 与数控系统一样由终点和取整后的R确定圆心
+            radius = np.round(radius, places)
+            chord = p2 - p0
+            length = np.hypot(chord[:, 0], chord[:, 1])
+            height = np.sqrt(np.maximum(np.square(radius) - np.square(length / 2), 0.0))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                normal = np.column_stack([-chord[:, 1], chord[:, 0]]) / length[:, None]
+            offset = chord / 2 + direction[:, None] * height[:, None] * normal
+        center = p0 + offset
+
+        # 展开为组内各程序段
+        total = int(count.sum())
+        bounds = np.cumsum(count) - count
+        owner = np.repeat(np.arange(first.size), count)
+        segment = first[owner] + np.arange(total) - bounds[owner]
+        u = start[segment] - center[owner]
+        v = end[segment] - center[owner]
+        r = radius[owner]
+        chord_length = np.hypot(*(end[segment] - start[segment]).T)
+        with np.errstate(invalid='ignore'):
+            sagitta = r - np.sqrt(np.maximum(np.square(r) - np.square(chord_length / 2), 0.0))
+            deviation = sagitta + np.maximum(np.abs(np.hypot(u[:, 0], u[:, 1]) - r),
+                                             np.abs(np.hypot(v[:, 0], v[:, 1]) - r))
+        deviation = np.where(chord_length / 2 <= r, deviation, np.inf)
+        forward = np.arctan2(_cross(u, v), (u * v).sum(axis=1)) * direction[owner]
+
+        if total:
+            max_deviation = np.maximum.reduceat(np.nan_to_num(deviation, nan=np.inf), bounds)
+            min_forward = np.minimum.reduceat(np.nan_to_num(forward, nan=-1.0), bounds)
+            sweep = np.add.reduceat(forward, bounds)
+        else:
+            max_deviation = min_forward = sweep = np.empty(0)
+        max_sweep = np.pi if use_r else 2 * np.pi - 1e-3
+        ok = (np.isfinite(radius) & (direction != 0) & (radius >= self.config['min_radius'])
+              & (radius <= self.config['max_radius']) & (max_deviation <= self.config['tolerance'])
+              & (min_forward > 0) & (sweep < max_sweep))
+        return {'ok': ok, 'first': first, 'last': last, 'offset': offset, 'radius': radius,
+                'direction': direction, 'deviation': max_deviation}
+
+    # ---- 输出 ----
+
+    def _emit(self, table: NCProgramTable, lines: np.ndarray, start: np.ndarray, end: np.ndarray,
+              arcs: Dict) -> str:
+        """用圆弧程序段替换各组的直线程序段；圆弧之后依靠01组模态的程序段补上G01"""
+        places = int(self.config['decimal_places'])
+        source = table.lines
+        has_words = np.diff(table.line_word_start) > 0
+        sets_motion = table.lines_with(_MOTION_CODES) | table.invalid
+
+        def number(value: float) -> str:
+            return f"{round(float(value), places) + 0.0:.{places}f}"
+
+        out: List[str] = []
+        cursor = 0
+        restore = False
+
+        def copy(stop: int):
+            nonlocal cursor, restore
+            while restore and cursor < stop:
+                if has_words[cursor] and not sets_motion[cursor]:
+                    text = source[cursor].lstrip()
+                    if table.word_letter[table.line_word_start[cursor]] == ord('N'):
+                        sequence, _, rest = text.partition(' ')
+                        out.append(f"{sequence} G01 {rest}".rstrip())
+                    else:
+                        out.append(f"G01 {text}")
+                    restore = False
+                elif table.invalid[cursor]:
+                    out.extend(["G01", source[cursor]])
+                    restore = False
+                else:
+                    out.append(source[cursor])
+                    restore = not sets_motion[cursor]
+                cursor += 1
+            out.extend(source[cursor:stop])
+            cursor = max(cursor, stop)
+
+        first_lines = lines[arcs['first']]
+        last_lines = lines[arcs['last']]
+        for k in range(first_lines.size):
+            line = int(first_lines[k])
+            copy(line)
+            x, y = end[arcs['last'][k]]
+            words = [f"G0{3 if arcs['direction'][k] > 0 else 2}", f"X{number(x)}", f"Y{number(y)}"]
+            if self.config['arc_format'] == 'r':
+                words.append(f"R{number(arcs['radius'][k])}")
+            else:
+                words.extend([f"I{number(arcs['offset'][k][0])}", f"J{number(arcs['offset'][k][1])}"])
+            words.extend(text for text in table.word_texts(line) if text[0] == 'F')
+            if self.config['keep_comments'] and table.comment_start[line] >= 0:
+                offset = int(table.line_offsets[line])
+                words.append(table.data[offset + table.comment_start[line]:offset + table.comment_end[line]]
+                             .decode('utf-8', 'replace'))
+            out.append(' '.join(words))
+            cursor = int(last_lines[k]) + 1
+            restore = True
+        copy(table.n_lines)
+        return '\n'.join(out)
+
+    def _consistent(self, before: Dict, after: Dict, expected: int) -> bool:
+        """改写后的程序没有新的报警、切削运动段数与预期相同、最终位置不变"""
+        segments = after['segments']
+        cutting = np.isin(segments['kind'], (KIND_LINEAR, KIND_ARC_CW, KIND_ARC_CCW)) & (segments['length'] > 0)
+        old_alarms = Counter(alarm['code'] for alarm in before['alarms'])
+        new_alarms = Counter(alarm['code'] for alarm in after['alarms'])
+        tolerance = 10.0 ** -int(self.config['decimal_places'])
+        return (int(np.count_nonzero(cutting)) == expected
+                and all(new_alarms[code] <= old_alarms[code] for code in new_alarms)
+                and np.allclose(before['final_position'], after['final_position'], atol=tolerance))
+
+
+# 创建全局圆弧拟合器实例
+arc_fitter = ArcFitter()
+
+
+def fit_arcs(nc_program: ProgramLike, config: Optional[Dict] = None) -> Tuple[str, Dict]:
+    """
+    把NC程序中连续的短G01程序段拟合为G02/G03圆弧
+
+    Args:
+        nc_program: NC程序代码
+        config: 覆盖 ARC_FITTING_CONFIG 中的部分参数（如 {'tolerance': 0.01}）
+
+    Returns:
+        Tuple[str, Dict]: (改写后的程序, 前后运动段数、圆弧数、最大偏差等统计信息)
+    """
+    fitter = ArcFitter(config) if config else arc_fitter
+    return fitter.fit(nc_program)
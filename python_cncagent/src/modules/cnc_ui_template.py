@@ -983,53 +983,103 @@ HTML_TEMPLATE = '''
                 </div>
             `;
             
-            // 创建带超时的fetch请求
-            const controller = new AbortController();
-            const timeoutId = setTimeout(() => controller.abort(), 120000); // 2分钟超时
-            
             try {
-                const response = await fetch('/generate_nc', {
+                // 提交异步作业，再通过状态流显示进度和逐行到达的NC代码
+                const response = await fetch('/jobs', {
                     method: 'POST',
-                    body: formData,
-                    signal: controller.signal
+                    body: formData
                 });
+                const submitted = await response.json();
                 
-                clearTimeout(timeoutId); // 清除超时
-                
+                if (response.status === 429) {
+                    throw new Error('服务器繁忙，作业队列已满，请稍后重试');
+                }
                 if (!response.ok) {
-                    throw new Error(`HTTP错误! 状态: ${response.status}`);
+                    throw new Error(submitted.error || `HTTP错误! 状态: ${response.status}`);
                 }
                 
-                const data = await response.json();
-                
-                if (data.status === 'success') {
-                    resultDiv.innerHTML = `
-                        <div class="result">
-                            <h3>✅ 生成成功 <small>(AI驱动)</small></h3>
-                            <p>NC程序已生成，共 ${data.nc_program.split('\\n').length} 行代码</p>
-                            <div class="nc-code">${escapeHtml(data.nc_program)}</div>
-                            <a href="/download_nc/${data.nc_file_path}" class="btn btn-success download-btn" download="output.nc">
-                                💾 下载NC文件
-                            </a>
-                        </div>
-                    `;
-                } else {
-                    resultDiv.innerHTML = `<div class="error">❌ 错误: ${data.error || '未知错误'}</div>`;
-                }
+                const data = await waitForJob(submitted.job_id, resultDiv);
+                resultDiv.innerHTML = `
+                    <div class="result">
+                        <h3>✅ 生成成功 <small>(AI驱动)</small></h3>
+                        <p>NC程序已生成，共 ${data.nc_program.split('\\n').length} 行代码</p>
+                        <div class="nc-code">${escapeHtml(data.nc_program)}</div>
+                        <a href="/download_nc/${data.nc_file_path}" class="btn btn-success download-btn" download="output.nc">
+                            💾 下载NC文件
+                        </a>
+                    </div>
+                `;
             } catch (error) {
-                clearTimeout(timeoutId); // 清除超时
-                
-                if (error.name === 'AbortError') {
-                    resultDiv.innerHTML = '<div class="error">❌ 请求超时: AI处理时间过长，请稍后重试或检查API密钥配置</div>';
-                } else {
-                    resultDiv.innerHTML = `<div class="error">❌ 请求失败: ${error.message}</div>`;
-                }
+                resultDiv.innerHTML = `<div class="error">❌ 请求失败: ${error.message}</div>`;
             } finally {
                 submitBtn.disabled = false;
                 submitBtn.innerHTML = '🚀 生成NC程序 <span id="submitSpinner" class="spinner" style="display: none;"></span>';
             }
         });
         
+        // 作业进度阶段名称
+        const STAGE_LABELS = {
+            render: '渲染图纸',
+            ocr: '文字识别',
+            detect: '特征识别',
+            llm: '大模型生成NC程序',
+            validate: '验证NC程序'
+        };
+        
+        // 订阅作业状态流：显示当前阶段和流式到达的NC代码行，作业成功后返回结果
+        function waitForJob(jobId, resultDiv) {
+            resultDiv.innerHTML = `
+                <div class="loading">
+                    <span class="spinner"></span>
+                    <span id="jobStage">作业排队中...</span>
+                </div>
+                <div class="nc-code" id="streamingCode" style="display: none;"></div>
+            `;
+            const stageSpan = document.getElementById('jobStage');
+            const streamingCode = document.getElementById('streamingCode');
+            
+            return new Promise((resolve, reject) => {
+                const events = new EventSource(`/jobs/${jobId}/events`);
+                let settled = false;
+                
+                events.addEventListener('nc_line', (event) => {
+                    streamingCode.style.display = 'block';
+                    streamingCode.textContent += JSON.parse(event.data).line + '\\n';
+                    streamingCode.scrollTop = streamingCode.scrollHeight;
+                });
+                
+                events.onmessage = async (event) => {
+                    const job = JSON.parse(event.data);
+                    if (job.status === 'running' && job.stage) {
+                        const page = job.detail && job.detail.page ? `（第${job.detail.page}页）` : '';
+                        stageSpan.textContent = `${STAGE_LABELS[job.stage] || job.stage}${page}...`;
+                    }
+                    if (['succeeded', 'failed', 'cancelled'].includes(job.status)) {
+                        settled = true;
+                        events.close();
+                        if (job.status !== 'succeeded') {
+                            reject(new Error(job.status === 'cancelled' ? '作业已取消' : (job.error || '生成失败')));
+                            return;
+                        }
+                        try {
+                            const result = await fetch(`/jobs/${jobId}/result`);
+                            resolve(await result.json());
+                        } catch (error) {
+                            reject(error);
+                        }
+                    }
+                };
+                
+                events.onerror = () => {
+                    if (!settled) {
+                        settled = true;
+                        events.close();
+                        reject(new Error('与服务器的连接中断'));
+                    }
+                };
+            });
+        }
+        
         // HTML转义函数
         function escapeHtml(unsafe) {
             return unsafe
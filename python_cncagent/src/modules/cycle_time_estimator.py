@@ -0,0 +1,220 @@
+"""
+加工时间估算模块
+用NC解释器展开程序（含固定循环）得到运动段，按各轴快速移动速度、进给倍率、
+梯形加减速、换刀时间、主轴加减速和暂停（G04/G82 P）逐段计算时间，
+并按刀具和工序汇总。所有运动段的时间一次向量化计算，批量评估候选程序时
+多个程序的运动段拼接后共同计算
+"""
+import logging
+import re
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+
+from src.config import CYCLE_TIME_CONFIG
+from .nc_interpreter import (
+    KIND_ARC_CCW, KIND_ARC_CW, KIND_LINEAR, KIND_RAPID, PLANE_AXES, FANUCInterpreter, nc_interpreter
+)
+from .nc_tokenizer import NCProgramTable, ProgramLike, as_table
+
+# 时间分类
+CATEGORIES = ('rapid', 'cutting', 'dwell', 'spindle', 'tool_change')
+
+# 生成程序中的工序注释，如 "(STEP 2: DRILLING OPERATION)"
+STEP_PATTERN = re.compile(rb'\(\s*STEP\s*\d+\s*:\s*([^)]*?)\s*(?:OPERATION)?\s*\)', re.IGNORECASE)
+
+# 平面 -> 圆弧所在两轴的下标
+_PLANE_PAIRS = np.zeros((20, 2), dtype=np.intp)
+for _plane, _axes in PLANE_AXES.items():
+    _PLANE_PAIRS[_plane] = _axes[:2]
+
+
+def segment_times(segments: np.ndarray, config: Optional[Dict] = None,
+                  starts: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    逐段计算时间（秒）
+
+    每个程序段按起停都为零速的梯形速度曲线计算（相当于G61准确停止，对G64连续切削是偏保守的上限）：
+    快速移动的速度和加速度取运动方向上各轴限制的最小值，切削进给受倍率和最大切削进给限制，
+    圆弧另受向心加速度限制 v ≤ √(a·r)。主轴加减速计在转速变化后的第一段，换刀时间计在新刀具的第一段
+
+    Args:
+        segments: 解释器输出的 SEGMENT_DTYPE 运动段数组
+        config: 加工时间参数，默认 CYCLE_TIME_CONFIG
+        starts: 每个程序第一段的下标（多个程序拼接时使用），默认只有一个程序
+
+    Returns:
+        Dict[str, np.ndarray]: CATEGORIES 中每一类的逐段时间
+    """
+    config = config or CYCLE_TIME_CONFIG
+    n = segments.size
+    kind = segments['kind']
+    delta = segments['end'] - segments['start']
+    length = segments['length']
+    rapid = kind == KIND_RAPID
+    arc = (kind == KIND_ARC_CW) | (kind == KIND_ARC_CCW)
+    cutting = (kind == KIND_LINEAR) | arc
+
+    rates = np.asarray(config['rapid_rates'], dtype=np.float64) / 60.0
+    accelerations = np.asarray(config['accelerations'], dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 沿运动方向的速度/加速度：各轴分量不能超过该轴的限制
+        direction = np.abs(delta) / np.sqrt(np.square(delta).sum(axis=1))[:, None]
+        moving = direction > 1e-12
+        axis_speed = np.where(moving, rates / direction, np.inf).min(axis=1)
+        axis_acceleration = np.where(moving, accelerations / direction, np.inf).min(axis=1)
+
+        feed = np.minimum(segments['feed'] * config['feed_override'], config['max_cutting_feed']) / 60.0
+        speed = np.where(rapid, axis_speed * config['rapid_override'], feed)
+        acceleration = axis_acceleration
+        if arc.any():
+            pairs = _PLANE_PAIRS[segments['plane'][arc]]
+            arc_acceleration = accelerations[pairs].min(axis=1)
+            radius = np.sqrt(np.square(segments['start'][arc] - segments['center'][arc]).sum(axis=1))
+            speed[arc] = np.minimum(speed[arc], np.sqrt(arc_acceleration * radius))
+            acceleration = acceleration.copy()
+            acceleration[arc] = arc_acceleration
+
+        # 梯形速度曲线：加速到v再减速到零需要 v²/a 的距离，不够时为三角形
+        ramp_distance = np.square(speed) / acceleration
+        motion = np.where(length >= ramp_distance,
+                          length / speed + speed / acceleration,
+                          2.0 * np.sqrt(length / acceleration))
+    motion = np.where((length > 0) & (speed > 0) & np.isfinite(motion), motion, 0.0)
+
+    first = np.zeros(n, dtype=bool)
+    if n:
+        first[0 if starts is None else starts] = True
+    spindle = segments['spindle']
+    previous_spindle = np.where(first, 0.0, np.roll(spindle, 1))
+    tool = segments['tool']
+    previous_tool = np.where(first, 0, np.roll(tool, 1))
+
+    return {
+        'rapid': np.where(rapid, motion, 0.0),
+        'cutting': np.where(cutting, motion, 0.0),
+        'dwell': segments['dwell'].astype(np.float64),
+        'spindle': np.abs(spindle - previous_spindle) / config['spindle_acceleration'],
+        'tool_change': np.where(tool != previous_tool, float(config['tool_change_seconds']), 0.0)
+    }
+
+
+class CycleTimeEstimator:
+    """
+    NC程序加工时间估算器
+
+    Args:
+        config: 覆盖 CYCLE_TIME_CONFIG 中的部分参数
+        interpreter: 展开程序用的解释器，默认使用全局解释器
+    """
+
+    def __init__(self, config: Optional[Dict] = None, interpreter: Optional[FANUCInterpreter] = None):
+        self.config = dict(CYCLE_TIME_CONFIG)
+        self.config.update(config or {})
+        self.interpreter = interpreter or nc_interpreter
+        self.logger = logging.getLogger(__name__)
+
+    def estimate(self, program: ProgramLike) -> Dict:
+        """
+        估算单个程序的加工时间
+
+        Args:
+            program: NC程序文本或地址字表
+
+        Returns:
+            Dict: total_seconds（总时间）、breakdown（按分类）、by_tool（按刀具号）、
+                  by_operation（按工序的列表，每项含 name/tool/first_line/seconds/breakdown）、
+                  segment_count 以及解释器的 alarms
+        """
+        table = as_table(program)
+        result = self.interpreter.run(table)
+        segments = result['segments']
+        times = segment_times(segments, self.config)
+        total = sum(times.values())
+
+        tools, tool_index = np.unique(segments['tool'], return_inverse=True)
+        by_tool = np.bincount(tool_index, weights=total, minlength=tools.size)
+
+        operation, names = self._operations(table, segments)
+        by_operation = []
+        for index in np.unique(operation):
+            rows = np.flatnonzero(operation == index)
+            by_operation.append({
+                'name': names[index],
+                'tool': int(segments['tool'][rows[0]]),
+                'first_line': int(segments['line'][rows[0]]) + 1,
+                'seconds': float(total[rows].sum()),
+                'breakdown': {name: float(times[name][rows].sum()) for name in CATEGORIES}
+            })
+
+        return {
+            'total_seconds': float(total.sum()),
+            'breakdown': {name: float(times[name].sum()) for name in CATEGORIES},
+            'by_tool': {int(tool): float(seconds) for tool, seconds in zip(tools, by_tool)},
+            'by_operation': by_operation,
+            'segment_count': int(segments.size),
+            'alarms': result['alarms']
+        }
+
+    def estimate_batch(self, programs: Sequence[Union[ProgramLike, np.ndarray]]) -> np.ndarray:
+        """
+        批量估算候选程序的总加工时间
+
+        各程序先分别展开为运动段（已展开的运动段数组可直接传入），拼接后一次计算全部段的时间
+
+        Args:
+            programs: NC程序文本、地址字表或 SEGMENT_DTYPE 运动段数组的序列
+
+        Returns:
+            np.ndarray: 每个程序的总时间（秒）
+        """
+        parts = [item if isinstance(item, np.ndarray) else self.interpreter.run(item)['segments']
+                 for item in programs]
+        if not parts:
+            return np.zeros(0)
+        sizes = np.array([part.size for part in parts])
+        segments = np.concatenate(parts)
+        starts = np.cumsum(sizes) - sizes
+        times = segment_times(segments, self.config, starts[sizes > 0])
+        total = sum(times.values())
+        owner = np.repeat(np.arange(len(parts)), sizes)
+        return np.bincount(owner, weights=total, minlength=len(parts))
+
+    @staticmethod
+    def _operations(table: NCProgramTable, segments: np.ndarray):
+        """
+        每个运动段所属的工序
+
+        有 "(STEP n: ...)" 工序注释时按注释划分（第一条注释之前为"程序准备"），
+        否则按换刀划分，工序名为刀具号
+        """
+        matches = list(STEP_PATTERN.finditer(table.data))
+        if matches:
+            step_lines = np.searchsorted(table.line_offsets, [m.start() for m in matches], side='right') - 1
+            operation = np.searchsorted(step_lines, segments['line'], side='right')
+            names = ['程序准备'] + [m.group(1).decode('utf-8', 'replace').strip() for m in matches]
+            return operation, names
+
+        tool = segments['tool']
+        changed = np.ones(tool.size, dtype=bool)
+        changed[1:] = tool[1:] != tool[:-1]
+        operation = np.cumsum(changed) - 1
+        names = [f"T{int(t)}" if t else '程序准备' for t in tool[changed]]
+        return operation, names
+
+
+# 创建全局加工时间估算器实例
+cycle_time_estimator = CycleTimeEstimator()
+
+
+def estimate_cycle_time(program: ProgramLike) -> Dict:
+    """
+    估算NC程序的加工时间
+
+    Args:
+        program: NC程序文本或地址字表
+
+    Returns:
+        Dict: 估算结果，见 CycleTimeEstimator.estimate
+    """
+    return cycle_time_estimator.estimate(program)
@@ -4,8 +4,19 @@ FANUC NC程序优化模块
 """
 from typing import List, Dict
 
+from src.modules.hole_sequencing import format_sequencing_comment, sequence_holes
 
-def optimize_drilling_cycle(hole_positions: List[tuple], drilling_depth: float, feed_rate: float = 100) -> List[str]:
+
+def _sequence(hole_positions: List[tuple], operation: str, gcode: List[str]) -> List[tuple]:
+    """按快速移动距离最短重排孔位，重排时在代码前加一行统计注释"""
+    ordered, stats = sequence_holes(hole_positions)
+    if stats['method'] != 'original':
+        gcode.append(format_sequencing_comment(stats, operation))
+    return ordered
+
+
+def optimize_drilling_cycle(hole_positions: List[tuple], drilling_depth: float, feed_rate: float = 100,
+                            optimize_order: bool = True) -> List[str]:
     """
     优化钻孔循环，使用简化编程格式提高效率
     
@@ -13,6 +24,7 @@ def optimize_drilling_cycle(hole_positions: List[tuple], drilling_depth: float,
         hole_positions: 孔位置列表 [(x1, y1), (x2, y2), ...]
         drilling_depth: 钻孔深度
         feed_rate: 进给率
+        optimize_order: 是否按快速移动距离最短重排孔位
     
     Returns:
         优化的G代码列表
@@ -22,6 +34,9 @@ def optimize_drilling_cycle(hole_positions: List[tuple], drilling_depth: float,
     if not hole_positions:
         return gcode
     
+    if optimize_order:
+        hole_positions = _sequence(hole_positions, "DRILLING", gcode)
+    
     # 第一个孔使用完整G代码
     first_x, first_y = hole_positions[0]
     gcode.append(f"G83 X{first_x:.3f} Y{first_y:.3f} Z{-drilling_depth} R2 Q1 F{feed_rate} (DEEP HOLE DRILLING CYCLE)")
@@ -33,7 +48,8 @@ def optimize_drilling_cycle(hole_positions: List[tuple], drilling_depth: float,
     return gcode
 
 
-def optimize_tapping_cycle(hole_positions: List[tuple], tapping_depth: float, spindle_speed: float, thread_type: str) -> List[str]:
+def optimize_tapping_cycle(hole_positions: List[tuple], tapping_depth: float, spindle_speed: float, thread_type: str,
+                           optimize_order: bool = True) -> List[str]:
     """
     优化攻丝循环，使用简化编程格式并确保F=S*螺距的正确计算
     
@@ -42,6 +58,7 @@ def optimize_tapping_cycle(hole_positions: List[tuple], tapping_depth: float, sp
         tapping_depth: 攻丝深度
         spindle_speed: 主轴转速
         thread_type: 螺纹类型 (如 "M10", "M6" 等)
+        optimize_order: 是否按快速移动距离最短重排孔位
     
     Returns:
         优化的G代码列表
@@ -51,6 +68,9 @@ def optimize_tapping_cycle(hole_positions: List[tuple], tapping_depth: float, sp
     if not hole_positions:
         return gcode
     
+    if optimize_order:
+        hole_positions = _sequence(hole_positions, "TAPPING", gcode)
+    
     # 根据螺纹类型确定螺距
     thread_pitch = get_thread_pitch(thread_type)
     
@@ -20,7 +20,8 @@ from src.modules.ocr_ai_inference import extract_features_from_pdf_with_ai
 def identify_features(image: np.ndarray, min_area: float = None, min_perimeter: float = None, 
                       canny_low: int = None, canny_high: int = None, 
                       gaussian_kernel: tuple = None, morph_kernel: tuple = None, 
-                      drawing_text: str = "") -> List[Dict]:
+                      drawing_text: str = "", tiled: Optional[bool] = None,
+                      pyramid: Optional[bool] = None) -> List[Dict]:
     """
     从图像中识别几何特征（圆形、矩形、多边形等）
     
@@ -33,6 +34,9 @@ def identify_features(image: np.ndarray, min_area: float = None, min_perimeter:
         gaussian_kernel (tuple): 高斯模糊核大小
         morph_kernel (tuple): 形态学操作核大小
         drawing_text (str): 图纸OCR文本，用于辅助特征识别
+        tiled (bool): 是否分块检测；None时按TILED_DETECTION_CONFIG和内存预算自动决定
+        pyramid (bool): 是否由粗到精检测（降采样层找候选，只在候选区域按原分辨率检测）；
+            None时按PYRAMID_DETECTION_CONFIG和图像尺寸自动决定，细化区域过大时回退整图或分块检测
     
     Returns:
         list: 识别出的特征列表，每个特征包含形状、位置、尺寸等信息
@@ -51,99 +55,30 @@ def identify_features(image: np.ndarray, min_area: float = None, min_perimeter:
     if morph_kernel is None:
         morph_kernel = IMAGE_PROCESSING_CONFIG['default_morph_kernel']
     
-    # 应用高斯模糊以减少噪声
-    blurred = cv2.GaussianBlur(image, gaussian_kernel, 0)
-    
-    # 边缘检测
-    edges = cv2.Canny(blurred, canny_low, canny_high)
-    
-    # 形态学操作以连接断开的边缘
-    kernel = np.ones(morph_kernel, np.uint8)
-    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)  # 只进行闭操作，避免去除有用边缘
+    from src.modules.pyramid_detection import find_edge_contours_pyramid, should_use_pyramid
+    from src.modules.tiled_detection import find_contours_tiled, should_use_tiles
     
-    # 寻找轮廓（使用RETR_LIST以获取所有轮廓，不限制层级）
-    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    if pyramid is None:
+        pyramid = should_use_pyramid(image.shape)
+    contours = None
+    if pyramid:
+        # 大幅面图纸由粗到精检测，空白区域和孤立噪点不按原分辨率处理
+        contours = find_edge_contours_pyramid(image, canny_low, canny_high, gaussian_kernel, morph_kernel,
+                                              min_area=min_area)
     
-    features = []
-    
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        
-        # 过滤小面积轮廓
-        if area < min_area:
-            continue
-        
-        # 计算轮廓的周长
-        perimeter = cv2.arcLength(contour, True)
-        
-        # 跳过周长过小的轮廓
-        if perimeter < min_perimeter:
-            continue
-        
-        # 计算轮廓的圆度，用于识别圆形
-        _, radius = cv2.minEnclosingCircle(contour)
-        radius = int(radius)
-        circle_area = math.pi * radius * radius
+    if contours is None:
+        if tiled is None:
+            tiled = should_use_tiles(image.shape)
         
-        # 计算边界框
-        x, y, w, h = cv2.boundingRect(contour)
-        
-        # 计算长宽比
-        aspect_ratio = float(w) / h if h != 0 else 0
-        
-        # 多种形状识别方法的融合
-        shape, confidence = identify_shape_advanced(contour, area, circle_area, aspect_ratio)
-        
-        if shape and confidence > IMAGE_PROCESSING_CONFIG['min_confidence_threshold']:
-            # 计算几何中心
-            m = cv2.moments(contour)
-            if m["m00"] != 0:
-                cx = int(m["m10"] / m["m00"])
-                cy = int(m["m01"] / m["m00"])
-            else:
-                cx, cy = x + w//2, y + h//2
-            
-            feature = {
-                "shape": shape,
-                "contour": contour,
-                "bounding_box": (x, y, w, h),
-                "area": area,
-                "center": (cx, cy),
-                "dimensions": (w, h),
-                "confidence": confidence,
-                "aspect_ratio": aspect_ratio  # 添加长宽比信息
-            }
-            
-            # 添加特定形状的额外信息
-            if shape == "circle":
-                feature["radius"] = radius
-                # 计算圆形度作为一个额外的特征
-                circularity = 4 * math.pi * area / (perimeter * perimeter)
-                feature["circularity"] = circularity
-            elif shape in ["rectangle", "square", "parallelogram"]:
-                feature["length"] = max(w, h)
-                feature["width"] = min(w, h)
-                feature["aspect_ratio"] = aspect_ratio
-            elif shape == "triangle":
-                feature["vertices"] = [tuple(point[0]) for point in cv2.approxPolyDP(contour, 0.03 * perimeter, True)]
-            elif shape == "ellipse":
-                # 拟合椭圆
-                if len(contour) >= 5:  # 至少需要5个点才能拟合椭圆
-                                try:
-                                    ellipse = cv2.fitEllipse(contour)
-                                    center, axes, angle = ellipse
-                                    feature["ellipse_params"] = {
-                                        "center": center,
-                                        "axes": axes,
-                                        "angle": angle
-                                    }
-                                    feature["major_axis"] = max(axes)
-                                    feature["minor_axis"] = min(axes)
-                                except cv2.error:
-                                    pass  # 如果拟合失败，忽略椭圆参数
-                                except ValueError:
-                                    pass  # 如果其他错误，忽略椭圆参数            
-            features.append(feature)
+        if tiled:
+            # 大幅面图纸分块检测，峰值内存受预算限制
+            contours = find_contours_tiled(image, canny_low, canny_high, gaussian_kernel, morph_kernel)
+        else:
+            edges = detect_edges(image, canny_low, canny_high, gaussian_kernel, morph_kernel)
+            # 寻找轮廓（使用RETR_LIST以获取所有轮廓，不限制层级）
+            contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    
+    features = extract_contour_features(contours, min_area, min_perimeter)
     
     # 过滤重复特征
     features = filter_duplicate_features_advanced(features)
@@ -157,7 +92,207 @@ def identify_features(image: np.ndarray, min_area: float = None, min_perimeter:
     return features
 
 
-def identify_shape_advanced(contour: np.ndarray, area: float, circle_area: float, aspect_ratio: float) -> Tuple[str, float]:
+def detect_edges(image: np.ndarray, canny_low: int, canny_high: int,
+                 gaussian_kernel: tuple, morph_kernel: tuple) -> np.ndarray:
+    """
+    高斯模糊 + Canny边缘检测 + 闭运算，得到用于查找轮廓的二值边缘图
+    
+    Args:
+        image (numpy.ndarray): 输入灰度图像
+        canny_low (int): Canny边缘检测低阈值
+        canny_high (int): Canny边缘检测高阈值
+        gaussian_kernel (tuple): 高斯模糊核大小
+        morph_kernel (tuple): 形态学操作核大小
+    
+    Returns:
+        numpy.ndarray: 二值边缘图
+    """
+    # 应用高斯模糊以减少噪声
+    blurred = cv2.GaussianBlur(image, gaussian_kernel, 0)
+    
+    # 边缘检测
+    edges = cv2.Canny(blurred, canny_low, canny_high)
+    del blurred
+    
+    # 形态学操作以连接断开的边缘
+    kernel = np.ones(morph_kernel, np.uint8)
+    return cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)  # 只进行闭操作，避免去除有用边缘
+
+
+# 轮廓描述子结构化数组的字段：每行对应一个轮廓
+CONTOUR_DESCRIPTOR_DTYPE = np.dtype([
+    ("area", np.float64),
+    ("perimeter", np.float64),
+    ("x", np.int64),
+    ("y", np.int64),
+    ("w", np.int64),
+    ("h", np.int64),
+    ("cx", np.int64),
+    ("cy", np.int64),
+    ("circularity", np.float64),
+])
+
+
+def compute_contour_descriptors(contours) -> np.ndarray:
+    """
+    批量计算所有轮廓的基础几何描述子
+
+    把全部轮廓点拼接成一个数组，用分段归约一次性求出面积（鞋带公式）、闭合周长、
+    边界框和几何中心，结果与 cv2.contourArea / arcLength / boundingRect / moments 一致。
+
+    Args:
+        contours: cv2.findContours返回的轮廓序列
+
+    Returns:
+        np.ndarray: CONTOUR_DESCRIPTOR_DTYPE结构化数组，每个轮廓一行
+    """
+    descriptors = np.zeros(len(contours), dtype=CONTOUR_DESCRIPTOR_DTYPE)
+    if len(contours) == 0:
+        return descriptors
+
+    lengths = np.fromiter(map(len, contours), dtype=np.int64, count=len(contours))
+    points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+
+    # 每个点的下一个点（闭合轮廓，最后一点连回第一点）
+    next_points = np.empty_like(points)
+    next_points[:-1] = points[1:]
+    next_points[ends - 1] = points[starts]
+    x, y = points[:, 0], points[:, 1]
+    next_x, next_y = next_points[:, 0], next_points[:, 1]
+
+    # 鞋带公式：整数坐标下各项乘积和累加都是精确的
+    cross = x * next_y - next_x * y
+    cross_sum = np.add.reduceat(cross, starts).astype(np.float64)
+    descriptors["area"] = np.abs(cross_sum) * 0.5
+
+    # 与cv2.arcLength相同：单段长度按float32开方，累加用float64
+    delta = next_points - points
+    segment = np.sqrt(np.einsum('ij,ij->i', delta, delta).astype(np.float32))
+    descriptors["perimeter"] = np.add.reduceat(segment, starts, dtype=np.float64)
+
+    x_min = np.minimum.reduceat(x, starts)
+    y_min = np.minimum.reduceat(y, starts)
+    descriptors["x"] = x_min
+    descriptors["y"] = y_min
+    descriptors["w"] = np.maximum.reduceat(x, starts) - x_min + 1
+    descriptors["h"] = np.maximum.reduceat(y, starts) - y_min + 1
+
+    # 多边形矩，与cv2.moments相同的计算顺序（先求和再乘1/2、1/6），保证截断取整后一致
+    m00 = cross_sum * 0.5
+    m10 = np.add.reduceat((x + next_x) * cross, starts) * (1.0 / 6)
+    m01 = np.add.reduceat((y + next_y) * cross, starts) * (1.0 / 6)
+    has_moments = np.abs(m00) > np.finfo(np.float32).eps
+    safe_m00 = np.where(has_moments, m00, 1.0)
+    descriptors["cx"] = np.where(has_moments, np.trunc(m10 / safe_m00), x_min + descriptors["w"] // 2)
+    descriptors["cy"] = np.where(has_moments, np.trunc(m01 / safe_m00), y_min + descriptors["h"] // 2)
+
+    perimeter = descriptors["perimeter"]
+    descriptors["circularity"] = np.divide(4 * math.pi * descriptors["area"], perimeter * perimeter,
+                                           out=np.zeros(len(contours)), where=perimeter > 0)
+    return descriptors
+
+
+def extract_contour_features(contours, min_area: float, min_perimeter: float) -> List[Dict]:
+    """
+    从轮廓中提取特征字典
+
+    先批量计算描述子，用数组掩码过滤面积、周长过小的轮廓，
+    只对剩余轮廓做形状识别，最后只为通过置信度过滤的轮廓生成特征字典。
+
+    Args:
+        contours: cv2.findContours返回的轮廓序列
+        min_area (float): 最小面积阈值
+        min_perimeter (float): 最小周长阈值
+
+    Returns:
+        list: 特征列表（顺序与输入轮廓一致）
+    """
+    descriptors = compute_contour_descriptors(contours)
+    candidates = np.flatnonzero((descriptors["area"] >= min_area) & (descriptors["perimeter"] >= min_perimeter))
+
+    # 幸存轮廓的描述子一次性转为Python列表，避免逐行访问结构化数组
+    survivors = descriptors[candidates]
+    areas = survivors["area"].tolist()
+    perimeters = survivors["perimeter"].tolist()
+    xs, ys = survivors["x"].tolist(), survivors["y"].tolist()
+    widths, heights = survivors["w"].tolist(), survivors["h"].tolist()
+    # 圆形判断要求圆形度超过阈值，其余轮廓无需计算最小外接圆
+    maybe_circle = (survivors["circularity"] > FEATURE_RECOGNITION_CONFIG['circularity_threshold'] - 1e-6).tolist()
+
+    # 形状识别依赖凸包、多边形逼近等，只能逐个轮廓进行
+    shapes = []
+    confidences = np.zeros(len(candidates))
+    radii = []
+    for k, index in enumerate(candidates.tolist()):
+        contour = contours[index]
+        radius = int(cv2.minEnclosingCircle(contour)[1]) if maybe_circle[k] else 0
+        radii.append(radius)
+        circle_area = math.pi * radius * radius
+        aspect_ratio = float(widths[k]) / heights[k] if heights[k] != 0 else 0
+        shape, confidences[k] = identify_shape_advanced(contour, areas[k], circle_area, aspect_ratio,
+                                                        perimeter=perimeters[k],
+                                                        bounding_rect=(xs[k], ys[k], widths[k], heights[k]))
+        shapes.append(shape)
+
+    has_shape = np.array([bool(shape) for shape in shapes], dtype=bool)
+    accepted = has_shape & (confidences > IMAGE_PROCESSING_CONFIG['min_confidence_threshold'])
+
+    features = []
+    for k in np.flatnonzero(accepted).tolist():
+        index = int(candidates[k])
+        contour = contours[index]
+        row = survivors[k]
+        shape = shapes[k]
+        x, y, w, h = xs[k], ys[k], widths[k], heights[k]
+        area = areas[k]
+        perimeter = perimeters[k]
+        aspect_ratio = float(w) / h if h != 0 else 0
+
+        feature = {
+            "shape": shape,
+            "contour": contour,
+            "bounding_box": (x, y, w, h),
+            "area": area,
+            "center": (int(row["cx"]), int(row["cy"])),
+            "dimensions": (w, h),
+            "confidence": float(confidences[k]),
+            "aspect_ratio": aspect_ratio  # 添加长宽比信息
+        }
+
+        # 添加特定形状的额外信息
+        if shape == "circle":
+            feature["radius"] = radii[k]
+            # 计算圆形度作为一个额外的特征
+            feature["circularity"] = float(row["circularity"])
+        elif shape in ["rectangle", "square", "parallelogram"]:
+            feature["length"] = max(w, h)
+            feature["width"] = min(w, h)
+        elif shape == "triangle":
+            feature["vertices"] = [tuple(point[0]) for point in cv2.approxPolyDP(contour, 0.03 * perimeter, True)]
+        elif shape == "ellipse":
+            # 拟合椭圆
+            if len(contour) >= 5:  # 至少需要5个点才能拟合椭圆
+                try:
+                    center, axes, angle = cv2.fitEllipse(contour)
+                    feature["ellipse_params"] = {
+                        "center": center,
+                        "axes": axes,
+                        "angle": angle
+                    }
+                    feature["major_axis"] = max(axes)
+                    feature["minor_axis"] = min(axes)
+                except (cv2.error, ValueError):
+                    pass  # 如果拟合失败，忽略椭圆参数
+        features.append(feature)
+
+    return features
+
+
+def identify_shape_advanced(contour: np.ndarray, area: float, circle_area: float, aspect_ratio: float,
+                            perimeter: Optional[float] = None,
+                            bounding_rect: Optional[Tuple[int, int, int, int]] = None) -> Tuple[str, float]:
     """
     使用多种方法识别形状并返回置信度（改进版）
     
@@ -166,11 +301,14 @@ def identify_shape_advanced(contour: np.ndarray, area: float, circle_area: float
         area: 轮廓面积
         circle_area: 最小外接圆面积
         aspect_ratio: 长宽比
+        perimeter: 已计算好的闭合周长（可选，缺省时重新计算）
+        bounding_rect: 已计算好的边界框 (x, y, w, h)（可选，缺省时重新计算）
     
     Returns:
         tuple: (形状名称, 置信度)
     """
-    perimeter = cv2.arcLength(contour, True)
+    if perimeter is None:
+        perimeter = cv2.arcLength(contour, True)
     
     # 计算轮廓的实心度（solidity）
     hull = cv2.convexHull(contour)
@@ -178,7 +316,7 @@ def identify_shape_advanced(contour: np.ndarray, area: float, circle_area: float
     solidity = float(area) / hull_area if hull_area > 0 else 0
     
     # 计算轮廓的延伸度（extent）
-    x, y, w, h = cv2.boundingRect(contour)
+    x, y, w, h = bounding_rect if bounding_rect is not None else cv2.boundingRect(contour)
     rect_area = w * h
     extent = float(area) / rect_area if rect_area > 0 else 0
     
@@ -192,8 +330,9 @@ def identify_shape_advanced(contour: np.ndarray, area: float, circle_area: float
     approx = cv2.approxPolyDP(contour, epsilon, True)
     num_vertices = len(approx)
     
-    # 检查是否是椭圆（通过拟合椭圆或圆形度判断）
-    if len(contour) >= 5 and area > 0 and circularity < FEATURE_RECOGNITION_CONFIG['circularity_threshold']:
+    # 检查是否是椭圆（通过拟合椭圆或圆形度判断）；实心度不达标时不可能判为椭圆，跳过拟合
+    if (len(contour) >= 5 and area > 0 and circularity < FEATURE_RECOGNITION_CONFIG['circularity_threshold']
+            and solidity > FEATURE_RECOGNITION_CONFIG['solidity_threshold']):
         try:
             # 尝试拟合椭圆
             ellipse = cv2.fitEllipse(contour)
@@ -281,69 +420,165 @@ def identify_shape_advanced(contour: np.ndarray, area: float, circle_area: float
 def filter_duplicate_features_advanced(features: List[Dict]) -> List[Dict]:
     """
     使用更精确的方法过滤重复的特征（改进版）
-    
+
+    判定规则：中心距离小于两者最大尺寸均值的50%、形状相同、且边界框IoU大于阈值。
+    按输入顺序处理，当前特征与已保留特征中最靠前的一个重复时，保留置信度更高者（原位替换）。
+    候选对通过网格空间索引生成，判定在候选对上批量向量化计算，避免逐对两两比较。
+
     Args:
         features: 特征列表
-    
+
     Returns:
         过滤后的特征列表
     """
     if not features:
         return []
-    
-    # 按中心点距离和形状类型综合判断重复
-    filtered_features = []
-    
-    for current_feature in features:
-        is_duplicate = False
-        best_match_idx = -1
-        best_confidence = current_feature.get("confidence", 0)
-        
-        for i, existing_feature in enumerate(filtered_features):
-            # 计算中心点距离
-            curr_center = current_feature["center"]
-            exist_center = existing_feature["center"]
-            distance = math.sqrt((curr_center[0] - exist_center[0])**2 + (curr_center[1] - exist_center[1])**2)
-            
-            # 检查形状是否相同
-            same_shape = current_feature["shape"] == existing_feature["shape"]
-            
-            # 计算边界框重叠度
-            curr_x, curr_y, curr_w, curr_h = current_feature["bounding_box"]
-            exist_x, exist_y, exist_w, exist_h = existing_feature["bounding_box"]
-            
-            # 计算重叠区域
-            x_overlap = max(0, min(curr_x + curr_w, exist_x + exist_w) - max(curr_x, exist_x))
-            y_overlap = max(0, min(curr_y + curr_h, exist_y + curr_h) - max(curr_y, exist_y))
-            overlap_area = x_overlap * y_overlap
-            
-            # 计算并集面积
-            union_area = curr_w * curr_h + exist_w * curr_h - overlap_area
-            iou = overlap_area / union_area if union_area > 0 else 0
-            
-            # 综合判断：位置接近、形状相同、且有较大重叠度
-            curr_max_dim = max(current_feature["dimensions"])
-            exist_max_dim = max(existing_feature["dimensions"])
-            avg_max_dim = (curr_max_dim + exist_max_dim) / 2
-            position_threshold = avg_max_dim * 0.5  # 使用平均尺寸的50%作为位置阈值
-            
-            if distance < position_threshold and same_shape and iou > 0.3:
-                # 找到重复特征，保留置信度更高的
-                existing_conf = existing_feature.get("confidence", 0)
-                if current_feature.get("confidence", 0) > existing_conf:
-                    best_match_idx = i
-                    best_confidence = current_feature.get("confidence", 0)
-                else:
-                    is_duplicate = True
-                break
-        
-        if is_duplicate and best_match_idx != -1:
+
+    n = len(features)
+    iou_threshold = IMAGE_PROCESSING_CONFIG.get('iou_threshold', 0.3)
+    centers = np.array([feature["center"] for feature in features], dtype=np.float64).reshape(n, 2)
+    boxes = np.array([feature["bounding_box"] for feature in features], dtype=np.float64).reshape(n, 4)
+    max_dims = np.array([max(feature["dimensions"]) for feature in features], dtype=np.float64)
+    shape_codes = {}
+    shapes = np.array([shape_codes.setdefault(feature["shape"], len(shape_codes)) for feature in features])
+    confidences = [feature.get("confidence", 0) for feature in features]
+
+    later, earlier = _duplicate_candidate_pairs(centers, boxes, max_dims, iou_threshold)
+
+    if len(later):
+        # 在候选对上向量化计算中心距离、形状和IoU
+        delta = centers[later] - centers[earlier]
+        distance = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+        position_threshold = (max_dims[later] + max_dims[earlier]) / 2 * 0.5
+
+        curr_x, curr_y, curr_w, curr_h = boxes[later].T
+        exist_x, exist_y, exist_w, exist_h = boxes[earlier].T
+        x_overlap = np.maximum(0, np.minimum(curr_x + curr_w, exist_x + exist_w) - np.maximum(curr_x, exist_x))
+        y_overlap = np.maximum(0, np.minimum(curr_y + curr_h, exist_y + exist_h) - np.maximum(curr_y, exist_y))
+        overlap_area = x_overlap * y_overlap
+        union_area = curr_w * curr_h + exist_w * exist_h - overlap_area
+        iou = np.divide(overlap_area, union_area, out=np.zeros_like(overlap_area), where=union_area > 0)
+
+        is_match = (distance < position_threshold) & (shapes[later] == shapes[earlier]) & (iou > iou_threshold)
+        later, earlier = later[is_match], earlier[is_match]
+
+    # 按后出现的特征分组，得到每个特征可能重复的前序特征
+    order = np.argsort(later, kind='stable')
+    later, earlier = later[order], earlier[order]
+    bounds = np.searchsorted(later, np.arange(n + 1)).tolist()
+    earlier = earlier.tolist()
+
+    # 顺序决议：与已保留特征中位置最靠前的匹配项比较置信度
+    kept = []
+    slot_of = [-1] * n
+    for i in range(n):
+        best_slot = -1
+        for j in earlier[bounds[i]:bounds[i + 1]]:
+            slot = slot_of[j]
+            if slot >= 0 and (best_slot < 0 or slot < best_slot):
+                best_slot = slot
+        if best_slot < 0:
+            slot_of[i] = len(kept)
+            kept.append(i)
+        elif confidences[i] > confidences[kept[best_slot]]:
             # 替换现有的低置信度特征
-            filtered_features[best_match_idx] = current_feature
-        elif not is_duplicate:
-            filtered_features.append(current_feature)
-    
-    return filtered_features
+            slot_of[kept[best_slot]] = -1
+            kept[best_slot] = i
+            slot_of[i] = best_slot
+
+    return [features[i] for i in kept]
+
+
+def _duplicate_candidate_pairs(centers: np.ndarray, boxes: np.ndarray, max_dims: np.ndarray,
+                               iou_threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    用网格空间索引生成可能重复的特征对
+
+    IoU大于阈值t时，两个边界框的宽、高之比都必须在 (t, 1/t) 之间，
+    因此按边界框最大边长的log2分层，只需比较层级相差不超过 floor(-log2 t)+1 的分组；
+    每对分组内再以中心距离阈值上限为网格边长，只比较相邻3x3网格中的特征。
+
+    Args:
+        centers: 特征中心点 (n, 2)
+        boxes: 边界框 (x, y, w, h) (n, 4)
+        max_dims: 特征最大尺寸 (n,)
+        iou_threshold: IoU阈值
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (后出现的特征索引, 先出现的特征索引)
+    """
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+    if iou_threshold >= 1:
+        return empty
+
+    widths, heights = boxes[:, 2], boxes[:, 3]
+    valid = np.flatnonzero((widths > 0) & (heights > 0))  # 面积为零的边界框IoU恒为0
+    if len(valid) < 2:
+        return empty
+    levels = np.floor(np.log2(np.maximum(widths[valid], heights[valid]))).astype(np.int64)
+    max_level_gap = int(math.floor(-math.log2(iou_threshold))) + 1 if iou_threshold > 0 else None
+
+    groups = {level: valid[levels == level] for level in np.unique(levels).tolist()}
+    pair_later, pair_earlier = [], []
+    for level_a, group_a in groups.items():
+        for level_b, group_b in groups.items():
+            if level_b < level_a or (max_level_gap is not None and level_b - level_a > max_level_gap):
+                continue
+            radius = (max_dims[group_a].max() + max_dims[group_b].max()) / 2 * 0.5
+            if radius <= 0:
+                continue
+            a, b = _grid_neighbor_pairs(centers[group_a], centers[group_b], radius)
+            a, b = group_a[a], group_b[b]
+            if level_a == level_b:
+                keep = a > b  # 同组内每个无序对只保留一次
+                a, b = a[keep], b[keep]
+            pair_later.append(np.maximum(a, b))
+            pair_earlier.append(np.minimum(a, b))
+
+    if not pair_later:
+        return empty
+    return np.concatenate(pair_later), np.concatenate(pair_earlier)
+
+
+def _grid_neighbor_pairs(points_a: np.ndarray, points_b: np.ndarray, cell_size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    返回落在相邻3x3网格内的点对索引（距离小于cell_size的点对必然包含在内）
+
+    Args:
+        points_a: 查询点 (m, 2)
+        points_b: 被索引的点 (k, 2)
+        cell_size: 网格边长
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (points_a中的索引, points_b中的索引)
+    """
+    cells_a = np.floor(points_a / cell_size).astype(np.int64)
+    cells_b = np.floor(points_b / cell_size).astype(np.int64)
+    y_min = min(cells_a[:, 1].min(), cells_b[:, 1].min()) - 1
+    stride = max(cells_a[:, 1].max(), cells_b[:, 1].max()) - y_min + 2
+
+    keys_b = cells_b[:, 0] * stride + (cells_b[:, 1] - y_min)
+    order_b = np.argsort(keys_b, kind='stable')
+    sorted_keys = keys_b[order_b]
+
+    result_a, result_b = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            query = (cells_a[:, 0] + dx) * stride + (cells_a[:, 1] + dy - y_min)
+            lo = np.searchsorted(sorted_keys, query, side='left')
+            hi = np.searchsorted(sorted_keys, query, side='right')
+            counts = hi - lo
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            # 把每个查询点命中的 [lo, hi) 区间展开成扁平的索引数组
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            result_a.append(np.repeat(np.arange(len(points_a)), counts))
+            result_b.append(order_b[np.repeat(lo, counts) + offsets])
+
+    if not result_a:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(result_a), np.concatenate(result_b)
 
 
 def identify_counterbore_features(features: List[Dict], user_description: str = "", drawing_text: str = "") -> List[Dict]:
@@ -426,6 +661,14 @@ def identify_counterbore_features(features: List[Dict], user_description: str =
             smallest_circle = sorted_by_radius[1] if len(sorted_by_radius) > 1 else sorted_by_radius[0]  # 取第二大，如果只有一组则取本身
             
             # 判断是否可能是沉孔特征 (φ22沉孔 + φ14.5底孔)
+    
+    # 未识别为沉孔的分组中的圆仍作为普通圆特征保留
+    for group_center, group_features in grouped_features.items():
+        if group_center not in valid_counterbore_groups:
+            filtered_features.extend(group_features)
+    filtered_features.extend(counterbore_features)
+    
+    return filtered_features
 
 
 def identify_pocket_features(features: List[Dict], user_description: str = "", drawing_text: str = "") -> List[Dict]:
@@ -461,8 +704,8 @@ def identify_pocket_features(features: List[Dict], user_description: str = "", d
     # 如果用户明确要求腔槽加工，或图纸文本中包含腔槽信息，则提高识别阈值
     strict_threshold = user_wants_pocket or drawing_has_pocket
     
-    # 过滤后的特征列表
-    filtered_features = [f for f in features if f.get("shape") not in ["rectangle", "square", "rectangular_pocket", "rounded_rectangle", "rounded_square", "rounded_rectangular_pocket"]]
+    # 过滤后的特征列表（矩形类和圆形在下面判断后再加回）
+    filtered_features = [f for f in features if f.get("shape") not in ["rectangle", "square", "rectangular_pocket", "rounded_rectangle", "rounded_square", "rounded_rectangular_pocket", "circle"]]
     
     # 识别腔槽特征
     pocket_features = []
@@ -2,14 +2,21 @@
 FANUC NC程序生成模块
 根据识别的特征和用户描述生成符合FANUC标准的G代码
 """
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Iterable, Iterator, Optional, TextIO, Union, Tuple
 import math
 import datetime
 import logging
+import os
 
 # 导入配置参数
-from src.config import GCODE_GENERATION_CONFIG, THREAD_PITCH_MAP
+from src.config import (ARC_FITTING_CONFIG, GCODE_GENERATION_CONFIG, HOLE_PATTERN_CONFIG, OPERATION_SCHEDULER_CONFIG,
+                        SUBPROGRAM_CONFIG, TAP_DRILL_MAP, THREAD_PITCH_MAP)
 from src.exceptions import NCGenerationError, handle_exception
+from src.modules.arc_fitting import fit_arcs
+from src.modules.hole_patterns import detect_hole_pattern, format_pattern_comment, format_pattern_cycle
+from src.modules.hole_sequencing import format_sequencing_comment, sequence_holes
+from src.modules.operation_scheduler import format_schedule_comment, schedule_operations
+from src.modules.subprogram_extraction import extract_subprograms
 
 # 导入优化模块
 try:
@@ -58,6 +65,134 @@ def generate_fanuc_nc(features: List[Dict], description_analysis: Dict, scale: f
     Raises:
         NCGenerationError: NC代码生成过程中发生错误
     """
+    _check_generation_inputs(features, description_analysis, scale)
+    
+    try:
+        # 各工序生成的程序头注释（如孔加工顺序优化节省的快速移动距离）插入到程序头之后
+        header_notes = []
+        body = list(_generate_program_body(features, description_analysis, header_notes))
+        program = "\n".join(_program_header() + header_notes + body)
+        if ARC_FITTING_CONFIG['enabled']:
+            # 轮廓中连续的短直线程序段拟合为G02/G03圆弧
+            program, _ = fit_arcs(program)
+        if SUBPROGRAM_CONFIG['enabled']:
+            # 多个位置重复的程序段提取为增量子程序（M98调用）
+            program, _ = extract_subprograms(program)
+        return program
+    except Exception as e:
+        error = handle_exception(e, logging.getLogger(__name__), "生成FANUC NC代码时出错")
+        raise NCGenerationError(f"NC代码生成失败: {str(error)}", original_exception=e) from e
+
+
+def stream_fanuc_nc(features: List[Dict], description_analysis: Dict, scale: float = 1.0) -> Iterator[str]:
+    """
+    逐行生成FANUC NC程序，生成一行输出一行，内存占用与程序长度无关
+    
+    与 generate_fanuc_nc 的程序段相同，只是各工序的程序头注释（孔加工顺序、孔阵列、工序调度）
+    在流式输出中放在对应工序的程序段之前。圆弧拟合和子程序提取需要完整程序，
+    二者启用时先生成完整程序再逐行输出。
+    
+    Args:
+        features (list): 识别出的几何特征列表
+        description_analysis (dict): 用户描述分析结果
+        scale (float): 比例尺因子
+    
+    Returns:
+        Iterator[str]: NC程序的各行（不含换行符）
+        
+    Raises:
+        NCGenerationError: 参数错误时立即抛出，生成过程中的错误在迭代时抛出
+    """
+    _check_generation_inputs(features, description_analysis, scale)
+    if ARC_FITTING_CONFIG['enabled'] or SUBPROGRAM_CONFIG['enabled']:
+        return iter(generate_fanuc_nc(features, description_analysis, scale).split("\n"))
+    return _stream_program(features, description_analysis)
+
+
+def _stream_program(features: List[Dict], description_analysis: Dict) -> Iterator[str]:
+    """stream_fanuc_nc 的生成器部分：工序新增的程序头注释在它的下一个程序段之前输出"""
+    try:
+        yield from _program_header()
+        notes = []
+        for line in _generate_program_body(features, description_analysis, notes):
+            if notes:
+                yield from notes
+                notes.clear()
+            yield line
+        yield from notes
+    except Exception as e:
+        error = handle_exception(e, logging.getLogger(__name__), "生成FANUC NC代码时出错")
+        raise NCGenerationError(f"NC代码生成失败: {str(error)}", original_exception=e) from e
+
+
+def iter_nc_chunks(program: Union[str, Iterable[str]], chunk_size: Optional[int] = None) -> Iterator[str]:
+    """
+    把NC程序切成大小约为 chunk_size 个字符的文本块，用于分块写文件或HTTP分块响应
+    
+    Args:
+        program: 完整的程序文本，或逐行的程序（如 stream_fanuc_nc 的结果）
+        chunk_size: 每块的字符数，默认取 GCODE_GENERATION_CONFIG['streaming']['chunk_size']
+    
+    Returns:
+        Iterator[str]: 文本块，依次拼接后与 "\n".join(各行) 相同
+    """
+    chunk_size = chunk_size or GCODE_GENERATION_CONFIG['streaming']['chunk_size']
+    if isinstance(program, str):
+        for start in range(0, len(program), chunk_size):
+            yield program[start:start + chunk_size]
+        return
+    
+    buffer = []
+    buffered = 0
+    separator = ""
+    for line in program:
+        buffer.append(separator + line)
+        buffered += len(line) + len(separator)
+        separator = "\n"
+        if buffered >= chunk_size:
+            yield "".join(buffer)
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def write_nc_program(program: Union[str, Iterable[str]], destination: Union[str, os.PathLike, TextIO],
+                     chunk_size: Optional[int] = None) -> int:
+    """
+    分块把NC程序写入文件路径或已打开的文本流（如 socket.makefile('w')）
+    
+    Args:
+        program: 完整的程序文本，或逐行的程序
+        destination: 输出文件路径或可写的文本流
+        chunk_size: 每次写入的字符数
+    
+    Returns:
+        int: 写入的字符数
+    """
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, "w", encoding="utf-8") as f:
+            return write_nc_program(program, f, chunk_size)
+    written = 0
+    for chunk in iter_nc_chunks(program, chunk_size):
+        destination.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def write_fanuc_nc(features: List[Dict], description_analysis: Dict,
+                   destination: Union[str, os.PathLike, TextIO], scale: float = 1.0) -> int:
+    """
+    流式生成FANUC NC程序并直接写入文件或文本流，不在内存中保留整个程序
+    
+    Returns:
+        int: 写入的字符数
+    """
+    return write_nc_program(stream_fanuc_nc(features, description_analysis, scale), destination)
+
+
+def _check_generation_inputs(features: List[Dict], description_analysis: Dict, scale: float) -> None:
+    """校验 generate_fanuc_nc / stream_fanuc_nc 的参数"""
     # 输入验证
     if not isinstance(features, list):
         raise NCGenerationError("特征列表必须是list类型")
@@ -76,158 +211,109 @@ def generate_fanuc_nc(features: List[Dict], description_analysis: Dict, scale: f
         feature_errors = _validate_feature(feature)
         if feature_errors:
             raise NCGenerationError(f"特征 {i} 验证失败: {', '.join(feature_errors)}")
-    
-    try:
-        gcode = []
-        
-        # 程序头部注释 - 符合FANUC规范
-        gcode.append("O0001 (MAIN PROGRAM)")
-        gcode.append("(DESCRIPTION: FANUC CNC PROGRAM FOR FEATURE MACHINING)")
-        gcode.append(f"(DATE: {datetime.datetime.now().strftime('%Y-%m-%d')})")
-        gcode.append("(AUTHOR: CNC AGENT)")
-        gcode.append("")
-        
-        # 添加程序准备指令
-        gcode.append("(PROGRAM PREPARATION)")
-        gcode.append("G21 (MILLIMETER UNITS)")
-        gcode.append("G90 (ABSOLUTE COORDINATE SYSTEM)")
-        gcode.append("G40 (CANCEL TOOL RADIUS COMPENSATION)")
-        gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
-        gcode.append("G80 (CANCEL FIXED CYCLE)")
-        gcode.append("")
-        
-        # 坐标系统说明
-        gcode.append("(COORDINATE SYSTEM SETUP)")
-        gcode.append("(G90 - USE ABSOLUTE COORDINATE SYSTEM)")
-        gcode.append("(USER COORDINATE SYSTEM - COORDINATES RELATIVE TO WORKPIECE DATUM)")
-        gcode.append("(X,Y COORDINATES ARE ADJUSTED BASED ON FEATURE POSITIONS)")
-        gcode.append("")
-        
-        # 设置初始安全高度
-        gcode.append("(MOVE TO SAFE HEIGHT)")
-        gcode.append(f"G00 Z{GCODE_GENERATION_CONFIG['safety']['safe_height']:.1f} (RAPID MOVE TO SAFE HEIGHT)")
-        gcode.append("")
+
+
+def _program_header() -> List[str]:
+    """程序头部注释 - 符合FANUC规范"""
+    return ["O0001 (MAIN PROGRAM)",
+            "(DESCRIPTION: FANUC CNC PROGRAM FOR FEATURE MACHINING)",
+            f"(DATE: {datetime.datetime.now().strftime('%Y-%m-%d')})",
+            "(AUTHOR: CNC AGENT)"]
+
+
+def _program_end(safe_height: str = "100.0") -> List[str]:
+    """程序结束段"""
+    return ["",
+            "(PROGRAM END)",
+            "M05 (SPINDLE STOP)",
+            f"G00 Z{safe_height} (RAISE TOOL TO SAFE HEIGHT)",
+            "G00 X10.0 Y10.0 (MOVE TO SAFE POSITION - USER CAN MODIFY AS NEEDED)",
+            "M30 (PROGRAM END)"]
+
+
+def _generate_program_body(features: List[Dict], description_analysis: Dict,
+                           header_notes: List[str]) -> Iterator[str]:
+    """程序头注释之后的全部程序段：准备指令、按加工类型生成的工序代码和程序结束"""
+    yield ""
+    
+    # 添加程序准备指令
+    yield "(PROGRAM PREPARATION)"
+    yield "G21 (MILLIMETER UNITS)"
+    yield "G90 (ABSOLUTE COORDINATE SYSTEM)"
+    yield "G40 (CANCEL TOOL RADIUS COMPENSATION)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
+    yield "G80 (CANCEL FIXED CYCLE)"
+    yield ""
+    
+    # 坐标系统说明
+    yield "(COORDINATE SYSTEM SETUP)"
+    yield "(G90 - USE ABSOLUTE COORDINATE SYSTEM)"
+    yield "(USER COORDINATE SYSTEM - COORDINATES RELATIVE TO WORKPIECE DATUM)"
+    yield "(X,Y COORDINATES ARE ADJUSTED BASED ON FEATURE POSITIONS)"
+    yield ""
+    
+    # 设置初始安全高度
+    yield "(MOVE TO SAFE HEIGHT)"
+    yield f"G00 Z{GCODE_GENERATION_CONFIG['safety']['safe_height']:.1f} (RAPID MOVE TO SAFE HEIGHT)"
+    yield ""
+    
+    # 根据加工类型生成G代码
+    processing_type = description_analysis.get("processing_type", "general")
+    
+    if processing_type == "mixed" or any("process" in feature for feature in features):
+        # 混合零件：所有特征的工序按刀具合并后统一生成
+        yield from _generate_scheduled_code(features, description_analysis, header_notes)
+        yield from _program_end()
+    elif processing_type == "drilling":
+        yield from _generate_drilling_code(features, description_analysis, header_notes)
+        yield from _program_end()
+    elif processing_type == "tapping":  # 新增攻丝工艺
+        yield from _generate_tapping_code_with_full_process(features, description_analysis, header_notes)
+        yield from _program_end()
+    elif processing_type == "milling":
+        yield from _generate_milling_code(features, description_analysis)
+        yield from _program_end()
+    elif processing_type == "counterbore":  # 新增沉孔加工工艺
+        yield from _generate_counterbore_code(features, description_analysis, header_notes)
+        yield from _program_end()
+    elif processing_type == "turning":
+        yield from _generate_turning_code(features, description_analysis)
+        yield from _program_end()
+    else:
+        description = description_analysis.get("description", "")
+        # 确保描述字符串正确处理中文字符
+        if isinstance(description, bytes):
+            try:
+                description = description.decode('utf-8')
+            except UnicodeError:
+                description = description.decode('utf-8', errors='replace')
+        elif not isinstance(description, str):
+            description = str(description)
+        description = description.lower()
         
-        # 根据加工类型生成G代码
-        processing_type = description_analysis.get("processing_type", "general")
-        tool_required = description_analysis.get("tool_required", "general_tool")
+        # 使用更精确的正则表达式来判断加工类型，避免冲突
+        import re
         
-        # 根据加工类型生成G代码
-        if processing_type == "drilling":
-            gcode.extend(_generate_drilling_code(features, description_analysis))
-            # 添加程序结束
-            gcode.append("")
-            gcode.append("(PROGRAM END)")
-            gcode.append("M05 (SPINDLE STOP)")
-            gcode.append("G00 Z100.0 (RAISE TOOL TO SAFE HEIGHT)")
-            gcode.append("G00 X10.0 Y10.0 (MOVE TO SAFE POSITION - USER CAN MODIFY AS NEEDED)")
-            gcode.append("M30 (PROGRAM END)")
-        elif processing_type == "tapping":  # 新增攻丝工艺
-            gcode.extend(_generate_tapping_code_with_full_process(features, description_analysis))
-            # 攻丝工艺完成后，添加程序结束指令
-            gcode.append("")
-            gcode.append("(PROGRAM END)")
-            gcode.append("M05 (SPINDLE STOP)")
-            gcode.append("G00 Z100.0 (RAISE TOOL TO SAFE HEIGHT)")
-            gcode.append("G00 X10.0 Y10.0 (MOVE TO SAFE POSITION - USER CAN MODIFY AS NEEDED)")
-            gcode.append("M30 (PROGRAM END)")
-        elif processing_type == "milling":
-            gcode.extend(_generate_milling_code(features, description_analysis))
-            # 添加程序结束
-            gcode.append("")
-            gcode.append("(PROGRAM END)")
-            gcode.append("M05 (SPINDLE STOP)")
-            gcode.append("G00 Z100.0 (RAISE TOOL TO SAFE HEIGHT)")
-            gcode.append("G00 X10.0 Y10.0 (MOVE TO SAFE POSITION - USER CAN MODIFY AS NEEDED)")
-            gcode.append("M30 (PROGRAM END)")
-        elif processing_type == "counterbore":  # 新增沉孔加工工艺
-            gcode.extend(_generate_counterbore_code(features, description_analysis))
-            # 添加程序结束
-            gcode.append("")
-            gcode.append("(PROGRAM END)")
-            gcode.append("M05 (SPINDLE STOP)")
-            gcode.append("G00 Z100.0 (RAISE TOOL TO SAFE HEIGHT)")
-            gcode.append("G00 X10.0 Y10.0 (MOVE TO SAFE POSITION - USER CAN MODIFY AS NEEDED)")
-            gcode.append("M30 (PROGRAM END)")
-        elif processing_type == "turning":
-            gcode.extend(_generate_turning_code(features, description_analysis))
-            # 添加程序结束
-            gcode.append("")
-            gcode.append("(PROGRAM END)")
-            gcode.append("M05 (SPINDLE STOP)")
-            gcode.append("G00 Z100.0 (RAISE TOOL TO SAFE HEIGHT)")
-            gcode.append("G00 X10.0 Y10.0 (MOVE TO SAFE POSITION - USER CAN MODIFY AS NEEDED)")
-            gcode.append("M30 (PROGRAM END)")
+        # 检查用户描述中是否包含沉孔相关关键词 - 优先级最高
+        if re.search(r'(?:沉孔|counterbore|锪孔)', description):
+            yield from _generate_counterbore_code(features, description_analysis, header_notes)
+            yield from _program_end()
+        # 检查用户描述中是否包含螺纹相关关键词 - 第二优先级
+        elif re.search(r'(?:螺纹|thread|tapping|攻丝)', description):
+            yield from _generate_tapping_code_with_full_process(features, description_analysis, header_notes)
+            yield from _program_end()
+        # 检查用户描述中是否包含钻孔相关关键词 - 第三优先级
+        elif re.search(r'(?:钻孔|drill|hole|钻)', description) and not re.search(r'(?:沉孔|counterbore|锪孔)', description):
+            yield from _generate_drilling_code(features, description_analysis, header_notes)
+            yield from _program_end()
+        # 检查用户描述中是否包含铣削相关关键词 - 仅在没有沉孔、钻孔等特殊工艺时才考虑铣削
+        elif re.search(r'(?:铣|mill|cut)', description) and not any(re.search(keyword, description) for keyword in [r'沉孔', r'counterbore', r'锪孔', r'钻孔', r'drill']):
+            yield from _generate_milling_code(features, description_analysis)
+            yield from _program_end("100")
         else:
-            description = description_analysis.get("description", "")
-            # 确保描述字符串正确处理中文字符
-            if isinstance(description, bytes):
-                try:
-                    description = description.decode('utf-8')
-                except UnicodeError:
-                    description = description.decode('utf-8', errors='replace')
-            elif not isinstance(description, str):
-                description = str(description)
-            description = description.lower()
-            
-            # 使用更精确的正则表达式来判断加工类型，避免冲突
-            import re
-            
-            # 检查用户描述中是否包含沉孔相关关键词 - 优先级最高
-            if re.search(r'(?:沉孔|counterbore|锪孔)', description):
-                gcode.extend(_generate_counterbore_code(features, description_analysis))
-                # 沉孔加工完成后，添加程序结束指令
-                gcode.append("")
-                gcode.append("(PROGRAM END)")
-                gcode.append("M05 (SPINDLE STOP)")
-                gcode.append("G00 Z100.0 (RAISE TOOL TO SAFE HEIGHT)")
-                gcode.append("G00 X10.0 Y10.0 (MOVE TO SAFE POSITION - USER CAN MODIFY AS NEEDED)")
-                gcode.append("M30 (PROGRAM END)")
-            # 检查用户描述中是否包含螺纹相关关键词 - 第二优先级
-            elif re.search(r'(?:螺纹|thread|tapping|攻丝)', description):
-                gcode.extend(_generate_tapping_code_with_full_process(features, description_analysis))
-                # 攻丝工艺完成后，添加程序结束指令
-                gcode.append("")
-                gcode.append("(PROGRAM END)")
-                gcode.append("M05 (SPINDLE STOP)")
-                gcode.append("G00 Z100.0 (RAISE TOOL TO SAFE HEIGHT)")
-                gcode.append("G00 X10.0 Y10.0 (MOVE TO SAFE POSITION - USER CAN MODIFY AS NEEDED)")
-                gcode.append("M30 (PROGRAM END)")
-            # 检查用户描述中是否包含钻孔相关关键词 - 第三优先级
-            elif re.search(r'(?:钻孔|drill|hole|钻)', description) and not re.search(r'(?:沉孔|counterbore|锪孔)', description):
-                gcode.extend(_generate_drilling_code(features, description_analysis))
-                # 添加程序结束
-                gcode.append("")
-                gcode.append("(PROGRAM END)")
-                gcode.append("M05 (SPINDLE STOP)")
-                gcode.append("G00 Z100.0 (RAISE TOOL TO SAFE HEIGHT)")
-                gcode.append("G00 X10.0 Y10.0 (MOVE TO SAFE POSITION - USER CAN MODIFY AS NEEDED)")
-                gcode.append("M30 (PROGRAM END)")
-            # 检查用户描述中是否包含铣削相关关键词 - 仅在没有沉孔、钻孔等特殊工艺时才考虑铣削
-            elif re.search(r'(?:铣|mill|cut)', description) and not any(re.search(keyword, description) for keyword in [r'沉孔', r'counterbore', r'锪孔', r'钻孔', r'drill']):
-                gcode.extend(_generate_milling_code(features, description_analysis))
-                # 添加程序结束
-                gcode.append("")
-                gcode.append("(PROGRAM END)")
-                gcode.append("M05 (SPINDLE STOP)")
-                gcode.append("G00 Z100 (RAISE TOOL TO SAFE HEIGHT)")
-                gcode.append("G00 X10.0 Y10.0 (MOVE TO SAFE POSITION - USER CAN MODIFY AS NEEDED)")
-                gcode.append("M30 (PROGRAM END)")
-            else:
-                # 默认使用铣削代码
-                gcode.extend(_generate_milling_code(features, description_analysis))
-                # 添加程序结束
-                gcode.append("")
-                gcode.append("(PROGRAM END)")
-                gcode.append("M05 (SPINDLE STOP)")
-                gcode.append("G00 Z100 (RAISE TOOL TO SAFE HEIGHT)")
-                gcode.append("G00 X10.0 Y10.0 (MOVE TO SAFE POSITION - USER CAN MODIFY AS NEEDED)")
-                gcode.append("M30 (PROGRAM END)")
-
-        return "\n".join(gcode)
-    except Exception as e:
-        error = handle_exception(e, logging.getLogger(__name__), "生成FANUC NC代码时出错")
-        raise NCGenerationError(f"NC代码生成失败: {str(error)}", original_exception=e) from e
+            # 默认使用铣削代码
+            yield from _generate_milling_code(features, description_analysis)
+            yield from _program_end("100")
 
 
 def _get_tool_number(tool_type: str) -> int:
@@ -237,9 +323,36 @@ def _get_tool_number(tool_type: str) -> int:
     return TOOL_MAPPING.get(tool_type, 5)
 
 
-def _generate_drilling_code(features: List[Dict], description_analysis: Dict) -> List[str]:
+def _sequence_holes(positions: List, operation: str, header_notes: Optional[List[str]]) -> List:
+    """按快速移动距离最短重排孔位，并把节省的距离记入程序头注释"""
+    ordered, stats = sequence_holes(positions)
+    if header_notes is not None and stats['method'] != 'original':
+        header_notes.append(format_sequencing_comment(stats, operation))
+    return ordered
+
+
+def _hole_pattern(positions: List, operation: str, description_analysis: Optional[Dict],
+                  header_notes: Optional[List[str]]) -> Tuple[Optional[Dict], str]:
+    """
+    紧凑输出开启时识别孔阵列（矩形阵列、螺栓孔圆），识别结果记入程序头注释
+
+    输出方式取描述分析中的 pattern_mode，未给出时取 HOLE_PATTERN_CONFIG['mode']
+
+    Returns:
+        Tuple[Optional[Dict], str]: 阵列参数（未开启或未识别时为None）和输出方式
+    """
+    mode = (description_analysis or {}).get('pattern_mode') or HOLE_PATTERN_CONFIG['mode']
+    if mode not in ('macro', 'polar') or not positions:
+        return None, mode
+    pattern = detect_hole_pattern(positions)
+    if pattern is not None and header_notes is not None:
+        header_notes.append(format_pattern_comment(pattern, operation))
+    return pattern, mode
+
+
+def _generate_drilling_code(features: List[Dict], description_analysis: Dict,
+                            header_notes: Optional[List[str]] = None) -> Iterator[str]:
     """生成钻孔加工代码"""
-    gcode = []
     
     # 获取材料信息，默认为铝
     material = "aluminum"  # 默认值
@@ -285,11 +398,11 @@ def _generate_drilling_code(features: List[Dict], description_analysis: Dict) ->
             optimal_params, tool_diameter, workpiece_dimensions
         )
         if validation_errors:
-            gcode.append(f"(WARNING: OPTIMIZATION ISSUES DETECTED: {', '.join(validation_errors)})")
+            yield f"(WARNING: OPTIMIZATION ISSUES DETECTED: {', '.join(validation_errors)})"
             # 仍然使用优化参数，但添加警告注释
     except Exception as e:
         # 如果优化失败，使用默认参数
-        gcode.append(f"(WARNING: Optimization failed, using default parameters: {str(e)})")
+        yield f"(WARNING: Optimization failed, using default parameters: {str(e)})"
         spindle_speed = GCODE_GENERATION_CONFIG['drilling']['default_spindle_speed']
         feed_rate = GCODE_GENERATION_CONFIG['drilling']['default_feed_rate']
     
@@ -308,42 +421,46 @@ def _generate_drilling_code(features: List[Dict], description_analysis: Dict) ->
     # 获取刀具编号（钻头通常是T2）
     tool_number = _get_tool_number("drill_bit")
     
-    gcode.append(f"(DRILLING OPERATION)")
-    gcode.append(f"M03 S{int(spindle_speed)} (SPINDLE FORWARD, DRILLING SPEED)")
-    gcode.append(f"G04 P{GCODE_GENERATION_CONFIG['safety']['delay_time']} (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)")
+    yield f"(DRILLING OPERATION)"
+    yield f"M03 S{int(spindle_speed)} (SPINDLE FORWARD, DRILLING SPEED)"
+    yield f"G04 P{GCODE_GENERATION_CONFIG['safety']['delay_time']} (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
     
     # 激活刀具长度补偿
-    gcode.append(f"G43 H{tool_number} Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T{tool_number:02})")
+    yield f"G43 H{tool_number} Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T{tool_number:02})"
     
     # 开启切削液
-    gcode.append("M08 (COOLANT ON)")
+    yield "M08 (COOLANT ON)"
     
     # 为每个圆形特征生成钻孔点
     hole_features = [f for f in features if f["shape"] in ["circle", "square", "rectangle"]]
-    if hole_features:
+    pattern, pattern_mode = _hole_pattern(hole_features, "DRILLING", description_analysis, header_notes)
+    if pattern is not None:
+        # 孔阵列用宏程序循环或极坐标重复代替逐孔程序段（阵列按固定顺序加工，不再重排）
+        yield from format_pattern_cycle(
+            pattern, f"G99 G83 Z{-depth:.3f} R2.0 Q{min(tool_diameter/2, 3.0):.1f} F{feed_rate:.1f}", pattern_mode)
+    elif hole_features:
+        hole_features = _sequence_holes(hole_features, "DRILLING", header_notes)
         # 首先在第一个孔执行完整循环
         first_feature = hole_features[0]
         center_x, center_y = first_feature["center"]
         # 使用优化的钻孔循环G83，考虑切削深度和排屑
-        gcode.append(f"G99 G83 X{center_x:.3f} Y{center_y:.3f} Z{-depth:.3f} R2.0 Q{min(tool_diameter/2, 3.0):.1f} F{feed_rate:.1f} (DEEP HOLE DRILLING CYCLE WITH PECKING)")
+        yield f"G99 G83 X{center_x:.3f} Y{center_y:.3f} Z{-depth:.3f} R2.0 Q{min(tool_diameter/2, 3.0):.1f} F{feed_rate:.1f} (DEEP HOLE DRILLING CYCLE WITH PECKING)"
         
         # 对于后续孔，只使用X、Y坐标，简化编程
         for feature in hole_features[1:]:
             center_x, center_y = feature["center"]
-            gcode.append(f"X{center_x:.3f} Y{center_y:.3f} (DRILLING OPERATION)")
+            yield f"X{center_x:.3f} Y{center_y:.3f} (DRILLING OPERATION)"
     else:
-        gcode.append(f"G99 G83 Z{-depth:.3f} R2.0 Q{min(tool_diameter/2, 3.0):.1f} F{feed_rate:.1f} (DEEP HOLE DRILLING CYCLE WITH PECKING)")
+        yield f"G99 G83 Z{-depth:.3f} R2.0 Q{min(tool_diameter/2, 3.0):.1f} F{feed_rate:.1f} (DEEP HOLE DRILLING CYCLE WITH PECKING)"
     
-    gcode.append("G80 (CANCEL FIXED CYCLE)")
+    yield "G80 (CANCEL FIXED CYCLE)"
     
     # 关闭切削液
-    gcode.append("M09 (COOLANT OFF)")
+    yield "M09 (COOLANT OFF)"
     
     # 移动到统一的安全高度，然后取消刀具长度补偿
-    gcode.append("G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
-    
-    return gcode
+    yield "G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
 
 
 def _extract_counterbore_parameters(features: List[Dict], description_analysis: Dict) -> Tuple[float, float, float, int, List[Tuple[float, float]], float, float, float, float, float]:
@@ -649,7 +766,6 @@ def _extract_counterbore_parameters(features: List[Dict], description_analysis:
 
 
 def _generate_polar_coordinate_counterbore_code(
-    gcode: List[str], 
     counterbore_positions: List[Tuple[float, float]], 
     outer_diameter: float, 
     inner_diameter: float, 
@@ -658,47 +774,56 @@ def _generate_polar_coordinate_counterbore_code(
     drilling_depth: float,
     drill_feed: float,
     counterbore_spindle_speed: float,
-    counterbore_feed: float
-) -> bool:
-    """生成极坐标系下的沉孔加工代码"""
+    counterbore_feed: float,
+    pattern: Optional[Dict] = None,
+    pattern_mode: str = 'polar'
+) -> Iterator[str]:
+    """生成极坐标系下的沉孔加工代码（识别到螺栓孔圆时用G52+G16的增量角度重复代替逐孔程序段）"""
     if not counterbore_positions:
-        return False
+        return
+    if pattern is not None:
+        # 三把刀的循环都由阵列循环定位（螺栓孔圆的G16极坐标在循环内部启用和取消）
+        yield from _generate_cartesian_counterbore_code(
+            counterbore_positions, outer_diameter, inner_diameter, counterbore_depth,
+            len(counterbore_positions), centering_depth, drilling_depth, drill_feed,
+            counterbore_spindle_speed, counterbore_feed, {}, pattern, pattern_mode)
+        return
     
     # 计算极坐标并输出
-    gcode.append("(POLAR COORDINATE OUTPUT)")
+    yield "(POLAR COORDINATE OUTPUT)"
     base_x, base_y = counterbore_positions[0]  # 选择第一个孔作为参考点
-    gcode.append(f"(REFERENCE HOLE: X{base_x:.3f}, Y{base_y:.3f})")
+    yield f"(REFERENCE HOLE: X{base_x:.3f}, Y{base_y:.3f})"
     
     # 输出原始坐标作为验证
-    gcode.append("(ORIGINAL CARTESIAN COORDINATES - FOR VERIFICATION)")
+    yield "(ORIGINAL CARTESIAN COORDINATES - FOR VERIFICATION)"
     for i, (x, y) in enumerate(counterbore_positions):
-        gcode.append(f"(HOLE {i+1}: X{x:.3f}, Y{y:.3f})")
+        yield f"(HOLE {i+1}: X{x:.3f}, Y{y:.3f})"
     
     # 添加调试输出，显示坐标转换过程
-    gcode.append("(DEBUG: COORDINATE CONVERSION FROM CARTESIAN TO POLAR)")
+    yield "(DEBUG: COORDINATE CONVERSION FROM CARTESIAN TO POLAR)"
     for i, (x, y) in enumerate(counterbore_positions):
         dx = x - base_x
         dy = y - base_y
         radius = math.sqrt(dx*dx + dy*dy)
         angle = math.degrees(math.atan2(dy, dx))
-        gcode.append(f"(DEBUG: HOLE {i+1} - CARTESIAN({x:.3f}, {y:.3f}) -> RELATIVE({dx:.3f}, {dy:.3f}) -> POLAR(R{radius:.3f}, A{angle:.3f}°))")
+        yield f"(DEBUG: HOLE {i+1} - CARTESIAN({x:.3f}, {y:.3f}) -> RELATIVE({dx:.3f}, {dy:.3f}) -> POLAR(R{radius:.3f}, A{angle:.3f}°))"
     
     # 在加工循环中使用极坐标
     # 注意：在FANUC中，G16启用极坐标模式后，X表示半径，Y表示角度
-    gcode.append("")
-    gcode.append("(STEP 1: PILOT DRILLING OPERATION WITH POLAR COORDINATES)")
-    gcode.append("(TOOL CHANGE - T01: CENTER DRILL)")
-    gcode.append("T1 M06 (TOOL CHANGE - CENTER DRILL)")
-    gcode.append("G54 (ENSURE WORK COORDINATE SYSTEM IS SELECTED)")
-    gcode.append("G43 H1 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T1)")
-    gcode.append("M03 S1000 (SPINDLE FORWARD, PILOT DRILLING SPEED)")
-    gcode.append("G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)")
-    gcode.append("M08 (COOLANT ON)")
+    yield ""
+    yield "(STEP 1: PILOT DRILLING OPERATION WITH POLAR COORDINATES)"
+    yield "(TOOL CHANGE - T01: CENTER DRILL)"
+    yield "T1 M06 (TOOL CHANGE - CENTER DRILL)"
+    yield "G54 (ENSURE WORK COORDINATE SYSTEM IS SELECTED)"
+    yield "G43 H1 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T1)"
+    yield "M03 S1000 (SPINDLE FORWARD, PILOT DRILLING SPEED)"
+    yield "G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
+    yield "M08 (COOLANT ON)"
     
     # 设置参考点
-    gcode.append(f"G00 X{base_x:.3f} Y{base_y:.3f} (MOVE TO POLAR COORDINATE REFERENCE POINT)")
+    yield f"G00 X{base_x:.3f} Y{base_y:.3f} (MOVE TO POLAR COORDINATE REFERENCE POINT)"
     # 启用极坐标模式
-    gcode.append("G16 (ENTER POLAR COORDINATE MODE)")
+    yield "G16 (ENTER POLAR COORDINATE MODE)"
     
     # 使用极坐标进行点孔加工 - X表示半径，Y表示角度
     for i, (x, y) in enumerate(counterbore_positions):
@@ -709,30 +834,30 @@ def _generate_polar_coordinate_counterbore_code(
         angle = math.degrees(math.atan2(dy, dx))  # 角度
         
         if i == 0:
-            gcode.append(f"G82 X{radius:.3f} Y{angle:.3f} Z{-centering_depth:.3f} R{GCODE_GENERATION_CONFIG['safety']['approach_height']:.1f} P{GCODE_GENERATION_CONFIG['safety']['dwell_time']:.0f} F50.0 (SPOT DRILLING CYCLE, R{radius:.1f}, ANGLE{angle:.1f})")
+            yield f"G82 X{radius:.3f} Y{angle:.3f} Z{-centering_depth:.3f} R{GCODE_GENERATION_CONFIG['safety']['approach_height']:.1f} P{GCODE_GENERATION_CONFIG['safety']['dwell_time']:.0f} F50.0 (SPOT DRILLING CYCLE, R{radius:.1f}, ANGLE{angle:.1f})"
         else:
-            gcode.append(f"X{radius:.3f} Y{angle:.3f} (PILOT DRILLING {i+1}: R{radius:.1f}, ANGLE{angle:.1f})")
+            yield f"X{radius:.3f} Y{angle:.3f} (PILOT DRILLING {i+1}: R{radius:.1f}, ANGLE{angle:.1f})"
     
-    gcode.append("G80 (CANCEL FIXED CYCLE)")
-    gcode.append("M09 (COOLANT OFF)")
-    gcode.append(f"G00 Z{GCODE_GENERATION_CONFIG['safety']['safe_height']:.1f} (RAPID MOVE TO UNIFIED SAFE HEIGHT)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
-    gcode.append("G15 (CANCEL POLAR COORDINATES)")
+    yield "G80 (CANCEL FIXED CYCLE)"
+    yield "M09 (COOLANT OFF)"
+    yield f"G00 Z{GCODE_GENERATION_CONFIG['safety']['safe_height']:.1f} (RAPID MOVE TO UNIFIED SAFE HEIGHT)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
+    yield "G15 (CANCEL POLAR COORDINATES)"
     
     # 2. 钻孔工艺使用极坐标
-    gcode.append("")
-    gcode.append("(STEP 2: DRILLING OPERATION WITH POLAR COORDINATES)")
-    gcode.append(f"(TOOL CHANGE - T02: DRILL BIT, HOLE DIAMETER {inner_diameter}mm)")
-    gcode.append("T2 M06 (TOOL CHANGE - DRILL BIT)")
-    gcode.append("G54 (ENSURE WORK COORDINATE SYSTEM IS SELECTED)")
-    gcode.append("G43 H2 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T2)")
-    gcode.append("M03 S800 (SPINDLE FORWARD, DRILLING SPEED)")
-    gcode.append("G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)")
-    gcode.append("M08 (COOLANT ON)")
+    yield ""
+    yield "(STEP 2: DRILLING OPERATION WITH POLAR COORDINATES)"
+    yield f"(TOOL CHANGE - T02: DRILL BIT, HOLE DIAMETER {inner_diameter}mm)"
+    yield "T2 M06 (TOOL CHANGE - DRILL BIT)"
+    yield "G54 (ENSURE WORK COORDINATE SYSTEM IS SELECTED)"
+    yield "G43 H2 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T2)"
+    yield "M03 S800 (SPINDLE FORWARD, DRILLING SPEED)"
+    yield "G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
+    yield "M08 (COOLANT ON)"
     
     # 重新启用极坐标模式（因为固定循环已被取消）
-    gcode.append(f"G00 X{base_x:.3f} Y{base_y:.3f} (MOVE TO POLAR COORDINATE REFERENCE POINT)")
-    gcode.append("G16 (ENTER POLAR COORDINATE MODE)")
+    yield f"G00 X{base_x:.3f} Y{base_y:.3f} (MOVE TO POLAR COORDINATE REFERENCE POINT)"
+    yield "G16 (ENTER POLAR COORDINATE MODE)"
     
     # 使用极坐标进行钻孔加工
     for i, (x, y) in enumerate(counterbore_positions):
@@ -743,30 +868,30 @@ def _generate_polar_coordinate_counterbore_code(
         angle = math.degrees(math.atan2(dy, dx))  # 角度
         
         if i == 0:
-            gcode.append(f"G83 X{radius:.3f} Y{angle:.3f} Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f} (DEEP HOLE DRILLING CYCLE - R{radius:.1f}, ANGLE{angle:.1f}, φ{inner_diameter} THRU HOLE)")
+            yield f"G83 X{radius:.3f} Y{angle:.3f} Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f} (DEEP HOLE DRILLING CYCLE - R{radius:.1f}, ANGLE{angle:.1f}, φ{inner_diameter} THRU HOLE)"
         else:
-            gcode.append(f"X{radius:.3f} Y{angle:.3f} (DRILLING {i+1}: R{radius:.1f}, ANGLE{angle:.1f} - φ{inner_diameter} THRU HOLE)")
+            yield f"X{radius:.3f} Y{angle:.3f} (DRILLING {i+1}: R{radius:.1f}, ANGLE{angle:.1f} - φ{inner_diameter} THRU HOLE)"
     
-    gcode.append("G80 (CANCEL FIXED CYCLE)")
-    gcode.append("M09 (COOLANT OFF)")
-    gcode.append("G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
-    gcode.append("G15 (CANCEL POLAR COORDINATES)")
+    yield "G80 (CANCEL FIXED CYCLE)"
+    yield "M09 (COOLANT OFF)"
+    yield "G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
+    yield "G15 (CANCEL POLAR COORDINATES)"
     
     # 3. 锪孔工艺使用极坐标
-    gcode.append("")
-    gcode.append("(STEP 3: COUNTERBORE OPERATION WITH POLAR COORDINATES)")
-    gcode.append(f"(TOOL CHANGE - T04: COUNTERBORE TOOL, φ{outer_diameter}mm)")
-    gcode.append("T4 M06 (TOOL CHANGE - COUNTERBORE TOOL)")
-    gcode.append("G54 (ENSURE WORK COORDINATE SYSTEM IS SELECTED)")
-    gcode.append("G43 H4 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T4)")
-    gcode.append(f"M03 S{int(counterbore_spindle_speed)} (SPINDLE FORWARD, COUNTERBORE SPEED)")
-    gcode.append("G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)")
-    gcode.append("M08 (COOLANT ON)")
+    yield ""
+    yield "(STEP 3: COUNTERBORE OPERATION WITH POLAR COORDINATES)"
+    yield f"(TOOL CHANGE - T04: COUNTERBORE TOOL, φ{outer_diameter}mm)"
+    yield "T4 M06 (TOOL CHANGE - COUNTERBORE TOOL)"
+    yield "G54 (ENSURE WORK COORDINATE SYSTEM IS SELECTED)"
+    yield "G43 H4 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T4)"
+    yield f"M03 S{int(counterbore_spindle_speed)} (SPINDLE FORWARD, COUNTERBORE SPEED)"
+    yield "G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
+    yield "M08 (COOLANT ON)"
     
     # 重新启用极坐标模式（因为固定循环已被取消）
-    gcode.append(f"G00 X{base_x:.3f} Y{base_y:.3f} (MOVE TO POLAR COORDINATE REFERENCE POINT)")
-    gcode.append("G16 (ENTER POLAR COORDINATE MODE)")
+    yield f"G00 X{base_x:.3f} Y{base_y:.3f} (MOVE TO POLAR COORDINATE REFERENCE POINT)"
+    yield "G16 (ENTER POLAR COORDINATE MODE)"
     
     # 使用极坐标进行锪孔加工
     for i, (x, y) in enumerate(counterbore_positions):
@@ -777,36 +902,33 @@ def _generate_polar_coordinate_counterbore_code(
         angle = math.degrees(math.atan2(dy, dx))  # 角度
         
         if i == 0:
-            gcode.append(f"G81 X{radius:.3f} Y{angle:.3f} Z{-counterbore_depth:.3f} R2.0 F{counterbore_feed:.1f} (COUNTERBORE {i+1}: R{radius:.1f}, ANGLE{angle:.1f} - φ{outer_diameter} COUNTERBORE DEPTH {counterbore_depth}mm)")
+            yield f"G81 X{radius:.3f} Y{angle:.3f} Z{-counterbore_depth:.3f} R2.0 F{counterbore_feed:.1f} (COUNTERBORE {i+1}: R{radius:.1f}, ANGLE{angle:.1f} - φ{outer_diameter} COUNTERBORE DEPTH {counterbore_depth}mm)"
         else:
-            gcode.append(f"X{radius:.3f} Y{angle:.3f} (COUNTERBORE {i+1}: R{radius:.1f}, ANGLE{angle:.1f} - φ{outer_diameter} COUNTERBORE DEPTH {counterbore_depth}mm)")
+            yield f"X{radius:.3f} Y{angle:.3f} (COUNTERBORE {i+1}: R{radius:.1f}, ANGLE{angle:.1f} - φ{outer_diameter} COUNTERBORE DEPTH {counterbore_depth}mm)"
     
-    gcode.append("G80 (CANCEL FIXED CYCLE)")
-    gcode.append("M09 (COOLANT OFF)")
-    gcode.append(f"G00 Z100.0 (RAPID RETRACTION TO UNIFIED SAFE HEIGHT)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
-    gcode.append("M05 (SPINDLE STOP)")
-    gcode.append("G15 (CANCEL POLAR COORDINATES)")
+    yield "G80 (CANCEL FIXED CYCLE)"
+    yield "M09 (COOLANT OFF)"
+    yield f"G00 Z100.0 (RAPID RETRACTION TO UNIFIED SAFE HEIGHT)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
+    yield "M05 (SPINDLE STOP)"
+    yield "G15 (CANCEL POLAR COORDINATES)"
     
-    gcode.append("")
+    yield ""
     # 特别输出符合用户期望的极坐标格式（仅作为参考）
-    gcode.append("(EXPECTED POLAR COORDINATE OUTPUT - FOR REFERENCE)")
+    yield "(EXPECTED POLAR COORDINATE OUTPUT - FOR REFERENCE)"
     for i, (x, y) in enumerate(counterbore_positions):
         if i == 0:
-            gcode.append(f"(CENTER REFERENCE: X{base_x:.1f}, Y{base_y:.1f})")
+            yield f"(CENTER REFERENCE: X{base_x:.1f}, Y{base_y:.1f})"
         else:
             dx = x - base_x
             dy = y - base_y
             radius = math.sqrt(dx*dx + dy*dy)
             angle = math.degrees(math.atan2(dy, dx))
-            gcode.append(f"(POLAR POSITION: R{radius:.1f} ANGLE{angle:.1f})")
-    gcode.append("")
-    
-    return True
+            yield f"(POLAR POSITION: R{radius:.1f} ANGLE{angle:.1f})"
+    yield ""
 
 
 def _generate_cartesian_counterbore_code(
-    gcode: List[str], 
     counterbore_positions: List[Tuple[float, float]], 
     outer_diameter: float, 
     inner_diameter: float, 
@@ -817,135 +939,145 @@ def _generate_cartesian_counterbore_code(
     drill_feed: float,
     counterbore_spindle_speed: float,
     counterbore_feed: float,
-    description_analysis: Dict
-) -> None:
-    """生成笛卡尔坐标系下的沉孔加工代码"""
+    description_analysis: Dict,
+    pattern: Optional[Dict] = None,
+    pattern_mode: str = 'macro'
+) -> Iterator[str]:
+    """生成笛卡尔坐标系下的沉孔加工代码（识别到孔阵列时用阵列循环代替逐孔程序段）"""
     description = description_analysis.get("description", "").lower()
     
     # 添加加工统计信息
     if not counterbore_positions:
         if "沉孔" in description or "counterbore" in description or "锪孔" in description:
-            gcode.append("(COUNTERBORE OPERATION - NO SPECIFIC POSITIONS DETECTED)")
-            gcode.append("(USING EXAMPLE POSITION 50.0, 50.0 - MODIFY ACCORDING TO ACTUAL DRAWING)")
-            gcode.append(f"(COUNTERBORE PROCESS - REQUESTED {hole_count} HOLES, USING {len(counterbore_positions)} EXAMPLE POSITIONS - MODIFY AS NEEDED)")
+            yield "(COUNTERBORE OPERATION - NO SPECIFIC POSITIONS DETECTED)"
+            yield "(USING EXAMPLE POSITION 50.0, 50.0 - MODIFY ACCORDING TO ACTUAL DRAWING)"
+            yield f"(COUNTERBORE PROCESS - REQUESTED {hole_count} HOLES, USING {len(counterbore_positions)} EXAMPLE POSITIONS - MODIFY AS NEEDED)"
         else:
-            gcode.append(f"(COUNTERBORE PROCESS - TOTAL {len(counterbore_positions)} HOLES)")
+            yield f"(COUNTERBORE PROCESS - TOTAL {len(counterbore_positions)} HOLES)"
     else:
-        gcode.append(f"(COUNTERBORE PROCESS - REQUESTED {hole_count} HOLES, DETECTED {len(counterbore_positions)} POSITIONS)")
+        yield f"(COUNTERBORE PROCESS - REQUESTED {hole_count} HOLES, DETECTED {len(counterbore_positions)} POSITIONS)"
     
-    # 为每个位置添加标注
-    for i, (x, y) in enumerate(counterbore_positions):
-        gcode.append(f"(HOLE {i+1}: POSITION X{x:.3f} Y{y:.3f} - φ{outer_diameter if outer_diameter > 0 else 22.0} COUNTERBORE DEPTH {counterbore_depth}mm + φ{inner_diameter if inner_diameter > 0 else 14.5} THRU HOLE)")
+    # 为每个位置添加标注（孔阵列只标注阵列参数）
+    if pattern is not None:
+        yield format_pattern_comment(pattern, "COUNTERBORE")
+    for i, (x, y) in enumerate(counterbore_positions if pattern is None else []):
+        yield f"(HOLE {i+1}: POSITION X{x:.3f} Y{y:.3f} - φ{outer_diameter if outer_diameter > 0 else 22.0} COUNTERBORE DEPTH {counterbore_depth}mm + φ{inner_diameter if inner_diameter > 0 else 14.5} THRU HOLE)"
     
-    gcode.append("")
+    yield ""
     
     # 1. 点孔工艺 (使用T1 - 中心钻)
-    gcode.append("(STEP 1: PILOT DRILLING OPERATION)")
-    gcode.append("(TOOL CHANGE - T01: CENTER DRILL)")
-    gcode.append("T1 M06 (TOOL CHANGE - CENTER DRILL)")
-    gcode.append("M03 S1000 (SPINDLE FORWARD, PILOT DRILLING SPEED)")
-    gcode.append("G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)")
+    yield "(STEP 1: PILOT DRILLING OPERATION)"
+    yield "(TOOL CHANGE - T01: CENTER DRILL)"
+    yield "T1 M06 (TOOL CHANGE - CENTER DRILL)"
+    yield "M03 S1000 (SPINDLE FORWARD, PILOT DRILLING SPEED)"
+    yield "G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
     
     # 激活刀具长度补偿
-    gcode.append("G43 H1 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T1)")
+    yield "G43 H1 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T1)"
     
     # 开启切削液
-    gcode.append("M08 (COOLANT ON)")
+    yield "M08 (COOLANT ON)"
     
     # 点孔循环
-    if counterbore_positions:
+    if pattern is not None:
+        yield from format_pattern_cycle(pattern, f"G82 Z{-centering_depth:.3f} R2.0 P1000 F50.0", pattern_mode)
+    elif counterbore_positions:
         first_x, first_y = counterbore_positions[0]
-        gcode.append(f"G82 X{first_x:.3f} Y{first_y:.3f} Z{-centering_depth:.3f} R2.0 P1000 F50.0 (SPOT DRILLING CYCLE, DWELL 1 SECOND)")
+        yield f"G82 X{first_x:.3f} Y{first_y:.3f} Z{-centering_depth:.3f} R2.0 P1000 F50.0 (SPOT DRILLING CYCLE, DWELL 1 SECOND)"
         
         # 对于后续孔位置，只使用X、Y坐标
         for i, (center_x, center_y) in enumerate(counterbore_positions[1:], 2):
-            gcode.append(f"X{center_x:.3f} Y{center_y:.3f} (PILOT DRILLING {i}: X{center_x:.1f},Y{center_y:.1f})")
+            yield f"X{center_x:.3f} Y{center_y:.3f} (PILOT DRILLING {i}: X{center_x:.1f},Y{center_y:.1f})"
     else:
-        gcode.append(f"G82 Z{-centering_depth:.3f} R2.0 P1000 F50.0 (SPOT DRILLING CYCLE, DWELL 1 SECOND)")
+        yield f"G82 Z{-centering_depth:.3f} R2.0 P1000 F50.0 (SPOT DRILLING CYCLE, DWELL 1 SECOND)"
     
-    gcode.append("G80 (CANCEL FIXED CYCLE)")
+    yield "G80 (CANCEL FIXED CYCLE)"
     
     # 关闭切削液
-    gcode.append("M09 (COOLANT OFF)")
+    yield "M09 (COOLANT OFF)"
     
     # 移动到统一的安全高度，然后取消刀具长度补偿
-    gcode.append("G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
+    yield "G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
     
     # 2. 钻孔工艺 (使用T2 - φ14.5钻头)
-    gcode.append("")
-    gcode.append("(STEP 2: DRILLING OPERATION)")
-    gcode.append(f"(TOOL CHANGE - T02: DRILL BIT, HOLE DIAMETER {inner_diameter}mm)")
-    gcode.append("T2 M06 (TOOL CHANGE - DRILL BIT)")
-    gcode.append("M03 S800 (SPINDLE FORWARD, DRILLING SPEED)")
-    gcode.append("G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)")
+    yield ""
+    yield "(STEP 2: DRILLING OPERATION)"
+    yield f"(TOOL CHANGE - T02: DRILL BIT, HOLE DIAMETER {inner_diameter}mm)"
+    yield "T2 M06 (TOOL CHANGE - DRILL BIT)"
+    yield "M03 S800 (SPINDLE FORWARD, DRILLING SPEED)"
+    yield "G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
     
     # 激活刀具长度补偿
-    gcode.append("G43 H2 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T2)")
+    yield "G43 H2 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T2)"
     
     # 开启切削液
-    gcode.append("M08 (COOLANT ON)")
+    yield "M08 (COOLANT ON)"
     
     # 钻孔循环
-    if counterbore_positions:
+    if pattern is not None:
+        yield from format_pattern_cycle(pattern, f"G83 Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f}", pattern_mode)
+    elif counterbore_positions:
         first_x, first_y = counterbore_positions[0]
-        gcode.append(f"G83 X{first_x:.3f} Y{first_y:.3f} Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f} (DEEP HOLE DRILLING CYCLE - φ{inner_diameter} THRU HOLE)")
+        yield f"G83 X{first_x:.3f} Y{first_y:.3f} Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f} (DEEP HOLE DRILLING CYCLE - φ{inner_diameter} THRU HOLE)"
         
         # 对于后续孔位置，只使用X、Y坐标
         for i, (center_x, center_y) in enumerate(counterbore_positions[1:], 2):
-            gcode.append(f"X{center_x:.3f} Y{center_y:.3f} (DRILLING {i}: X{center_x:.1f},Y{center_y:.1f} - φ{inner_diameter} THRU HOLE)")
+            yield f"X{center_x:.3f} Y{center_y:.3f} (DRILLING {i}: X{center_x:.1f},Y{center_y:.1f} - φ{inner_diameter} THRU HOLE)"
     else:
-        gcode.append(f"G83 Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f} (DEEP HOLE DRILLING CYCLE - φ{inner_diameter} THRU HOLE)")
+        yield f"G83 Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f} (DEEP HOLE DRILLING CYCLE - φ{inner_diameter} THRU HOLE)"
     
-    gcode.append("G80 (CANCEL FIXED CYCLE)")
+    yield "G80 (CANCEL FIXED CYCLE)"
     
     # 关闭切削液
-    gcode.append("M09 (COOLANT OFF)")
+    yield "M09 (COOLANT OFF)"
     
     # 移动到统一的安全高度，然后取消刀具长度补偿
-    gcode.append("G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
+    yield "G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
     
     # 3. 锪孔工艺 (使用T4 - 锪孔刀)
-    gcode.append("")
-    gcode.append("(STEP 3: COUNTERBORE OPERATION)")
-    gcode.append(f"(TOOL CHANGE - T04: COUNTERBORE TOOL, φ{outer_diameter}mm)")
+    yield ""
+    yield "(STEP 3: COUNTERBORE OPERATION)"
+    yield f"(TOOL CHANGE - T04: COUNTERBORE TOOL, φ{outer_diameter}mm)"
     
-    gcode.append("T4 M06 (TOOL CHANGE - COUNTERBORE TOOL)")
-    gcode.append(f"M03 S{int(counterbore_spindle_speed)} (SPINDLE FORWARD, COUNTERBORE SPEED)")
-    gcode.append("G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)")
+    yield "T4 M06 (TOOL CHANGE - COUNTERBORE TOOL)"
+    yield f"M03 S{int(counterbore_spindle_speed)} (SPINDLE FORWARD, COUNTERBORE SPEED)"
+    yield "G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
     
     # 激活刀具长度补偿
-    gcode.append("G43 H4 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T4)")
+    yield "G43 H4 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T4)"
     
     # 开启切削液
-    gcode.append("M08 (COOLANT ON)")
+    yield "M08 (COOLANT ON)"
     
     # 锪孔循环
-    if counterbore_positions:
+    if pattern is not None:
+        yield from format_pattern_cycle(pattern, f"G81 Z{-counterbore_depth:.3f} R2.0 F{counterbore_feed:.1f}", pattern_mode)
+    elif counterbore_positions:
         first_x, first_y = counterbore_positions[0]
-        gcode.append(f"G81 X{first_x:.3f} Y{first_y:.3f} Z{-counterbore_depth:.3f} R2.0 F{counterbore_feed:.1f} (COUNTERBORE 1: X{first_x:.1f},Y{first_y:.1f} - φ{outer_diameter} COUNTERBORE DEPTH {counterbore_depth}mm)")
+        yield f"G81 X{first_x:.3f} Y{first_y:.3f} Z{-counterbore_depth:.3f} R2.0 F{counterbore_feed:.1f} (COUNTERBORE 1: X{first_x:.1f},Y{first_y:.1f} - φ{outer_diameter} COUNTERBORE DEPTH {counterbore_depth}mm)"
         
         # 对于后续孔位置，只使用X、Y坐标
         for i, (center_x, center_y) in enumerate(counterbore_positions[1:], 2):
-            gcode.append(f"X{center_x:.3f} Y{center_y:.3f} (COUNTERBORE {i}: X{center_x:.1f},Y{center_y:.1f} - φ{outer_diameter} COUNTERBORE DEPTH {counterbore_depth}mm)")
+            yield f"X{center_x:.3f} Y{center_y:.3f} (COUNTERBORE {i}: X{center_x:.1f},Y{center_y:.1f} - φ{outer_diameter} COUNTERBORE DEPTH {counterbore_depth}mm)"
     else:
-        gcode.append(f"G81 Z{-counterbore_depth:.3f} R2.0 F{counterbore_feed:.1f} (COUNTERBORE CYCLE - φ{outer_diameter} COUNTERBORE DEPTH {counterbore_depth}mm)")
+        yield f"G81 Z{-counterbore_depth:.3f} R2.0 F{counterbore_feed:.1f} (COUNTERBORE CYCLE - φ{outer_diameter} COUNTERBORE DEPTH {counterbore_depth}mm)"
     
-    gcode.append("G80 (CANCEL FIXED CYCLE)")
+    yield "G80 (CANCEL FIXED CYCLE)"
     
     # 关闭切削液
-    gcode.append("M09 (COOLANT OFF)")
+    yield "M09 (COOLANT OFF)"
     
     # 加工完成后，移动到安全高度，然后取消刀具长度补偿
-    gcode.append(f"G00 Z100.0 (RAPID RETRACTION TO UNIFIED SAFE HEIGHT)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
-    gcode.append("M05 (SPINDLE STOP)")
+    yield f"G00 Z100.0 (RAPID RETRACTION TO UNIFIED SAFE HEIGHT)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
+    yield "M05 (SPINDLE STOP)"
 
 
-def _generate_counterbore_code(features: List[Dict], description_analysis: Dict) -> List[str]:
+def _generate_counterbore_code(features: List[Dict], description_analysis: Dict,
+                               header_notes: Optional[List[str]] = None) -> Iterator[str]:
     """生成沉孔（Counterbore）加工代码 - 使用点孔、钻孔、锪孔工艺"""
-    gcode = []
     
     # 提取沉孔参数
     (outer_diameter, inner_diameter, counterbore_depth, hole_count, counterbore_positions,
@@ -978,7 +1110,7 @@ def _generate_counterbore_code(features: List[Dict], description_analysis: Dict)
         "using polar coordinates at" in description or
         "polar coordinate position" in description):
         use_polar_coordinates = True
-        gcode.append("(USER REQUESTED POLAR COORDINATE POSITIONING - PROCESSING CARTESIAN COORDINATES AS POLAR REFERENCE POINTS)")
+        yield "(USER REQUESTED POLAR COORDINATE POSITIONING - PROCESSING CARTESIAN COORDINATES AS POLAR REFERENCE POINTS)"
     elif ("使用极坐标" in description or 
           "极坐标模式" in description or 
           "polar mode" in description or
@@ -999,44 +1131,48 @@ def _generate_counterbore_code(features: List[Dict], description_analysis: Dict)
         # 如果同时包含极坐标关键词和笛卡尔坐标，则使用极坐标模式
         if cartesian_coords_found and len(cartesian_coords_found) > 0 and has_polar_keyword:
             use_polar_coordinates = True
-            gcode.append(f"(FOUND {len(cartesian_coords_found)} CARTESIAN COORDINATES AND POLAR KEYWORD - USING POLAR COORDINATE MODE)")
+            yield f"(FOUND {len(cartesian_coords_found)} CARTESIAN COORDINATES AND POLAR KEYWORD - USING POLAR COORDINATE MODE)"
             for coord in cartesian_coords_found:
-                gcode.append(f"(COORD: {coord})")
+                yield f"(COORD: {coord})"
         elif cartesian_coords_found and len(cartesian_coords_found) > 0:
             # 如果只有笛卡尔坐标没有极坐标关键词，则使用笛卡尔坐标
             use_polar_coordinates = False
-            gcode.append(f"(FOUND {len(cartesian_coords_found)} CARTESIAN COORDINATES IN DESCRIPTION - USING CARTESIAN MODE)")
+            yield f"(FOUND {len(cartesian_coords_found)} CARTESIAN COORDINATES IN DESCRIPTION - USING CARTESIAN MODE)"
             for coord in cartesian_coords_found:
-                gcode.append(f"(COORD: {coord})")
+                yield f"(COORD: {coord})"
         else:
             # 如果没有笛卡尔坐标但有极坐标关键词，则使用极坐标
             use_polar_coordinates = True
     
     # 如果用户明确要求使用极坐标，才使用极坐标模式
     if use_polar_coordinates and len(counterbore_positions) > 0:
-        gcode.append("(USING POLAR COORDINATES FOR HOLE POSITIONS)")
-        if _generate_polar_coordinate_counterbore_code(
-            gcode, counterbore_positions, outer_diameter, inner_diameter, 
+        yield "(USING POLAR COORDINATES FOR HOLE POSITIONS)"
+        # 用户要求极坐标时螺栓孔圆总是用G16输出（矩形阵列仍为宏程序循环）
+        pattern, _ = _hole_pattern(counterbore_positions, "COUNTERBORE", description_analysis, header_notes)
+        yield from _generate_polar_coordinate_counterbore_code(
+            counterbore_positions, outer_diameter, inner_diameter, 
             counterbore_depth, centering_depth, drilling_depth, 
-            drill_feed, counterbore_spindle_speed, counterbore_feed
-        ):
-            return gcode  # 如果生成了极坐标代码，则返回
+            drill_feed, counterbore_spindle_speed, counterbore_feed,
+            pattern, 'polar'
+        )
     else:
         # 默认使用笛卡尔坐标系，这是大多数情况下的正确选择
+        # 极坐标按用户给出的角度顺序加工，笛卡尔坐标按快速移动距离最短重排
+        pattern, pattern_mode = _hole_pattern(counterbore_positions, "COUNTERBORE", description_analysis, header_notes)
+        if pattern is None:
+            counterbore_positions = _sequence_holes(counterbore_positions, "COUNTERBORE", header_notes)
         # 生成笛卡尔坐标代码
-        _generate_cartesian_counterbore_code(
-            gcode, counterbore_positions, outer_diameter, inner_diameter, 
+        yield from _generate_cartesian_counterbore_code(
+            counterbore_positions, outer_diameter, inner_diameter, 
             counterbore_depth, hole_count, centering_depth, drilling_depth, 
             drill_feed, counterbore_spindle_speed, counterbore_feed, 
-            description_analysis
+            description_analysis, pattern, pattern_mode
         )
-    
-    return gcode
 
 
-def _generate_tapping_code_with_full_process(features: List[Dict], description_analysis: Dict) -> List[str]:
+def _generate_tapping_code_with_full_process(features: List[Dict], description_analysis: Dict,
+                                             header_notes: Optional[List[str]] = None) -> Iterator[str]:
     """生成完整的螺纹孔加工代码 - 使用点孔、钻孔、攻丝3把刀的完整工艺"""
-    gcode = []
     
     # 优先使用从描述分析中提取的螺纹规格信息
     description = description_analysis.get("description", "").lower()
@@ -1064,17 +1200,7 @@ def _generate_tapping_code_with_full_process(features: List[Dict], description_a
             thread_size = "M10"  # 默认
     
     # 根据螺纹规格确定钻孔尺寸
-    thread_to_drill = {
-        "M3": 2.5,
-        "M4": 3.3,
-        "M5": 4.2,
-        "M6": 5.0,
-        "M8": 6.8,
-        "M10": 8.5,
-        "M12": 10.2
-    }
-    
-    drill_diameter = thread_to_drill.get(thread_size, 8.5)
+    drill_diameter = TAP_DRILL_MAP.get(thread_size, 8.5)
     
     # 计算点孔、钻孔、攻丝的深度 - 优先使用描述分析中的深度
     centering_depth = 1    # 点孔深度
@@ -1100,74 +1226,84 @@ def _generate_tapping_code_with_full_process(features: List[Dict], description_a
         if user_hole_positions:
             hole_positions = user_hole_positions
     
+    # 点孔、钻孔、攻丝三把刀按同一顺序走（孔阵列按阵列循环的固定顺序）
+    pattern, pattern_mode = _hole_pattern(hole_positions, "TAPPING", description_analysis, header_notes)
+    if pattern is None:
+        hole_positions = _sequence_holes(hole_positions, "TAPPING", header_notes)
+    
     # 如果仍然没有孔位置，但用户要求加工螺纹孔，提供一个默认位置
     if not hole_positions:
         # 检查用户描述是否确实要求加工螺纹孔
         if "螺纹" in description or "thread" in description or "攻丝" in description or "tapping" in description:
             # 提供一个默认位置，同时在注释中说明这是示例位置
             hole_positions = [(50.0, 50.0)]  # 默认位置，用户可修改
-            gcode.append("(THREADING OPERATION - NO SPECIFIC POSITIONS DETECTED)")
-            gcode.append("(USING EXAMPLE POSITION 50.0, 50.0 - MODIFY ACCORDING TO ACTUAL DRAWING)")
-            gcode.append(f"(THREADING PROCESS - TOTAL {len(hole_positions)} HOLE - EXAMPLE)")
-            gcode.append("(HOLE 1: POSITION X50.000 Y50.000 - MODIFY TO ACTUAL POSITION)")
+            yield "(THREADING OPERATION - NO SPECIFIC POSITIONS DETECTED)"
+            yield "(USING EXAMPLE POSITION 50.0, 50.0 - MODIFY ACCORDING TO ACTUAL DRAWING)"
+            yield f"(THREADING PROCESS - TOTAL {len(hole_positions)} HOLE - EXAMPLE)"
+            yield "(HOLE 1: POSITION X50.000 Y50.000 - MODIFY TO ACTUAL POSITION)"
         else:
-            gcode.append(f"(THREADING PROCESS - TOTAL {len(hole_positions)} HOLES)")
+            yield f"(THREADING PROCESS - TOTAL {len(hole_positions)} HOLES)"
             for i, (x, y) in enumerate(hole_positions):
-                gcode.append(f"(HOLE {i+1}: POSITION X{x:.3f} Y{y:.3f})")
+                yield f"(HOLE {i+1}: POSITION X{x:.3f} Y{y:.3f})"
+    elif pattern is not None:
+        yield f"(THREADING PROCESS - TOTAL {len(hole_positions)} HOLES)"
+        yield format_pattern_comment(pattern, "TAPPING")
     else:
-        gcode.append(f"(THREADING PROCESS - TOTAL {len(hole_positions)} HOLES)")
+        yield f"(THREADING PROCESS - TOTAL {len(hole_positions)} HOLES)"
         for i, (x, y) in enumerate(hole_positions):
-            gcode.append(f"(HOLE {i+1}: POSITION X{x:.3f} Y{y:.3f})")
+            yield f"(HOLE {i+1}: POSITION X{x:.3f} Y{y:.3f})"
     
-    gcode.append("")
+    yield ""
     
     # 1. 点孔工艺 (使用T1 - 中心钻)
-    gcode.append("(STEP 1: PILOT DRILLING OPERATION)")
-    gcode.append("(TOOL CHANGE - T01: CENTER DRILL)")
-    gcode.append("T1 M06 (TOOL CHANGE - CENTER DRILL)")
-    gcode.append("M03 S1000 (SPINDLE FORWARD, PILOT DRILLING SPEED)")
-    gcode.append("G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)")
+    yield "(STEP 1: PILOT DRILLING OPERATION)"
+    yield "(TOOL CHANGE - T01: CENTER DRILL)"
+    yield "T1 M06 (TOOL CHANGE - CENTER DRILL)"
+    yield "M03 S1000 (SPINDLE FORWARD, PILOT DRILLING SPEED)"
+    yield "G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
     
     # 激活刀具长度补偿
-    gcode.append("G43 H1 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T1)")
+    yield "G43 H1 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T1)"
     
     # 开启切削液
-    gcode.append("M08 (COOLANT ON)")
+    yield "M08 (COOLANT ON)"
     
     # 点孔循环 - 首先在第一个孔位置执行完整循环
-    if hole_positions:
+    if pattern is not None:
+        yield from format_pattern_cycle(pattern, f"G82 Z{-centering_depth:.3f} R2.0 P1000 F50.0", pattern_mode)
+    elif hole_positions:
         first_x, first_y = hole_positions[0]
-        gcode.append(f"G82 X{first_x:.3f} Y{first_y:.3f} Z{-centering_depth:.3f} R2.0 P1000 F50.0 (SPOT DRILLING CYCLE, DWELL 1 SECOND)")
+        yield f"G82 X{first_x:.3f} Y{first_y:.3f} Z{-centering_depth:.3f} R2.0 P1000 F50.0 (SPOT DRILLING CYCLE, DWELL 1 SECOND)"
         
         # 对于后续孔位置，只使用X、Y坐标，简化编程
         for i, (center_x, center_y) in enumerate(hole_positions[1:], 2):
-            gcode.append(f"X{center_x:.3f} Y{center_y:.3f} (PILOT DRILLING {i}: X{center_x:.1f},Y{center_y:.1f})")
+            yield f"X{center_x:.3f} Y{center_y:.3f} (PILOT DRILLING {i}: X{center_x:.1f},Y{center_y:.1f})"
     else:
         # 如果没有孔位置，仍保留原始循环指令
-        gcode.append(f"G82 Z{-centering_depth:.3f} R2.0 P1000 F50.0 (SPOT DRILLING CYCLE, DWELL 1 SECOND)")
+        yield f"G82 Z{-centering_depth:.3f} R2.0 P1000 F50.0 (SPOT DRILLING CYCLE, DWELL 1 SECOND)"
     
-    gcode.append("G80 (CANCEL FIXED CYCLE)")
+    yield "G80 (CANCEL FIXED CYCLE)"
     
     # 关闭切削液
-    gcode.append("M09 (COOLANT OFF)")
+    yield "M09 (COOLANT OFF)"
     
     # 移动到统一的安全高度，然后取消刀具长度补偿
-    gcode.append("G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
+    yield "G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
     
     # 2. 钻孔工艺 (使用T2 - 钻头)
-    gcode.append("")
-    gcode.append("(STEP 2: DRILLING OPERATION)")
-    gcode.append(f"(TOOL CHANGE - T02: DRILL BIT, HOLE DIAMETER {drill_diameter}mm)")
-    gcode.append("T2 M06 (TOOL CHANGE - DRILL BIT)")
-    gcode.append("M03 S800 (SPINDLE FORWARD, DRILLING SPEED)")
-    gcode.append("G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)")
+    yield ""
+    yield "(STEP 2: DRILLING OPERATION)"
+    yield f"(TOOL CHANGE - T02: DRILL BIT, HOLE DIAMETER {drill_diameter}mm)"
+    yield "T2 M06 (TOOL CHANGE - DRILL BIT)"
+    yield "M03 S800 (SPINDLE FORWARD, DRILLING SPEED)"
+    yield "G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
     
     # 激活刀具长度补偿
-    gcode.append("G43 H2 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T2)")
+    yield "G43 H2 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T2)"
     
     # 开启切削液
-    gcode.append("M08 (COOLANT ON)")
+    yield "M08 (COOLANT ON)"
     
     # 钻孔循环 - 首先在第一个孔位置执行完整循环
     # 优先使用描述分析中的进给率
@@ -1177,30 +1313,32 @@ def _generate_tapping_code_with_full_process(features: List[Dict], description_a
     else:
         drill_feed = float(drill_feed)
     
-    if hole_positions:
+    if pattern is not None:
+        yield from format_pattern_cycle(pattern, f"G83 Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f}", pattern_mode)
+    elif hole_positions:
         first_x, first_y = hole_positions[0]
-        gcode.append(f"G83 X{first_x:.3f} Y{first_y:.3f} Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f} (DEEP HOLE DRILLING CYCLE)")
+        yield f"G83 X{first_x:.3f} Y{first_y:.3f} Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f} (DEEP HOLE DRILLING CYCLE)"
         
         # 对于后续孔位置，只使用X、Y坐标，简化编程
         for i, (center_x, center_y) in enumerate(hole_positions[1:], 2):
-            gcode.append(f"X{center_x:.3f} Y{center_y:.3f} (DRILLING {i}: X{center_x:.1f},Y{center_y:.1f})")
+            yield f"X{center_x:.3f} Y{center_y:.3f} (DRILLING {i}: X{center_x:.1f},Y{center_y:.1f})"
     else:
         # 如果没有孔位置，仍保留原始循环指令
-        gcode.append(f"G83 Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f} (DEEP HOLE DRILLING CYCLE)")
+        yield f"G83 Z{-drilling_depth:.3f} R2.0 Q1.0 F{drill_feed:.1f} (DEEP HOLE DRILLING CYCLE)"
     
-    gcode.append("G80 (CANCEL FIXED CYCLE)")
+    yield "G80 (CANCEL FIXED CYCLE)"
     
     # 关闭切削液
-    gcode.append("M09 (COOLANT OFF)")
+    yield "M09 (COOLANT OFF)"
     
     # 移动到统一的安全高度，然后取消刀具长度补偿
-    gcode.append("G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
+    yield "G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
     
     # 3. 攻丝工艺 (使用T3 - 丝锥)
-    gcode.append("")
-    gcode.append("(STEP 3: TAPPING OPERATION)")
-    gcode.append("(TOOL CHANGE - T03: TAP)")
+    yield ""
+    yield "(STEP 3: TAPPING OPERATION)"
+    yield "(TOOL CHANGE - T03: TAP)"
     
     # 获取攻丝参数 - 优先使用描述分析中的参数
     tapping_spindle_speed = description_analysis.get("spindle_speed")
@@ -1225,59 +1363,150 @@ def _generate_tapping_code_with_full_process(features: List[Dict], description_a
     # 确保攻丝进给率不低于1，避免系统报错
     tapping_feed = max(tapping_feed, 1.0)
     
-    gcode.append(f"T3 M06 (TOOL CHANGE - TAP)")
-    gcode.append(f"M03 S{int(tapping_spindle_speed)} (SPINDLE FORWARD, TAPPING SPEED)")
-    gcode.append("G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)")
+    yield f"T3 M06 (TOOL CHANGE - TAP)"
+    yield f"M03 S{int(tapping_spindle_speed)} (SPINDLE FORWARD, TAPPING SPEED)"
+    yield "G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
     
     # 激活刀具长度补偿
-    gcode.append("G43 H3 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T3)")
+    yield "G43 H3 Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T3)"
     
     # 开启切削液
-    gcode.append("M08 (COOLANT ON)")
+    yield "M08 (COOLANT ON)"
     
     # 攻丝循环 - 首先在第一个孔位置执行完整循环
-    if hole_positions:
+    if pattern is not None:
+        yield from format_pattern_cycle(pattern, f"G84 Z{-tapping_depth:.3f} R2.0 F{tapping_feed:.1f}", pattern_mode)
+    elif hole_positions:
         first_x, first_y = hole_positions[0]
-        gcode.append(f"G84 X{first_x:.3f} Y{first_y:.3f} Z{-tapping_depth:.3f} R2.0 F{tapping_feed:.1f} (TAPPING 1: X{first_x:.1f},Y{first_y:.1f} - {thread_size} THREAD)")
+        yield f"G84 X{first_x:.3f} Y{first_y:.3f} Z{-tapping_depth:.3f} R2.0 F{tapping_feed:.1f} (TAPPING 1: X{first_x:.1f},Y{first_y:.1f} - {thread_size} THREAD)"
         
         # 对于后续孔位置，只使用X、Y坐标，简化编程
         for i, (center_x, center_y) in enumerate(hole_positions[1:], 2):
-            gcode.append(f"X{center_x:.3f} Y{center_y:.3f} (TAPPING {i}: X{center_x:.1f},Y{center_y:.1f} - {thread_size} THREAD)")
+            yield f"X{center_x:.3f} Y{center_y:.3f} (TAPPING {i}: X{center_x:.1f},Y{center_y:.1f} - {thread_size} THREAD)"
     else:
         # 如果没有孔位置，仍保留原始循环指令
-        gcode.append(f"G84 Z{-tapping_depth:.3f} R2.0 F{tapping_feed:.1f} (TAPPING CYCLE - NO SPECIFIC POSITION)")
+        yield f"G84 Z{-tapping_depth:.3f} R2.0 F{tapping_feed:.1f} (TAPPING CYCLE - NO SPECIFIC POSITION)"
     
-    gcode.append("G80 (CANCEL FIXED CYCLE)")
+    yield "G80 (CANCEL FIXED CYCLE)"
     
     # 关闭切削液
-    gcode.append("M09 (COOLANT OFF)")
+    yield "M09 (COOLANT OFF)"
     
     # 攻丝后主轴反转退刀
-    gcode.append(f"M04 S{int(tapping_spindle_speed)} (SPINDLE REVERSE, PREPARE FOR RETRACTION)")
+    yield f"M04 S{int(tapping_spindle_speed)} (SPINDLE REVERSE, PREPARE FOR RETRACTION)"
     # 移动到统一的安全高度，然后取消刀具长度补偿
-    gcode.append(f"G00 Z100.0 (RAPID RETRACTION TO UNIFIED SAFE HEIGHT)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
-    gcode.append("M05 (SPINDLE STOP)")
-    
-    return gcode
+    yield f"G00 Z100.0 (RAPID RETRACTION TO UNIFIED SAFE HEIGHT)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
+    yield "M05 (SPINDLE STOP)"
+
+
+_SCHEDULED_TOOL_NAMES = {
+    'spot_drill': "CENTER DRILL",
+    'drill': "DRILL BIT",
+    'tap': "TAP",
+    'counterbore': "COUNTERBORE TOOL",
+    'mill': "END MILL",
+}
 
 
-def _generate_milling_code(features: List[Dict], description_analysis: Dict) -> List[str]:
+def _generate_scheduled_code(features: List[Dict], description_analysis: Dict,
+                             header_notes: Optional[List[str]] = None) -> Iterator[str]:
+    """按工序调度计划生成混合零件代码 - 每把刀装一次，完成它能加工的全部工序后再换刀"""
+    blocks, stats = schedule_operations(features, description_analysis)
+    if header_notes is not None:
+        header_notes.append(format_schedule_comment(stats))
+
+    drilling = GCODE_GENERATION_CONFIG['drilling']
+    counterbore = GCODE_GENERATION_CONFIG['counterbore']
+    feed_rate = description_analysis.get("feed_rate")
+    drill_feed = float(feed_rate) if isinstance(feed_rate, (int, float)) else drilling['default_feed_rate']
+    spindle_speed = description_analysis.get("spindle_speed")
+    tapping_speed = float(spindle_speed) if isinstance(spindle_speed, (int, float)) \
+        else GCODE_GENERATION_CONFIG['tapping']['tapping_spindle_speed']
+
+    for step, block in enumerate(blocks, 1):
+        kind, size = block['tool']
+        tool_number = block['tool_number']
+        tool_name = _SCHEDULED_TOOL_NAMES.get(kind, "TOOL")
+        label = f" {size}" if kind == 'tap' else (f" φ{size}mm" if size is not None else "")
+        operations = block['operations']
+
+        if step > 1:
+            # 上一刀具块已关闭切削液（M09），换刀前再停主轴
+            yield "M05 (SPINDLE STOP)"
+        yield f"(STEP {step}: {kind.replace('_', ' ').upper()} OPERATION - {len(operations)} FEATURES)"
+        yield f"(TOOL CHANGE - T{tool_number:02}: {tool_name}{label})"
+        yield f"T{tool_number} M06 (TOOL CHANGE - {tool_name})"
+
+        if kind == 'mill':
+            yield from _generate_milling_code([op['feature_data'] for op in operations], description_analysis)
+            yield ""
+            continue
+
+        if kind == 'spot_drill':
+            speed = 1000
+        elif kind == 'drill':
+            speed = drilling['default_spindle_speed']
+        elif kind == 'tap':
+            speed = tapping_speed
+        else:
+            speed = counterbore['counterbore_spindle_speed']
+        yield f"M03 S{int(speed)} (SPINDLE FORWARD)"
+        yield "G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
+        yield f"G43 H{tool_number} Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T{tool_number})"
+        yield "M08 (COOLANT ON)"
+
+        # 同一把刀的工序按循环深度分组，每组孔位按快速移动距离最短排列
+        groups: Dict[float, List[Tuple[float, float]]] = {}
+        for operation in operations:
+            groups.setdefault(operation['depth'], []).append(operation['position'])
+        for depth, positions in groups.items():
+            operation_name = f"T{tool_number} {kind.replace('_', ' ').upper()}"
+            pattern, pattern_mode = _hole_pattern(positions, operation_name, description_analysis, header_notes)
+            if pattern is None and OPERATION_SCHEDULER_CONFIG['sequence_holes']:
+                positions = _sequence_holes(positions, operation_name, header_notes)
+            if kind == 'spot_drill':
+                cycle, comment = f"G82 Z{-depth:.3f} R2.0 P1000 F50.0", "(SPOT DRILLING CYCLE, DWELL 1 SECOND)"
+            elif kind == 'drill':
+                cycle, comment = f"G83 Z{-depth:.3f} R2.0 Q1.0 F{drill_feed:.1f}", f"(DEEP HOLE DRILLING CYCLE - φ{size})"
+            elif kind == 'tap':
+                tapping_feed = max(tapping_speed * THREAD_PITCH_MAP.get(size, GCODE_GENERATION_CONFIG['tapping']['default_thread_pitch']), 1.0)
+                cycle, comment = f"G84 Z{-depth:.3f} R2.0 F{tapping_feed:.1f}", f"(TAPPING CYCLE - {size} THREAD)"
+            else:
+                cycle, comment = (f"G81 Z{-depth:.3f} R2.0 F{counterbore['counterbore_feed_rate']:.1f}",
+                                  f"(COUNTERBORE CYCLE - φ{size} DEPTH {depth}mm)")
+            if pattern is not None:
+                yield comment
+                yield from format_pattern_cycle(pattern, cycle, pattern_mode)
+            else:
+                first_x, first_y = positions[0]
+                code, rest = cycle.split(' ', 1)
+                yield f"{code} X{first_x:.3f} Y{first_y:.3f} {rest} {comment}"
+                for center_x, center_y in positions[1:]:
+                    yield f"X{center_x:.3f} Y{center_y:.3f}"
+            yield "G80 (CANCEL FIXED CYCLE)"
+
+        yield "M09 (COOLANT OFF)"
+        yield "G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)"
+        yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
+        yield ""
+
+
+def _generate_milling_code(features: List[Dict], description_analysis: Dict) -> Iterator[str]:
     """Generate milling code with optimized roughing and finishing strategy and tool radius compensation"""
-    gcode = []
     
     # Import the milling strategy optimizer and tool compensation optimizer
     from .milling_strategy_optimizer import milling_optimizer
     from .tool_compensation_optimizer import tool_compensation_optimizer, ToolCompensationParams
     
     # Add safety check for tool radius compensation at the beginning of the program
-    gcode.append("")
-    gcode.append("(SAFETY CHECK - TOOL RADIUS COMPENSATION)")
-    gcode.append("(ENSURE G41D** COMPENSATION VALUES ARE CORRECTLY SET BEFORE STARTING)")
-    gcode.append("(G41D** VALUES ARE ONLY FOR WEAR COMPENSATION, NOT MAIN DIMENSION)")
-    gcode.append("(MAIN DIMENSION COMPENSATION IS CALCULATED INTO COORDINATES)")
-    gcode.append("(VERIFY TOOL OFFSET VALUES IN OFFSET TABLE)")
-    gcode.append("")
+    yield ""
+    yield "(SAFETY CHECK - TOOL RADIUS COMPENSATION)"
+    yield "(ENSURE G41D** COMPENSATION VALUES ARE CORRECTLY SET BEFORE STARTING)"
+    yield "(G41D** VALUES ARE ONLY FOR WEAR COMPENSATION, NOT MAIN DIMENSION)"
+    yield "(MAIN DIMENSION COMPENSATION IS CALCULATED INTO COORDINATES)"
+    yield "(VERIFY TOOL OFFSET VALUES IN OFFSET TABLE)"
+    yield ""
     
     # Extract parameters with defaults
     depth = 2.0  # Default depth for face milling: 2mm
@@ -1330,35 +1559,35 @@ def _generate_milling_code(features: List[Dict], description_analysis: Dict) ->
     tool_number = _get_tool_number("end_mill")
     
     # Add program header for tool radius compensation
-    gcode.append("(TOOL RADIUS COMPENSATION CHECK - IMPORTANT!)")
-    gcode.append(f"(TOOL DIAMETER: {tool_diameter}mm, RADIUS: {tool_diameter/2:.3f}mm)")
-    gcode.append(f"(TOOL RADIUS COMPENSATION OFFSET: D{tool_number})")
-    gcode.append(f"(G41D{tool_number} - ONLY FOR WEAR COMPENSATION, NOT MAIN DIMENSION)")
-    gcode.append("(MAIN DIMENSION COMPENSATION IS CALCULATED INTO COORDINATES)")
-    gcode.append("(VERIFY TOOL OFFSET D{tool_number} BEFORE STARTING PROGRAM)")
-    gcode.append("")
+    yield "(TOOL RADIUS COMPENSATION CHECK - IMPORTANT!)"
+    yield f"(TOOL DIAMETER: {tool_diameter}mm, RADIUS: {tool_diameter/2:.3f}mm)"
+    yield f"(TOOL RADIUS COMPENSATION OFFSET: D{tool_number})"
+    yield f"(G41D{tool_number} - ONLY FOR WEAR COMPENSATION, NOT MAIN DIMENSION)"
+    yield "(MAIN DIMENSION COMPENSATION IS CALCULATED INTO COORDINATES)"
+    yield "(VERIFY TOOL OFFSET D{tool_number} BEFORE STARTING PROGRAM)"
+    yield ""
     
     # Spindle start with optimized parameters
-    gcode.append(f"M03 S{int(spindle_speed)} (SPINDLE FORWARD, ROUGHING SPEED)")
-    gcode.append("G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)")
+    yield f"M03 S{int(spindle_speed)} (SPINDLE FORWARD, ROUGHING SPEED)"
+    yield "G04 P1000 (DELAY 1 SECOND, WAIT FOR SPINDLE TO REACH SET SPEED)"
     
     # Tool radius compensation and length compensation
     # G43 is tool length compensation, G41/G42 for radius compensation
-    gcode.append(f"G43 H{tool_number} Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T{tool_number:02})")
+    yield f"G43 H{tool_number} Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T{tool_number:02})"
     
     # Add tool radius compensation setup - for finishing passes
     # Note: G41/G42 compensation is applied based on the direction of cut
     # G41 for left cutter compensation, G42 for right cutter compensation
-    gcode.append(f"(TOOL RADIUS COMPENSATION: D{tool_number} - WEAR OFFSET ONLY)")
-    gcode.append(f"(MAIN OFFSET IS CALCULATED INTO COORDINATES - VERIFY OFFSET VALUE!)")
+    yield f"(TOOL RADIUS COMPENSATION: D{tool_number} - WEAR OFFSET ONLY)"
+    yield f"(MAIN OFFSET IS CALCULATED INTO COORDINATES - VERIFY OFFSET VALUE!)"
     
     # Coolant on
-    gcode.append("M08 (COOLANT ON)")
+    yield "M08 (COOLANT ON)"
     
     # Generate milling code for each feature
     for feature in features:
-        gcode.append("")
-        gcode.append(f"(MILLING OPERATION - {feature['shape'].upper()})")
+        yield ""
+        yield f"(MILLING OPERATION - {feature['shape'].upper()})"
         
         if feature["shape"] == "rectangle" and len(feature["dimensions"]) >= 2:
             # Rectangular face milling - consider tool diameter and workpiece size
@@ -1367,7 +1596,7 @@ def _generate_milling_code(features: List[Dict], description_analysis: Dict) ->
             
             # Roughing pass if needed
             if strategy['has_roughing']:
-                gcode.append(f"(ROUGHING PASS - DEPTH: {strategy['roughing_depth_per_pass']:.3f}mm, STEP: {strategy['stepover']:.3f}mm)")
+                yield f"(ROUGHING PASS - DEPTH: {strategy['roughing_depth_per_pass']:.3f}mm, STEP: {strategy['stepover']:.3f}mm)"
                 
                 current_depth = 0
                 for pass_idx in range(int(strategy['roughing_passes'])):
@@ -1385,14 +1614,14 @@ def _generate_milling_code(features: List[Dict], description_analysis: Dict) ->
                             start_x = center_x + length/2 - strategy['stepover']/2
                             end_x = center_x - length/2 + strategy['stepover']/2
                         
-                        gcode.append(f"G00 X{start_x:.3f} Y{y_pos:.3f} (MOVE TO START OF ROUGHING PASS {pass_idx+1})")
-                        gcode.append(f"G01 Z{current_depth:.3f} F{strategy['roughing_feed']/2:.1f} (ENGAGE MATERIAL)")
-                        gcode.append(f"G01 X{end_x:.3f} F{strategy['roughing_feed']} (ROUGHING PASS)")
+                        yield f"G00 X{start_x:.3f} Y{y_pos:.3f} (MOVE TO START OF ROUGHING PASS {pass_idx+1})"
+                        yield f"G01 Z{current_depth:.3f} F{strategy['roughing_feed']/2:.1f} (ENGAGE MATERIAL)"
+                        yield f"G01 X{end_x:.3f} F{strategy['roughing_feed']} (ROUGHING PASS)"
                         
                         # Move to next Y position if available
                         next_y = y_pos + strategy['stepover']
                         if next_y <= center_y + width/2 - strategy['stepover']/2:
-                            gcode.append(f"G01 Y{next_y:.3f} F{strategy['roughing_feed']/2:.1f} (MOVE TO NEXT PASS)")
+                            yield f"G01 Y{next_y:.3f} F{strategy['roughing_feed']/2:.1f} (MOVE TO NEXT PASS)"
                             y_pos = next_y
                             direction *= -1  # Change direction
                         else:
@@ -1400,7 +1629,7 @@ def _generate_milling_code(features: List[Dict], description_analysis: Dict) ->
             
             # Finishing pass around perimeter with proper allowance (0.15-0.25mm as required)
             if strategy['roughing_allowance'] > 0:
-                gcode.append(f"(FINISHING PASS - ALLOWANCE: {strategy['roughing_allowance']:.3f}mm)")
+                yield f"(FINISHING PASS - ALLOWANCE: {strategy['roughing_allowance']:.3f}mm)"
                 final_depth = -depth
                 
                 # For finishing pass, calculate tool radius compensation into coordinates
@@ -1418,25 +1647,25 @@ def _generate_milling_code(features: List[Dict], description_analysis: Dict) ->
                 start_y = center_y - width/2 + compensation_distance
                 
                 # Move to the starting point before activating compensation
-                gcode.append(f"G00 X{start_x:.3f} Y{start_y:.3f} (MOVE TO FINISHING START POINT - CALCULATED FOR TOOL RADIUS)")
+                yield f"G00 X{start_x:.3f} Y{start_y:.3f} (MOVE TO FINISHING START POINT - CALCULATED FOR TOOL RADIUS)"
                 
                 # Activate tool radius compensation - D number is for wear compensation only
-                gcode.append(f"G41 D{tool_number} (ACTIVATE TOOL RADIUS COMPENSATION LEFT - WEAR OFFSET ONLY)")
-                gcode.append(f"G01 Z{final_depth:.3f} F{strategy['finishing_feed']/2:.1f} (ENGAGE MATERIAL FOR FINISHING)")
+                yield f"G41 D{tool_number} (ACTIVATE TOOL RADIUS COMPENSATION LEFT - WEAR OFFSET ONLY)"
+                yield f"G01 Z{final_depth:.3f} F{strategy['finishing_feed']/2:.1f} (ENGAGE MATERIAL FOR FINISHING)"
                 
                 # Perimeter finishing pass - coordinates are calculated including tool radius
                 # This creates the correct finished size when G41 is active
                 # First pass: along X edges (positive direction)
-                gcode.append(f"G01 X{center_x + length/2 - compensation_distance:.3f} F{strategy['finishing_feed']} (MILL X POSITIVE EDGE - CALCULATED PATH)")
+                yield f"G01 X{center_x + length/2 - compensation_distance:.3f} F{strategy['finishing_feed']} (MILL X POSITIVE EDGE - CALCULATED PATH)"
                 # Y positive edge
-                gcode.append(f"G01 Y{center_y + width/2 - compensation_distance:.3f} F{strategy['finishing_feed']} (MILL Y POSITIVE EDGE - CALCULATED PATH)")
+                yield f"G01 Y{center_y + width/2 - compensation_distance:.3f} F{strategy['finishing_feed']} (MILL Y POSITIVE EDGE - CALCULATED PATH)"
                 # X negative edge
-                gcode.append(f"G01 X{center_x - length/2 + compensation_distance:.3f} F{strategy['finishing_feed']} (MILL X NEGATIVE EDGE - CALCULATED PATH)")
+                yield f"G01 X{center_x - length/2 + compensation_distance:.3f} F{strategy['finishing_feed']} (MILL X NEGATIVE EDGE - CALCULATED PATH)"
                 # Y negative edge to close the loop
-                gcode.append(f"G01 Y{center_y - width/2 + compensation_distance:.3f} F{strategy['finishing_feed']} (CLOSE CONTOUR - CALCULATED PATH)")
+                yield f"G01 Y{center_y - width/2 + compensation_distance:.3f} F{strategy['finishing_feed']} (CLOSE CONTOUR - CALCULATED PATH)"
                 
                 # Cancel tool radius compensation
-                gcode.append(f"G40 (CANCEL TOOL RADIUS COMPENSATION)")
+                yield f"G40 (CANCEL TOOL RADIUS COMPENSATION)"
                 
         elif feature["shape"] == "circle":
             # Circular milling with optimized roughing and finishing
@@ -1445,7 +1674,7 @@ def _generate_milling_code(features: List[Dict], description_analysis: Dict) ->
             
             # Roughing pass if needed
             if strategy['has_roughing']:
-                gcode.append(f"(ROUGHING PASS - DEPTH: {strategy['roughing_depth_per_pass']:.3f}mm)")
+                yield f"(ROUGHING PASS - DEPTH: {strategy['roughing_depth_per_pass']:.3f}mm)"
                 # Peck milling for circle with stepover
                 current_depth = 0
                 for pass_idx in range(int(strategy['roughing_passes'])):
@@ -1454,14 +1683,14 @@ def _generate_milling_code(features: List[Dict], description_analysis: Dict) ->
                     current_radius = radius
                     while current_radius > strategy['stepover']:
                         start_x = center_x - current_radius
-                        gcode.append(f"G00 X{start_x:.3f} Y{center_y:.3f} (MOVE TO CIRCULAR ROUGHING START POINT)")
-                        gcode.append(f"G01 Z{current_depth:.3f} F{strategy['roughing_feed']/2:.1f} (ENGAGE MATERIAL)")
-                        gcode.append(f"G02 X{start_x:.3f} Y{center_y:.3f} I{current_radius:.3f} J0 F{strategy['roughing_feed']} (CLOCKWISE CIRCULAR MILLING)")
+                        yield f"G00 X{start_x:.3f} Y{center_y:.3f} (MOVE TO CIRCULAR ROUGHING START POINT)"
+                        yield f"G01 Z{current_depth:.3f} F{strategy['roughing_feed']/2:.1f} (ENGAGE MATERIAL)"
+                        yield f"G02 X{start_x:.3f} Y{center_y:.3f} I{current_radius:.3f} J0 F{strategy['roughing_feed']} (CLOCKWISE CIRCULAR MILLING)"
                         current_radius -= strategy['stepover']
             
             # Finishing pass with proper allowance
             if strategy['roughing_allowance'] > 0:
-                gcode.append(f"(FINISHING PASS - ALLOWANCE: {strategy['roughing_allowance']:.3f}mm)")
+                yield f"(FINISHING PASS - ALLOWANCE: {strategy['roughing_allowance']:.3f}mm)"
                 final_depth = -depth
                 tool_radius = tool_diameter / 2.0
                 
@@ -1475,19 +1704,19 @@ def _generate_milling_code(features: List[Dict], description_analysis: Dict) ->
                     # If the adjusted radius is too small, just use the original path
                     # But still apply compensation for safety
                     adjusted_radius = radius
-                    gcode.append(f"G00 X{center_x - adjusted_radius:.3f} Y{center_y:.3f} (MOVE TO CIRCULAR FINISHING START POINT)")
-                    gcode.append(f"G41 D{tool_number} (ACTIVATE TOOL RADIUS COMPENSATION - WEAR OFFSET ONLY)")
-                    gcode.append(f"G01 Z{final_depth:.3f} F{strategy['finishing_feed']/2:.1f} (ENGAGE MATERIAL FOR FINISHING)")
-                    gcode.append(f"G02 X{center_x - adjusted_radius:.3f} Y{center_y:.3f} I{adjusted_radius:.3f} J0 F{strategy['finishing_feed']} (CLOCKWISE FINISH CIRCULAR MILLING)")
+                    yield f"G00 X{center_x - adjusted_radius:.3f} Y{center_y:.3f} (MOVE TO CIRCULAR FINISHING START POINT)"
+                    yield f"G41 D{tool_number} (ACTIVATE TOOL RADIUS COMPENSATION - WEAR OFFSET ONLY)"
+                    yield f"G01 Z{final_depth:.3f} F{strategy['finishing_feed']/2:.1f} (ENGAGE MATERIAL FOR FINISHING)"
+                    yield f"G02 X{center_x - adjusted_radius:.3f} Y{center_y:.3f} I{adjusted_radius:.3f} J0 F{strategy['finishing_feed']} (CLOCKWISE FINISH CIRCULAR MILLING)"
                 else:
                     # Calculate the start point including tool radius compensation
                     start_x = center_x - adjusted_radius
-                    gcode.append(f"G00 X{start_x:.3f} Y{center_y:.3f} (MOVE TO CIRCULAR FINISHING START POINT - CALCULATED FOR TOOL RADIUS)")
-                    gcode.append(f"G41 D{tool_number} (ACTIVATE TOOL RADIUS COMPENSATION LEFT - WEAR OFFSET ONLY)")
-                    gcode.append(f"G01 Z{final_depth:.3f} F{strategy['finishing_feed']/2:.1f} (ENGAGE MATERIAL FOR FINISHING)")
-                    gcode.append(f"G02 X{start_x:.3f} Y{center_y:.3f} I{adjusted_radius:.3f} J0 F{strategy['finishing_feed']} (CLOCKWISE FINISH CIRCULAR MILLING - CALCULATED PATH)")
+                    yield f"G00 X{start_x:.3f} Y{center_y:.3f} (MOVE TO CIRCULAR FINISHING START POINT - CALCULATED FOR TOOL RADIUS)"
+                    yield f"G41 D{tool_number} (ACTIVATE TOOL RADIUS COMPENSATION LEFT - WEAR OFFSET ONLY)"
+                    yield f"G01 Z{final_depth:.3f} F{strategy['finishing_feed']/2:.1f} (ENGAGE MATERIAL FOR FINISHING)"
+                    yield f"G02 X{start_x:.3f} Y{center_y:.3f} I{adjusted_radius:.3f} J0 F{strategy['finishing_feed']} (CLOCKWISE FINISH CIRCULAR MILLING - CALCULATED PATH)"
                 
-                gcode.append(f"G40 (CANCEL TOOL RADIUS COMPENSATION)")
+                yield f"G40 (CANCEL TOOL RADIUS COMPENSATION)"
                 
         elif feature["shape"] == "triangle":
             # Triangular milling with optimized strategy
@@ -1510,58 +1739,55 @@ def _generate_milling_code(features: List[Dict], description_analysis: Dict) ->
                 
                 # Roughing pass if needed
                 if strategy['has_roughing']:
-                    gcode.append(f"(ROUGHING PASS - DEPTH: {strategy['roughing_depth_per_pass']:.3f}mm)")
-                    gcode.append(f"G00 X{start_x:.3f} Y{start_y:.3f} (MOVE TO TRIANGLE START POINT)")
+                    yield f"(ROUGHING PASS - DEPTH: {strategy['roughing_depth_per_pass']:.3f}mm)"
+                    yield f"G00 X{start_x:.3f} Y{start_y:.3f} (MOVE TO TRIANGLE START POINT)"
                     
                     current_depth = 0
                     for pass_idx in range(int(strategy['roughing_passes'])):
                         current_depth -= strategy['roughing_depth_per_pass']
-                        gcode.append(f"G01 Z{current_depth:.3f} F{strategy['roughing_feed']/2:.1f} (ROUGHING CUTTING PASS {pass_idx+1})")
+                        yield f"G01 Z{current_depth:.3f} F{strategy['roughing_feed']/2:.1f} (ROUGHING CUTTING PASS {pass_idx+1})"
                         
                         for i in range(1, len(vertices)):
                             x, y = vertices[i]
-                            gcode.append(f"G01 X{x:.3f} Y{y:.3f} F{strategy['roughing_feed']} (MILL TRIANGLE EDGE)")
+                            yield f"G01 X{x:.3f} Y{y:.3f} F{strategy['roughing_feed']} (MILL TRIANGLE EDGE)"
                         
                         # Close triangle
                         x, y = vertices[0]
-                        gcode.append(f"G01 X{x:.3f} Y{y:.3f} F{strategy['roughing_feed']} (CLOSE TRIANGLE)")
+                        yield f"G01 X{x:.3f} Y{y:.3f} F{strategy['roughing_feed']} (CLOSE TRIANGLE)"
                 
                 # Finishing pass with proper allowance
                 if strategy['roughing_allowance'] > 0:
-                    gcode.append(f"(FINISHING PASS - ALLOWANCE: {strategy['roughing_allowance']:.3f}mm)")
+                    yield f"(FINISHING PASS - ALLOWANCE: {strategy['roughing_allowance']:.3f}mm)"
                     final_depth = -depth
                     
                     # Move to first point before activating compensation
-                    gcode.append(f"G00 X{start_x:.3f} Y{start_y:.3f} (MOVE TO TRIANGLE FINISHING START POINT - CALCULATED FOR TOOL RADIUS)")
+                    yield f"G00 X{start_x:.3f} Y{start_y:.3f} (MOVE TO TRIANGLE FINISHING START POINT - CALCULATED FOR TOOL RADIUS)"
                     
                     # Activate tool radius compensation - wear compensation only
-                    gcode.append(f"G41 D{tool_number} (ACTIVATE TOOL RADIUS COMPENSATION LEFT - WEAR OFFSET ONLY)")
-                    gcode.append(f"G01 Z{final_depth:.3f} F{strategy['finishing_feed']/2:.1f} (ENGAGE MATERIAL FOR FINISHING)")
+                    yield f"G41 D{tool_number} (ACTIVATE TOOL RADIUS COMPENSATION LEFT - WEAR OFFSET ONLY)"
+                    yield f"G01 Z{final_depth:.3f} F{strategy['finishing_feed']/2:.1f} (ENGAGE MATERIAL FOR FINISHING)"
                     
                     for i in range(1, len(vertices)):
                         x, y = vertices[i]
-                        gcode.append(f"G01 X{x:.3f} Y{y:.3f} F{strategy['finishing_feed']} (MILL TRIANGLE EDGE - CALCULATED PATH)")
+                        yield f"G01 X{x:.3f} Y{y:.3f} F{strategy['finishing_feed']} (MILL TRIANGLE EDGE - CALCULATED PATH)"
                     
                     # Close triangle
                     x, y = vertices[0]
-                    gcode.append(f"G01 X{x:.3f} Y{y:.3f} F{strategy['finishing_feed']} (CLOSE TRIANGLE - CALCULATED PATH)")
+                    yield f"G01 X{x:.3f} Y{y:.3f} F{strategy['finishing_feed']} (CLOSE TRIANGLE - CALCULATED PATH)"
                     
                     # Cancel tool radius compensation
-                    gcode.append(f"G40 (CANCEL TOOL RADIUS COMPENSATION)")
+                    yield f"G40 (CANCEL TOOL RADIUS COMPENSATION)"
 
     # Coolant off
-    gcode.append("M09 (COOLANT OFF)")
+    yield "M09 (COOLANT OFF)"
     
     # Move to safe height and cancel tool compensations
-    gcode.append("G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)")
-    gcode.append("G40 (CANCEL TOOL RADIUS COMPENSATION)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
-    
-    return gcode
+    yield "G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)"
+    yield "G40 (CANCEL TOOL RADIUS COMPENSATION)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
 
-def _generate_turning_code(features: List[Dict], description_analysis: Dict) -> List[str]:
+def _generate_turning_code(features: List[Dict], description_analysis: Dict) -> Iterator[str]:
     """生成车削加工代码"""
-    gcode = []
     
     # 设置车削参数 - 优先使用从用户描述中提取的参数
     depth = description_analysis.get("depth")
@@ -1585,18 +1811,18 @@ def _generate_turning_code(features: List[Dict], description_analysis: Dict) ->
     # 获取刀具编号（车刀通常是T5）
     tool_number = _get_tool_number("cutting_tool")
     
-    gcode.append(f"M03 S{int(spindle_speed)} (SET SPINDLE SPEED)")
+    yield f"M03 S{int(spindle_speed)} (SET SPINDLE SPEED)"
     
     # 激活刀具长度补偿
-    gcode.append(f"G43 H{tool_number} Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T{tool_number:02})")
+    yield f"G43 H{tool_number} Z100. (ACTIVATE TOOL LENGTH COMPENSATION FOR T{tool_number:02})"
     
     # 开启切削液
-    gcode.append("M08 (COOLANT ON)")
+    yield "M08 (COOLANT ON)"
     
     # 为每个特征生成车削代码
     for feature in features:
-        gcode.append("")
-        gcode.append(f"(TURNING OPERATION - {feature['shape'].upper()})")
+        yield ""
+        yield f"(TURNING OPERATION - {feature['shape'].upper()})"
         
         if feature["shape"] in ["rectangle", "square"]:
             # 假设矩形表示需要车削的外径
@@ -1604,23 +1830,21 @@ def _generate_turning_code(features: List[Dict], description_analysis: Dict) ->
             diameter = max(width, height)  # 假设最大尺寸为直径
             
             # 粗车循环 (G71)
-            gcode.append(f"G71 U2 R1 (ROUGH TURNING CYCLE, 2MM DEPTH PER PASS)")
-            gcode.append(f"G71 P10 Q20 U{diameter/10:.3f} W0.5 F{feed_rate/2} (ROUGH EXTERNAL DIAMETER)")
-            gcode.append("N10 G00 X0.0 Z0.0")
-            gcode.append(f"N20 G01 X{diameter:.3f} Z0.0 F{feed_rate/2}")
+            yield f"G71 U2 R1 (ROUGH TURNING CYCLE, 2MM DEPTH PER PASS)"
+            yield f"G71 P10 Q20 U{diameter/10:.3f} W0.5 F{feed_rate/2} (ROUGH EXTERNAL DIAMETER)"
+            yield "N10 G00 X0.0 Z0.0"
+            yield f"N20 G01 X{diameter:.3f} Z0.0 F{feed_rate/2}"
             
             # 精车循环 (G70)
-            gcode.append("G70 P10 Q20 (FINISHING CYCLE)")
+            yield "G70 P10 Q20 (FINISHING CYCLE)"
     
     # 关闭切削液
-    gcode.append("M09 (COOLANT OFF)")
+    yield "M09 (COOLANT OFF)"
     
     # 移动到足够高的安全位置（高于刀具补偿值），然后取消刀具长度补偿
-    gcode.append("G00 Z105 (RAPID MOVE TO SAFE HEIGHT - ABOVE TOOL COMPENSATION VALUE)")
-    gcode.append("G49 (CANCEL TOOL LENGTH COMPENSATION)")
-    gcode.append("G00 Z50 (RAPID MOVE TO INTERMEDIATE SAFE HEIGHT)")
-    
-    return gcode
+    yield "G00 Z105 (RAPID MOVE TO SAFE HEIGHT - ABOVE TOOL COMPENSATION VALUE)"
+    yield "G49 (CANCEL TOOL LENGTH COMPENSATION)"
+    yield "G00 Z50 (RAPID MOVE TO INTERMEDIATE SAFE HEIGHT)"
 
 
 def validate_nc_code(nc_code: str) -> List[str]:
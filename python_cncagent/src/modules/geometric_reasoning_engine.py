@@ -11,6 +11,8 @@ import numpy as np
 import cv2
 from scipy import ndimage
 
+from src.modules.pyramid_detection import find_edge_contours_pyramid, should_use_pyramid
+
 
 @dataclass
 class Feature3D:
@@ -54,16 +56,23 @@ class GeometricReasoningEngine:
         """
         features = []
         
-        # 使用OpenCV进行边缘检测
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
-        edges = cv2.Canny(gray, 50, 150)
-        
-        # 进行形态学操作以连接断开的边缘
-        kernel = np.ones((3,3), np.uint8)
-        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+        contours = None
+        if should_use_pyramid(image.shape):
+            # 大幅面图纸由粗到精：降采样层找候选，只在候选区域按原分辨率检测（与下面的整图处理相同）
+            contours = find_edge_contours_pyramid(image, 50, 150, (1, 1), (3, 3),
+                                                  mode=cv2.RETR_EXTERNAL, min_area=100)
         
-        # 查找轮廓
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if contours is None:
+            # 使用OpenCV进行边缘检测
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+            edges = cv2.Canny(gray, 50, 150)
+            
+            # 进行形态学操作以连接断开的边缘
+            kernel = np.ones((3,3), np.uint8)
+            edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+            
+            # 查找轮廓
+            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         for contour in contours:
             # 过滤小面积轮廓
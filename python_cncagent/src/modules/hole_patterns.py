@@ -0,0 +1,229 @@
+"""
+孔阵列识别与紧凑输出模块
+识别孔位构成的矩形阵列和螺栓孔圆（等角度分布的圆周孔），把固定循环的逐孔程序段
+改写为用户宏程序B的WHILE循环（阵列原点、间距、行列数作为变量）或G16极坐标的增量角度重复，
+上千个孔的阵列只需几十行程序
+"""
+import math
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.config import HOLE_PATTERN_CONFIG, NC_INTERPRETER_CONFIG
+
+# 输出参数的小数位数（坐标0.001mm，角度0.001度）
+_PLACES = 3
+
+
+def _points(positions: Sequence) -> np.ndarray:
+    """孔位坐标元组或带center的特征字典 -> (n, 2) 数组"""
+    centers = [item['center'] if isinstance(item, dict) else item for item in positions]
+    return np.asarray([tuple(center)[:2] for center in centers], dtype=np.float64).reshape(-1, 2)
+
+
+def _levels(values: np.ndarray, tolerance: float):
+    """按容差把坐标值聚成若干层，返回每层的平均值和每个值所在的层号"""
+    order = np.argsort(values, kind='stable')
+    breaks = np.diff(values[order]) > tolerance
+    level = np.empty(values.size, dtype=np.intp)
+    level[order] = np.concatenate([[0], np.cumsum(breaks)])
+    means = np.bincount(level, weights=values) / np.bincount(level)
+    return means, level
+
+
+def _detect_grid(points: np.ndarray, tolerance: float) -> Optional[Dict]:
+    """所有行列交点上都有孔、行距和列距各自相等的矩形阵列（不支持旋转的阵列）"""
+    xs, column = _levels(points[:, 0], tolerance)
+    ys, row = _levels(points[:, 1], tolerance)
+    if xs.size * ys.size != len(points) or np.unique(row * xs.size + column).size != len(points):
+        return None
+    pitch = [(levels[-1] - levels[0]) / (levels.size - 1) if levels.size > 1 else 0.0 for levels in (xs, ys)]
+    pattern = {
+        'type': 'grid',
+        'origin': (round(float(xs[0]), _PLACES), round(float(ys[0]), _PLACES)),
+        'pitch': (round(float(pitch[0]), _PLACES), round(float(pitch[1]), _PLACES)),
+        'counts': (int(xs.size), int(ys.size)),
+        'count': len(points)
+    }
+    expected = np.column_stack([pattern['origin'][0] + column * pattern['pitch'][0],
+                                pattern['origin'][1] + row * pattern['pitch'][1]])
+    return pattern if _within(points, expected, tolerance) else None
+
+
+def _detect_bolt_circle(points: np.ndarray, tolerance: float) -> Optional[Dict]:
+    """圆周上等角度分布的孔（整圆或一段圆弧），圆心和半径按最小二乘拟合"""
+    x, y = points[:, 0], points[:, 1]
+    design = np.column_stack([x, y, np.ones_like(x)])
+    solution, *_ = np.linalg.lstsq(design, np.square(x) + np.square(y), rcond=None)
+    cx, cy = solution[0] / 2, solution[1] / 2
+    radius = math.sqrt(max(solution[2] + cx * cx + cy * cy, 0.0))
+    if radius <= 10 * tolerance:
+        return None
+
+    angles = np.mod(np.degrees(np.arctan2(y - cy, x - cx)), 360.0)
+    ordered = np.sort(angles)
+    gaps = np.diff(np.concatenate([ordered, [ordered[0] + 360.0]]))
+    widest = int(np.argmax(gaps))
+    # 最大间隔之后的孔为起点（整圆时各间隔相等，取0度起逆时针的第一个孔）
+    if gaps[widest] - np.min(gaps) <= math.degrees(tolerance / radius):
+        widest = len(ordered) - 1
+    steps = np.delete(gaps, widest)
+    first = (widest + 1) % len(ordered)
+    start = float(ordered[first])
+    pattern = {
+        'type': 'bolt_circle',
+        'center': (round(float(cx), _PLACES), round(float(cy), _PLACES)),
+        'radius': round(radius, _PLACES),
+        'start_angle': round(start, _PLACES),
+        'step_angle': round(float(np.mean(steps)) if steps.size else 360.0, _PLACES),
+        'count': len(points)
+    }
+    by_angle = np.roll(np.argsort(angles, kind='stable'), -first)
+    return pattern if _within(points[by_angle], pattern_positions(pattern), tolerance) else None
+
+
+def _within(points: np.ndarray, expected: np.ndarray, tolerance: float) -> bool:
+    """逐个孔与对应的理论位置比较"""
+    return bool(np.all(np.sqrt(np.square(points - expected).sum(axis=1)) <= tolerance))
+
+
+def _with_position(cycle: str, x: float, y: float) -> str:
+    """在固定循环程序段的G代码之后插入XY（G99 G83 X.. Y.. Z.. R.. 的常用写法）"""
+    words = cycle.split()
+    at = next((i for i, word in enumerate(words) if not word.startswith('G')), len(words))
+    return " ".join(words[:at] + [f"X{x:.3f}", f"Y{y:.3f}"] + words[at:])
+
+
+def pattern_positions(pattern: Dict) -> np.ndarray:
+    """
+    按阵列参数计算孔位（即循环程序的加工顺序：矩形阵列逐行蛇形，螺栓孔圆按角度递增）
+
+    Args:
+        pattern: detect_hole_pattern 返回的阵列参数
+
+    Returns:
+        np.ndarray: (n, 2) 孔位坐标
+    """
+    if pattern['type'] == 'grid':
+        (x0, y0), (dx, dy), (nx, ny) = pattern['origin'], pattern['pitch'], pattern['counts']
+        row = np.repeat(np.arange(ny), nx)
+        column = np.tile(np.arange(nx), ny)
+        column = np.where(row % 2 == 1, nx - 1 - column, column)
+        return np.column_stack([x0 + column * dx, y0 + row * dy])
+    angles = np.radians(pattern['start_angle'] + np.arange(pattern['count']) * pattern['step_angle'])
+    cx, cy = pattern['center']
+    return np.column_stack([cx + pattern['radius'] * np.cos(angles), cy + pattern['radius'] * np.sin(angles)])
+
+
+def detect_hole_pattern(positions: Sequence, tolerance: Optional[float] = None,
+                        min_holes: Optional[int] = None) -> Optional[Dict]:
+    """
+    识别孔位构成的矩形阵列或螺栓孔圆
+
+    按输出精度取整后的阵列参数重新计算孔位，与对应的原孔位逐一比较，偏差都在容差内才认为识别成功
+
+    Args:
+        positions: 孔位坐标元组或带center的特征字典列表
+        tolerance: 孔位的最大偏差mm，默认取 HOLE_PATTERN_CONFIG
+        min_holes: 最少孔数，默认取 HOLE_PATTERN_CONFIG
+
+    Returns:
+        Optional[Dict]: 阵列参数，未识别到时为None
+            矩形阵列: type='grid'、origin、pitch、counts（列数, 行数）、count
+            螺栓孔圆: type='bolt_circle'、center、radius、start_angle（0~360）、step_angle（度）、count
+    """
+    tolerance = HOLE_PATTERN_CONFIG['tolerance'] if tolerance is None else tolerance
+    min_holes = HOLE_PATTERN_CONFIG['min_holes'] if min_holes is None else min_holes
+    points = _points(positions)
+    if len(points) < max(min_holes, 2) or len(np.unique(points, axis=0)) < len(points):
+        return None
+    return _detect_grid(points, tolerance) or _detect_bolt_circle(points, tolerance)
+
+
+def format_pattern_comment(pattern: Dict, operation: str = "HOLES") -> str:
+    """
+    把阵列参数格式化为NC程序注释
+
+    Returns:
+        str: 如 "(HOLE PATTERN - DRILLING: GRID 40 X 25, PITCH X10.000 Y12.000, 1000 HOLES)"
+    """
+    if pattern['type'] == 'grid':
+        (nx, ny), (dx, dy) = pattern['counts'], pattern['pitch']
+        return f"(HOLE PATTERN - {operation}: GRID {nx} X {ny}, PITCH X{dx:.3f} Y{dy:.3f}, {pattern['count']} HOLES)"
+    return (f"(HOLE PATTERN - {operation}: BOLT CIRCLE R{pattern['radius']:.3f}, {pattern['count']} HOLES, "
+            f"START {pattern['start_angle']:.3f} STEP {pattern['step_angle']:.3f} DEG)")
+
+
+def format_pattern_cycle(pattern: Dict, cycle: str, mode: str = 'macro',
+                         first_variable: Optional[int] = None) -> List[str]:
+    """
+    生成阵列的固定循环程序段
+
+    macro: 固定循环先用K0只设定循环数据，再在WHILE循环中计算每个孔的XY（矩形阵列逐行蛇形）；
+    polar: 螺栓孔圆用G52把局部坐标原点移到圆心，G16极坐标下第一个孔给出半径和起始角，
+           其余孔用 G91 Y<角度增量> K<次数> 重复（FANUC 0i-MD手册的螺栓孔圆写法），矩形阵列仍用宏程序
+    重复次数的地址取 NC_INTERPRETER_CONFIG['cycle_repeat_address']（FS0i为K，旧格式设为L）
+
+    Args:
+        pattern: detect_hole_pattern 返回的阵列参数
+        cycle: 不含XY的固定循环程序段，如 "G99 G83 Z-10.000 R2.0 Q1.0 F100.0"
+        mode: 'macro' 或 'polar'
+        first_variable: 宏程序使用的公共变量起始号，默认取 HOLE_PATTERN_CONFIG
+
+    Returns:
+        List[str]: 程序段（之后由调用方输出G80取消循环）
+    """
+    v = HOLE_PATTERN_CONFIG['first_variable'] if first_variable is None else first_variable
+    repeat = NC_INTERPRETER_CONFIG['cycle_repeat_address'].upper()
+    if pattern['type'] == 'bolt_circle' and mode == 'polar':
+        (cx, cy), count = pattern['center'], pattern['count']
+        lines = [f"G52 X{cx:.3f} Y{cy:.3f} (LOCAL COORDINATE ORIGIN AT BOLT CIRCLE CENTER)",
+                 "G16 (POLAR COORDINATES - X RADIUS, Y ANGLE)",
+                 f"{_with_position(cycle, pattern['radius'], pattern['start_angle'])} (HOLE 1 OF {count})"]
+        if count > 1:
+            lines.append(f"G91 Y{pattern['step_angle']:.3f} {repeat}{count - 1} (REMAINING {count - 1} HOLES)")
+        lines.extend(["G80 G15 G90 (CANCEL CYCLE AND POLAR COORDINATES)",
+                      "G52 X0 Y0 (CANCEL LOCAL COORDINATE SYSTEM)"])
+        return lines
+
+    if pattern['type'] == 'grid':
+        (x0, y0), (dx, dy), (nx, ny) = pattern['origin'], pattern['pitch'], pattern['counts']
+        row, column, index = f"#{v + 6}", f"#{v + 7}", f"#{v + 8}"
+        return [
+            f"#{v}={x0:.3f} (GRID ORIGIN X)",
+            f"#{v + 1}={y0:.3f} (GRID ORIGIN Y)",
+            f"#{v + 2}={dx:.3f} (PITCH X)",
+            f"#{v + 3}={dy:.3f} (PITCH Y)",
+            f"#{v + 4}={nx} (COLUMNS)",
+            f"#{v + 5}={ny} (ROWS)",
+            f"{cycle} {repeat}0 (CYCLE DATA ONLY)",
+            f"{row}=0",
+            f"WHILE [{row} LT #{v + 5}] DO1",
+            f"{column}=0",
+            f"WHILE [{column} LT #{v + 4}] DO2",
+            f"{index}={column}",
+            f"IF [[{row}-FIX[{row}/2]*2] EQ 1] THEN {index}=#{v + 4}-1-{column} (SERPENTINE ROWS)",
+            f"X[#{v}+{index}*#{v + 2}] Y[#{v + 1}+{row}*#{v + 3}]",
+            f"{column}={column}+1",
+            "END2",
+            f"{row}={row}+1",
+            "END1",
+        ]
+
+    (cx, cy), count = pattern['center'], pattern['count']
+    hole, angle = f"#{v + 6}", f"#{v + 7}"
+    return [
+        f"#{v}={cx:.3f} (BOLT CIRCLE CENTER X)",
+        f"#{v + 1}={cy:.3f} (BOLT CIRCLE CENTER Y)",
+        f"#{v + 2}={pattern['radius']:.3f} (RADIUS)",
+        f"#{v + 3}={pattern['start_angle']:.3f} (START ANGLE)",
+        f"#{v + 4}={pattern['step_angle']:.3f} (ANGLE STEP)",
+        f"#{v + 5}={count} (HOLES)",
+        f"{cycle} {repeat}0 (CYCLE DATA ONLY)",
+        f"{hole}=0",
+        f"WHILE [{hole} LT #{v + 5}] DO1",
+        f"{angle}=#{v + 3}+{hole}*#{v + 4}",
+        f"X[#{v}+#{v + 2}*COS[{angle}]] Y[#{v + 1}+#{v + 2}*SIN[{angle}]]",
+        f"{hole}={hole}+1",
+        "END1",
+    ]
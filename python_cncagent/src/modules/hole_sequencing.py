@@ -0,0 +1,396 @@
+"""
+孔加工顺序优化模块
+把钻孔、攻丝、沉孔等固定循环的孔位排成快速移动距离尽量短的顺序（开放路径的旅行商问题）：
+规则阵列直接按蛇形顺序排列，其余用最近邻法生成初始顺序，
+再在K近邻候选表上做2-opt和Or-opt局部改进，5000个孔在一秒内完成
+"""
+import logging
+import math
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import HOLE_SEQUENCING_CONFIG
+
+_EPS = 1e-9
+
+
+def path_length(points: np.ndarray, order: Sequence[int], start: Optional[Sequence[float]] = None) -> float:
+    """
+    按给定顺序走过所有点的XY距离
+
+    Args:
+        points: 孔位坐标 (n, 2)
+        order: 访问顺序
+        start: 起点坐标，None表示从第一个孔开始计算
+
+    Returns:
+        float: 路径长度
+    """
+    path = np.asarray(points, dtype=np.float64)[np.asarray(order, dtype=np.intp)]
+    if start is not None and len(path):
+        path = np.vstack([np.asarray(start, dtype=np.float64)[:2], path])
+    return float(np.sqrt(np.square(np.diff(path, axis=0)).sum(axis=1)).sum())
+
+
+def _matrix_neighbors(points: np.ndarray, rows: np.ndarray, k: int,
+                      deadline: Optional[float] = None) -> Optional[np.ndarray]:
+    """
+    rows中每个点按距离排序的k个最近点（分块计算距离矩阵，每块约四百万个元素）
+
+    每块开始前检查deadline，超时返回None
+    """
+    n = len(points)
+    squared = np.square(points).sum(axis=1)
+    result = np.empty((rows.size, k), dtype=np.intp)
+    block = max(1, 4_000_000 // n)
+    for lo in range(0, rows.size, block):
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        chunk = rows[lo:lo + block]
+        distance = squared[chunk, None] + squared[None, :] - 2.0 * points[chunk] @ points.T
+        distance[np.arange(chunk.size), chunk] = np.inf
+        nearest = np.argpartition(distance, k - 1, axis=1)[:, :k]
+        ranked = np.argsort(np.take_along_axis(distance, nearest, axis=1), axis=1)
+        result[lo:lo + chunk.size] = np.take_along_axis(nearest, ranked, axis=1)
+    return result
+
+
+def _nearest_neighbors(points: np.ndarray, k: int, deadline: Optional[float] = None) -> Optional[np.ndarray]:
+    """
+    每个点按距离排序的k个最近点
+
+    先按平均每格约两个点划分网格，只比较相邻3x3格内的点；候选不足k个的点
+    （稀疏区域）以及点过于集中导致候选对太多时改用距离矩阵。结果用于局部改进的候选表，
+    网格得到的近邻在格边缘处可能不是严格最近，不影响正确性。
+    孔位密集重叠时距离矩阵的计算量接近n²，到deadline时放弃并返回None
+    """
+    n = len(points)
+    k = min(k, n - 1)
+    low = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - low, 1e-9)
+    if extent.min() * np.sqrt(n) < extent.max():
+        cell_size = extent.max() * 3.0 / n  # 接近一条直线时按一维估计
+    else:
+        cell_size = np.sqrt(2.0 * extent[0] * extent[1] / n)
+    for _ in range(3):
+        cells = np.floor((points - low) / cell_size).astype(np.int64)
+        stride = int(cells[:, 1].max()) + 3
+        keys = (cells[:, 0] + 1) * stride + cells[:, 1] + 1
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        # 孔位成簇时按点数加权的每格点数偏大，缩小网格
+        occupancy = np.square(np.diff(np.flatnonzero(np.diff(sorted_keys, prepend=-1, append=-1)))).sum() / n
+        if occupancy <= 4.0:
+            break
+        cell_size /= np.sqrt(occupancy / 2.0)
+
+    offsets = [dx * stride + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+    spans = [(np.searchsorted(sorted_keys, keys + offset, side='left'),
+              np.searchsorted(sorted_keys, keys + offset, side='right')) for offset in offsets]
+    total = sum(int((hi - lo).sum()) for lo, hi in spans)
+    if total > 8_000_000:
+        return _matrix_neighbors(points, np.arange(n), k, deadline)
+
+    source, target = [], []
+    for lo, hi in spans:
+        counts = hi - lo
+        # 把每个点命中的 [lo, hi) 区间展开成扁平的索引数组
+        flat = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        source.append(np.repeat(np.arange(n), counts))
+        target.append(order[np.repeat(lo, counts) + flat])
+    source, target = np.concatenate(source), np.concatenate(target)
+    keep = source != target
+    source, target = source[keep], target[keep]
+    distance = np.square(points[source] - points[target]).sum(axis=1)
+    ranked = np.lexsort((distance, source))
+    source, target = source[ranked], target[ranked]
+    rank = np.arange(source.size) - np.searchsorted(source, source, side='left')
+
+    result = np.full((n, k), -1, dtype=np.intp)
+    chosen = rank < k
+    result[source[chosen], rank[chosen]] = target[chosen]
+    short = np.flatnonzero(result[:, -1] < 0)
+    if short.size:
+        sparse = _matrix_neighbors(points, short, k, deadline)
+        if sparse is None:
+            return None
+        result[short] = sparse
+    return result
+
+
+def _nearest_neighbor_order(points: np.ndarray, start: np.ndarray) -> np.ndarray:
+    """最近邻法：从start出发每次走到最近的未访问孔，剩余点数减半时压缩候选数组"""
+    remaining = np.arange(len(points))
+    xs, ys = points[:, 0].copy(), points[:, 1].copy()
+    alive = np.ones(len(points), dtype=bool)
+    order = np.empty(len(points), dtype=np.intp)
+    cx, cy = float(start[0]), float(start[1])
+    live = len(points)
+    for step in range(len(points)):
+        distance = np.square(xs - cx) + np.square(ys - cy)
+        distance[~alive] = np.inf
+        best = int(np.argmin(distance))
+        order[step] = remaining[best]
+        alive[best] = False
+        cx, cy = xs[best], ys[best]
+        live -= 1
+        if live and live * 2 < remaining.size:
+            remaining, xs, ys = remaining[alive], xs[alive], ys[alive]
+            alive = np.ones(remaining.size, dtype=bool)
+    return order
+
+
+def _grid_orders(points: np.ndarray, tolerance: float, min_fill: float) -> List[np.ndarray]:
+    """
+    点位构成规则阵列（行列对齐、填充率不低于min_fill）时返回各种蛇形顺序，否则返回空列表
+
+    行方向和列方向各有4种（起始行在两端 × 第一行的方向），由调用方按路径长度挑选
+    """
+    def bands(values: np.ndarray) -> Tuple[np.ndarray, int]:
+        order = np.argsort(values, kind='stable')
+        breaks = np.diff(values[order]) > tolerance
+        band = np.empty(values.size, dtype=np.intp)
+        band[order] = np.concatenate([[0], np.cumsum(breaks)])
+        return band, int(breaks.sum()) + 1
+
+    rows, n_rows = bands(points[:, 1])
+    columns, n_columns = bands(points[:, 0])
+    if min(n_rows, n_columns) < 2 or len(points) < min_fill * n_rows * n_columns:
+        return []
+
+    orders = []
+    for line, across in ((rows, columns), (columns, rows)):
+        for flip_lines in (False, True):
+            line_key = -line if flip_lines else line
+            for flip_first in (False, True):
+                direction = np.where((line % 2 == 0) != flip_first, 1, -1)
+                orders.append(np.lexsort((across * direction, line_key)))
+    return orders
+
+
+class _LocalSearch:
+    """
+    K近邻候选表上的2-opt和Or-opt改进
+
+    路径的第0个位置固定为起点节点（下标n）；没有给定起点时起点到各孔的距离为0，
+    路径的首尾都可以改变
+    """
+
+    def __init__(self, points: np.ndarray, start: Optional[np.ndarray], neighbors: np.ndarray, segment: int):
+        self.n = n = len(points)
+        self.xs = points[:, 0].tolist() + [float(start[0]) if start is not None else 0.0]
+        self.ys = points[:, 1].tolist() + [float(start[1]) if start is not None else 0.0]
+        self.free_start = start is None
+        self.neighbors = neighbors.tolist()
+        self.segment = segment
+        self.tour: List[int] = []
+        self.pos = [0] * (n + 1)
+
+    def dist(self, a: int, b: Optional[int]) -> float:
+        if b is None or (self.free_start and (a == self.n or b == self.n)):
+            return 0.0
+        return math.hypot(self.xs[a] - self.xs[b], self.ys[a] - self.ys[b])
+
+    def next(self, index: int) -> Optional[int]:
+        return self.tour[index + 1] if index < self.n else None
+
+    def run(self, order: np.ndarray, deadline: float) -> np.ndarray:
+        self.tour = [self.n] + order.tolist()
+        self._reindex(0, self.n)
+        queue = deque(self.tour[1:])
+        queued = [True] * (self.n + 1)
+        checks = 0
+        while queue:
+            checks += 1
+            if checks % 64 == 0 and time.perf_counter() > deadline:
+                break
+            node = queue.popleft()
+            queued[node] = False
+            touched = self._two_opt(node) or self._or_opt(node)
+            for other in touched or ():
+                if other is not None and other != self.n and not queued[other]:
+                    queued[other] = True
+                    queue.append(other)
+        return np.asarray(self.tour[1:], dtype=np.intp)
+
+    def _reindex(self, lo: int, hi: int):
+        tour, pos = self.tour, self.pos
+        for index in range(lo, hi + 1):
+            pos[tour[index]] = index
+
+    def _two_opt(self, a: int):
+        dist, pos, tour = self.dist, self.pos, self.tour
+        i = pos[a]
+        b = self.next(i)
+        p = tour[i - 1]
+        ab = dist(a, b) if b is not None else math.inf
+        pa = dist(p, a)
+        for c in self.neighbors[a]:
+            ac = dist(a, c)
+            if ac >= ab and ac >= pa:
+                break
+            j = pos[c]
+            if j > i + 1 and ac < ab:
+                # a b ... c d  ->  a c ... b d
+                d = self.next(j)
+                if ab + dist(c, d) - ac - dist(b, d) > _EPS:
+                    tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+                    self._reindex(i + 1, j)
+                    return a, b, c, d
+            elif j < i - 1 and ac < pa:
+                # f c ... p a  ->  f p ... c a
+                f = tour[j - 1]
+                if dist(f, c) + pa - dist(f, p) - ac > _EPS:
+                    tour[j:i] = tour[j:i][::-1]
+                    self._reindex(j, i - 1)
+                    return a, p, c, f
+        return None
+
+    def _or_opt(self, a: int):
+        """把以a开头的1~segment个连续孔移到别处（可反向）"""
+        dist, pos, tour, n = self.dist, self.pos, self.tour, self.n
+        i = pos[a]
+        p = tour[i - 1]
+        for length in range(1, self.segment + 1):
+            if i + length - 1 > n:
+                break
+            last = tour[i + length - 1]
+            e = self.next(i + length - 1)
+            removed = dist(p, a) + dist(last, e) - dist(p, e)
+            if removed <= _EPS:
+                continue
+            for x, y in ((a, last), (last, a)):
+                for c in self.neighbors[x]:
+                    cx = dist(c, x)
+                    if cx >= removed:
+                        break
+                    j = pos[c]
+                    if i - 1 <= j <= i + length - 1:
+                        continue
+                    # c x ... y g：插到c之后
+                    g = self.next(j)
+                    if removed - (cx + dist(y, g) - dist(c, g)) > _EPS:
+                        return self._move(i, length, c, after=True, forward=(x == a)) + (p, e, g)
+                    # h y ... x c：插到c之前
+                    if j == i + length:
+                        continue
+                    h = tour[j - 1]
+                    if removed - (dist(h, y) + cx - dist(h, c)) > _EPS:
+                        return self._move(i, length, c, after=False, forward=(x != a)) + (p, e, h)
+        return None
+
+    def _move(self, i: int, length: int, c: int, after: bool, forward: bool) -> Tuple[int, ...]:
+        segment = self.tour[i:i + length]
+        rest = self.tour[:i] + self.tour[i + length:]
+        j = self.pos[c]
+        k = (j if j < i else j - length) + (1 if after else 0)
+        self.tour = rest[:k] + (segment if forward else segment[::-1]) + rest[k:]
+        self._reindex(min(i, k), max(i + length, k + length) - 1)
+        return (c, segment[0], segment[-1])
+
+
+class HoleSequencer:
+    """
+    孔加工顺序优化器
+
+    Args:
+        config: 覆盖 HOLE_SEQUENCING_CONFIG 中的部分参数
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(HOLE_SEQUENCING_CONFIG)
+        self.config.update(config or {})
+        self.logger = logging.getLogger(__name__)
+
+    def order(self, positions: Sequence[Sequence[float]],
+              start: Optional[Sequence[float]] = None) -> Tuple[np.ndarray, Dict]:
+        """
+        计算孔位的加工顺序
+
+        Args:
+            positions: 孔位XY坐标列表
+            start: 刀具起点XY，默认使用配置中的 start_position（None表示不限定起点）
+
+        Returns:
+            Tuple[np.ndarray, Dict]: 访问顺序（positions的下标），以及统计信息
+                holes、original_distance、optimized_distance、reduction（节省比例）、method、seconds
+        """
+        began = time.perf_counter()
+        points = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        n = len(points)
+        start = self.config['start_position'] if start is None else start
+        origin = None if start is None else np.asarray(start, dtype=np.float64)[:2]
+        identity = np.arange(n)
+        original = path_length(points, identity, origin)
+        stats = {'holes': n, 'original_distance': original, 'optimized_distance': original,
+                 'reduction': 0.0, 'method': 'original', 'seconds': 0.0}
+        if not self.config['enabled'] or n < self.config['min_holes']:
+            return identity, stats
+
+        grid = _grid_orders(points, self.config['grid_tolerance'], self.config['grid_min_fill']) \
+            if self.config['grid_serpentine'] else []
+        if grid:
+            lengths = [path_length(points, order, origin) for order in grid]
+            order = grid[int(np.argmin(lengths))]
+            method = 'serpentine'
+        else:
+            # 没有起点时从包围盒左下角最近的孔开始
+            seed = origin if origin is not None else points.min(axis=0)
+            order = _nearest_neighbor_order(points, seed)
+            method = 'nearest_neighbor'
+
+        deadline = began + self.config['time_limit_seconds']
+        # 近邻表超时未建成时保留最近邻/蛇形顺序
+        neighbors = _nearest_neighbors(points, self.config['neighbors'], deadline) \
+            if n > 3 and time.perf_counter() < deadline else None
+        if neighbors is not None:
+            order = _LocalSearch(points, origin, neighbors, self.config['or_opt_segment']).run(order, deadline)
+            method += '+2opt/oropt'
+
+        optimized = path_length(points, order, origin)
+        if optimized >= original - _EPS:
+            order, optimized, method = identity, original, 'original'
+        stats.update(optimized_distance=optimized, method=method, seconds=time.perf_counter() - began,
+                     reduction=(original - optimized) / original if original > 0 else 0.0)
+        self.logger.debug(f"孔加工顺序优化: {n} 个孔，快速移动 {original:.1f} -> {optimized:.1f} mm（{method}）")
+        return order, stats
+
+
+def format_sequencing_comment(stats: Dict, operation: str = "HOLES") -> str:
+    """
+    把顺序优化统计格式化为NC程序注释
+
+    Args:
+        stats: HoleSequencer.order 返回的统计信息
+        operation: 工序名称
+
+    Returns:
+        str: 如 "(HOLE SEQUENCING - DRILLING: 120 HOLES, RAPID XY 5230.4 -> 1872.9 MM, SAVED 64.2%)"
+    """
+    return (f"(HOLE SEQUENCING - {operation}: {stats['holes']} HOLES, "
+            f"RAPID XY {stats['original_distance']:.1f} -> {stats['optimized_distance']:.1f} MM, "
+            f"SAVED {stats['reduction'] * 100:.1f}%)")
+
+
+# 创建全局孔加工顺序优化器实例
+hole_sequencer = HoleSequencer()
+
+
+def sequence_holes(positions: Sequence, start: Optional[Sequence[float]] = None) -> Tuple[List, Dict]:
+    """
+    按优化后的顺序重排孔位（元素可以是坐标元组，也可以是带center的特征字典）
+
+    Args:
+        positions: 孔位坐标或特征字典列表
+        start: 刀具起点XY
+
+    Returns:
+        Tuple[List, Dict]: 重排后的列表和统计信息
+    """
+    items = list(positions)
+    points = [item['center'] if isinstance(item, dict) else item for item in items]
+    order, stats = hole_sequencer.order([tuple(point)[:2] for point in points], start)
+    return [items[index] for index in order], stats
@@ -0,0 +1,308 @@
+"""
+大模型API客户端池
+按 (API地址, 密钥) 复用进程内的OpenAI兼容客户端（连接保持复用，免去每次请求的TLS握手），
+用信号量限制同时进行的请求数，对429/5xx/连接错误做带抖动的指数退避重试，
+并按模型记录请求延迟直方图
+"""
+import bisect
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.config import LLM_CLIENT_CONFIG
+
+# OpenAI兼容SDK（可选依赖，DeepSeek等服务也使用该接口）
+try:
+    import openai
+    from openai import OpenAI
+    HAS_OPENAI = True
+except ImportError:
+    HAS_OPENAI = False
+
+
+class LatencyHistogram:
+    """固定桶上界的延迟直方图（最后一个桶为+Inf）"""
+
+    def __init__(self, buckets: List[float]):
+        self.bounds = sorted(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.errors = 0
+        self.retries = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶估计分位数，返回所在桶的上界（落在+Inf桶时返回最大上界）"""
+        count = sum(self.counts)
+        if not count:
+            return None
+        rank, seen = q * count, 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return self.bounds[-1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        count = sum(self.counts)
+        cumulative, seen = {}, 0
+        for bound, bucket_count in zip(self.bounds + [float('inf')], self.counts):
+            seen += bucket_count
+            cumulative['+Inf' if bound == float('inf') else str(bound)] = seen
+        return {
+            'count': count,
+            'sum_seconds': self.total,
+            'mean_seconds': self.total / count if count else None,
+            'p50_seconds': self.quantile(0.5),
+            'p95_seconds': self.quantile(0.95),
+            'errors': self.errors,
+            'retries': self.retries,
+            'buckets': cumulative
+        }
+
+
+class LLMClientPool:
+    """
+    进程级大模型客户端池
+
+    每个 (API地址, 密钥) 只创建一个客户端实例，其内部的HTTP连接池在请求间保持连接；
+    SDK自带的重试被关闭，由本类统一做并发限制、退避重试和延迟统计。
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, backoff_base: Optional[float] = None,
+                 backoff_max: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.max_concurrency = max_concurrency or LLM_CLIENT_CONFIG['max_concurrency']
+        self.timeout = timeout or LLM_CLIENT_CONFIG['timeout_seconds']
+        self.max_retries = max_retries if max_retries is not None else LLM_CLIENT_CONFIG['max_retries']
+        self.backoff_base = backoff_base if backoff_base is not None else LLM_CLIENT_CONFIG['backoff_base_seconds']
+        self.backoff_max = backoff_max if backoff_max is not None else LLM_CLIENT_CONFIG['backoff_max_seconds']
+
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._clients: Dict[Tuple[Optional[str], str], Any] = {}
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._first_token_histograms: Dict[str, LatencyHistogram] = {}  # 流式请求的首个增量延迟
+        self._in_flight = 0
+        self._peak_in_flight = 0
+
+    def get_client(self, api_key: str, base_url: Optional[str] = None):
+        """
+        获取（必要时创建）指定API地址和密钥的客户端
+
+        Args:
+            api_key: API密钥
+            base_url: API基础地址，None表示OpenAI官方地址
+
+        Returns:
+            OpenAI: 可跨线程共享的客户端实例
+        """
+        if not HAS_OPENAI:
+            raise ImportError("未安装openai库，无法调用大模型API")
+        key = (base_url, api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = OpenAI(api_key=api_key, base_url=base_url, timeout=self.timeout, max_retries=0)
+                self._clients[key] = client
+                self.logger.info(f"创建大模型客户端: {base_url or 'OpenAI默认地址'}")
+            return client
+
+    def chat_completion(self, api_key: str, model: str, messages: List[Dict[str, str]],
+                        base_url: Optional[str] = None, **params: Any) -> str:
+        """
+        调用对话补全接口，返回第一条回复的文本
+
+        Args:
+            api_key: API密钥
+            model: 模型名称
+            messages: 对话消息列表
+            base_url: API基础地址
+            **params: 传给接口的其他参数（temperature、max_tokens等）
+
+        Returns:
+            str: 模型回复内容
+
+        Raises:
+            重试用尽或不可重试的错误原样抛出
+        """
+        client = self.get_client(api_key, base_url)
+
+        def request():
+            response = client.chat.completions.create(model=model, messages=messages, **params)
+            return response.choices[0].message.content or ""
+
+        return self.call(model, request)
+
+    def stream_chat_completion(self, api_key: str, model: str, messages: List[Dict[str, str]],
+                               base_url: Optional[str] = None, **params: Any) -> Iterator[str]:
+        """
+        流式调用对话补全接口，逐个产出回复文本的增量
+
+        并发名额在整个流的读取期间保持占用；收到首个增量之前的失败按call的策略重试，
+        之后的失败直接抛出（已产出的内容无法撤回）。调用方提前关闭生成器时立即断开HTTP流，
+        服务端随之停止生成，不再为剩余token付费。
+
+        Args:
+            api_key: API密钥
+            model: 模型名称
+            messages: 对话消息列表
+            base_url: API基础地址
+            **params: 传给接口的其他参数
+
+        Yields:
+            str: 回复文本增量
+        """
+        client = self.get_client(api_key, base_url)
+        histogram = self._histogram(model)
+        first_token = self._histogram(model, self._first_token_histograms)
+        for attempt in range(self.max_retries + 1):
+            with self._slot():
+                start = time.perf_counter()
+                try:
+                    stream = client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+                except Exception as e:
+                    error = e
+                    with self._lock:
+                        histogram.observe(time.perf_counter() - start)
+                else:
+                    received = False
+                    try:
+                        for chunk in stream:
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if not delta:
+                                continue
+                            if not received:
+                                received = True
+                                with self._lock:
+                                    first_token.observe(time.perf_counter() - start)
+                            yield delta
+                    finally:
+                        stream.close()
+                        with self._lock:
+                            histogram.observe(time.perf_counter() - start)
+                    return
+            delay = self._next_attempt(histogram, error, attempt)
+            if delay is None:
+                raise error
+            time.sleep(delay)  # 退避期间不占用并发名额
+
+    def call(self, model: str, request: Callable[[], Any]) -> Any:
+        """
+        在并发限制下执行一次请求，失败时按退避策略重试，并记录延迟
+
+        Args:
+            model: 模型名称（延迟统计的分组键）
+            request: 发起请求的无参函数
+
+        Returns:
+            request的返回值
+        """
+        histogram = self._histogram(model)
+        for attempt in range(self.max_retries + 1):
+            with self._slot():
+                start = time.perf_counter()
+                try:
+                    return request()
+                except Exception as e:
+                    error = e
+                finally:
+                    with self._lock:
+                        histogram.observe(time.perf_counter() - start)
+            delay = self._next_attempt(histogram, error, attempt)
+            if delay is None:
+                raise error
+            time.sleep(delay)  # 退避期间不占用并发名额
+
+    @contextmanager
+    def _slot(self):
+        """占用一个并发名额，并记录在途请求数"""
+        with self._semaphore:
+            with self._lock:
+                self._in_flight += 1
+                self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+    def _next_attempt(self, histogram: LatencyHistogram, error: Exception, attempt: int) -> Optional[float]:
+        """记录失败并返回重试前的等待时间，不再重试时返回None"""
+        delay = self._retry_delay(error, attempt)
+        with self._lock:
+            if delay is None or attempt == self.max_retries:
+                histogram.errors += 1
+                return None
+            histogram.retries += 1
+        self.logger.warning(f"大模型请求失败（{type(error).__name__}），{delay:.2f}秒后第{attempt + 1}次重试")
+        return delay
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        计算重试前的等待时间，不可重试的错误返回None
+
+        429和5xx按状态码判断，连接错误和超时按SDK异常类型判断；
+        服务端给出Retry-After时优先采用（不超过退避上限）
+        """
+        status = getattr(error, 'status_code', None)
+        if status is not None:
+            if status != 429 and status < 500:
+                return None
+        elif not (HAS_OPENAI and isinstance(error, openai.APIConnectionError)):
+            return None
+
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), self.backoff_max)
+            except ValueError:
+                pass
+        # 全抖动指数退避：在 [0, base * 2^attempt] 内均匀取值
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _histogram(self, model: str, histograms: Optional[Dict[str, LatencyHistogram]] = None) -> LatencyHistogram:
+        if histograms is None:
+            histograms = self._histograms
+        with self._lock:
+            histogram = histograms.get(model)
+            if histogram is None:
+                histogram = histograms[model] = LatencyHistogram(LLM_CLIENT_CONFIG['latency_buckets'])
+            return histogram
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取客户端池统计信息
+
+        Returns:
+            Dict: 客户端数、并发上限、当前/峰值在途请求数，各模型的请求延迟和流式首个增量延迟直方图
+        """
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'max_concurrency': self.max_concurrency,
+                'in_flight': self._in_flight,
+                'peak_in_flight': self._peak_in_flight,
+                'models': {model: histogram.snapshot() for model, histogram in self._histograms.items()},
+                'first_token': {model: histogram.snapshot()
+                                for model, histogram in self._first_token_histograms.items()}
+            }
+
+    def close(self) -> None:
+        """关闭所有客户端的连接池"""
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+
+# 创建全局客户端池实例
+llm_client_pool = LLMClientPool()
@@ -3,10 +3,13 @@ NC代码验证器模块
 用于验证AI生成的NC代码的安全性和正确性
 提供传统方法作为备选和对比验证
 """
-import re
 from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
 from .gcode_generation import generate_fanuc_nc as traditional_generate
 from .material_tool_matcher import analyze_user_description
+from .nc_tokenizer import NCProgramTable, ProgramLike, as_table
 
 class NCCodeValidator:
     """
@@ -14,6 +17,9 @@ class NCCodeValidator:
     验证AI生成的代码安全性和正确性，提供传统方法作为备选
     """
     
+    INIT_CHECK_LINES = 20        # 初始化指令检查的行数
+    COORDINATE_CHECK_LINES = 10  # 坐标系设置检查的行数
+    
     def __init__(self):
         self.safety_rules = [
             self._check_required_initialization,
@@ -27,30 +33,47 @@ class NCCodeValidator:
             self._check_syntax_validity,
             self._check_coordinate_system,
             self._check_feed_rate_reasonableness,
-            self._check_spindle_speed_reasonableness
+            self._check_spindle_speed_reasonableness,
+            self._check_motion_simulation
         ]
+        
+        # 只检查程序开头若干行的规则及其窗口行数：收到足够行数后结论即可确定，流式生成时可提前判定
+        self.prefix_rules = {
+            self._check_required_initialization: self.INIT_CHECK_LINES,
+            self._check_coordinate_system: self.COORDINATE_CHECK_LINES
+        }
     
-    def validate_nc_code(self, nc_code: str, user_description: str = "") -> Dict[str, any]:
+    def start_incremental(self) -> 'IncrementalNCValidation':
+        """
+        开始一次增量验证（用于流式生成）
+        
+        Returns:
+            IncrementalNCValidation: 逐行接收代码的验证状态
+        """
+        return IncrementalNCValidation(self)
+    
+    def validate_nc_code(self, nc_code: ProgramLike, user_description: str = "") -> Dict[str, any]:
         """
         验证NC代码
         
         Args:
-            nc_code: 待验证的NC代码
+            nc_code: 待验证的NC代码（文本或已切分好的地址字表）
             user_description: 用户描述，用于对比验证
             
         Returns:
             Dict: 验证结果
         """
-        lines = [line.strip() for line in nc_code.split('\n') if line.strip()]
+        # 只切分一次，所有规则共用同一张地址字表
+        table = as_table(nc_code)
         
         safety_results = []
         for rule in self.safety_rules:
-            result = rule(lines)
+            result = rule(table)
             safety_results.append(result)
         
         correctness_results = []
         for rule in self.correctness_rules:
-            result = rule(lines)
+            result = rule(table)
             correctness_results.append(result)
         
         # 检查是否存在严重安全问题
@@ -69,15 +92,12 @@ class NCCodeValidator:
             'suggested_fixes': self._get_suggested_fixes(safety_results, correctness_results)
         }
     
-    def _check_required_initialization(self, lines: List[str]) -> Dict[str, any]:
+    def _check_required_initialization(self, lines: ProgramLike) -> Dict[str, any]:
         """检查必需的初始化指令"""
+        table = as_table(lines)
         required_gcodes = ['G21', 'G90', 'G40', 'G49', 'G80']
-        missing_codes = []
-        
-        for code in required_gcodes:
-            found = any(code in line for line in lines[:20])  # 检查前20行
-            if not found:
-                missing_codes.append(code)
+        found = table.present_codes(required_gcodes, stop=table.head_stop(self.INIT_CHECK_LINES))  # 检查前20行
+        missing_codes = [code for code in required_gcodes if code not in found]
         
         return {
             'rule': 'Required initialization codes',
@@ -86,13 +106,10 @@ class NCCodeValidator:
             'severity': 'critical' if missing_codes else 'none'
         }
     
-    def _check_safe_height_usage(self, lines: List[str]) -> Dict[str, any]:
+    def _check_safe_height_usage(self, lines: ProgramLike) -> Dict[str, any]:
         """检查安全高度使用"""
         # 检查是否有安全高度设置（通常>50mm）
-        has_safe_height = any('Z' in line and 
-                             re.search(r'Z([+-]?\d+\.?\d*)', line) and 
-                             float(re.search(r'Z([+-]?\d+\.?\d*)', line).group(1)) > 50 
-                             for line in lines)
+        has_safe_height = bool((as_table(lines).values('Z') > 50).any())
         
         return {
             'rule': 'Safe height usage',
@@ -101,9 +118,10 @@ class NCCodeValidator:
             'severity': 'critical' if not has_safe_height else 'none'
         }
     
-    def _check_program_end(self, lines: List[str]) -> Dict[str, any]:
+    def _check_program_end(self, lines: ProgramLike) -> Dict[str, any]:
         """检查程序结束指令"""
-        has_end = any('M30' in line or 'M02' in line for line in lines[-5:])  # 检查最后5行
+        table = as_table(lines)
+        has_end = bool(table.present_codes(['M30', 'M02'], start=table.tail_start(5)))  # 检查最后5行
         
         return {
             'rule': 'Program end instruction',
@@ -112,9 +130,9 @@ class NCCodeValidator:
             'severity': 'critical' if not has_end else 'none'
         }
     
-    def _check_tool_compensation(self, lines: List[str]) -> Dict[str, any]:
+    def _check_tool_compensation(self, lines: ProgramLike) -> Dict[str, any]:
         """检查刀具补偿"""
-        has_compensation = any('G43' in line or 'G49' in line for line in lines)
+        has_compensation = bool(as_table(lines).present_codes(['G43', 'G49']))
         
         return {
             'rule': 'Tool compensation',
@@ -123,9 +141,9 @@ class NCCodeValidator:
             'severity': 'high' if not has_compensation else 'none'
         }
     
-    def _check_spindle_control(self, lines: List[str]) -> Dict[str, any]:
+    def _check_spindle_control(self, lines: ProgramLike) -> Dict[str, any]:
         """检查主轴控制"""
-        has_spindle_control = any('M03' in line or 'M04' in line or 'M05' in line for line in lines)
+        has_spindle_control = bool(as_table(lines).present_codes(['M03', 'M04', 'M05']))
         
         return {
             'rule': 'Spindle control',
@@ -134,18 +152,18 @@ class NCCodeValidator:
             'severity': 'high' if not has_spindle_control else 'none'
         }
     
-    def _check_syntax_validity(self, lines: List[str]) -> Dict[str, any]:
-        """检查语法有效性"""
-        # 识别无效的G/M代码格式
-        invalid_lines = []
-        valid_gcode_pattern = re.compile(r'^(G|M)\d+(\.\d+)?(\s+[XYZIJKRFPSTL]\s*[-+]?\d+(\.\d+)*)*(.*)?$')
-        
-        for line in lines:
-            if line and not line.startswith('('):  # 忽略注释行
-                # 移除注释部分
-                clean_line = line.split('(')[0].strip()
-                if clean_line and not valid_gcode_pattern.match(clean_line):
-                    invalid_lines.append(clean_line)
+    def _check_syntax_validity(self, lines: ProgramLike) -> Dict[str, any]:
+        """
+        检查语法有效性
+
+        由地址字（字母 + [+-]数字[.数字]）、%和注释组成的行都有效，不要求以G/M代码开头，
+        程序号（O1234）、顺序号（N10）、换刀（T1 M06）和只含坐标的续行都能通过；
+        用户宏程序B语句（#1=10、WHILE [...] DO1、END1、X[#500+#502]）按宏程序语法检查；
+        没有数值的地址字母、多个小数点或符号、未依附地址的数值和不完整的宏表达式无效
+        """
+        # 识别含有无法切分为地址字内容、也不是宏程序语句的行（注释已由分词器排除）
+        table = as_table(lines)
+        invalid_lines = [table.lines[i].strip() for i in np.flatnonzero(table.invalid & ~table.macro)[:4]]
         
         return {
             'rule': 'Syntax validity',
@@ -154,11 +172,11 @@ class NCCodeValidator:
             'severity': 'high' if invalid_lines else 'none'
         }
     
-    def _check_coordinate_system(self, lines: List[str]) -> Dict[str, any]:
+    def _check_coordinate_system(self, lines: ProgramLike) -> Dict[str, any]:
         """检查坐标系统设置"""
-        has_coordinate_system = any('G54' in line or 'G55' in line or 'G56' in line 
-                                   or 'G57' in line or 'G58' in line or 'G59' in line 
-                                   for line in lines[:10])
+        table = as_table(lines)
+        has_coordinate_system = bool(table.present_codes(['G54', 'G55', 'G56', 'G57', 'G58', 'G59'],
+                                                         stop=table.head_stop(self.COORDINATE_CHECK_LINES)))
         
         return {
             'rule': 'Coordinate system',
@@ -167,15 +185,12 @@ class NCCodeValidator:
             'severity': 'high' if not has_coordinate_system else 'none'
         }
     
-    def _check_feed_rate_reasonableness(self, lines: List[str]) -> Dict[str, any]:
+    def _check_feed_rate_reasonableness(self, lines: ProgramLike) -> Dict[str, any]:
         """检查进给速度合理性"""
-        feed_rates = []
-        for line in lines:
-            matches = re.findall(r'F(\d+\.?\d*)', line)
-            feed_rates.extend([float(match) for match in matches])
+        feed_rates = as_table(lines).values('F')
         
         # 检查是否存在明显不合理的进给速度（如过大或过小）
-        unreasonable_rates = [fr for fr in feed_rates if fr < 1 or fr > 5000]
+        unreasonable_rates = feed_rates[(feed_rates < 1) | (feed_rates > 5000)].tolist()
         
         return {
             'rule': 'Feed rate reasonableness',
@@ -184,15 +199,12 @@ class NCCodeValidator:
             'severity': 'medium' if unreasonable_rates else 'none'
         }
     
-    def _check_spindle_speed_reasonableness(self, lines: List[str]) -> Dict[str, any]:
+    def _check_spindle_speed_reasonableness(self, lines: ProgramLike) -> Dict[str, any]:
         """检查主轴转速合理性"""
-        spindle_speeds = []
-        for line in lines:
-            matches = re.findall(r'S(\d+\.?\d*)', line)
-            spindle_speeds.extend([float(match) for match in matches])
+        spindle_speeds = as_table(lines).values('S')
         
         # 检查是否存在明显不合理的主轴转速
-        unreasonable_speeds = [ss for ss in spindle_speeds if ss > 20000]  # 通常不超过20000rpm
+        unreasonable_speeds = spindle_speeds[spindle_speeds > 20000].tolist()  # 通常不超过20000rpm
         
         return {
             'rule': 'Spindle speed reasonableness',
@@ -201,6 +213,21 @@ class NCCodeValidator:
             'severity': 'medium' if unreasonable_speeds else 'none'
         }
     
+    def _check_motion_simulation(self, lines: ProgramLike) -> Dict[str, any]:
+        """按FANUC模态规则执行程序，检查圆弧、进给和固定循环数据等会引起报警的问题"""
+        from .nc_interpreter import interpret_nc_program
+        
+        alarms = [alarm for alarm in interpret_nc_program(as_table(lines))['alarms']
+                  if alarm['code'] != 'UNSUPPORTED']
+        messages = [f"line {alarm['line']}: {alarm['code']} {alarm['message']}" for alarm in alarms]
+        
+        return {
+            'rule': 'Motion simulation',
+            'passed': len(alarms) == 0,
+            'details': f'Alarms: {messages[:3]}...' if len(messages) > 3 else f'Alarms: {messages}' if messages else 'No alarms',
+            'severity': 'high' if alarms else 'none'
+        }
+    
     def _calculate_overall_score(self, safety_results: List[Dict], correctness_results: List[Dict]) -> float:
         """计算整体评分"""
         total_checks = len(safety_results) + len(correctness_results)
@@ -249,40 +276,86 @@ class NCCodeValidator:
         traditional_nc_code = self.generate_with_traditional_fallback(features, description_analysis)
         
         # 简单对比关键指标
-        ai_lines = [line.strip() for line in ai_nc_code.split('\n') if line.strip() and not line.strip().startswith('(')]
-        traditional_lines = [line.strip() for line in traditional_nc_code.split('\n') if line.strip() and not line.strip().startswith('(')]
+        ai_table = as_table(ai_nc_code)
+        traditional_table = as_table(traditional_nc_code)
         
         # 检查关键G/M代码的存在性
-        ai_gcodes = set()
-        traditional_gcodes = set()
-        
-        for line in ai_lines:
-            g_matches = re.findall(r'G\d+', line)
-            m_matches = re.findall(r'M\d+', line)
-            ai_gcodes.update(g_matches + m_matches)
-        
-        for line in traditional_lines:
-            g_matches = re.findall(r'G\d+', line)
-            m_matches = re.findall(r'M\d+', line)
-            traditional_gcodes.update(g_matches + m_matches)
+        ai_gcodes = ai_table.codes('GM')
+        traditional_gcodes = traditional_table.codes('GM')
         
         # 检查是否存在重要缺失
         missing_in_ai = traditional_gcodes - ai_gcodes
         missing_in_traditional = ai_gcodes - traditional_gcodes
         
+        def code_lines(table: NCProgramTable) -> int:
+            """不含空行和纯注释行的行数"""
+            return int(np.count_nonzero(np.diff(table.line_word_start) > 0))
+        
+        def has_safe_operations(table: NCProgramTable) -> bool:
+            """前10个代码行中是否有同时设置G21和G90的行"""
+            head = np.flatnonzero(np.diff(table.line_word_start) > 0)[:10]
+            both = table.lines_with(['G21']) & table.lines_with(['G90'])
+            return bool(both[head].any())
+        
         return {
-            'ai_line_count': len(ai_lines),
-            'traditional_line_count': len(traditional_lines),
+            'ai_line_count': code_lines(ai_table),
+            'traditional_line_count': code_lines(traditional_table),
             'missing_in_ai': list(missing_in_ai),
             'missing_in_traditional': list(missing_in_traditional),
-            'ai_has_spindle_control': any('M03' in line or 'M04' in line or 'M05' in line for line in ai_lines),
-            'traditional_has_spindle_control': any('M03' in line or 'M04' in line or 'M05' in line for line in traditional_lines),
-            'ai_has_tool_compensation': any('G43' in line or 'G49' in line for line in ai_lines),
-            'traditional_has_tool_compensation': any('G43' in line or 'G49' in line for line in traditional_lines),
-            'ai_has_safe_operations': any('G21' in line and 'G90' in line for line in ai_lines[:10]),
-            'traditional_has_safe_operations': any('G21' in line and 'G90' in line for line in traditional_lines[:10])
+            'ai_has_spindle_control': bool(ai_table.present_codes(['M03', 'M04', 'M05'])),
+            'traditional_has_spindle_control': bool(traditional_table.present_codes(['M03', 'M04', 'M05'])),
+            'ai_has_tool_compensation': bool(ai_table.present_codes(['G43', 'G49'])),
+            'traditional_has_tool_compensation': bool(traditional_table.present_codes(['G43', 'G49'])),
+            'ai_has_safe_operations': has_safe_operations(ai_table),
+            'traditional_has_safe_operations': has_safe_operations(traditional_table)
         }
 
 
+class IncrementalNCValidation:
+    """
+    增量NC代码验证
+    
+    逐行接收代码，开头窗口规则在收满窗口行数时立即给出结论；
+    其余规则需要完整程序，在finish时与validate_nc_code一次性得出相同结果。
+    """
+    
+    def __init__(self, validator: NCCodeValidator):
+        self.validator = validator
+        self.lines: List[str] = []
+        self.decided: List[Dict[str, any]] = []
+    
+    def add_line(self, line: str) -> List[Dict[str, any]]:
+        """
+        接收一行代码
+        
+        Args:
+            line: NC代码行
+            
+        Returns:
+            List[Dict]: 因这一行而确定未通过的规则结果（通常为空）
+        """
+        line = line.strip()
+        if not line:
+            return []
+        self.lines.append(line)
+        failed = []
+        for rule, window in self.validator.prefix_rules.items():
+            if len(self.lines) == window:
+                result = rule(self.lines)
+                self.decided.append(result)
+                if not result['passed']:
+                    failed.append(result)
+        return failed
+    
+    def finish(self, user_description: str = "") -> Dict[str, any]:
+        """
+        完成验证
+        
+        Returns:
+            Dict: 与validate_nc_code相同格式的验证结果
+        """
+        return self.validator.validate_nc_code("\n".join(self.lines), user_description)
+
+
 # 创建全局实例
 nc_validator = NCCodeValidator()
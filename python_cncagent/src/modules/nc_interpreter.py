@@ -0,0 +1,604 @@
+"""
+FANUC NC程序解释器模块
+按FANUC 0i-MD的模态规则执行地址字表，输出NumPy结构化数组形式的运动段，
+供验证、加工时间估算和仿真使用。各模态组的状态用前向填充、坐标用分段累加整体计算，
+只有固定循环的初始点平面按循环段数逐段推进，百万行程序可在数秒内完成
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import NC_INTERPRETER_CONFIG
+from .nc_tokenizer import NCProgramTable, ProgramLike, as_table
+
+# 运动段类型
+KIND_RAPID = 0      # G00 快速定位
+KIND_LINEAR = 1     # G01 直线插补（含固定循环的切削进给）
+KIND_ARC_CW = 2     # G02 顺时针圆弧
+KIND_ARC_CCW = 3    # G03 逆时针圆弧
+KIND_DWELL = 4      # 暂停（G04），起点与终点相同
+
+# 运动段数组的字段：坐标为机床坐标（已加上工件坐标系偏置和刀具长度补偿），单位mm
+SEGMENT_DTYPE = np.dtype([
+    ('line', np.int32),            # 所在行号（从0开始）
+    ('kind', np.uint8),            # 运动段类型 KIND_*
+    ('start', np.float64, (3,)),   # 起点 X/Y/Z
+    ('end', np.float64, (3,)),     # 终点 X/Y/Z
+    ('center', np.float64, (3,)),  # 圆弧圆心（非圆弧为NaN）
+    ('sweep', np.float64),         # 圆弧扫过的角度（弧度，逆时针为正）
+    ('length', np.float64),        # 路径长度（圆弧含螺旋分量）
+    ('feed', np.float64),          # 进给速度 mm/min（快速定位和暂停为0）
+    ('spindle', np.float64),       # 主轴转速 rpm（M04为负，M05为0）
+    ('dwell', np.float64),         # 到达终点后的暂停时间（秒）
+    ('tool', np.int32),            # 当前刀具号（最近一次M06时的T）
+    ('plane', np.uint8),           # 平面 17/18/19
+    ('wcs', np.uint8),             # 工件坐标系 54-59
+    ('length_offset', np.int16),   # 刀具长度补偿号H（G49时为0）
+    ('cutter_comp', np.uint8),     # 刀具半径补偿 40/41/42（只记录状态，不计算偏置路径）
+    ('cycle', np.uint8),           # 固定循环 73/81/82/83/84，非循环为0
+    ('coolant', np.bool_),         # 冷却液是否开启
+])
+
+MOTION_GROUP = (0, 1, 2, 3)
+CYCLE_GROUP = (73, 81, 82, 83, 84)
+# 解释器没有建模、遇到时只报告的指令
+UNSUPPORTED_CODES = ['G10', 'G16', 'G51', 'G52', 'G65', 'G66', 'G68', 'G92', 'M98']
+# 平面 -> (第一轴, 第二轴, 垂直轴) 的坐标下标
+PLANE_AXES = {17: (0, 1, 2), 18: (2, 0, 1), 19: (1, 2, 0)}
+
+
+def _forward_fill(values: np.ndarray, default: float) -> np.ndarray:
+    """把NaN替换为之前最近一个非NaN值，开头的NaN替换为default"""
+    index = np.where(np.isnan(values), -1, np.arange(values.size))
+    np.maximum.accumulate(index, out=index)
+    return np.where(index >= 0, values[np.maximum(index, 0)], default)
+
+
+def _fill_index(mask: np.ndarray) -> np.ndarray:
+    """每个位置之前（含）最近一个mask为真的位置，没有时为-1"""
+    index = np.where(mask, np.arange(mask.size), -1)
+    return np.maximum.accumulate(index) if index.size else index
+
+
+class FANUCInterpreter:
+    """
+    FANUC 0i-MD NC程序解释器
+
+    支持 G00/G01/G02/G03、G04、G17-G19、G20/G21、G28、G40-G42、G43/G44/G49、G53、G54-G59、
+    G73/G81/G82/G83/G84/G80（含L重复和G98/G99）、G90/G91、G94/G95，以及F/S/T和M03/M04/M05/M06/M08/M09/M02/M30
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(NC_INTERPRETER_CONFIG)
+        self.config.update(config or {})
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, program: ProgramLike) -> Dict:
+        """
+        执行NC程序
+
+        Args:
+            program: NC程序文本或地址字表
+
+        Returns:
+            Dict: segments（SEGMENT_DTYPE运动段数组）、alarms（报警列表）、
+                  executed_lines（执行到的行数，M02/M30之后的行不执行）、final_position（最终机床坐标）
+        """
+        table = as_table(program)
+        state = _ProgramState(table, self.config)
+        alarms = state.alarms
+
+        # 各部分内部已按执行顺序排列，按行号稳定排序即得到整个程序的执行顺序
+        parts = [state.linear_segments(), state.arc_segments(), state.reference_segments(),
+                 state.dwell_segments(), state.cycle_segments()]
+        lines = np.concatenate([part['line'] for part in parts])
+        order = np.argsort(lines, kind='stable')
+        lines = lines[order]
+
+        segments = np.zeros(lines.size, dtype=SEGMENT_DTYPE)
+        segments['line'] = lines
+        for name in ('kind', 'start', 'end', 'dwell', 'cycle'):
+            segments[name] = np.concatenate([part[name] for part in parts])[order]
+        kind = segments['kind']
+        feeding = (kind == KIND_LINEAR) | (kind == KIND_ARC_CW) | (kind == KIND_ARC_CCW)
+        segments['feed'] = np.where(feeding, state.feed[lines], 0.0)
+        segments['spindle'] = state.spindle[lines]
+        segments['tool'] = state.tool[lines]
+        segments['plane'] = state.plane[lines]
+        segments['wcs'] = state.wcs[lines]
+        segments['length_offset'] = np.where(state.length_comp[lines] == 49, 0, state.h_number[lines])
+        segments['cutter_comp'] = state.cutter_comp[lines]
+        segments['coolant'] = state.coolant[lines]
+        segments['length'] = np.sqrt(np.square(segments['end'] - segments['start']).sum(axis=1))
+        segments['center'] = np.nan
+
+        # 圆弧的圆心、角度和弧长按排序后的位置写回
+        arcs = parts[1]
+        position = np.empty_like(order)
+        position[order] = np.arange(order.size)
+        arc_rows = position[parts[0]['line'].size + np.arange(arcs['line'].size)]
+        segments['center'][arc_rows] = arcs['center']
+        segments['sweep'][arc_rows] = arcs['sweep']
+        segments['length'][arc_rows] = arcs['arc_length']
+
+        # 进给速度为零的切削运动（FANUC PS011）
+        for line in np.unique(segments['line'][feeding & (segments['feed'] <= 0) & (segments['length'] > 0)])[:10]:
+            alarms.append(self._alarm(line, 'PS011', '切削进给速度为零'))
+
+        alarms.sort(key=lambda alarm: alarm['line'])
+        return {
+            'segments': segments,
+            'alarms': alarms,
+            'executed_lines': state.n,
+            'final_position': state.post[-1].tolist() if state.n else list(state.origin)
+        }
+
+    @staticmethod
+    def _alarm(line: int, code: str, message: str) -> Dict:
+        return {'line': int(line) + 1, 'code': code, 'message': message}
+
+
+class _ProgramState:
+    """一次执行的逐行模态状态和坐标（长度为执行行数的数组）"""
+
+    def __init__(self, table: NCProgramTable, config: Dict):
+        self.table = table
+        self.config = config
+        self.alarms: List[Dict] = []
+
+        # M02/M30之后的行不执行
+        end_lines = np.flatnonzero(table.lines_with(['M02', 'M30']))
+        self.n = n = int(end_lines[0]) + 1 if end_lines.size else table.n_lines
+        words = slice(0, int(table.line_word_start[n]))
+        # 宏程序语句（变量赋值、WHILE/IF、变量或表达式作地址值）不执行，其中的字母不当作地址字
+        macro = table.macro[:n]
+        words = np.flatnonzero(~macro[table.word_line[words]]) if macro.any() else words
+        self.letters = table.word_letter[words]
+        self.values = table.word_value[words]
+        self.word_line = table.word_line[words]
+        self._code_words: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+        self._modal_states()
+        self._positions()
+
+        for code in sorted(table.present_codes(UNSUPPORTED_CODES, stop=n)):
+            line = int(np.flatnonzero(table.lines_with([code], stop=n))[0])
+            self.alarms.append(FANUCInterpreter._alarm(line, 'UNSUPPORTED', f'解释器不支持 {code}，其后的轨迹可能不准确'))
+        if macro.any():
+            self.alarms.append(FANUCInterpreter._alarm(int(np.flatnonzero(macro)[0]), 'UNSUPPORTED',
+                                                       '解释器不执行用户宏程序B（#变量、WHILE/IF），宏循环中的孔位不在轨迹中'))
+
+    # ---- 逐行状态 ----
+
+    def _letter(self, letter: str) -> np.ndarray:
+        """每行地址letter的数值（同一行出现多次时取最后一个，没有时为NaN）"""
+        mask = self.letters == ord(letter)
+        out = np.full(self.n, np.nan)
+        out[self.word_line[mask]] = self.values[mask]
+        return out
+
+    def _group(self, letter: str, codes) -> np.ndarray:
+        """每行属于codes这一组的最后一个指令数值（没有时为NaN）"""
+        if letter not in self._code_words:
+            mask = self.letters == ord(letter)
+            self._code_words[letter] = (self.word_line[mask], self.values[mask])
+        lines, values = self._code_words[letter]
+        mask = np.isin(values, codes)
+        out = np.full(self.n, np.nan)
+        out[lines[mask]] = values[mask]
+        return out
+
+    def _has(self, letter: str, codes) -> np.ndarray:
+        """每行是否含有codes中的指令"""
+        return ~np.isnan(self._group(letter, codes))
+
+    def _modal_states(self):
+        config = self.config
+        self.motion = _forward_fill(self._group('G', MOTION_GROUP), config['default_motion'])
+        cycle_words = self._group('G', MOTION_GROUP + CYCLE_GROUP + (80,))
+        cycle_words[~np.isnan(cycle_words) & ~np.isin(cycle_words, CYCLE_GROUP)] = 0  # G80和G00-G03取消循环
+        self.cycle = _forward_fill(cycle_words, 0).astype(np.uint8)
+        self.plane = _forward_fill(self._group('G', (17, 18, 19)), 17).astype(np.uint8)
+        self.absolute = _forward_fill(self._group('G', (90, 91)), 90) == 90
+        self.inch = _forward_fill(self._group('G', (20, 21)), 21) == 20
+        self.wcs = _forward_fill(self._group('G', (54, 55, 56, 57, 58, 59)), 54).astype(np.uint8)
+        self.length_comp = _forward_fill(self._group('G', (43, 44, 49)), 49).astype(np.uint8)
+        self.cutter_comp = _forward_fill(self._group('G', (40, 41, 42)), 40).astype(np.uint8)
+        self.return_initial = _forward_fill(self._group('G', (98, 99)), 98) == 98
+        per_revolution = _forward_fill(self._group('G', (94, 95)), 94) == 95
+
+        self.dwell_line = self._has('G', (4,))
+        self.reference_line = self._has('G', (28,))
+        self.machine_line = self._has('G', (53,))
+
+        self.scale = np.where(self.inch, 25.4, 1.0)
+        speed = _forward_fill(self._letter('S'), 0)
+        direction = _forward_fill(self._group('M', (3, 4, 5)), 5)
+        self.spindle = np.select([direction == 3, direction == 4], [speed, -speed], 0.0)
+        feed = _forward_fill(self._letter('F') * self.scale, 0)
+        self.feed = np.where(per_revolution, feed * np.abs(self.spindle), feed)
+
+        tool_change = self._has('M', (6,))
+        selected = _forward_fill(self._letter('T'), 0)
+        self.tool = _forward_fill(np.where(tool_change, selected, np.nan), 0).astype(np.int32)
+        self.coolant = _forward_fill(self._group('M', (7, 8, 9)), 9) != 9
+        self.h_number = _forward_fill(np.where(self._has('G', (43, 44)), self._letter('H'), np.nan), 0).astype(np.int16)
+
+        # 坐标偏置：工件坐标系偏置，Z再加刀具长度补偿；G53行为机床坐标
+        offsets = np.zeros((60, 3))
+        for name, offset in config['work_offsets'].items():
+            offsets[int(name.upper().lstrip('G'))] = offset
+        lengths = np.zeros(int(self.h_number.max(initial=0)) + 1)
+        for number, length in config['tool_lengths'].items():
+            if int(number) < lengths.size:
+                lengths[int(number)] = length
+        self.shift = offsets[self.wcs]
+        sign = np.select([self.length_comp == 43, self.length_comp == 44], [1.0, -1.0], 0.0)
+        self.shift[:, 2] += sign * lengths[self.h_number]
+        self.shift[self.machine_line] = 0
+
+    # ---- 坐标 ----
+
+    def _positions(self):
+        """计算每行执行后的机床坐标 post，以及固定循环的孔位数据"""
+        n = self.n
+        self.origin = np.asarray(self.config['start_position'], dtype=np.float64)
+        reference = np.asarray(self.config['reference_position'], dtype=np.float64)
+
+        cycle_active = self.cycle > 0
+        # 重复次数：FS0i用K，旧格式用L，同一行两者都有时以 cycle_repeat_address 为准
+        preferred = self.config['cycle_repeat_address'].upper()
+        repeat = self._letter(preferred)
+        fallback = self._letter('L' if preferred == 'K' else 'K')
+        repeat = np.where(np.isnan(repeat), fallback, repeat)
+        self.repeat = np.where(cycle_active & ~np.isnan(repeat), repeat, 1).astype(np.int64)
+
+        axis_values = np.stack([self._letter(axis) for axis in 'XYZ'], axis=1) * self.scale[:, None]
+        axis_values[self.dwell_line, 0] = np.nan  # G04的X为暂停时间
+        specified = ~np.isnan(axis_values)
+        r_value = self._letter('R') * self.scale
+
+        # 固定循环中含X/Y/Z/R任一地址（且重复次数不为0）的行执行钻孔
+        self.hole_line = cycle_active & (specified.any(axis=1) | ~np.isnan(r_value)) & (self.repeat > 0)
+        data_only = cycle_active & (self.repeat == 0)
+        specified[data_only] = False
+
+        absolute = (self.absolute | self.machine_line)[:, None]
+        reset = specified & (absolute | self.reference_line[:, None])
+        base = np.where(self.reference_line[:, None], reference, axis_values + self.shift)
+        delta = np.where(specified & ~reset, axis_values, 0.0)
+        delta[self.hole_line] *= self.repeat[self.hole_line, None]
+        # 钻孔行的Z地址是孔底数据，执行后Z停在返回平面（稍后按循环逐段确定）
+        reset[self.hole_line, 2] = True
+        delta[self.hole_line, 2] = 0.0
+        self.axis_values = axis_values
+
+        self.cumulative = np.cumsum(delta, axis=0)
+        self.reset_index = np.stack([_fill_index(reset[:, axis]) for axis in range(3)], axis=1)
+        self.base = base
+        if self.hole_line.any():
+            self._cycle_levels(r_value)
+
+        self.post = np.empty((n, 3))
+        for axis in range(3):
+            index = self.reset_index[:, axis]
+            anchor = np.where(index >= 0, base[np.maximum(index, 0), axis] - self.cumulative[np.maximum(index, 0), axis],
+                              self.origin[axis])
+            self.post[:, axis] = anchor + self.cumulative[:, axis]
+        self.pre = np.vstack([self.origin[None, :], self.post[:-1]]) if n else self.post.copy()
+
+    def _z_after(self, line: int) -> float:
+        """第line行执行后的Z（只依赖之前已确定的基准值）"""
+        if line < 0:
+            return float(self.origin[2])
+        index = self.reset_index[line, 2]
+        if index < 0:
+            return float(self.origin[2] + self.cumulative[line, 2])
+        return float(self.base[index, 2] - self.cumulative[index, 2] + self.cumulative[line, 2])
+
+    def _cycle_levels(self, r_value: np.ndarray):
+        """确定每个钻孔行的初始平面、R平面、孔底和返回平面"""
+        n = self.n
+        cycle_active = self.cycle > 0
+        run_start = cycle_active & ~np.concatenate(([False], cycle_active[:-1]))
+        run_id = np.cumsum(run_start) - 1
+        starts = np.flatnonzero(run_start)
+
+        def run_fill(values):
+            """循环段内的前向填充（循环数据在G80后清除）"""
+            index = _fill_index(cycle_active & ~np.isnan(values))
+            valid = (index >= 0) & cycle_active
+            valid[valid] = index[valid] >= starts[run_id[valid]]
+            return np.where(valid, values[np.maximum(index, 0)], np.nan)
+
+        z_data = run_fill(self._letter('Z') * self.scale)
+        r_data = run_fill(r_value)
+        self.peck = run_fill(self._letter('Q') * self.scale)
+        dwell = run_fill(self._letter('P'))
+        self.cycle_dwell = np.where(np.isnan(dwell), 0.0, dwell / 1000.0)
+
+        holes = np.flatnonzero(self.hole_line)
+        missing = holes[np.isnan(z_data[holes]) | np.isnan(r_data[holes])]
+        for line in missing[:10]:
+            self.alarms.append(FANUCInterpreter._alarm(line, 'PS0045', '固定循环缺少孔底Z或R点数据'))
+
+        # 返回平面 = a * 初始平面 + c：G98回到初始平面；G99回到R点（增量方式下R点相对初始平面）
+        shift_z = self.shift[:, 2]
+        r_absolute = self.absolute | self.machine_line
+        r_a = np.where(r_absolute, 0.0, 1.0)
+        r_c = np.where(r_absolute, r_data + shift_z, r_data)
+        r_c = np.where(np.isnan(r_c), 0.0, r_c)
+        ret_a = np.where(self.return_initial, 1.0, r_a)
+        ret_c = np.where(self.return_initial, 0.0, r_c)
+
+        # 初始平面：循环开始前一行执行后的Z；前一行的Z可能来自上一段循环的返回平面，因此按循环段依次推进
+        initial = np.zeros(starts.size)
+        hole_run = np.full(n, -1)
+        hole_run[holes] = run_id[holes]
+        reset_z = self.reset_index[:, 2]
+        for k, start in enumerate(starts.tolist()):
+            before = start - 1
+            index = int(reset_z[before]) if before >= 0 else -1
+            if index >= 0 and hole_run[index] >= 0:
+                level = ret_a[index] * initial[hole_run[index]] + ret_c[index]
+                initial[k] = level - self.cumulative[index, 2] + self.cumulative[before, 2]
+            else:
+                initial[k] = self._z_after(before)
+
+        hole_initial = initial[run_id[holes]]
+        self.hole_index = holes
+        self.initial_level = hole_initial
+        self.r_level = r_a[holes] * hole_initial + r_c[holes]
+        bottom = np.where(r_absolute[holes], z_data[holes] + shift_z[holes], self.r_level + z_data[holes])
+        self.bottom_level = np.where(np.isnan(bottom), self.r_level, bottom)
+        self.return_level = ret_a[holes] * hole_initial + ret_c[holes]
+        self.base[holes, 2] = self.return_level
+
+    # ---- 运动段 ----
+
+    @staticmethod
+    def _part(lines, kind, start, end, dwell=None, cycle=None) -> Dict:
+        count = len(lines)
+        return {
+            'line': np.asarray(lines, dtype=np.int64),
+            'kind': np.broadcast_to(np.asarray(kind, dtype=np.uint8), (count,)),
+            'start': np.asarray(start, dtype=np.float64).reshape(count, 3),
+            'end': np.asarray(end, dtype=np.float64).reshape(count, 3),
+            'dwell': np.zeros(count) if dwell is None else np.broadcast_to(dwell, (count,)),
+            'cycle': np.zeros(count, dtype=np.uint8) if cycle is None else np.broadcast_to(cycle, (count,))
+        }
+
+    def _plain_lines(self) -> np.ndarray:
+        """非循环、非G04/G28的普通运动行"""
+        return (self.cycle == 0) & ~self.dwell_line & ~self.reference_line
+
+    def linear_segments(self) -> Dict:
+        """G00/G01"""
+        moved = ~np.isnan(self.axis_values).all(axis=1)
+        lines = np.flatnonzero(self._plain_lines() & moved & (self.motion <= 1))
+        return self._part(lines, self.motion[lines], self.pre[lines], self.post[lines])
+
+    def arc_segments(self) -> Dict:
+        """G02/G03：圆心由I/J/K（相对起点）或R（负值为大于180度的圆弧）确定"""
+        ijk = np.stack([self._letter(axis) for axis in 'IJK'], axis=1) * self.scale[:, None]
+        r_value = self._letter('R') * self.scale
+        moved = ~np.isnan(self.axis_values).all(axis=1) | ~np.isnan(ijk).all(axis=1)
+        lines = np.flatnonzero(self._plain_lines() & moved & (self.motion >= 2))
+        start, end = self.pre[lines], self.post[lines]
+        ccw = self.motion[lines] == 3
+        plane_axes = np.zeros((20, 3), dtype=np.int64)
+        for plane, axis_order in PLANE_AXES.items():
+            plane_axes[plane] = axis_order
+        axes = plane_axes[self.plane[lines]]
+        rows = np.arange(lines.size)
+        sp, sq = start[rows, axes[:, 0]], start[rows, axes[:, 1]]
+        ep, eq = end[rows, axes[:, 0]], end[rows, axes[:, 1]]
+
+        offset = np.nan_to_num(ijk[lines])
+        use_r = ~np.isnan(r_value[lines]) & np.isnan(ijk[lines]).all(axis=1)
+        cp = sp + offset[rows, axes[:, 0]]
+        cq = sq + offset[rows, axes[:, 1]]
+        if use_r.any():
+            radius = r_value[lines][use_r]
+            dp, dq = (ep - sp)[use_r], (eq - sq)[use_r]
+            chord = np.hypot(dp, dq)
+            half = chord / 2
+            too_small = np.abs(radius) < half - self.config['arc_radius_tolerance']
+            for line in lines[use_r][too_small][:10]:
+                self.alarms.append(FANUCInterpreter._alarm(line, 'PS0022', '圆弧半径R小于起点到终点距离的一半'))
+            height = np.sqrt(np.maximum(radius ** 2 - half ** 2, 0.0))
+            side = np.where(ccw[use_r], 1.0, -1.0) * np.sign(radius)
+            safe = np.where(chord > 0, chord, 1.0)
+            cp[use_r] = sp[use_r] + dp / 2 - side * height * dq / safe
+            cq[use_r] = sq[use_r] + dq / 2 + side * height * dp / safe
+
+        start_angle = np.arctan2(sq - cq, sp - cp)
+        end_angle = np.arctan2(eq - cq, ep - cp)
+        sweep = np.mod(end_angle - start_angle, 2 * np.pi)
+        full = (np.hypot(ep - sp, eq - sq) < 1e-9) & ~use_r  # I/J/K方式起点等于终点为整圆
+        sweep = np.where(ccw, np.where(full, 2 * np.pi, sweep),
+                         -np.where(full, 2 * np.pi, np.mod(-sweep, 2 * np.pi)))
+
+        # 起点和终点到圆心的距离之差超出公差（FANUC PS020）
+        start_radius = np.hypot(sp - cp, sq - cq)
+        mismatch = np.abs(np.hypot(ep - cp, eq - cq) - start_radius) > self.config['arc_radius_tolerance']
+        for line in lines[mismatch & ~use_r][:10]:
+            self.alarms.append(FANUCInterpreter._alarm(line, 'PS0020', '圆弧终点不在圆弧上（起点和终点半径之差超出公差）'))
+
+        center = start.copy()
+        center[rows, axes[:, 0]] = cp
+        center[rows, axes[:, 1]] = cq
+        helix = end[rows, axes[:, 2]] - start[rows, axes[:, 2]]
+        arc_length = np.hypot(start_radius * np.abs(sweep), helix)
+        part = self._part(lines, np.where(ccw, KIND_ARC_CCW, KIND_ARC_CW), start, end)
+        part.update(center=center, sweep=sweep, arc_length=arc_length)
+        return part
+
+    def reference_segments(self) -> Dict:
+        """G28：经中间点快速返回参考点"""
+        lines = np.flatnonzero(self.reference_line & ~np.isnan(self.axis_values).all(axis=1))
+        values = self.axis_values[lines]
+        specified = ~np.isnan(values)
+        absolute = self.absolute[lines, None]
+        middle = np.where(specified, np.where(absolute, values + self.shift[lines], self.pre[lines] + values),
+                          self.pre[lines])
+        moved = np.any(middle != self.pre[lines], axis=1)  # 中间点与当前位置相同时只有返回参考点一段
+        # 每行先到中间点再到参考点：把两段交错排列
+        order = np.argsort(np.concatenate([np.flatnonzero(moved) * 2, np.arange(lines.size) * 2 + 1]), kind='stable')
+        first = self._part(lines[moved], KIND_RAPID, self.pre[lines][moved], middle[moved])
+        second = self._part(lines, KIND_RAPID, middle, self.post[lines])
+        return {name: np.concatenate([first[name], second[name]])[order] for name in first}
+
+    def dwell_segments(self) -> Dict:
+        """G04：X为秒，P为毫秒"""
+        lines = np.flatnonzero(self.dwell_line)
+        seconds = self._letter('X')[lines]
+        seconds = np.where(np.isnan(seconds), self._letter('P')[lines] / 1000.0, seconds)
+        return self._part(lines, KIND_DWELL, self.pre[lines], self.pre[lines],
+                          dwell=np.nan_to_num(seconds))
+
+    def cycle_segments(self) -> Dict:
+        """
+        固定循环展开：定位到孔位 -> 快速到R点 -> 切削（G73/G83按Q分次啄钻）-> 孔底暂停 -> 返回
+
+        G73每次啄钻后回退peck_retract；G83每次回到R点，再快速下降到上次深度以上peck_clearance处；
+        G84以进给速度退回R点（G98时再快速回到初始平面）
+        """
+        if not self.hole_line.any():
+            return self._part([], KIND_RAPID, np.empty((0, 3)), np.empty((0, 3)))
+
+        # 按L展开重复钻孔：增量方式下每次移动一个增量，绝对方式下在同一位置重复
+        holes = self.hole_index
+        count = self.repeat[holes]
+        hole = np.repeat(np.arange(holes.size), count)
+        lines = holes[hole]
+        repetition = np.arange(hole.size) - np.repeat(np.cumsum(count) - count, count)
+        step = np.where(self.absolute[lines, None] | np.isnan(self.axis_values[lines]), 0.0,
+                        np.nan_to_num(self.axis_values[lines]))
+        xy = np.where(step[:, :2] != 0, self.pre[lines, :2] + step[:, :2] * (repetition[:, None] + 1),
+                      self.post[lines, :2])
+        xy_before = np.where(repetition[:, None] > 0, np.roll(xy, 1, axis=0), self.pre[lines, :2])
+
+        r_level = self.r_level[hole]
+        bottom, back = self.bottom_level[hole], self.return_level[hole]
+        z_before = np.where(repetition > 0, back, self.pre[lines, 2])
+        cycle = self.cycle[lines]
+        d_clear, d_retract = self.config['peck_clearance'], self.config['peck_retract']
+
+        peck = np.nan_to_num(self.peck[lines])
+        pecking = np.isin(cycle, (73, 83)) & (peck > 0)
+        pecks = np.ones(lines.size, dtype=np.int64)
+        pecks[pecking] = np.maximum(np.ceil((r_level - bottom)[pecking] / peck[pecking]), 1)
+        full_return = cycle == 83
+        tapping = cycle == 84
+        extra = tapping & (back != r_level)
+
+        # 每个孔的段：定位、快速到R点，每次啄钻[快速接近(G83第2次起)、切削、回退(最后一次除外)]，返回，(G84)回初始平面
+        # 第k次啄钻的切削段在孔内的序号为 2 + 2k + (G83时再加k)
+        size = 2 + 2 * pecks + np.where(full_return, pecks - 1, 0) + extra
+        first = np.cumsum(size) - size
+        total = int(size.sum())
+        # X/Y在一个孔内不变，只需逐段确定Z的起止和段类型
+        out_kind = np.full(total, KIND_RAPID, dtype=np.uint8)
+        z_start = np.empty(total)
+        z_end = np.empty(total)
+        out_dwell = np.zeros(total)
+        z_start[first] = z_before
+        z_end[first] = z_before
+        z_start[first + 1] = z_before
+        z_end[first + 1] = r_level
+
+        owner = np.repeat(np.arange(lines.size), pecks)
+        k = np.arange(owner.size) - np.repeat(np.cumsum(pecks) - pecks, pecks)
+        last = k == pecks[owner] - 1
+        o_r, o_bottom, o_peck = r_level[owner], bottom[owner], peck[owner]
+        depth = np.where(last, o_bottom, np.maximum(o_r - (k + 1) * o_peck, o_bottom))
+        previous = np.maximum(o_r - k * o_peck, o_bottom)
+        o_full = full_return[owner]
+        feed_start = np.where(k == 0, o_r, np.minimum(previous + np.where(o_full, d_clear, d_retract), o_r))
+        cut = first[owner] + 2 + 2 * k + np.where(o_full, k, 0)
+
+        out_kind[cut] = KIND_LINEAR
+        z_start[cut] = feed_start
+        z_end[cut] = depth
+        out_dwell[cut[last]] = self.cycle_dwell[lines]
+        approach = cut[(k > 0) & o_full]
+        z_start[approach - 1] = o_r[(k > 0) & o_full]
+        z_end[approach - 1] = z_start[approach]
+        retreat = ~last
+        z_start[cut[retreat] + 1] = depth[retreat]
+        z_end[cut[retreat] + 1] = np.where(o_full, o_r, depth + d_retract)[retreat]
+
+        # 返回：G84以进给退回R点，其余快速回到返回平面
+        back_row = first + size - 1 - extra
+        out_kind[back_row[tapping]] = KIND_LINEAR
+        z_start[back_row] = bottom
+        z_end[back_row] = np.where(tapping, r_level, back)
+        z_start[back_row[extra] + 1] = r_level[extra]
+        z_end[back_row[extra] + 1] = back[extra]
+
+        x_end = np.repeat(xy[:, 0], size)
+        y_end = np.repeat(xy[:, 1], size)
+        x_start = x_end.copy()
+        y_start = y_end.copy()
+        x_start[first] = xy_before[:, 0]
+        y_start[first] = xy_before[:, 1]
+
+        # 去掉长度为零且不带暂停的段（如G99第二个孔从R点出发时的下降）
+        keep = (z_start != z_end) | (x_start != x_end) | (y_start != y_end) | (out_dwell > 0)
+        start = np.column_stack([x_start[keep], y_start[keep], z_start[keep]])
+        end = np.column_stack([x_end[keep], y_end[keep], z_end[keep]])
+        return self._part(np.repeat(lines, size)[keep], out_kind[keep], start, end,
+                          dwell=out_dwell[keep], cycle=np.repeat(cycle, size)[keep])
+
+
+# 创建全局解释器实例
+nc_interpreter = FANUCInterpreter()
+
+
+def interpret_nc_program(program: ProgramLike) -> Dict:
+    """
+    执行NC程序并返回运动段
+
+    Args:
+        program: NC程序文本或地址字表
+
+    Returns:
+        Dict: 执行结果，见 FANUCInterpreter.run
+    """
+    return nc_interpreter.run(program)
+
+
+def same_motion(before: ProgramLike, after: ProgramLike, tolerance: float) -> bool:
+    """
+    比较两个程序执行后的运动段是否一致
+
+    不比较行号，零长度的移动不计（删除未改变的坐标或拆分程序段后会出现或消失）；
+    坐标、圆心、进给、转速和暂停时间允许tolerance的误差，类型、刀具、循环和冷却液必须相同
+
+    Args:
+        before: 原程序
+        after: 改写后的程序
+        tolerance: 数值允许误差
+
+    Returns:
+        bool: 运动一致时为True
+    """
+    def moving(segments: np.ndarray) -> np.ndarray:
+        return np.flatnonzero((segments['length'] > 0) | (segments['kind'] == KIND_DWELL) | (segments['dwell'] > 0))
+
+    old = nc_interpreter.run(before)['segments']
+    new = nc_interpreter.run(after)['segments']
+    old_rows, new_rows = moving(old), moving(new)
+    if old_rows.size != new_rows.size:
+        return False
+    for name in ('kind', 'tool', 'cycle', 'coolant'):
+        if not np.array_equal(old[name][old_rows], new[name][new_rows]):
+            return False
+    for name in ('start', 'end', 'center', 'feed', 'spindle', 'dwell'):
+        a, b = old[name][old_rows], new[name][new_rows]
+        nan = np.isnan(a)
+        if not np.array_equal(nan, np.isnan(b)) or np.any(np.abs(a[~nan] - b[~nan]) > tolerance):
+            return False
+    return True
@@ -0,0 +1,408 @@
+"""
+NC程序分词器
+一次扫描把FANUC NC程序切分成按数组存放的地址字表（地址字母、数值、所在行、数值在原文中的位置）
+和按行存放的程序段信息（空行、首字符、注释范围、是否含无法识别的内容），
+供NC验证器和优化器共用，避免每条规则各自拆分程序、逐行跑正则
+"""
+import re
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+CHUNK_BYTES = 1 << 20  # 按约1MB的整行分块扫描，限制临时数组的内存占用
+
+_SPACE = np.zeros(256, dtype=bool)
+_SPACE[[9, 11, 12, 13, 32]] = True  # 制表符、回车等视同空格
+
+
+# 用户宏程序B：表达式由变量、数值、运算符、方括号、函数和比较/逻辑运算组成（空白已去掉）
+_MACRO_EXPRESSION = re.compile(
+    r'(?:#\d+|\d+\.?\d*|\.\d+|[-+*/\[\]]|SIN|COS|TAN|ASIN|ACOS|ATAN|SQRT|ABS|BIN|BCD|ROUND|FIX|FUP|LN|EXP|POW'
+    r'|EQ|NE|GT|GE|LT|LE|AND|OR|XOR|MOD)*')
+_MACRO_ASSIGNMENT = re.compile(r'#\d+=(.+)')
+_MACRO_WHILE = re.compile(r'WHILE(\[.*\])DO\d+')
+_MACRO_IF = re.compile(r'IF(\[.*\])(?:THEN(#\d+=.+)|GOTO\d+)')
+_MACRO_JUMP = re.compile(r'(?:END|GOTO)\d+')
+# 地址字的值可以是数值、（带符号的）变量或方括号表达式
+_MACRO_WORD = re.compile(r'[A-Z](?:[+-]?\d*\.?\d+\.?|[+-]?#\d+|(?=\[))')
+
+
+def _macro_expression(expression: str) -> bool:
+    """表达式只含宏程序B的记号，且方括号配对"""
+    if not _MACRO_EXPRESSION.fullmatch(expression):
+        return False
+    depth = 0
+    for char in expression:
+        depth += (char == '[') - (char == ']')
+        if depth < 0:
+            return False
+    return depth == 0
+
+
+def _bracket_end(code: str, start: int) -> int:
+    """code[start]为'['时返回配对的']'之后的位置，没有配对时返回-1"""
+    depth = 0
+    for index in range(start, len(code)):
+        depth += (code[index] == '[') - (code[index] == ']')
+        if depth == 0:
+            return index + 1
+    return -1
+
+
+def is_macro_statement(code: str) -> bool:
+    """
+    判断一行（已去掉注释）是否为合法的用户宏程序B语句
+
+    变量赋值（#1=#2+1）、WHILE [...] DOn / ENDn、IF [...] THEN / GOTOn，以及地址值为变量或
+    方括号表达式的程序段（X[#500+#508*#502] Y#501）
+    """
+    code = re.sub(r'\s+', '', code).upper()
+    code = re.sub(r'^N\d+', '', code)
+    if not code or not ('#' in code or '[' in code or _MACRO_JUMP.fullmatch(code)):
+        return False
+    if _MACRO_JUMP.fullmatch(code):
+        return True
+    match = _MACRO_ASSIGNMENT.fullmatch(code)
+    if match:
+        return _macro_expression(match.group(1))
+    match = _MACRO_WHILE.fullmatch(code)
+    if match:
+        return _macro_expression(match.group(1))
+    match = _MACRO_IF.fullmatch(code)
+    if match:
+        return _macro_expression(match.group(1)) and (match.group(2) is None or is_macro_statement(match.group(2)))
+    index = 0
+    while index < len(code):
+        word = _MACRO_WORD.match(code, index)
+        if not word:
+            return False
+        index = word.end()
+        if index < len(code) and code[index] == '[' and word.end() == word.start() + 1:
+            end = _bracket_end(code, index)
+            if end < 0 or not _macro_expression(code[index:end]):
+                return False
+            index = end
+        elif word.end() == word.start() + 1:
+            return False
+    return True
+
+
+def _parse_code(code: str) -> Tuple[int, float]:
+    """把'G21'、'M30'这样的指令拆成 (地址字母的字节值, 数值)"""
+    code = code.strip().upper()
+    return ord(code[0]), float(code[1:])
+
+
+class NCProgramTable:
+    """
+    NC程序的地址字表
+
+    地址字按在程序中出现的顺序存放：word_letter为大写地址字母的字节值，word_value为数值
+    （地址后没有合法数值时为NaN），word_line为所在行号（从0开始，含空行），
+    word_num_start/word_num_end为数值在UTF-8编码原文中的字节范围。
+    按行存放：line_word_start（第i行的地址字为 [line_word_start[i], line_word_start[i+1])），
+    blank（空行）、invalid（含无法识别的内容）、
+    comment_start/comment_end（注释在行内的字节范围，无注释为-1）。
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.data = text.encode('utf-8')
+        chunks = []
+        line_base = 0
+        start = 0
+        size = len(self.data)
+        while True:
+            end = self.data.find(b'\n', start + CHUNK_BYTES) if size - start > CHUNK_BYTES else -1
+            last = end < 0
+            end = size if last else end + 1
+            chunk = self._scan(self.data[start:end], start, line_base, last)
+            chunks.append(chunk)
+            line_base += len(chunk['blank'])
+            start = end
+            if last:
+                break
+
+        def join(name):
+            return np.concatenate([chunk[name] for chunk in chunks])
+
+        self.n_lines = line_base
+        self.word_letter = join('word_letter')
+        self.word_value = join('word_value')
+        self.word_line = join('word_line')
+        self.word_num_start = join('word_num_start')
+        self.word_num_end = join('word_num_end')
+        self.blank = join('blank')
+        self.invalid = join('invalid')
+        self.comment_start = join('comment_start')
+        self.comment_end = join('comment_end')
+        self.line_offsets = np.append(join('line_start'), size + 1)  # 第i行的字节范围为 [offsets[i], offsets[i+1]-1)
+        self.line_word_start = np.searchsorted(self.word_line, np.arange(self.n_lines + 1))
+
+    @staticmethod
+    def _scan(chunk: bytes, byte_base: int, line_base: int, last: bool) -> Dict[str, np.ndarray]:
+        """扫描由整行组成的一块字节，返回该块的地址字和行信息（位置和行号已加上块的偏移）"""
+        a = np.frombuffer(chunk, dtype=np.uint8)
+        n = a.size
+        is_nl = a == 10
+        nl_pos = np.flatnonzero(is_nl).astype(np.int32)
+        n_lines = nl_pos.size + (1 if last else 0)
+        line_start = np.concatenate(([0], nl_pos + 1))[:n_lines].astype(np.int32)
+        line_of = np.cumsum(is_nl, dtype=np.int32)
+        line_of -= is_nl
+
+        # 注释：括号内（不跨行、不嵌套，缺少右括号时到行尾）以及分号到行尾，用差分数组标记范围
+        line_end = np.append(nl_pos, np.int32(n))
+        opens = np.flatnonzero(a == 40).astype(np.int32)
+        closes = np.flatnonzero(a == 41).astype(np.int32)
+        semis = np.flatnonzero(a == 59).astype(np.int32)
+        open_line_end = line_end[np.searchsorted(nl_pos, opens)]
+        close_after = np.append(closes, np.int32(n))[np.searchsorted(closes, opens)]
+        span_end = np.where(close_after < open_line_end, close_after + 1, open_line_end)
+        span_start = np.concatenate((opens, semis))
+        span_end = np.concatenate((span_end, line_end[np.searchsorted(nl_pos, semis)]))
+        if span_start.size:
+            marks = np.bincount(span_start, minlength=n + 1) - np.bincount(span_end, minlength=n + 1)
+            comment = np.cumsum(marks[:n]) > 0
+        else:
+            comment = np.zeros(n, dtype=bool)
+        space = _SPACE[a]
+
+        # 有效代码字节（去掉空白、注释和换行）压成一个流，地址字母与数值之间的空白被忽略
+        sel = np.flatnonzero(~(comment | space | is_nl))
+        c = a[sel]
+        cl = line_of[sel]
+        m = c.size
+        up = c & 0xDF
+        is_letter = (up >= 65) & (up <= 90)
+        is_digit = (c >= 48) & (c <= 57)
+        is_dot = c == 46
+        is_sign = (c == 43) | (c == 45)
+        is_num = is_digit | is_dot | is_sign
+        same_prev = np.zeros(m, dtype=bool)
+        same_prev[1:] = cl[1:] == cl[:-1]
+        num_prev = np.zeros(m, dtype=bool)
+        num_prev[1:] = is_num[:-1]
+        run_start = is_num & ~(num_prev & same_prev)
+        num_next = np.zeros(m, dtype=bool)
+        num_next[:-1] = is_num[1:] & same_prev[1:]
+        run_last = is_num & ~num_next
+        starts = np.flatnonzero(run_start)
+        ends = np.flatnonzero(run_last) + 1
+
+        # 数值串必须形如 [+-]数字[.数字]，且紧跟在同一行的地址字母之后
+        run_of = np.cumsum(run_start, dtype=np.int32) - 1
+        dots = np.bincount(run_of[is_dot], minlength=starts.size)
+        signs = np.bincount(run_of[is_sign], minlength=starts.size)
+        digits = ends - starts - dots - signs
+        valid = (digits >= 1) & (dots <= 1) & (signs == is_sign[starts])
+        attached = np.zeros(starts.size, dtype=bool)
+        inner = starts > 0
+        attached[inner] = is_letter[starts[inner] - 1] & same_prev[starts[inner]]
+        parsed = valid & attached
+
+        char_parsed = np.zeros(m, dtype=bool)
+        char_parsed[is_num] = parsed[run_of[is_num]]
+        buffer = np.full(m, 32, dtype=np.uint8)
+        buffer[char_parsed] = c[char_parsed]
+        numbers = np.fromstring(buffer.tobytes(), dtype=np.float64, sep=' ') if parsed.any() else np.empty(0)
+
+        letters = np.flatnonzero(is_letter)
+        following = np.minimum(letters + 1, max(m - 1, 0))
+        has_value = (letters + 1 < m) & run_start[following] & same_prev[following]
+        run_index = run_of[following[has_value]]
+        has_value[has_value] = parsed[run_index]
+        run_index = run_of[following[has_value]]
+        values = np.full(letters.size, np.nan)
+        values[has_value] = numbers[(np.cumsum(parsed) - 1)[run_index]]
+        num_start = sel[letters] + 1
+        num_end = num_start.copy()
+        num_start[has_value] = sel[following[has_value]]
+        num_end[has_value] = sel[ends[run_index] - 1] + 1
+
+        # 无法识别的内容：非地址字母/数值/%的字符、没有合法数值的地址字母、未依附地址的数值串
+        bad = ~(is_letter | is_num | (c == 37)) | (is_num & ~char_parsed)
+        bad[letters[~has_value]] = True
+        invalid = np.bincount(cl[bad], minlength=n_lines).astype(bool)[:n_lines]
+
+        # 注释范围按行汇总（同一行有多段注释时取第一段的开始和最后一段的结束）
+        comment_start = np.full(n_lines, -1, dtype=np.int32)
+        comment_end = np.full(n_lines, -1, dtype=np.int32)
+        if span_start.size:
+            span_line = line_of[span_start]
+            first_span = np.full(n_lines, n, dtype=np.int32)
+            np.minimum.at(first_span, span_line, span_start)
+            np.maximum.at(comment_end, span_line, span_end)
+            commented = comment_end >= 0
+            comment_start[commented] = first_span[commented] - line_start[commented]
+            comment_end[commented] -= line_start[commented]
+        blank = (np.bincount(cl, minlength=n_lines)[:n_lines] == 0) & (comment_start < 0)
+
+        return {
+            'word_letter': up[letters],
+            'word_value': values,
+            'word_line': cl[letters] + line_base,
+            'word_num_start': num_start + byte_base,
+            'word_num_end': num_end + byte_base,
+            'blank': blank,
+            'invalid': invalid,
+            'comment_start': comment_start,
+            'comment_end': comment_end,
+            'line_start': line_start + byte_base
+        }
+
+    @cached_property
+    def lines(self) -> List[str]:
+        """按换行拆分的原始各行（与行号一一对应）"""
+        return self.text.split('\n')
+
+    @cached_property
+    def macro(self) -> np.ndarray:
+        """每行是否为用户宏程序B语句（分词器不能切分为地址字、但符合宏程序语法的行）"""
+        mask = np.zeros(self.n_lines, dtype=bool)
+        for line in np.flatnonzero(self.invalid):
+            code = self.data[self.line_offsets[line]:self.line_offsets[line + 1] - 1]
+            if self.comment_start[line] >= 0:
+                code = code[:self.comment_start[line]] + code[self.comment_end[line]:]
+            mask[line] = is_macro_statement(code.decode('utf-8', 'replace'))
+        return mask
+
+    @cached_property
+    def first_char(self) -> np.ndarray:
+        """每行去掉行首空白后的第一个字符（空行为空字符串）"""
+        return np.array([line.lstrip()[:1] for line in self.lines], dtype='<U1')
+
+    @cached_property
+    def nonblank(self) -> np.ndarray:
+        """非空行的行号"""
+        return np.flatnonzero(~self.blank)
+
+    def head_stop(self, count: int) -> int:
+        """前count个非空行的结束行号（不含），用于只检查程序开头的规则"""
+        if count <= 0:
+            return 0
+        return int(self.nonblank[count - 1]) + 1 if self.nonblank.size >= count else self.n_lines
+
+    @cached_property
+    def main_stop(self) -> int:
+        """主程序的结束行号（不含）：M02/M30之后第一个以程序号O开头的行（附在后面的子程序），没有时为总行数"""
+        ends = np.flatnonzero(self.lines_with(['M02', 'M30']))
+        if ends.size == 0 or self.word_letter.size == 0:
+            return self.n_lines
+        first_word = self.line_word_start[:-1]
+        has_words = first_word < self.line_word_start[1:]
+        first_letter = self.word_letter[np.minimum(first_word, self.word_letter.size - 1)]
+        headers = np.flatnonzero(has_words & (first_letter == ord('O')))
+        headers = headers[headers > ends[0]]
+        return int(headers[0]) if headers.size else self.n_lines
+
+    def tail_start(self, count: int) -> int:
+        """主程序最后count个非空行的起始行号，用于只检查程序结尾的规则（不含附在后面的子程序）"""
+        if count <= 0:
+            return self.n_lines
+        nonblank = self.nonblank[self.nonblank < self.main_stop]
+        return int(nonblank[-count]) if nonblank.size >= count else 0
+
+    def _words(self, start: int, stop: Optional[int]) -> slice:
+        stop = self.n_lines if stop is None else min(stop, self.n_lines)
+        return slice(int(self.line_word_start[start]), int(self.line_word_start[max(stop, start)]))
+
+    def code_mask(self, codes: Iterable[str], start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """行范围 [start, stop) 内的地址字中属于codes（如'G21'、'M30'）的掩码"""
+        words = self._words(start, stop)
+        letters, values = self.word_letter[words], self.word_value[words]
+        mask = np.zeros(letters.size, dtype=bool)
+        for letter, value in map(_parse_code, codes):
+            mask |= (letters == letter) & (values == value)
+        return mask
+
+    def present_codes(self, codes: Iterable[str], start: int = 0, stop: Optional[int] = None) -> Set[str]:
+        """返回codes中在行范围 [start, stop) 内出现过的指令"""
+        words = self._words(start, stop)
+        letters, values = self.word_letter[words], self.word_value[words]
+        return {code for code in codes
+                if np.any((letters == _parse_code(code)[0]) & (values == _parse_code(code)[1]))}
+
+    def lines_with(self, codes: Iterable[str], start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """每行是否含有codes中任一指令（长度为行数的布尔数组）"""
+        words = self._words(start, stop)
+        mask = np.zeros(self.n_lines, dtype=bool)
+        mask[self.word_line[words][self.code_mask(codes, start, stop)]] = True
+        return mask
+
+    def letter_mask(self, letter: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """行范围 [start, stop) 内地址字母为letter的地址字掩码"""
+        return self.word_letter[self._words(start, stop)] == ord(letter.upper())
+
+    def values(self, letter: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """行范围 [start, stop) 内地址letter的数值（按出现顺序，不含没有数值的地址字）"""
+        values = self.word_value[self._words(start, stop)][self.letter_mask(letter, start, stop)]
+        return values[~np.isnan(values)]
+
+    def letter_lines(self, letter: str) -> np.ndarray:
+        """地址letter的每个地址字所在的行号"""
+        return self.word_line[self.word_letter == ord(letter.upper())]
+
+    def codes(self, letters: str = 'GM') -> Set[str]:
+        """程序中出现过的指令名称集合（如'G01'、'M30'，整数两位补零）"""
+        mask = np.isin(self.word_letter, [ord(letter) for letter in letters.upper()])
+        pairs = np.unique(np.stack([self.word_letter[mask], self.word_value[mask]], axis=1), axis=0)
+        return {f"{chr(int(letter))}{value:02g}" for letter, value in pairs if not np.isnan(value)}
+
+    def word_texts(self, line: int) -> List[str]:
+        """第line行的各地址字原文（如'X10.'、'Z-5.0'），地址字母统一为大写"""
+        texts = []
+        for k in range(int(self.line_word_start[line]), int(self.line_word_start[line + 1])):
+            number = self.data[self.word_num_start[k]:self.word_num_end[k]].decode('ascii', 'ignore')
+            texts.append(chr(self.word_letter[k]) + "".join(number.split()))
+        return texts
+
+    def normalized_lines(self) -> List[str]:
+        """各行去掉首尾空白、行内连续空白合并为一个空格后的文本"""
+        a = np.frombuffer(self.data, dtype=np.uint8)
+        space = _SPACE[a]
+        keep = ~space
+        # 每段连续空白只在前后都是行内内容时保留第一个字节（替换为空格）
+        run_first = np.flatnonzero(space & ~np.concatenate(([False], space[:-1])))
+        run_last = np.flatnonzero(space & ~np.concatenate((space[1:], [False])))
+        inner = (run_first > 0) & (run_last + 1 < a.size)
+        run_first, run_last = run_first[inner], run_last[inner]
+        run_first = run_first[(a[run_first - 1] != 10) & (a[run_last + 1] != 10)]
+        keep[run_first] = True
+        out = a[keep].copy()
+        out[space[keep]] = 32
+        return out.tobytes().decode('utf-8', 'replace').split('\n')
+
+
+ProgramLike = Union[str, List[str], NCProgramTable]
+
+
+def tokenize(program: str) -> NCProgramTable:
+    """
+    把NC程序切分成地址字表
+
+    Args:
+        program: NC程序文本
+
+    Returns:
+        NCProgramTable: 地址字表
+    """
+    return NCProgramTable(program)
+
+
+def as_table(program: ProgramLike) -> NCProgramTable:
+    """
+    把程序文本、行列表或已有的地址字表统一为地址字表
+
+    Args:
+        program: NC程序文本、行列表或NCProgramTable
+
+    Returns:
+        NCProgramTable: 地址字表
+    """
+    if isinstance(program, NCProgramTable):
+        return program
+    if isinstance(program, str):
+        return NCProgramTable(program)
+    return NCProgramTable('\n'.join(program))
@@ -3,10 +3,15 @@ NC程序验证和优化模块
 验证生成的NC程序的正确性，并进行优化
 """
 import logging
-import re
+import time
 from typing import Dict, List, Tuple, Optional
 from pathlib import Path
 
+import numpy as np
+
+from src.config import NC_COMPACTION_CONFIG
+from .nc_tokenizer import NCProgramTable, ProgramLike, as_table
+
 class NCValidator:
     """
     NC程序验证器
@@ -22,26 +27,18 @@ class NCValidator:
             'safety': ['G54', 'G00', 'M03', 'M05', 'M08', 'M09', 'M30'],
             'modal': ['G00', 'G01', 'G02', 'G03', 'G80', 'G81', 'G82', 'G83', 'G84']
         }
-        
-        # 定义常见的编程错误模式
-        self.error_patterns = [
-            r'G0*[1-9]\d*.*G0*[1-9]\d*',  # 两个移动指令连续出现
-            r'F0*\.?\d*\.',  # 进给率为0或格式错误
-            r'S0*\.?\d*\.',  # 主轴转速为0或格式错误
-            r'Z-?\d+\.?\d*\s*Z-?\d+\.?\d*',  # Z轴坐标重复
-        ]
     
-    def validate_nc_program(self, nc_program: str) -> Dict:
+    def validate_nc_program(self, nc_program: ProgramLike) -> Dict:
         """
         验证NC程序
         
         Args:
-            nc_program: NC程序代码
+            nc_program: NC程序代码（文本或已切分好的地址字表）
             
         Returns:
             Dict: 验证结果
         """
-        lines = [line.strip() for line in nc_program.split('\n') if line.strip()]
+        table = as_table(nc_program)
         
         validation_result = {
             'is_valid': True,
@@ -53,146 +50,148 @@ class NCValidator:
         }
         
         # 检查必需的初始化指令
-        self._check_initialization_commands(lines, validation_result)
+        self._check_initialization_commands(table, validation_result)
         
         # 检查程序结束指令
-        self._check_program_end(lines, validation_result)
+        self._check_program_end(table, validation_result)
         
         # 检查语法错误
-        self._check_syntax_errors(lines, validation_result)
+        self._check_syntax_errors(table, validation_result)
         
         # 检查安全相关问题
-        self._check_safety_issues(lines, validation_result)
+        self._check_safety_issues(table, validation_result)
         
         # 计算完整性分数
-        validation_result['completeness_score'] = self._calculate_completeness_score(lines)
+        validation_result['completeness_score'] = self._calculate_completeness_score(table)
         
         # 计算安全性分数
-        validation_result['safety_score'] = self._calculate_safety_score(lines)
+        validation_result['safety_score'] = self._calculate_safety_score(table)
         
         # 总体有效性判断
         validation_result['is_valid'] = len(validation_result['errors']) == 0
         
         return validation_result
     
-    def _check_initialization_commands(self, lines: List[str], result: Dict):
+    def _check_initialization_commands(self, table: NCProgramTable, result: Dict):
         """检查初始化指令"""
-        program_start = lines[:20]  # 检查前20行
-        
-        missing_init = []
-        for cmd in self.critical_commands['initialization']:
-            if not any(cmd in line for line in program_start):
-                missing_init.append(cmd)
+        found = table.present_codes(self.critical_commands['initialization'],
+                                    stop=table.head_stop(20))  # 检查前20行
+        missing_init = [cmd for cmd in self.critical_commands['initialization'] if cmd not in found]
         
         if missing_init:
             result['warnings'].append(f"缺少初始化指令: {', '.join(missing_init)}")
     
-    def _check_program_end(self, lines: List[str], result: Dict):
+    def _check_program_end(self, table: NCProgramTable, result: Dict):
         """检查程序结束指令"""
-        program_end = lines[-10:]  # 检查最后10行
-        
-        has_end = any('M30' in line or 'M02' in line for line in program_end)
+        has_end = table.present_codes(['M30', 'M02'], start=table.tail_start(10))  # 检查最后10行
         if not has_end:
             result['errors'].append("程序缺少结束指令 (M30 或 M02)")
     
-    def _check_syntax_errors(self, lines: List[str], result: Dict):
+    def _check_syntax_errors(self, table: NCProgramTable, result: Dict):
         """检查语法错误"""
-        for i, line in enumerate(lines):
-            # 检查是否有重复的坐标指令
-            if re.search(r'X-?\d+\.?\d*\s*X-?\d+\.?\d*', line):
-                result['errors'].append(f"第{i+1}行: X坐标重复定义")
-            
-            if re.search(r'Y-?\d+\.?\d*\s*Y-?\d+\.?\d*', line):
-                result['errors'].append(f"第{i+1}行: Y坐标重复定义")
-            
-            if re.search(r'Z-?\d+\.?\d*\s*Z-?\d+\.?\d*', line):
-                result['errors'].append(f"第{i+1}行: Z坐标重复定义")
-            
-            # 检查进给率和转速是否为正数
-            f_match = re.search(r'F(\d+\.?\d*)', line)
-            if f_match:
-                try:
-                    f_value = float(f_match.group(1))
-                    if f_value <= 0:
-                        result['errors'].append(f"第{i+1}行: 进给率F值应为正数")
-                except ValueError:
-                    result['errors'].append(f"第{i+1}行: 进给率F格式错误")
-            
-            s_match = re.search(r'S(\d+\.?\d*)', line)
-            if s_match:
-                try:
-                    s_value = float(s_match.group(1))
-                    if s_value <= 0:
-                        result['errors'].append(f"第{i+1}行: 主轴转速S值应为正数")
-                except ValueError:
-                    result['errors'].append(f"第{i+1}行: 主轴转速S格式错误")
+        # 行号按非空行计数
+        rank = np.cumsum(~table.blank) - 1
+        letters, values, word_line = table.word_letter, table.word_value, table.word_line
+        found_lines = []
+        found_kinds = []
+        
+        # 检查是否有重复的坐标指令（同一行同一坐标出现两次以上）
+        for kind, axis in enumerate('XYZ'):
+            counts = np.bincount(word_line[letters == ord(axis)], minlength=table.n_lines)
+            repeated = np.flatnonzero(counts > 1)
+            found_lines.append(repeated)
+            found_kinds.append(np.full(repeated.size, kind))
+        
+        # 检查进给率和转速是否为正数
+        for kind, letter in ((3, 'F'), (4, 'S')):
+            not_positive = np.unique(word_line[(letters == ord(letter)) & (values <= 0)])
+            found_lines.append(not_positive)
+            found_kinds.append(np.full(not_positive.size, kind))
+        
+        messages = ["X坐标重复定义", "Y坐标重复定义", "Z坐标重复定义",
+                    "进给率F值应为正数", "主轴转速S值应为正数"]
+        error_lines = np.concatenate(found_lines)
+        error_kinds = np.concatenate(found_kinds)
+        for k in np.lexsort((error_kinds, error_lines)):
+            result['errors'].append(f"第{rank[error_lines[k]] + 1}行: {messages[error_kinds[k]]}")
     
-    def _check_safety_issues(self, lines: List[str], result: Dict):
+    def _check_safety_issues(self, table: NCProgramTable, result: Dict):
         """检查安全问题"""
+        present = table.present_codes(['G49', 'G28'])
+        
         # 检查是否有适当的刀具补偿取消
-        has_tool_comp_cancel = any('G49' in line for line in lines)
-        if not has_tool_comp_cancel:
+        if 'G49' not in present:
             result['warnings'].append("程序中缺少刀具长度补偿取消指令 (G49)")
         
         # 检查是否有适当的回零操作
-        has_return_home = any('G28' in line for line in lines)
-        if not has_return_home:
+        if 'G28' not in present:
             result['warnings'].append("程序中缺少回参考点指令 (G28)")
     
-    def _calculate_completeness_score(self, lines: List[str]) -> float:
+    def _calculate_completeness_score(self, table: NCProgramTable) -> float:
         """计算完整性分数"""
         score = 0.0
         max_score = 5.0
+        present = table.present_codes(['G40', 'G49', 'G80', 'M03', 'M04', 'M05'])
         
         # 检查是否有初始化
-        if any(cmd in ' '.join(lines[:10]) for cmd in ['G21', 'G90']):
+        if table.present_codes(['G21', 'G90'], stop=table.head_stop(10)):
             score += 1.0
         
         # 检查是否有安全指令
-        if any(cmd in ' '.join(lines) for cmd in ['G40', 'G49', 'G80']):
+        if present & {'G40', 'G49', 'G80'}:
             score += 1.0
         
         # 检查是否有程序结束
-        if any('M30' in line or 'M02' in line for line in lines[-5:]):
+        if table.present_codes(['M30', 'M02'], start=table.tail_start(5)):
             score += 1.0
         
         # 检查是否有刀具选择和调用
-        if any('T' in line and 'M06' in line for line in lines):
+        tool_lines = np.zeros(table.n_lines, dtype=bool)
+        tool_lines[table.letter_lines('T')] = True
+        if np.any(tool_lines & table.lines_with(['M06'])):
             score += 1.0
         
         # 检查是否有主轴控制
-        if any('M03' in line or 'M04' in line for line in lines):
+        if present & {'M03', 'M04'}:
             score += 0.5
-        if any('M05' in line for line in lines):
+        if 'M05' in present:
             score += 0.5
         
         return min(score / max_score, 1.0)
     
-    def _calculate_safety_score(self, lines: List[str]) -> float:
+    def _calculate_safety_score(self, table: NCProgramTable) -> float:
         """计算安全性分数"""
         score = 0.0
         max_score = 4.0
+        rapid_lines = table.lines_with(['G00'])
+        z_lines = np.zeros(table.n_lines, dtype=bool)
+        z_lines[table.letter_lines('Z')] = True
+        high_lines = np.zeros(table.n_lines, dtype=bool)
+        z_mask = table.word_letter == ord('Z')
+        high_lines[table.word_line[z_mask & (table.word_value > 50)]] = True
         
         # 检查是否有安全高度设置
-        if any('G00 Z' in line and float(re.search(r'Z(-?\d+\.?\d*)', line).group(1)) > 50 
-               for line in lines if re.search(r'Z(-?\d+\.?\d*)', line)):
+        if np.any(rapid_lines & high_lines):
             score += 1.0
-        elif any('G00' in line and 'Z' in line for line in lines):
+        elif np.any(rapid_lines & z_lines):
             # 如果有Z轴移动，假设有安全高度
             score += 0.5
         
         # 检查是否有冷却液控制
-        if any('M08' in line and 'M09' in line for line in lines):
+        coolant_on = table.lines_with(['M08'])
+        if np.any(coolant_on & table.lines_with(['M09'])):
             score += 1.0
-        elif any('M08' in line for line in lines):
+        elif coolant_on.any():
             score += 0.5
         
+        present = table.present_codes(['G28', 'G49'])
+        
         # 检查是否有回零操作
-        if any('G28' in line for line in lines):
+        if 'G28' in present:
             score += 1.0
         
         # 检查是否有刀具补偿取消
-        if any('G49' in line for line in lines):
+        if 'G49' in present:
             score += 1.0
         
         return min(score / max_score, 1.0)
@@ -203,182 +202,441 @@ class NCOptimizer:
     优化NC程序的效率和性能
     """
     
+    # 移动类指令：不参与重复指令的去除
+    MOTION_CODES = ['G00', 'G01', 'G02', 'G03', 'G81', 'G82', 'G83', 'G84']
+    # 改变刀具位置的指令：之后的指令不再视为重复
+    POSITION_CODES = ['G00', 'G01', 'G02', 'G03']
+    # 主要命令整数编码的取值范围
+    CODE_SPAN = 2 * 10 ** 9
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
     
-    def optimize_nc_program(self, nc_program: str) -> str:
+    def optimize_nc_program(self, nc_program: ProgramLike) -> str:
         """
         优化NC程序
         
         Args:
-            nc_program: 原始NC程序
+            nc_program: 原始NC程序（文本或已切分好的地址字表）
             
         Returns:
             str: 优化后的NC程序
         """
-        lines = nc_program.split('\n')
+        table = as_table(nc_program)
         
-        # 1. 移除多余的空行和注释
-        optimized_lines = self._remove_excess_whitespace(lines)
+        # 1. 移除多余的空行和空格
+        lines = table.normalized_lines()
+        sequence = self._remove_excess_whitespace(table)
         
         # 2. 优化刀具路径
-        optimized_lines = self._optimize_toolpath(optimized_lines)
+        sequence = self._optimize_toolpath(table, sequence, lines)
         
         # 3. 优化指令顺序
-        optimized_lines = self._optimize_command_order(optimized_lines)
+        sequence = self._optimize_command_order(table, sequence)
         
         # 4. 移除重复指令
-        optimized_lines = self._remove_duplicate_commands(optimized_lines)
+        sequence = self._remove_duplicate_commands(table, sequence)
         
-        return '\n'.join(optimized_lines)
+        return '\n'.join([lines[i] for i in sequence.tolist()])
     
-    def _remove_excess_whitespace(self, lines: List[str]) -> List[str]:
-        """移除多余的空白行和空格"""
-        cleaned_lines = []
-        empty_line_count = 0
-        
-        for line in lines:
-            stripped = line.strip()
-            if not stripped:
-                # 连续多个空行只保留一个
-                if empty_line_count == 0:
-                    cleaned_lines.append('')
-                    empty_line_count += 1
-            else:
-                # 移除行首行尾空格，但保留指令间的必要空格
-                cleaned_lines.append(self._clean_line_whitespace(stripped))
-                empty_line_count = 0
-        
-        return cleaned_lines
-    
-    def _clean_line_whitespace(self, line: str) -> str:
-        """清理行内多余的空格"""
-        # 保留指令和参数之间的单个空格
-        import re
-        # 将多个空格替换为单个空格
-        cleaned = re.sub(r'\s+', ' ', line)
-        # 特别处理坐标值，确保格式正确
-        cleaned = re.sub(r'([XYZIJKFST])(\d)', r'\1 \2', cleaned)
-        return cleaned.strip()
+    def compact_nc_program(self, nc_program: ProgramLike, config: Optional[Dict] = None) -> Tuple[str, Dict]:
+        """
+        压缩NC程序大小（减少程序存储占用和DNC传输时间）
+
+        按模态规则删除重复的模态G代码、重复的F值和未改变的坐标，按配置保留、截短或删除注释，
+        统一数值格式（去掉多余的零，按最小设定单位取整）。verify为真时用解释器重放压缩前后的程序，
+        运动段（类型、起止点、圆心、进给、转速、刀具、循环、暂停）不一致时返回原程序
+
+        Args:
+            nc_program: NC程序（文本或已切分好的地址字表）
+            config: 覆盖 NC_COMPACTION_CONFIG 中的部分参数
+
+        Returns:
+            Tuple[str, Dict]: 压缩后的程序，以及统计信息
+                bytes_before、bytes_after、reduction、lines_before、lines_after、
+                words_removed、comments_removed、verified、seconds
+        """
+        began = time.perf_counter()
+        settings = dict(NC_COMPACTION_CONFIG)
+        settings.update(config or {})
+        table = as_table(nc_program)
+
+        compactor = _ModalCompactor(table, settings)
+        lines = compactor.run()
+        compacted = '\n'.join(lines)
+
+        verified = None
+        if settings['verify']:
+            verified = self._same_motion(table, compacted, 0.5 * 10 ** -compactor.places + 1e-9)
+            if not verified:
+                self.logger.warning("压缩后的程序运动轨迹与原程序不一致，返回原程序")
+                compacted, lines = table.text, table.lines
+
+        bytes_before = len(table.data)
+        bytes_after = len(compacted.encode('utf-8'))
+        report = {
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'reduction': (bytes_before - bytes_after) / bytes_before if bytes_before else 0.0,
+            'lines_before': table.n_lines,
+            'lines_after': len(lines),
+            'words_removed': compactor.words_removed if verified is not False else 0,
+            'comments_removed': compactor.comments_removed if verified is not False else 0,
+            'verified': verified,
+            'seconds': time.perf_counter() - began
+        }
+        self.logger.debug(f"NC程序压缩: {bytes_before} -> {bytes_after} 字节")
+        return compacted, report
+
+    def _same_motion(self, before: NCProgramTable, after: str, tolerance: float) -> bool:
+        """用解释器执行压缩前后的程序，比较运动段（不比较行号，删除坐标后消失的零长度移动不计）"""
+        from .nc_interpreter import same_motion
+
+        try:
+            return same_motion(before, after, tolerance)
+        except Exception as e:
+            self.logger.warning(f"重放NC程序失败: {str(e)}")
+            return False
+
+    def _remove_excess_whitespace(self, table: NCProgramTable) -> np.ndarray:
+        """移除多余的空白行（连续多个空行只保留一个），返回保留的行号"""
+        blank = table.blank
+        previous_blank = np.concatenate(([False], blank[:-1]))
+        return np.flatnonzero(~(blank & previous_blank))
     
-    def _optimize_toolpath(self, lines: List[str]) -> List[str]:
-        """优化刀具路径"""
-        optimized = []
-        
-        for line in lines:
-            # 简单的路径优化：合并连续的快速移动
-            if 'G00' in line and optimized and 'G00' in optimized[-1]:
-                # 如果前一行也是G00，尝试合并坐标
-                prev_line = optimized[-1]
-                if self._can_merge_moves(prev_line, line):
-                    merged = self._merge_moves(prev_line, line)
-                    optimized[-1] = merged
-                    continue
-            
-            optimized.append(line)
+    def _optimize_toolpath(self, table: NCProgramTable, sequence: np.ndarray, lines: List[str]) -> np.ndarray:
+        """
+        优化刀具路径：合并连续的、坐标轴互不重复的快速移动
         
-        return optimized
+        只合并仅由G00和X/Y/Z坐标组成（不含注释）的行，合并后的文本写回lines中第一行的位置
+        """
+        axis_bits = {ord('X'): 1, ord('Y'): 2, ord('Z'): 4}
+        letters = table.word_letter
+        bits = np.zeros(letters.size, dtype=np.int64)
+        for letter, bit in axis_bits.items():
+            bits[letters == letter] = bit
+        word_line = table.word_line
+        n_lines = table.n_lines
+        axis_count = np.bincount(word_line[bits > 0], minlength=n_lines)
+        axis_mask = np.bincount(word_line, weights=bits, minlength=n_lines).astype(np.int64)
+        rapid_count = np.bincount(word_line[table.code_mask(['G00'])], minlength=n_lines)
+        word_count = np.diff(table.line_word_start)
+        popcount = (axis_mask & 1) + ((axis_mask >> 1) & 1) + ((axis_mask >> 2) & 1)
+        pure_rapid = ((rapid_count == 1) & (axis_count >= 1) & (axis_count == popcount)
+                      & (word_count == axis_count + 1) & ~table.invalid & (table.comment_start < 0))
+        
+        pure = pure_rapid[sequence]
+        candidates = np.flatnonzero(pure[:-1] & pure[1:])
+        if candidates.size == 0:
+            return sequence
+        
+        drop = np.zeros(sequence.size, dtype=bool)
+        group_tail = -1
+        group: List[int] = []
+        group_mask = 0
+        
+        def flush():
+            if len(group) > 1:
+                words = [word for line in group for word in table.word_texts(line) if word[0] in 'XYZ']
+                lines[group[0]] = ' '.join(['G00'] + sorted(words, key=lambda word: word[0]))
+        
+        for position in candidates.tolist():
+            if position != group_tail:
+                flush()
+                group = [int(sequence[position])]
+                group_mask = int(axis_mask[group[0]])
+            following = int(sequence[position + 1])
+            if group_mask & int(axis_mask[following]) == 0:
+                # 如果坐标轴互不重复，合并到当前组
+                group.append(following)
+                group_mask |= int(axis_mask[following])
+                drop[position + 1] = True
+                group_tail = position + 1
+        flush()
+        
+        return sequence[~drop]
     
-    def _can_merge_moves(self, line1: str, line2: str) -> bool:
-        """检查两个移动指令是否可以合并"""
-        # 检查是否都是G00指令
-        if 'G00' not in line1 or 'G00' not in line2:
-            return False
-        
-        # 检查是否有重复的坐标轴
-        axes1 = set(re.findall(r'[XYZ]', line1))
-        axes2 = set(re.findall(r'[XYZ]', line2))
-        
-        # 如果有重复的轴，则不能合并
-        return len(axes1.intersection(axes2)) == 0
+    def _optimize_command_order(self, table: NCProgramTable, sequence: np.ndarray) -> np.ndarray:
+        """优化指令顺序：将G43(刀具长度补偿)移到换刀行(T..M06)之后"""
+        tool_lines = np.zeros(table.n_lines, dtype=bool)
+        tool_lines[table.letter_lines('T')] = True
+        tool_change = (tool_lines & table.lines_with(['M06']))[sequence]
+        if not tool_change.any():
+            return sequence
+        
+        has_g43 = table.lines_with(['G43'])
+        order = sequence.tolist()
+        moved_to, moved_from = -1, -1
+        for k in np.flatnonzero(tool_change).tolist():
+            if moved_to < k < moved_from:
+                k += 1  # 上一次移动使这一行后移了一位
+            # 查找后4行内的下一个G43指令
+            hits = [n for n, line in enumerate(order[k + 1:k + 5]) if has_g43[line]]
+            if hits and hits[0] > 0:
+                # 如果G43不在下一行，把它移到换刀行之后
+                j = k + 1 + hits[0]
+                order.insert(k + 1, order.pop(j))
+                moved_to, moved_from = k, j
+        
+        return np.array(order, dtype=sequence.dtype)
     
-    def _merge_moves(self, line1: str, line2: str) -> str:
-        """合并两个移动指令"""
-        import re
-        
-        # 提取所有坐标
-        coords = {}
-        
-        # 从第一行提取坐标
-        for match in re.finditer(r'([XYZ])(-?\d+\.?\d*)', line1):
-            coords[match.group(1)] = match.group(2)
-        
-        # 从第二行提取坐标
-        for match in re.finditer(r'([XYZ])(-?\d+\.?\d*)', line2):
-            coords[match.group(1)] = match.group(2)
-        
-        # 重构指令
-        parts = ['G00']
-        for axis in sorted(coords.keys()):
-            parts.append(f"{axis}{coords[axis]}")
+    def _remove_duplicate_commands(self, table: NCProgramTable, sequence: np.ndarray) -> np.ndarray:
+        """
+        移除重复指令
         
-        return ' '.join(parts)
+        以每行第一个G/M指令为主要命令；两次刀具位置改变之间重复出现的非移动主要命令被移除
+        """
+        main_code = self._extract_main_commands(table)[sequence]
+        exempt = table.lines_with(self.MOTION_CODES)[sequence]
+        moves = table.lines_with(self.POSITION_CODES)[sequence]
+        
+        # 每次移动之后开始新的一段，段内同一主要命令只保留第一次出现
+        segment = np.cumsum(moves) - moves
+        has_main = np.flatnonzero(main_code >= 0)
+        keys = segment[has_main].astype(np.int64) * self.CODE_SPAN + main_code[has_main]
+        first_in_segment = np.zeros(sequence.size, dtype=bool)
+        first_in_segment[has_main[np.unique(keys, return_index=True)[1]]] = True
+        drop = (main_code >= 0) & ~exempt & ~first_in_segment
+        
+        return sequence[~drop]
     
-    def _optimize_command_order(self, lines: List[str]) -> List[str]:
-        """优化指令顺序"""
-        # 确保安全指令在适当位置
-        # 将G43(刀具长度补偿)紧随T代码之后
-        optimized = []
-        
-        for i, line in enumerate(lines):
-            if 'T' in line and 'M06' in line:
-                # 查找下一个G43指令
-                next_g43_idx = -1
-                for j in range(i + 1, min(i + 5, len(lines))):
-                    if 'G43' in lines[j]:
-                        next_g43_idx = j
+    def _extract_main_commands(self, table: NCProgramTable) -> np.ndarray:
+        """每行主要命令（第一个G代码或M代码）的整数编码，没有时为-1"""
+        letters, values = table.word_letter, table.word_value
+        gm = np.flatnonzero(((letters == ord('G')) | (letters == ord('M'))) & ~np.isnan(values))
+        main_code = np.full(table.n_lines, -1, dtype=np.int64)
+        lines = table.word_line[gm]
+        first = gm[np.concatenate(([True], lines[1:] != lines[:-1]))] if gm.size else gm
+        # 数值保留三位小数（如G43.4），M代码编码在G代码之后
+        code = np.round(np.abs(values[first]) * 1000).astype(np.int64) % (self.CODE_SPAN // 2)
+        main_code[table.word_line[first]] = code + (letters[first] == ord('M')) * (self.CODE_SPAN // 2)
+        return main_code
+
+class _ModalCompactor:
+    """
+    按FANUC模态规则逐行压缩程序：删除与当前模态相同的G代码、F值和未改变的坐标，统一数值格式
+
+    各模态状态开始时视为未知（第一次出现的指令都保留）；遇到无法识别的行（宏程序等）、
+    子程序调用、换刀和程序停止后，坐标或全部状态重新视为未知
+    """
+
+    # 只改变模态、重复时可以删除的G代码组（组名 -> 代码）
+    MODAL_GROUPS = {
+        'plane': (17, 18, 19),
+        'units': (20, 21),
+        'distance': (90, 91),
+        'feed_mode': (94, 95),
+        'wcs': (54, 55, 56, 57, 58, 59),
+        'return_level': (98, 99),
+    }
+    # 00组（非模态）指令：所在行的坐标另有含义（如G04 X为暂停时间），不删除坐标
+    NON_MODAL = (4, 9, 10, 11, 27, 28, 29, 30, 31, 37, 39, 52, 53, 60, 65, 92)
+    CYCLES = (73, 74, 76, 81, 82, 83, 84, 85, 86, 87, 88, 89)
+    # 执行后刀具位置可能被改变（换刀、停止后手动移动）或状态不可知（子程序）的M代码
+    POSITION_BARRIERS = (0, 1, 2, 6, 30)
+    STATE_BARRIERS = (98, 99)
+    # 数值为整数的地址（其余地址按小数格式化）
+    INTEGER_ADDRESSES = 'GMTHDSPL'
+    # 程序号、顺序号保留原文
+    VERBATIM_ADDRESSES = 'ON'
+
+    def __init__(self, table: NCProgramTable, config: Dict):
+        self.table = table
+        self.config = config
+        self.places = int(config['decimal_places'])
+        self.words_removed = 0
+        self.comments_removed = 0
+        self._reset_state()
+
+    def _reset_state(self):
+        self.motion: Optional[float] = None
+        self.cycle_active: Optional[bool] = None
+        self.cutter_comp: Optional[float] = None
+        self.length_comp: Optional[float] = None
+        self.groups: Dict[str, Optional[float]] = {name: None for name in self.MODAL_GROUPS}
+        self.feed: Optional[float] = None
+        self.position: List[Optional[float]] = [None, None, None]
+        # 压缩后只剩01组代码的程序段暂不输出，等下一个用到它的程序段再补上（被下一个01组代码覆盖时直接丢弃）
+        self.pending: Optional[float] = None
+
+    def run(self) -> List[str]:
+        table = self.table
+        raw_lines = table.lines
+        letters = table.word_letter.tolist()
+        values = table.word_value.tolist()
+        bounds = table.line_word_start.tolist()
+        invalid = table.invalid.tolist()
+        blank = table.blank.tolist()
+        comment_start = table.comment_start.tolist()
+        comment_end = table.comment_end.tolist()
+
+        output = []
+        for line in range(table.n_lines):
+            if blank[line]:
+                if not self.config['drop_blank_lines']:
+                    output.append('')
+                continue
+            comment = None
+            if comment_start[line] >= 0:
+                data = table.data[table.line_offsets[line]:table.line_offsets[line + 1] - 1]
+                comment = self._comment(data[comment_start[line]:comment_end[line]].decode('utf-8', 'replace'))
+            if invalid[line] or bounds[line] == bounds[line + 1]:
+                # 宏程序等无法识别的行原样保留（只有注释或%的行按注释规则处理）
+                if invalid[line]:
+                    self._flush_pending(output)
+                    output.append(' '.join(raw_lines[line].split()))
+                    self._reset_state()
+                elif comment:
+                    output.append(comment)
+                elif comment is None:
+                    output.append(' '.join(raw_lines[line].split()))
+                continue
+            words = list(zip(letters[bounds[line]:bounds[line + 1]], values[bounds[line]:bounds[line + 1]],
+                             table.word_texts(line)))
+            kept = self._compact_words(words, bool(comment))
+            text = self.config['word_separator'].join(kept)
+            if comment:
+                text = f"{text} {comment}" if text else comment
+            if text:
+                output.append(text)
+        self._flush_pending(output)
+        return output
+
+    def _flush_pending(self, output: List[str]):
+        """把暂存的只含01组代码的程序段单独输出"""
+        if self.pending is not None:
+            output.append(self._format(ord('G'), self.pending, ''))
+            self.motion, self.pending = self.pending, None
+
+    def _comment(self, text: str) -> str:
+        """按配置保留、截短或删除注释（删除时返回空字符串）"""
+        mode = self.config['comments']
+        if mode == 'strip':
+            self.comments_removed += 1
+            return ''
+        if mode == 'shorten' and text.startswith('('):
+            inner = text[1:-1] if text.endswith(')') else text[1:]
+            limit = int(self.config['max_comment_length'])
+            if len(inner) > limit:
+                return f"({inner[:limit].rstrip()})"
+        return text
+
+    def _format(self, letter: int, value: float, raw: str) -> str:
+        """统一数值格式：整数地址去掉小数，小数地址去掉多余的零（没有小数点的原文不改，避免改变数值单位）"""
+        address = chr(letter)
+        if address in self.VERBATIM_ADDRESSES:
+            return raw
+        if address in self.INTEGER_ADDRESSES and value == int(value):
+            if address in 'GM' and not self.config['short_codes']:
+                return f"{address}{int(value):02d}"
+            return f"{address}{int(value)}"
+        if '.' not in raw:
+            return raw
+        text = f"{round(value, self.places):.{self.places}f}".rstrip('0')
+        return f"{address}{'0.' if text == '-0.' else text}"
+
+    def _compact_words(self, words: List[Tuple[int, float, str]], has_comment: bool = False) -> List[str]:
+        G, M, F = ord('G'), ord('M'), ord('F')
+        g_codes = [value for letter, value, _ in words if letter == G]
+        m_codes = [value for letter, value, _ in words if letter == M]
+        non_modal = any(code in self.NON_MODAL for code in g_codes)
+        drop = [False] * len(words)
+        previous_motion = self.motion
+        can_defer = self.cycle_active is False and self.cutter_comp == 40
+
+        flush = None
+        if self.pending is not None:
+            if not any(code in (0, 1, 2, 3) for code in g_codes) and (
+                    not all(chr(letter) in 'FMST' for letter, _, _ in words)
+                    or any(code in self.STATE_BARRIERS for code in m_codes)):
+                # 本段要用到暂存的01组模态，补在本段开头
+                flush = self._format(G, self.pending, '')
+                self.motion, self.pending = self.pending, None
+            elif any(code in (0, 1, 2, 3) for code in g_codes) or any(code in (2, 30) for code in m_codes):
+                # 被本段的01组代码覆盖，或程序结束
+                self.pending = None
+                self.words_removed += 1
+
+        for index, (letter, value, _) in enumerate(words):
+            if letter != G:
+                continue
+            if value in (0, 1, 2, 3):
+                if self.motion == value and self.cycle_active is False:
+                    drop[index] = True
+                self.motion = value
+                self.cycle_active = False
+            elif value in self.CYCLES:
+                self.cycle_active = True
+            elif value == 80:
+                self.cycle_active = False
+            elif value in (40, 41, 42):
+                if value == 40 and self.cutter_comp == 40:
+                    drop[index] = True
+                self.cutter_comp = value
+            elif value in (43, 44, 49):
+                if value == 49 and self.length_comp == 49:
+                    drop[index] = True
+                self.length_comp = value
+            else:
+                for name, codes in self.MODAL_GROUPS.items():
+                    if value in codes:
+                        if self.groups[name] == value:
+                            drop[index] = True
+                        elif name in ('units', 'wcs'):
+                            self.position = [None, None, None]
+                            self.feed = None
+                        elif name == 'feed_mode':
+                            self.feed = None
+                        self.groups[name] = value
                         break
-                
-                # 如果G43不在下一行，重新排列
-                if next_g43_idx > i + 1:
-                    # 添加当前T代码
-                    optimized.append(line)
-                    # 添加G43代码
-                    if next_g43_idx < len(lines):
-                        optimized.append(lines[next_g43_idx])
-                        # 跳过已添加的G43行
-                        continue
-                else:
-                    optimized.append(line)
+
+        for index, (letter, value, _) in enumerate(words):
+            if letter == F:
+                if self.feed == value:
+                    drop[index] = True
+                self.feed = value
+
+        in_cycle = bool(self.cycle_active) or any(code in self.CYCLES for code in g_codes)
+        touches_comp = any(code in (40, 41, 42, 43, 44, 49) for code in g_codes)
+        absolute = self.groups['distance']
+        # 刀具半径补偿中删除坐标可能产生无移动程序段、改变补偿路径，因此只在G40状态下删除
+        may_drop = (not non_modal and not in_cycle and not touches_comp and self.cutter_comp == 40
+                    and self.motion in (0, 1) and absolute is not None)
+        dwell_only = 4 in g_codes and not any(code in self.NON_MODAL and code != 4 for code in g_codes)
+        for index, (letter, value, _) in enumerate(words):
+            axis = letter - ord('X')
+            if dwell_only or not 0 <= axis <= 2:
+                continue  # G04 X为暂停时间
+            value = round(value, self.places)
+            current = self.position[axis]
+            if may_drop and ((absolute == 90 and current == value) or (absolute == 91 and value == 0)):
+                drop[index] = True
+            if non_modal or absolute is None:
+                self.position[axis] = None
+            elif absolute == 90:
+                self.position[axis] = value
             else:
-                # 跳过已处理的G43行
-                if i > 0 and 'T' in lines[i-1] and 'M06' in lines[i-1] and 'G43' in line:
-                    continue
-                optimized.append(line)
-        
-        return optimized
-    
-    def _remove_duplicate_commands(self, lines: List[str]) -> List[str]:
-        """移除重复指令"""
-        optimized = []
-        prev_commands = set()
-        
-        for line in lines:
-            # 提取主要命令（不包括参数）
-            main_cmd = self._extract_main_command(line)
-            
-            # 如果是重复的非移动命令，则跳过
-            if main_cmd in prev_commands and not any(m in line for m in ['G00', 'G01', 'G02', 'G03', 'G81', 'G82', 'G83', 'G84']):
-                continue
-            
-            optimized.append(line)
-            
-            # 更新已有的命令集
-            if main_cmd:
-                prev_commands.add(main_cmd)
-            
-            # 对于移动命令，清除之前的状态（因为位置已改变）
-            if any(m in line for m in ['G00', 'G01', 'G02', 'G03']):
-                prev_commands.clear()
-        
-        return optimized
-    
-    def _extract_main_command(self, line: str) -> str:
-        """提取主要命令"""
-        import re
-        # 匹配G代码或M代码
-        match = re.search(r'(G\d+|M\d+)', line.upper())
-        return match.group(1) if match else ""
+                self.position[axis] = None if current is None else round(current + value, self.places)
+        if in_cycle:
+            self.position[2] = None  # 固定循环结束在R点或初始点
+        if non_modal and any(code in (10, 27, 28, 29, 30, 31, 37, 52, 53, 65, 92) for code in g_codes):
+            self.position = [None, None, None]
+        if touches_comp and not any(letter == ord('Z') for letter, _, _ in words):
+            self.position[2] = None  # 长度补偿在下一次Z移动时才生效
+        if any(code in self.STATE_BARRIERS for code in m_codes):
+            self._reset_state()
+        elif any(code in self.POSITION_BARRIERS for code in m_codes):
+            self.position = [None, None, None]
+
+        self.words_removed += sum(drop)
+        kept = [(letter, value, raw) for (letter, value, raw), dropped in zip(words, drop) if not dropped]
+        if (can_defer and not has_comment and flush is None and len(kept) == 1
+                and kept[0][0] == G and kept[0][1] in (0, 1, 2, 3)):
+            self.motion, self.pending = previous_motion, kept[0][1]
+            return []
+        texts = [self._format(letter, value, raw) for letter, value, raw in kept]
+        return [flush] + texts if flush is not None else texts
+
 
 class NCProgramProcessor:
     """
@@ -391,19 +649,21 @@ class NCProgramProcessor:
         self.optimizer = NCOptimizer()
         self.logger = logging.getLogger(__name__)
     
-    def process_nc_program(self, nc_program: str, optimize: bool = True) -> Tuple[str, Dict]:
+    def process_nc_program(self, nc_program: ProgramLike, optimize: bool = True) -> Tuple[str, Dict]:
         """
         处理NC程序（验证和优化）
         
         Args:
-            nc_program: 原始NC程序
+            nc_program: 原始NC程序（文本或已切分好的地址字表）
             optimize: 是否进行优化
             
         Returns:
             Tuple[str, Dict]: (处理后的程序, 验证结果)
         """
-        # 首先验证程序
-        validation_result = self.validator.validate_nc_program(nc_program)
+        # 首先验证程序（验证和优化共用同一张地址字表）
+        table = as_table(nc_program)
+        nc_program = table.text
+        validation_result = self.validator.validate_nc_program(table)
         
         # 如果程序无效，返回原始程序和验证错误
         if not validation_result['is_valid']:
@@ -412,7 +672,7 @@ class NCProgramProcessor:
         
         # 程序有效，进行优化
         if optimize:
-            optimized_program = self.optimizer.optimize_nc_program(nc_program)
+            optimized_program = self.optimizer.optimize_nc_program(table)
             # 再次验证优化后的程序
             final_validation = self.validator.validate_nc_program(optimized_program)
             if not final_validation['is_valid']:
@@ -426,7 +686,7 @@ class NCProgramProcessor:
 # 创建全局实例
 processor = NCProgramProcessor()
 
-def validate_nc_program(nc_program: str) -> Dict:
+def validate_nc_program(nc_program: ProgramLike) -> Dict:
     """
     验证NC程序
     
@@ -438,7 +698,7 @@ def validate_nc_program(nc_program: str) -> Dict:
     """
     return processor.validator.validate_nc_program(nc_program)
 
-def optimize_nc_program(nc_program: str) -> str:
+def optimize_nc_program(nc_program: ProgramLike) -> str:
     """
     优化NC程序
     
@@ -450,7 +710,20 @@ def optimize_nc_program(nc_program: str) -> str:
     """
     return processor.optimizer.optimize_nc_program(nc_program)
 
-def process_nc_program(nc_program: str, optimize: bool = True) -> Tuple[str, Dict]:
+def compact_nc_program(nc_program: ProgramLike, config: Optional[Dict] = None) -> Tuple[str, Dict]:
+    """
+    压缩NC程序大小
+    
+    Args:
+        nc_program: NC程序代码
+        config: 覆盖 NC_COMPACTION_CONFIG 中的部分参数（如 {'comments': 'strip'}）
+        
+    Returns:
+        Tuple[str, Dict]: (压缩后的程序, 压缩前后字节数等统计信息)
+    """
+    return processor.optimizer.compact_nc_program(nc_program, config)
+
+def process_nc_program(nc_program: ProgramLike, optimize: bool = True) -> Tuple[str, Dict]:
     """
     处理NC程序（验证和优化）
     
@@ -101,31 +101,40 @@ class PDFFeatureExtractor:
             "tables": [],
             "figures": [],
             "dimensions": [],
-            "geometric_features": []
+            "geometric_features": [],
+            "text_source": None,
+            "feature_source": None
         }
         
-        # 提取文本
-        text = page.get_text()
-        page_features["text_content"] = text
+        # 提取文本：文本层优先，没有文本层的页面或位图区域才OCR，文本行带外接框（PDF坐标）
+        text_info = self._acquire_page_text(page, page_num)
+        page_features["text_content"] = text_info["text"]
+        page_features["text_source"] = text_info["pages"][0]["source"]
         
-        # 提取文本块（可能包含尺寸标注）
-        text_blocks = page.get_text_blocks()
-        for block in text_blocks:
-            block_text = block[4]  # 文本内容
-            # 检查是否包含尺寸信息
-            if self._is_dimension_text(block_text):
+        # 逐行检查尺寸标注，保留位置供后续按坐标关联
+        for line in text_info["lines"]:
+            if self._is_dimension_text(line["text"]):
                 page_features["dimensions"].append({
-                    "text": block_text,
-                    "bbox": block[:4],  # 边界框
-                    "type": "dimension"
+                    "text": line["text"],
+                    "bbox": line["bbox"],  # 边界框
+                    "type": "dimension",
+                    "source": line["source"]
                 })
         
         # 提取图像
         image_list = page.get_images()
         page_features["image_count"] = len(image_list)
-        
-        # 尝试从图像中提取特征（如果OpenCV可用）
+
+        # CAD导出的矢量图纸直接读取绘图路径，坐标为PDF单位（pt）
+        vector_features = self._extract_vector_features(page, page_num)
+        if vector_features is not None:
+            page_features["geometric_features"] = vector_features
+            page_features["feature_source"] = "vector"
+            return page_features
+
+        # 扫描图纸：尝试从嵌入图像中提取特征（如果OpenCV可用）
         if HAS_OPENCV:
+            page_features["feature_source"] = "raster"
             for img_index, img in enumerate(image_list):
                 xref = img[0]
                 pix = fitz.Pixmap(page.parent, xref)
@@ -142,7 +151,65 @@ class PDFFeatureExtractor:
                 pix = None  # 释放资源
         
         return page_features
-    
+
+    def _acquire_page_text(self, page: Any, page_num: int) -> Dict[str, Any]:
+        """
+        获取页面文本和带位置的文本行
+
+        Args:
+            page: PDF页面对象
+            page_num: 页码
+
+        Returns:
+            Dict: text、lines 和 pages（见 text_acquisition 模块）；未安装pytesseract时只读取文本层
+        """
+        from src.modules.text_acquisition import acquire_page_text
+        return acquire_page_text(page, page_num, run_ocr=HAS_TESSERACT)
+
+    def _extract_vector_features(self, page: Any, page_num: int) -> Optional[List[Dict]]:
+        """
+        从页面矢量路径中提取几何特征
+
+        Args:
+            page: PDF页面对象
+            page_num: 页码
+
+        Returns:
+            List[Dict]: 几何特征列表（与嵌入图像特征格式相同），页面不是矢量图纸时返回None
+        """
+        if not HAS_OPENCV:
+            return None
+
+        try:
+            from src.config import VECTOR_GEOMETRY_CONFIG
+            if not VECTOR_GEOMETRY_CONFIG['enabled']:
+                return None
+            from src.modules.vector_geometry import extract_vector_features
+            # dpi=72时特征坐标即PDF坐标，面积阈值与嵌入图像特征相同
+            features = extract_vector_features(page, dpi=72, min_area=100)
+        except Exception as e:
+            self.logger.warning(f"第{page_num + 1}页矢量几何提取失败: {str(e)}")
+            return None
+        if features is None:
+            return None
+
+        vector_features = []
+        for feature in features:
+            x, y, w, h = feature["bounding_box"]
+            vector_features.append({
+                "id": f"vec_{page_num}_{len(vector_features)}",
+                "type": feature["shape"],
+                "area": feature["area"],
+                "bbox": [x, y, w, h],
+                "center": feature["center"],
+                "circularity": feature.get("circularity", 0.0),
+                "aspect_ratio": feature["aspect_ratio"],
+                "is_circle": "radius" in feature,
+                "diameter_approx": 2 * feature["radius"] if "radius" in feature else None,
+                "source": "vector"
+            })
+        return vector_features
+
     def _is_dimension_text(self, text: str) -> bool:
         """
         判断文本是否为尺寸标注
@@ -191,14 +258,19 @@ class PDFFeatureExtractor:
         features = []
         
         try:
-            # 转换为灰度图
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            from .pyramid_detection import find_contours_pyramid, should_use_pyramid
             
-            # 应用阈值处理
-            _, thresh = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY)
+            contours = None
+            if should_use_pyramid(image.shape):
+                # 大幅面图像由粗到精：降采样层找候选，只在候选区域按原分辨率阈值化并查找轮廓
+                contours = find_contours_pyramid(image, self._binarize, mode=cv2.RETR_EXTERNAL, min_area=100)
             
-            # 查找轮廓
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            if contours is None:
+                # 转换为灰度图
+                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                
+                # 查找轮廓
+                contours, _ = cv2.findContours(self._binarize(gray), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             
             for contour in contours:
                 # 计算轮廓的几何属性
@@ -240,6 +312,12 @@ class PDFFeatureExtractor:
         
         return features
     
+    @staticmethod
+    def _binarize(gray: np.ndarray) -> np.ndarray:
+        """阈值处理，得到用于查找轮廓的二值图"""
+        _, thresh = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY)
+        return thresh
+    
     def _identify_shape_type(self, contour: np.ndarray, area: float, circularity: float, aspect_ratio: float) -> str:
         """
         识别轮廓的形状类型
@@ -0,0 +1,250 @@
+"""
+工序调度模块
+把混合零件上所有特征的工序（点孔、钻孔、攻丝、锪孔、铣削）收集起来，
+在保证同一特征工序先后顺序（点孔 → 钻孔 → 攻丝/锪孔）的前提下按刀具合并，尽量减少换刀次数
+"""
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.config import (GCODE_GENERATION_CONFIG, OPERATION_SCHEDULER_CONFIG, TAP_DRILL_MAP,
+                        TOOL_MAPPING)
+
+# 各加工工艺对应的工序链
+PROCESS_OPERATIONS = {
+    'drilling': ('spot_drill', 'drill'),
+    'tapping': ('spot_drill', 'drill', 'tap'),
+    'counterbore': ('spot_drill', 'drill', 'counterbore'),
+    'milling': ('mill',),
+}
+
+# 工序使用的刀具类型（TOOL_MAPPING中的键）
+OPERATION_TOOLS = {
+    'spot_drill': 'center_drill',
+    'drill': 'drill_bit',
+    'tap': 'tap',
+    'counterbore': 'counterbore_tool',
+    'mill': 'end_mill',
+}
+
+
+def feature_process(feature: Dict, default: Optional[str] = None) -> str:
+    """
+    判断特征的加工工艺
+
+    优先使用特征的 process 字段；腔槽等带 operation 的特征按铣削处理；
+    带螺纹规格的孔攻丝，沉孔锪孔，其余圆孔钻孔，其他形状铣削
+
+    Args:
+        feature: 特征字典
+        default: 圆孔的默认工艺（如描述分析中的 processing_type）
+
+    Returns:
+        str: PROCESS_OPERATIONS 中的工艺名称
+    """
+    process = feature.get('process')
+    if process in PROCESS_OPERATIONS:
+        return process
+    if str(feature.get('operation', '')).endswith('milling'):
+        return 'milling'
+    if feature.get('thread_size'):
+        return 'tapping'
+    shape = feature.get('shape')
+    if shape == 'counterbore':
+        return 'counterbore'
+    if shape == 'circle':
+        return default if default in ('drilling', 'tapping', 'counterbore') else 'drilling'
+    return 'milling'
+
+
+def count_tool_changes(operations: List[Dict]) -> int:
+    """按顺序加工时的换刀次数（第一把刀的装刀也计一次M06）"""
+    changes = 0
+    previous = None
+    for operation in operations:
+        if operation['tool'] != previous:
+            changes += 1
+            previous = operation['tool']
+    return changes
+
+
+class OperationScheduler:
+    """
+    工序调度器
+
+    Args:
+        config: 覆盖 OPERATION_SCHEDULER_CONFIG 中的部分参数
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(OPERATION_SCHEDULER_CONFIG)
+        self.config.update(config or {})
+        self.logger = logging.getLogger(__name__)
+
+    def collect(self, features: List[Dict], description_analysis: Optional[Dict] = None) -> List[Dict]:
+        """
+        收集所有特征的工序，按特征逐个、特征内按工序链排列（即逐个特征加工的原始顺序）
+
+        Args:
+            features: 特征列表
+            description_analysis: 描述分析结果，提供深度、螺纹规格等默认值
+
+        Returns:
+            List[Dict]: 工序列表，每项包含 feature、step、kind、tool、position 和循环参数
+        """
+        analysis = description_analysis or {}
+        default_process = analysis.get('processing_type')
+        default_depth = analysis.get('depth') if isinstance(analysis.get('depth'), (int, float)) else None
+        drilling = GCODE_GENERATION_CONFIG['drilling']
+        counterbore = GCODE_GENERATION_CONFIG['counterbore']
+
+        operations = []
+        for index, feature in enumerate(features):
+            process = feature_process(feature, default_process)
+            position = tuple(feature['center'][:2])
+            depth = feature.get('depth', default_depth)
+            if process == 'milling':
+                steps = [('mill', None, {'feature_data': feature})]
+            elif process == 'tapping':
+                thread = feature.get('thread_size') or analysis.get('thread_size') or self.config['default_thread_size']
+                thread_depth = float(depth if depth is not None else 14.0)
+                diameter = TAP_DRILL_MAP.get(thread, 8.5)
+                steps = [('spot_drill', None, {'depth': drilling['center_drill_depth']}),
+                         ('drill', diameter, {'depth': thread_depth + diameter / 3 + drilling['drilling_depth_factor']}),
+                         ('tap', thread, {'depth': thread_depth})]
+            elif process == 'counterbore':
+                # 与 _generate_counterbore_code 相同：特征自身尺寸优先，其次描述分析结果，最后取配置默认值
+                outer = float(next(value for value in (feature.get('outer_diameter'), analysis.get('outer_diameter'),
+                                                       counterbore['default_outer_diameter']) if value is not None))
+                inner = float(next(value for value in (feature.get('inner_diameter'), analysis.get('inner_diameter'),
+                                                       counterbore['default_inner_diameter']) if value is not None))
+                bore_depth = float(feature.get('counterbore_depth', depth if depth is not None else counterbore['default_depth']))
+                through = float(feature.get('through_depth', bore_depth + inner / 3 + counterbore['drilling_depth_factor']))
+                steps = [('spot_drill', None, {'depth': drilling['center_drill_depth']}),
+                         ('drill', inner, {'depth': through}),
+                         ('counterbore', outer, {'depth': bore_depth})]
+            else:
+                # 识别出的圆特征只带半径，没有半径时才使用描述中的刀具直径
+                if feature.get('radius'):
+                    diameter = round(2 * float(feature['radius']), 1)
+                else:
+                    diameter = float(feature.get('diameter') or analysis.get('tool_diameter') or 12.0)
+                steps = [('spot_drill', None, {'depth': drilling['center_drill_depth']}),
+                         ('drill', diameter, {'depth': float(depth if depth is not None else drilling['default_depth'])})]
+            for step, (kind, size, params) in enumerate(steps):
+                operation = {'feature': index, 'step': step, 'kind': kind, 'tool': (kind, size),
+                             'size': size, 'position': position}
+                operation.update(params)
+                operations.append(operation)
+        return operations
+
+    def schedule(self, operations: List[Dict]) -> Tuple[List[Dict], Dict]:
+        """
+        按刀具合并工序
+
+        每次从可加工（前道工序已完成）的工序中选一把刀，把它能加工的工序全部做完再换刀；
+        选刀时按 stage_order 优先，同阶段选可加工工序最多的刀。
+        各特征的工序链都符合 stage_order 时每把刀只装一次，换刀次数等于刀具数（最少）
+
+        Args:
+            operations: collect 返回的工序列表
+
+        Returns:
+            Tuple[List[Dict], Dict]: 按刀具分组的加工计划（tool、tool_number、kind、operations），以及统计信息
+                operations、tools、original_tool_changes、tool_changes、saved、seconds
+        """
+        began = time.perf_counter()
+        stage = {kind: rank for rank, kind in enumerate(self.config['stage_order'])}
+        successor = {}
+        heads = []
+        chains = {}
+        for operation in operations:
+            previous = chains.get(operation['feature'])
+            if previous is None:
+                heads.append(operation)
+            else:
+                successor[id(previous)] = operation
+            chains[operation['feature']] = operation
+
+        ready: Dict[Tuple, List[Dict]] = {}
+        first_seen: Dict[Tuple, int] = {}
+        for operation in operations:
+            first_seen.setdefault(operation['tool'], len(first_seen))
+        for operation in heads:
+            ready.setdefault(operation['tool'], []).append(operation)
+
+        blocks = []
+        while ready:
+            tool = min(ready, key=lambda t: (stage.get(t[0], len(stage)), -len(ready[t]), first_seen[t]))
+            block = []
+            while ready.get(tool):
+                batch = ready.pop(tool)
+                block.extend(batch)
+                for operation in batch:
+                    following = successor.get(id(operation))
+                    if following is not None:
+                        ready.setdefault(following['tool'], []).append(following)
+            blocks.append({'tool': tool, 'kind': tool[0], 'operations': block})
+
+        numbers = self._tool_numbers([block['tool'] for block in blocks])
+        for block in blocks:
+            block['tool_number'] = numbers[block['tool']]
+
+        original = count_tool_changes(operations)
+        stats = {'operations': len(operations), 'tools': len(numbers), 'original_tool_changes': original,
+                 'tool_changes': len(blocks), 'saved': original - len(blocks),
+                 'seconds': time.perf_counter() - began}
+        self.logger.debug(f"工序调度: {len(operations)} 道工序，换刀 {original} -> {len(blocks)} 次")
+        return blocks, stats
+
+    def plan(self, features: List[Dict], description_analysis: Optional[Dict] = None) -> Tuple[List[Dict], Dict]:
+        """收集并调度特征的全部工序"""
+        return self.schedule(self.collect(features, description_analysis))
+
+    def _tool_numbers(self, tools: List[Tuple]) -> Dict[Tuple, int]:
+        """每类刀具的第一种规格使用 TOOL_MAPPING 中的刀号，其余规格从 extra_tool_start 起依次编号"""
+        numbers = {}
+        used_kinds = set()
+        extra = self.config['extra_tool_start']
+        for tool in tools:
+            if tool in numbers:
+                continue
+            if tool[0] not in used_kinds:
+                numbers[tool] = TOOL_MAPPING.get(OPERATION_TOOLS.get(tool[0]), TOOL_MAPPING['general_tool'])
+                used_kinds.add(tool[0])
+            else:
+                numbers[tool] = extra
+                extra += 1
+        return numbers
+
+
+def format_schedule_comment(stats: Dict) -> str:
+    """
+    把调度统计格式化为NC程序注释
+
+    Args:
+        stats: OperationScheduler.schedule 返回的统计信息
+
+    Returns:
+        str: 如 "(OPERATION SCHEDULE: 1200 OPERATIONS, 5 TOOLS, TOOL CHANGES 1000 -> 5, SAVED 995)"
+    """
+    return (f"(OPERATION SCHEDULE: {stats['operations']} OPERATIONS, {stats['tools']} TOOLS, "
+            f"TOOL CHANGES {stats['original_tool_changes']} -> {stats['tool_changes']}, SAVED {stats['saved']})")
+
+
+# 创建全局工序调度器实例
+operation_scheduler = OperationScheduler()
+
+
+def schedule_operations(features: List[Dict], description_analysis: Optional[Dict] = None) -> Tuple[List[Dict], Dict]:
+    """
+    收集混合零件所有特征的工序并按刀具合并
+
+    Args:
+        features: 特征列表
+        description_analysis: 描述分析结果
+
+    Returns:
+        Tuple[List[Dict], Dict]: 按刀具分组的加工计划和统计信息
+    """
+    return operation_scheduler.plan(features, description_analysis)
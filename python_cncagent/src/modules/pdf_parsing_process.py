@@ -8,6 +8,23 @@ import pytesseract
 import numpy as np
 import os
 import logging
+import atexit
+import subprocess
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.config import PDF_PROCESSING_CONFIG, OCR_CONFIG, VECTOR_GEOMETRY_CONFIG
+from src.job_queue import report_progress, with_current_job
+
+# tesserocr直接调用libtesseract，可复用已加载语言模型的引擎实例（可选依赖）
+try:
+    import tesserocr
+    HAS_TESSEROCR = True
+except ImportError:
+    HAS_TESSEROCR = False
+
 # 设置Tesseract路径 - 优先使用环境变量或系统PATH
 import os
 tesseract_path = os.environ.get('TESSERACT_PATH', '')
@@ -15,33 +32,219 @@ if tesseract_path and os.path.exists(tesseract_path):
     pytesseract.pytesseract.tesseract_cmd = tesseract_path
 
 
-def pdf_to_images(pdf_path, dpi=150):  # 降低DPI以兼容性更好
+# 渲染工作进程内缓存的PDF文档（每个进程只打开一次）
+_worker_document = None
+
+
+def _resolve_worker_count(max_workers: Optional[int], task_count: int) -> int:
+    """根据配置和任务数确定工作进程数"""
+    if max_workers is None:
+        max_workers = PDF_PROCESSING_CONFIG['max_workers']
+    if not max_workers or max_workers < 0:
+        max_workers = os.cpu_count() or 1
+    return max(1, min(int(max_workers), task_count))
+
+
+def _init_render_worker(pdf_path: str) -> None:
+    """渲染进程初始化：打开PDF文档并缓存到进程全局变量"""
+    global _worker_document
+    _worker_document = fitz.open(pdf_path)
+
+
+def _render_page(page_num: int, dpi: int) -> Tuple[int, int, int, bytes]:
+    """
+    在工作进程中渲染单页
+
+    返回原始RGB像素而不是PIL对象，减少进程间序列化开销
+    """
+    zoom = dpi / 72
+    pix = _worker_document[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    return page_num, pix.width, pix.height, pix.samples
+
+
+def iter_pdf_pages(pdf_path: str, dpi: Optional[int] = None, max_workers: Optional[int] = None,
+                   pages: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    流式渲染PDF页面，每渲染完一页立即产出
+
+    多页文档使用进程池并行渲染，页面按完成顺序（而非页码顺序）产出；
+    同时在途的页面数受 max_pending_pages 限制，峰值内存与页数无关。
+
+    Args:
+        pdf_path (str): PDF文件路径
+        dpi (int): 输出图像的DPI，默认取配置值
+        max_workers (int): 渲染进程数，None表示使用配置，0表示按CPU核数
+        pages (Iterable[int]): 只渲染这些页码，None表示全部页面
+
+    Yields:
+        tuple: (页码, PIL图像对象)
+    """
+    if dpi is None:
+        dpi = PDF_PROCESSING_CONFIG['default_dpi']
+
+    pdf_document = fitz.open(pdf_path)
+    page_numbers = list(range(len(pdf_document))) if pages is None else list(pages)
+    workers = _resolve_worker_count(max_workers, len(page_numbers))
+
+    if workers <= 1:
+        # 单页或单进程：直接在当前进程渲染
+        try:
+            matrix = fitz.Matrix(dpi / 72, dpi / 72)
+            for page_num in page_numbers:
+                pix = pdf_document[page_num].get_pixmap(matrix=matrix)
+                yield page_num, Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+        finally:
+            pdf_document.close()
+        return
+
+    pdf_document.close()
+    window = workers * PDF_PROCESSING_CONFIG['max_pending_pages']
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker, initargs=(pdf_path,))
+    try:
+        next_index = 0
+        pending = set()
+        while next_index < len(page_numbers) or pending:
+            # 滑动窗口提交任务，避免已渲染但未消费的页面堆积
+            while next_index < len(page_numbers) and len(pending) < window:
+                pending.add(pool.submit(_render_page, page_numbers[next_index], dpi))
+                next_index += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_num, width, height, samples = future.result()
+                yield page_num, Image.frombytes("RGB", [width, height], samples)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def pdf_to_images(pdf_path, dpi=150, max_workers=None):  # 降低DPI以兼容性更好
     """
     将PDF转换为高分辨率图像列表
     
     Args:
         pdf_path (str): PDF文件路径
         dpi (int): 输出图像的DPI，默认150
+        max_workers (int): 渲染进程数，None表示使用配置
     
     Returns:
-        list: PIL图像对象列表
+        list: PIL图像对象列表（按页码排序）
     """
-    pdf_document = fitz.open(pdf_path)
-    images = []
-    
-    # 计算缩放矩阵，提高分辨率
-    zoom = dpi / 72  # 72是默认DPI
-    matrix = fitz.Matrix(zoom, zoom)
-    
-    for page_num in range(len(pdf_document)):
-        page = pdf_document[page_num]
-        # 渲染为高分辨率图像
-        pix = page.get_pixmap(matrix=matrix)
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        images.append(img)
-    
-    pdf_document.close()
-    return images
+    pages = dict(iter_pdf_pages(pdf_path, dpi=dpi, max_workers=max_workers))
+    return [pages[page_num] for page_num in sorted(pages)]
+
+
+def _analyze_page(page_num: int, image: Image.Image, run_ocr: bool, detect_features: bool,
+                  drawing_text: str, lang: str, vector_features: Optional[List[Dict]] = None) -> Dict[str, Any]:
+    """对单页执行OCR和特征识别（在线程池中运行）；已从矢量路径得到特征的页面跳过栅格识别"""
+    result = {
+        "page_number": page_num,
+        "image_size": image.size,
+        "ocr_text": "",
+        "features": [],
+        "feature_source": None
+    }
+    if run_ocr:
+        report_progress('ocr', page=page_num + 1)
+        result["ocr_text"] = ocr_image(image, lang=lang)
+    if vector_features is not None:
+        result["features"] = vector_features
+        result["feature_source"] = "vector"
+    elif detect_features:
+        from src.modules.feature_definition import identify_features
+        report_progress('detect', page=page_num + 1)
+        result["feature_source"] = "raster"
+        try:
+            features = identify_features(np.array(image.convert('L')), drawing_text=drawing_text)
+            result["features"] = features or []
+        except Exception as e:
+            logging.warning(f"第{page_num + 1}页特征识别失败: {str(e)}")
+    return result
+
+
+def _rendered_size(page: "fitz.Page", dpi: int) -> Tuple[int, int]:
+    """页面按dpi渲染后的像素尺寸（与get_pixmap一致），用于不需要渲染的页面"""
+    zoom = dpi / 72
+    bbox = (page.rect * fitz.Matrix(zoom, zoom)).irect
+    return bbox.width, bbox.height
+
+
+def process_pdf_pages(pdf_path: str, dpi: Optional[int] = None, max_workers: Optional[int] = None,
+                      run_ocr: bool = True, detect_features: bool = True,
+                      drawing_text: str = "", lang: str = 'chi_sim+eng',
+                      use_vector: Optional[bool] = None) -> Iterator[Dict[str, Any]]:
+    """
+    流式页面处理流水线：并行渲染，每页渲染完成后立即送入OCR和特征识别
+
+    渲染在进程池中进行，OCR（Tesseract子进程）和特征识别（OpenCV会释放GIL）
+    在线程池中进行，两个阶段相互重叠，总耗时随CPU核数而非页数增长。
+    CAD导出的矢量页面直接从绘图路径提取几何特征（见 vector_geometry 模块），不需要OCR时
+    这些页面完全不渲染；扫描页面回退到渲染后的栅格识别。
+
+    Args:
+        pdf_path (str): PDF文件路径
+        dpi (int): 渲染DPI，默认取配置值
+        max_workers (int): 渲染进程数和分析线程数，None表示使用配置
+        run_ocr (bool): 是否执行OCR
+        detect_features (bool): 是否执行几何特征识别
+        drawing_text (str): 图纸文本，用于辅助特征识别
+        lang (str): OCR语言
+        use_vector (bool): 是否优先使用矢量路径，None表示使用 VECTOR_GEOMETRY_CONFIG['enabled']
+
+    Yields:
+        dict: 单页结果，包含 page_number、image_size、ocr_text、features、
+            feature_source（vector / raster，未识别特征时为None），按完成顺序产出
+    """
+    if dpi is None:
+        dpi = PDF_PROCESSING_CONFIG['default_dpi']
+    if use_vector is None:
+        use_vector = VECTOR_GEOMETRY_CONFIG['enabled']
+
+    vector_features = {}
+    with fitz.open(pdf_path) as pdf_document:
+        page_count = len(pdf_document)
+        if detect_features and use_vector:
+            from src.modules.vector_geometry import extract_vector_features
+            for page_num in range(page_count):
+                page = pdf_document[page_num]
+                try:
+                    features = extract_vector_features(page, dpi=dpi, drawing_text=drawing_text)
+                except Exception as e:
+                    logging.warning(f"第{page_num + 1}页矢量几何提取失败，改用栅格识别: {str(e)}")
+                    features = None
+                if features is None:
+                    continue
+                vector_features[page_num] = features
+                if not run_ocr:
+                    report_progress('detect', page=page_num + 1, pages=page_count)
+                    yield {
+                        "page_number": page_num,
+                        "image_size": _rendered_size(page, dpi),
+                        "ocr_text": "",
+                        "features": features,
+                        "feature_source": "vector"
+                    }
+
+    # 需要OCR的页面和扫描页面才渲染
+    render_pages = [page_num for page_num in range(page_count) if run_ocr or page_num not in vector_features]
+    if not render_pages:
+        return
+    workers = _resolve_worker_count(max_workers, len(render_pages))
+
+    analyze_page = with_current_job(_analyze_page)
+    with ThreadPoolExecutor(max_workers=workers) as analyzers:
+        pending = set()
+        for page_num, image in iter_pdf_pages(pdf_path, dpi=dpi, max_workers=workers, pages=render_pages):
+            report_progress('render', page=page_num + 1, pages=page_count)
+            pending.add(analyzers.submit(analyze_page, page_num, image, run_ocr, detect_features,
+                                         drawing_text, lang, vector_features.get(page_num)))
+            # 先产出已完成的分析结果，同时限制在途页面数
+            done = {future for future in pending if future.done()}
+            if len(pending) - len(done) >= workers * PDF_PROCESSING_CONFIG['max_pending_pages']:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
 
 
 def preprocess_image(image):
@@ -61,6 +264,181 @@ def preprocess_image(image):
     return gray_img
 
 
+class _TesseractAPIs:
+    """
+    一个线程按语言缓存的tesserocr引擎
+
+    线程结束时线程局部数据被回收，引擎随之 End()；进程退出时由 atexit 释放仍存活线程的引擎
+    """
+
+    def __init__(self):
+        self.apis = {}
+
+    def get(self, lang: str):
+        if lang not in self.apis:
+            self.apis[lang] = tesserocr.PyTessBaseAPI(lang=lang)
+        return self.apis[lang]
+
+    def close(self):
+        """释放全部引擎"""
+        while self.apis:
+            _, api = self.apis.popitem()
+            api.End()
+
+    def __del__(self):
+        self.close()
+
+
+# 每个线程持有独立的tesserocr引擎（PyTessBaseAPI不是线程安全的）
+_tesseract_local = threading.local()
+_tesseract_apis = weakref.WeakSet()
+
+
+def _get_tesseract_api(lang: str, psm: Optional[int] = None, whitelist: Optional[str] = None):
+    """
+    获取当前线程的常驻Tesseract引擎，按语言缓存，避免每次调用重新加载模型
+
+    引擎在调用之间复用，每次取出时都重新设置页面分割模式和白名单，
+    上一次调用的设置不会带到下一次（None表示自动分割、不限制字符）
+    """
+    apis = getattr(_tesseract_local, 'apis', None)
+    if apis is None:
+        apis = _tesseract_local.apis = _TesseractAPIs()
+        _tesseract_apis.add(apis)
+    api = apis.get(lang)
+    api.SetPageSegMode(tesserocr.PSM.AUTO if psm is None else psm)
+    api.SetVariable('tessedit_char_whitelist', whitelist or '')
+    return api
+
+
+def close_tesseract_apis():
+    """释放当前线程的Tesseract引擎（长期存活的线程不再OCR时调用）"""
+    apis = getattr(_tesseract_local, 'apis', None)
+    if apis is not None:
+        apis.close()
+
+
+@atexit.register
+def _close_all_tesseract_apis():
+    """进程退出时释放所有线程的Tesseract引擎"""
+    for apis in list(_tesseract_apis):
+        apis.close()
+
+
+def _encode_pnm(samples: bytes, width: int, height: int, channels: int) -> bytes:
+    """
+    为原始像素缓冲区加上PGM/PPM文件头
+
+    PNM是未压缩格式，编码只是拼接一个十几字节的头，
+    Tesseract（leptonica）可以直接从标准输入读取
+    """
+    magic = b'P5' if channels == 1 else b'P6'
+    return magic + f"\n{width} {height}\n255\n".encode('ascii') + samples
+
+
+def ocr_buffer(samples: bytes, width: int, height: int, channels: int = 1,
+               lang: str = 'chi_sim+eng') -> str:
+    """
+    对原始像素缓冲区进行OCR识别，不经过PNG编解码和临时文件
+
+    安装了tesserocr时使用线程内常驻的引擎实例；否则将缓冲区以PNM格式
+    通过标准输入传给tesseract命令行。
+
+    Args:
+        samples (bytes): 行优先的8位像素数据（如fitz.Pixmap.samples）
+        width (int): 图像宽度
+        height (int): 图像高度
+        channels (int): 每像素字节数，1为灰度，3为RGB
+        lang (str): OCR语言
+
+    Returns:
+        str: 识别出的文本
+    """
+    backend = OCR_CONFIG['backend']
+    if backend == 'tesserocr' or (backend == 'auto' and HAS_TESSEROCR):
+        api = _get_tesseract_api(lang)
+        api.SetImageBytes(bytes(samples), width, height, channels, width * channels)
+        return api.GetUTF8Text()
+    return _run_tesseract_cli(samples, width, height, channels, lang)
+
+
+def _run_tesseract_cli(samples: bytes, width: int, height: int, channels: int, lang: str,
+                       *configs: str) -> str:
+    """以PNM格式通过标准输入调用tesseract命令行，configs为页面分割模式、变量和输出格式等附加参数"""
+    command = [pytesseract.pytesseract.tesseract_cmd, 'stdin', 'stdout', '-l', lang, *configs]
+    completed = subprocess.run(
+        command,
+        input=_encode_pnm(samples, width, height, channels),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=OCR_CONFIG['text_extraction_timeout']
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.decode('utf-8', errors='replace').strip())
+    return completed.stdout.decode('utf-8', errors='replace')
+
+
+def _parse_tsv_lines(tsv: str) -> List[Dict[str, Any]]:
+    """
+    把Tesseract的TSV输出按文本行合并为 text、bbox（像素 x0, y0, x1, y1）、confidence（0~1），
+    words 保留每个单词的 text、bbox 和 confidence，供低置信度单词重新识别
+    """
+    lines = {}
+    for row in tsv.splitlines():
+        fields = row.split('\t')
+        # 只取单词级（level 5）且有文字的行，跳过表头
+        if len(fields) < 12 or fields[0] != '5' or not fields[11].strip():
+            continue
+        left, top, width, height = (int(value) for value in fields[6:10])
+        word = (fields[11].strip(), left, top, left + width, top + height, max(float(fields[10]), 0.0))
+        lines.setdefault(tuple(fields[1:5]), []).append(word)
+    result = []
+    for words in lines.values():
+        result.append({
+            "text": " ".join(word[0] for word in words),
+            "bbox": (min(word[1] for word in words), min(word[2] for word in words),
+                     max(word[3] for word in words), max(word[4] for word in words)),
+            "confidence": sum(word[5] for word in words) / len(words) / 100,
+            "words": [{"text": word[0], "bbox": word[1:5], "confidence": word[5] / 100} for word in words]
+        })
+    return result
+
+
+def ocr_buffer_lines(samples: bytes, width: int, height: int, channels: int = 1,
+                     lang: str = 'chi_sim+eng', psm: Optional[int] = None,
+                     whitelist: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    对原始像素缓冲区进行OCR识别，返回带位置的文本行
+
+    与 ocr_buffer 使用相同的后端，输出改为Tesseract的TSV格式后按行合并。
+
+    Args:
+        samples (bytes): 行优先的8位像素数据
+        width (int): 图像宽度
+        height (int): 图像高度
+        channels (int): 每像素字节数，1为灰度，3为RGB
+        lang (str): OCR语言
+        psm (int): Tesseract页面分割模式，None表示默认的自动分割
+        whitelist (str): 只识别这些字符，None表示不限制
+
+    Returns:
+        list: 文本行，包含 text、bbox（像素坐标 x0, y0, x1, y1）、confidence（单词置信度均值，0~1）
+            和 words（单词的 text、bbox、confidence）
+    """
+    backend = OCR_CONFIG['backend']
+    if backend == 'tesserocr' or (backend == 'auto' and HAS_TESSEROCR):
+        api = _get_tesseract_api(lang, psm, whitelist)
+        api.SetImageBytes(bytes(samples), width, height, channels, width * channels)
+        return _parse_tsv_lines(api.GetTSVText(0))
+
+    configs = []
+    if psm is not None:
+        configs += ['--psm', str(psm)]
+    if whitelist:
+        configs += ['-c', f'tessedit_char_whitelist={whitelist}']
+    return _parse_tsv_lines(_run_tesseract_cli(samples, width, height, channels, lang, *configs, 'tsv'))
+
+
 def ocr_image(image, lang='chi_sim+eng'):
     """
     对图像进行OCR识别
@@ -72,26 +450,11 @@ def ocr_image(image, lang='chi_sim+eng'):
     Returns:
         str: 识别出的文本
     """
-    import tempfile
     try:
         # 预处理图像
         processed_img = preprocess_image(image)
-        
-        # 使用安全的临时文件
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
-            temp_path = temp_file.name
-        
-        try:
-            # 临时保存图像用于OCR
-            processed_img.save(temp_path)
-            
-            # OCR识别
-            text = pytesseract.image_to_string(Image.open(temp_path), lang=lang)
-            return text
-        finally:
-            # 确保临时文件被删除
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        width, height = processed_img.size
+        return ocr_buffer(processed_img.tobytes(), width, height, 1, lang=lang)
     except Exception as e:
         logging.warning(f"OCR处理失败: {str(e)}。请确保已安装Tesseract OCR引擎并添加到系统PATH中。")
         return ""
@@ -8,10 +8,13 @@ from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 import logging
 
-from .pdf_parsing_process import extract_text_from_pdf, pdf_to_images, ocr_image
+from .pdf_parsing_process import ocr_image, process_pdf_pages
+from .text_acquisition import acquire_pdf_text
 from .model_3d_processor import process_3d_model
 from .feature_definition import identify_features
 from .material_tool_matcher import analyze_user_description
+from src.config import PDF_PROCESSING_CONFIG, VECTOR_GEOMETRY_CONFIG
+from src.result_cache import result_cache
 
 
 class PromptBuilder:
@@ -150,34 +153,39 @@ class PromptBuilder:
         # 从PDF提取文本信息
         if pdf_path:
             try:
-                text_content = extract_text_from_pdf(pdf_path)
-                if text_content is not None:
-                    drawing_info['pdf_text'] = text_content
-                else:
-                    text_content = ""  # 设置为空字符串而不是None
+                # 文本和几何特征按PDF内容缓存，重复提交同一图纸时跳过渲染
+                pdf_digest = result_cache.file_digest(pdf_path)
+                dpi = PDF_PROCESSING_CONFIG['default_dpi']
+                text_key = result_cache.make_key('ocr_text', [pdf_digest], dpi=dpi, text_layer=True)
+                features_key = result_cache.make_key('features', [pdf_digest], dpi=dpi,
+                                                     vector=VECTOR_GEOMETRY_CONFIG['enabled'])
+                text_info = result_cache.get('ocr_text', text_key)
+                features = result_cache.get('features', features_key)
                 
-                # 使用OCR处理PDF图像
-                images = pdf_to_images(pdf_path)
-                if images is not None:
-                    ocr_results = []
-                    for img in images:
-                        ocr_result = ocr_image(img)
-                        ocr_results.append(ocr_result)
-                    drawing_info['ocr_text'] = " ".join(ocr_results)
-                    
-                    # 识别图像特征
-                    features = []
-                    for img in images:
-                        # 将PIL图像转换为numpy数组
-                        import numpy as np
-                        img_array = np.array(img.convert('L'))
-                        img_features = identify_features(img_array, drawing_text=text_content)
-                        if img_features:  # 确保img_features不为None
-                            features.extend(img_features)
-                    
+                if text_info is None:
+                    # 文本层优先，只OCR没有文本层的页面或位图区域
+                    text_info = acquire_pdf_text(pdf_path)
+                    if text_info["text"].strip():  # OCR失败时不缓存空结果
+                        result_cache.put('ocr_text', text_key, text_info)
+                drawing_info['pdf_text'] = text_info["layer_text"]
+                if text_info["ocr_text"]:
+                    drawing_info['ocr_text'] = text_info["ocr_text"]
+                drawing_info['text_lines'] = text_info["lines"]
+                
+                if features is None:
+                    # 流式页面流水线：矢量页直接读取路径，扫描页并行渲染后识别特征（文本已获取，不再OCR）
+                    pages = sorted(
+                        process_pdf_pages(pdf_path, drawing_text=text_info["text"], run_ocr=False),
+                        key=lambda page: page["page_number"]
+                    )
+                    if not pages:
+                        self.logger.warning(f"无法从PDF提取图像: {pdf_path}")
+                    else:
+                        features = [f for page in pages for f in page["features"]]
+                        result_cache.put('features', features_key, features)
+                
+                if features is not None:
                     drawing_info['geometric_features'] = features
-                else:
-                    self.logger.warning(f"无法从PDF提取图像: {pdf_path}")
             except Exception as e:
                 self.logger.warning(f"处理PDF图纸时出错: {str(e)}")
         
@@ -208,6 +216,11 @@ class PromptBuilder:
             return {}
         
         try:
+            cache_key = result_cache.make_key('features_3d', [result_cache.file_digest(model_3d_path)])
+            cached_info = result_cache.get('features_3d', cache_key)
+            if cached_info is not None:
+                return cached_info
+            
             # 处理3D模型
             model_features = process_3d_model(model_3d_path)
             
@@ -220,6 +233,7 @@ class PromptBuilder:
                 'material_info': model_features.get('material_info', {})
             }
             
+            result_cache.put('features_3d', cache_key, processed_info)
             return processed_info
         except Exception as e:
             self.logger.warning(f"处理3D模型时出错: {str(e)}")
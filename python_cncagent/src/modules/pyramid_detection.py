@@ -0,0 +1,327 @@
+"""
+金字塔特征检测模块
+大幅面图纸先在高斯金字塔的降采样层上查找候选轮廓，只把候选所在区域按原分辨率重新做边缘检测和
+轮廓查找（由粗到精），大片空白和构不成特征的噪点不再按原分辨率处理。金字塔按页面图像缓存，
+同一页面的多个检测器共用
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.config import PYRAMID_DETECTION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 区域 (x0, y0, x1, y1)，右、下边界为开区间
+Rect = Tuple[int, int, int, int]
+
+
+class ImagePyramid:
+    """
+    图像金字塔
+
+    第0层为灰度原图（彩色输入只转换一次），第k层由第k-1层经 cv2.pyrDown 得到，按需生成后保留
+
+    Args:
+        image: 页面图像（灰度、BGR或BGRA）
+    """
+
+    def __init__(self, image: np.ndarray):
+        self.source = image
+        if image.ndim == 3:
+            code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+            image = cv2.cvtColor(image, code)
+        self._levels = [image]
+        self._lock = threading.Lock()
+
+    @property
+    def base(self) -> np.ndarray:
+        """原分辨率灰度图"""
+        return self._levels[0]
+
+    def level(self, index: int) -> np.ndarray:
+        """第index层（边长约为原图的 1/2**index）"""
+        with self._lock:
+            while len(self._levels) <= index:
+                self._levels.append(cv2.pyrDown(self._levels[-1]))
+            return self._levels[index]
+
+
+_pyramid_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_image_pyramid(image: np.ndarray) -> ImagePyramid:
+    """
+    获取图像的金字塔，同一图像对象（同一页面）复用缓存，最多缓存 cache_size 张
+
+    缓存按对象身份匹配，原地修改过的图像需要以新数组传入
+    """
+    key = id(image)
+    with _cache_lock:
+        pyramid = _pyramid_cache.get(key)
+        if pyramid is not None and pyramid.source is image:
+            _pyramid_cache.move_to_end(key)
+            return pyramid
+
+    pyramid = ImagePyramid(image)
+    cache_size = PYRAMID_DETECTION_CONFIG['cache_size']
+    if cache_size > 0:
+        with _cache_lock:
+            # 缓存项持有原图引用，对象身份在缓存期间不会被复用
+            _pyramid_cache[key] = pyramid
+            _pyramid_cache.move_to_end(key)
+            while len(_pyramid_cache) > cache_size:
+                _pyramid_cache.popitem(last=False)
+    return pyramid
+
+
+class PyramidDetector:
+    """
+    由粗到精的轮廓检测器
+
+    在第 level 层上二值化并查找轮廓，外接框放大回原分辨率后可能达到 min_area 的轮廓作为候选。
+    候选外接框扩展 merge_margin 后在候选层上绘制，相连的合并成一个细化区域，每个区域按原分辨率
+    （外加卷积核所需的边距）重新二值化并查找轮廓。接触区域边界（图像边界除外）的轮廓不完整，被丢弃；
+    区域外接矩形可能相交，同一轮廓由第一个完整包含它的区域输出。外接框超过 max_refine_size 的候选
+    （图框、零件外轮廓）直接放大候选层轮廓，精度为金字塔的缩放倍数。细化区域覆盖大部分图像
+    （密集剖面线、扫描噪点过多）时返回None，由调用方回退整图检测
+
+    Args:
+        config: 覆盖 PYRAMID_DETECTION_CONFIG 中的部分参数
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        self.config = dict(PYRAMID_DETECTION_CONFIG)
+        self.config.update(config or {})
+
+    def should_use(self, shape: Tuple[int, ...]) -> bool:
+        """按 mode 和图像像素数判断是否使用金字塔检测"""
+        mode = self.config['mode']
+        if mode == 'always':
+            return True
+        if mode == 'never':
+            return False
+        return shape[0] * shape[1] >= self.config['min_pixels']
+
+    def find_contours(self, image: np.ndarray, binarize: Callable[[np.ndarray], np.ndarray],
+                      mode: int = cv2.RETR_LIST, min_area: float = 0.0, halo: int = 0,
+                      coarse_binarize: Optional[Callable[[np.ndarray], np.ndarray]] = None
+                      ) -> Optional[List[np.ndarray]]:
+        """
+        由粗到精查找轮廓
+
+        Args:
+            image (numpy.ndarray): 页面图像，灰度或彩色（按对象缓存金字塔）
+            binarize: 灰度图到二值图的函数，按原分辨率处理细化区域
+            mode (int): cv2.findContours 的轮廓检索模式
+            min_area (float): 特征的最小面积（原分辨率像素），更小的候选不细化
+            halo (int): binarize 结果在区域内保持与整图一致所需读取的额外边距
+            coarse_binarize: 候选层使用的二值化函数，默认与 binarize 相同
+
+        Returns:
+            list: 原分辨率坐标的轮廓（格式与cv2.findContours一致）；细化区域过大时返回None
+        """
+        pyramid = get_image_pyramid(image)
+        base = pyramid.base
+        height, width = base.shape[:2]
+        level = int(self.config['level'])
+        scale = 2 ** level
+        coarse = pyramid.level(level)
+
+        contours, _ = cv2.findContours((coarse_binarize or binarize)(coarse), mode, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return []
+        boxes = np.array([cv2.boundingRect(contour) for contour in contours], dtype=np.int64)
+        # 候选层外接框每边最多少算一个像素，按放宽后的外接框估计原分辨率下的面积上限
+        candidate = (boxes[:, 2] + 2) * (boxes[:, 3] + 2) * scale * scale >= min_area
+        large = candidate & (np.maximum(boxes[:, 2], boxes[:, 3]) * scale > self.config['max_refine_size'])
+
+        regions = self._plan_regions(boxes[candidate & ~large], coarse.shape, scale, width, height)
+        refine_area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+        if refine_area > self.config['max_refine_fraction'] * width * height:
+            logger.info(f"金字塔检测: 细化区域占图像 {refine_area / (width * height):.0%}，回退整图检测")
+            return None
+        logger.info(f"金字塔检测: {width}x{height} 像素, 第{level}层 {int(candidate.sum())} 个候选, "
+                    f"{len(regions)} 个细化区域（占图像 {refine_area / (width * height):.1%}）, "
+                    f"{int(large.sum())} 个大轮廓直接放大")
+
+        rects = np.array(regions, dtype=np.int64).reshape(-1, 4)
+
+        def run(index):
+            return self._refine_region(base, rects, index, binarize, mode, halo)
+
+        workers = self.config['max_workers'] or os.cpu_count() or 1
+        workers = max(1, min(workers, len(regions)))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(run, range(len(regions))))
+        else:
+            results = [run(index) for index in range(len(regions))]
+        found = [contour for region_contours in results for contour in region_contours]
+
+        large = np.flatnonzero(large)
+        if len(large):
+            x, y, w, h = (boxes[large, k] * scale for k in range(4))
+            # 留出一个缩放倍数的余量：完整落在某个细化区域内的大候选已由该区域按原分辨率输出
+            refined = _complete(np.column_stack((x, y, x + w, y + h)), rects, width, height, margin=scale)
+            for index in large[~refined.any(axis=1)].tolist():
+                # 放大到候选层像素覆盖范围的中心
+                found.append((contours[index] * scale + scale // 2).astype(np.int32))
+
+        # 与cv2.findContours相近的输出顺序（按起点的光栅扫描逆序）
+        found.sort(key=lambda contour: (-int(contour[0, 0, 1]), -int(contour[0, 0, 0])))
+        return found
+
+    def find_edge_contours(self, image: np.ndarray, canny_low: float, canny_high: float,
+                           gaussian_kernel: tuple = (1, 1), morph_kernel: tuple = (3, 3),
+                           mode: int = cv2.RETR_LIST, min_area: float = 0.0) -> Optional[List[np.ndarray]]:
+        """
+        高斯模糊 + Canny + 闭运算边缘图的由粗到精轮廓查找
+
+        细化区域与 feature_definition.detect_edges 的处理相同；候选层已经过pyrDown平滑，不再模糊，
+        细线降采样后对比度降低，Canny阈值乘以 coarse_threshold_scale
+
+        Args:
+            image (numpy.ndarray): 页面图像
+            canny_low (float): Canny边缘检测低阈值
+            canny_high (float): Canny边缘检测高阈值
+            gaussian_kernel (tuple): 高斯模糊核大小，(1, 1)表示不模糊
+            morph_kernel (tuple): 闭运算核大小
+            mode (int): cv2.findContours 的轮廓检索模式
+            min_area (float): 特征的最小面积（原分辨率像素）
+
+        Returns:
+            list: 原分辨率坐标的轮廓；细化区域过大时返回None
+        """
+        from src.modules.feature_definition import detect_edges
+        from src.modules.tiled_detection import _edge_halo
+
+        factor = self.config['coarse_threshold_scale']
+
+        def edges(gray):
+            return detect_edges(gray, canny_low, canny_high, gaussian_kernel, morph_kernel)
+
+        def coarse_edges(gray):
+            return detect_edges(gray, canny_low * factor, canny_high * factor, (1, 1), (3, 3))
+
+        return self.find_contours(image, edges, mode=mode, min_area=min_area,
+                                  halo=_edge_halo(gaussian_kernel, morph_kernel), coarse_binarize=coarse_edges)
+
+    def _plan_regions(self, boxes: np.ndarray, coarse_shape: Tuple[int, ...], scale: int,
+                      width: int, height: int) -> List[Rect]:
+        """合并相连的候选，返回按光栅顺序排列的细化区域（原分辨率）"""
+        mask = np.zeros(coarse_shape[:2], dtype=np.uint8)
+        margin = self.config['merge_margin']
+        for x, y, w, h in boxes.tolist():
+            cv2.rectangle(mask, (x - margin, y - margin), (x + w - 1 + margin, y + h - 1 + margin), 255, -1)
+        outlines, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        regions = []
+        for outline in outlines:
+            x, y, w, h = cv2.boundingRect(outline)
+            regions.append((x * scale, y * scale, min(width, (x + w) * scale), min(height, (y + h) * scale)))
+        regions.sort(key=lambda region: (region[1], region[0]))
+        return regions
+
+    @staticmethod
+    def _refine_region(base: np.ndarray, rects: np.ndarray, index: int,
+                       binarize: Callable[[np.ndarray], np.ndarray], mode: int, halo: int) -> List[np.ndarray]:
+        """按原分辨率处理第index个细化区域，返回由该区域负责输出的完整轮廓（全图坐标）"""
+        height, width = base.shape[:2]
+        x0, y0, x1, y1 = rects[index].tolist()
+        hx0, hy0 = max(0, x0 - halo), max(0, y0 - halo)
+        hx1, hy1 = min(width, x1 + halo), min(height, y1 + halo)
+        binary = binarize(base[hy0:hy1, hx0:hx1])
+        binary = np.ascontiguousarray(binary[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0])
+
+        contours, _ = cv2.findContours(binary, mode, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return []
+        boxes = np.array([cv2.boundingRect(contour) for contour in contours], dtype=np.int64)
+        bboxes = np.column_stack((boxes[:, 0] + x0, boxes[:, 1] + y0,
+                                  boxes[:, 0] + boxes[:, 2] + x0, boxes[:, 1] + boxes[:, 3] + y0))
+        complete = _complete(bboxes, rects[:index + 1], width, height)
+        # 在本区域完整，且没有排在前面的区域完整包含
+        owned = complete[:, index] & ~complete[:, :index].any(axis=1)
+        offset = np.array([x0, y0], dtype=np.int32)
+        return [contours[i] + offset for i in np.flatnonzero(owned).tolist()]
+
+
+def _complete(bboxes: np.ndarray, rects: np.ndarray, width: int, height: int, margin: int = 0) -> np.ndarray:
+    """
+    外接框 (x0, y0, x1, y1) 是否完整落在区域内：不接触区域边界（图像边界除外），且与边界至少相距margin
+
+    Returns:
+        np.ndarray: (外接框数, 区域数) 的布尔矩阵
+    """
+    b = bboxes[:, None, :]
+    r = rects[None, :, :]
+    return (((b[..., 0] > r[..., 0] + margin) | (r[..., 0] == 0)) &
+            ((b[..., 1] > r[..., 1] + margin) | (r[..., 1] == 0)) &
+            ((b[..., 2] < r[..., 2] - margin) | (r[..., 2] == width)) &
+            ((b[..., 3] < r[..., 3] - margin) | (r[..., 3] == height)))
+
+
+# 全局金字塔检测器实例
+pyramid_detector = PyramidDetector()
+
+
+def should_use_pyramid(shape: Tuple[int, ...], config: Optional[dict] = None) -> bool:
+    """按 PYRAMID_DETECTION_CONFIG 判断该尺寸的图像是否使用金字塔检测"""
+    detector = PyramidDetector(config) if config else pyramid_detector
+    return detector.should_use(shape)
+
+
+def find_contours_pyramid(image: np.ndarray, binarize: Callable[[np.ndarray], np.ndarray],
+                          mode: int = cv2.RETR_LIST, min_area: float = 0.0, halo: int = 0,
+                          coarse_binarize: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                          config: Optional[dict] = None) -> Optional[List[np.ndarray]]:
+    """
+    由粗到精查找轮廓的便捷函数
+
+    Args:
+        image (numpy.ndarray): 页面图像
+        binarize: 灰度图到二值图的函数
+        mode (int): cv2.findContours 的轮廓检索模式
+        min_area (float): 特征的最小面积（原分辨率像素）
+        halo (int): binarize 需要的额外边距
+        coarse_binarize: 候选层使用的二值化函数（可选）
+        config (dict): 覆盖 PYRAMID_DETECTION_CONFIG 的参数（可选）
+
+    Returns:
+        list: 原分辨率坐标的轮廓；细化区域过大时返回None
+    """
+    detector = PyramidDetector(config) if config else pyramid_detector
+    return detector.find_contours(image, binarize, mode=mode, min_area=min_area, halo=halo,
+                                  coarse_binarize=coarse_binarize)
+
+
+def find_edge_contours_pyramid(image: np.ndarray, canny_low: float, canny_high: float,
+                               gaussian_kernel: tuple = (1, 1), morph_kernel: tuple = (3, 3),
+                               mode: int = cv2.RETR_LIST, min_area: float = 0.0,
+                               config: Optional[dict] = None) -> Optional[List[np.ndarray]]:
+    """
+    边缘图由粗到精查找轮廓的便捷函数
+
+    Args:
+        image (numpy.ndarray): 页面图像
+        canny_low (float): Canny边缘检测低阈值
+        canny_high (float): Canny边缘检测高阈值
+        gaussian_kernel (tuple): 高斯模糊核大小，(1, 1)表示不模糊
+        morph_kernel (tuple): 闭运算核大小
+        mode (int): cv2.findContours 的轮廓检索模式
+        min_area (float): 特征的最小面积（原分辨率像素）
+        config (dict): 覆盖 PYRAMID_DETECTION_CONFIG 的参数（可选）
+
+    Returns:
+        list: 原分辨率坐标的轮廓；细化区域过大时返回None
+    """
+    detector = PyramidDetector(config) if config else pyramid_detector
+    return detector.find_edge_contours(image, canny_low, canny_high, gaussian_kernel, morph_kernel,
+                                       mode=mode, min_area=min_area)
@@ -6,6 +6,11 @@ import os
 from typing import List, Dict
 from datetime import datetime
 
+import numpy as np
+
+from .cycle_time_estimator import estimate_cycle_time
+from .nc_tokenizer import as_table
+
 def generate_simulation_report(features: List[Dict], 
                              description_analysis: Dict, 
                              nc_program: str, 
@@ -51,17 +56,31 @@ def generate_simulation_report(features: List[Dict],
     report.append("")
     
     # 添加NC程序统计
-    lines = nc_program.split('\n')
-    g_codes = [line for line in lines if line.strip().startswith('G')]
-    m_codes = [line for line in lines if line.strip().startswith('M')]
-    tool_changes = [line for line in lines if 'M06' in line]
+    table = as_table(nc_program)
+    lines = table.lines
+    g_code_lines = int(np.count_nonzero(table.first_char == 'G'))
+    m_code_lines = int(np.count_nonzero(table.first_char == 'M'))
+    tool_changes = int(np.count_nonzero(table.lines_with(['M06'])))
     
     report.append("NC程序统计:")
     report.append("-" * 30)
     report.append(f"总行数: {len(lines)}")
-    report.append(f"G代码行数: {len(g_codes)}")
-    report.append(f"M代码行数: {len(m_codes)}")
-    report.append(f"换刀次数: {len(tool_changes)}")
+    report.append(f"G代码行数: {g_code_lines}")
+    report.append(f"M代码行数: {m_code_lines}")
+    report.append(f"换刀次数: {tool_changes}")
+    report.append("")
+
+    # 添加预计加工时间
+    cycle_time = estimate_cycle_time(table)
+    breakdown = cycle_time['breakdown']
+    report.append("预计加工时间:")
+    report.append("-" * 30)
+    report.append(f"总计: {cycle_time['total_seconds'] / 60:.2f} 分钟 ({cycle_time['total_seconds']:.1f} 秒)")
+    report.append(f"快速移动 {breakdown['rapid']:.1f} 秒 / 切削 {breakdown['cutting']:.1f} 秒 / "
+                  f"暂停 {breakdown['dwell']:.1f} 秒 / 主轴加减速 {breakdown['spindle']:.1f} 秒 / "
+                  f"换刀 {breakdown['tool_change']:.1f} 秒")
+    for operation in cycle_time['by_operation']:
+        report.append(f"  {operation['name']} (T{operation['tool']}): {operation['seconds']:.1f} 秒")
     report.append("")
     
     # 添加NC程序预览
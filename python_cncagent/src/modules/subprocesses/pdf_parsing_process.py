@@ -1,6 +1,7 @@
 """
 PDF解析处理子模块
 """
+import logging
 import os
 import re
 import math
@@ -11,6 +12,8 @@ import uuid
 from src.modules.validation import validate_geometry_elements
 from src.modules.mechanical_drawing_expert import MechanicalDrawingExpert
 
+logger = logging.getLogger(__name__)
+
 def extract_geometric_info_from_text(text: str) -> Dict[str, Any]:
     """
     从文本中提取几何信息的辅助函数
@@ -1030,6 +1033,33 @@ def identify_view_orientation(geometry_elements: List[Dict[str, Any]], dimension
         'y_positive_direction': 'down'   # Y轴向下为正
     }
 
+def extract_geometric_info_from_lines(lines: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    逐行从带位置的文本行（见 text_acquisition 模块）中提取几何信息
+
+    每个提取结果附带所在文本行的 page_number、bbox（PDF坐标）和 text_source（text / ocr），
+    供后续按位置把尺寸标注与图形关联
+
+    Args:
+        lines: 文本行列表，包含 text、bbox、page_number 和 source
+
+    Returns:
+        与 extract_geometric_info_from_text 相同结构的字典
+    """
+    merged = {'geometry_elements': [], 'dimensions': [], 'tolerances': [], 'surface_finishes': []}
+    for line in lines:
+        extracted = extract_geometric_info_from_text(line['text'])
+        for key, items in merged.items():
+            for item in extracted[key]:
+                item.update({
+                    'page_number': line.get('page_number', 0),
+                    'bbox': line['bbox'],
+                    'text_source': line.get('source', 'text')
+                })
+                items.append(item)
+    return merged
+
+
 def pdf_parsing_process(file_path: str) -> Dict[str, Any]:
     """
     解析PDF内容的主要函数
@@ -1098,8 +1128,7 @@ def pdf_parsing_process(file_path: str) -> Dict[str, Any]:
                         tolerances.extend(extracted['tolerances'])
                         surface_finishes.extend(extracted['surface_finishes'])
             except ImportError:
-                import logging
-                logging.warning("警告: 未安装PyPDF2，无法解析PDF文本内容")
+                logger.warning("警告: 未安装PyPDF2，无法解析PDF文本内容")
                 # 返回基本结构
                 geometry_elements = [
                     {'id': 'default_rectangle', 'type': 'rectangle', 'bounds': {'x': 10, 'y': 10, 'width': 80, 'height': 60}}
@@ -1113,6 +1142,20 @@ def pdf_parsing_process(file_path: str) -> Dict[str, Any]:
         except Exception as e:
             print(f'PDF解析错误: {e}')
             raise ValueError(f'PDF解析失败: {str(e)}')
+        # 没有提取到文本（扫描图纸或未安装PyPDF2）：文本层优先、扫描页只OCR文字区域，逐行提取并保留位置
+        if not text_content.strip():
+            try:
+                from src.modules.text_acquisition import acquire_pdf_text
+                text_info = acquire_pdf_text(file_path)
+                extracted = extract_geometric_info_from_lines(text_info['lines'])
+                text_content = text_info['text']
+                if any(extracted.values()):
+                    geometry_elements = extracted['geometry_elements']
+                    dimensions = extracted['dimensions']
+                    tolerances = extracted['tolerances']
+                    surface_finishes = extracted['surface_finishes']
+            except Exception as e:
+                logger.warning(f"图纸文字区域识别失败: {str(e)}")
     else:
         # 对于其他文件类型，返回简化数据
         geometry_elements = [
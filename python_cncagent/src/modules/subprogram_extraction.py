@@ -0,0 +1,468 @@
+"""
+子程序提取模块
+同一个型腔或孔组在多个位置加工时，生成的程序会把相同的程序段逐个位置重复写出。
+本模块把每个程序段换算成相对上一位置的增量形式，用滚动哈希在整个程序中查找重复的程序段序列，
+改写为增量子程序（G91 ... G90 M99）并在原位置用 M98 P... L... 调用，最后展开子程序用解释器重放验证
+"""
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import SUBPROGRAM_CONFIG
+from .nc_tokenizer import NCProgramTable, ProgramLike, as_table
+
+_G, _M, _F, _O, _P, _L = (ord(letter) for letter in 'GMFOPL')
+_AXES = {ord('X'): 0, ord('Y'): 1, ord('Z'): 2}
+
+# 滚动哈希的底数（奇数，在2^64下可逆）
+_HASH_BASE = 0x9E3779B97F4A7C15
+
+
+class SubprogramExtractor:
+    """
+    重复程序段提取器
+
+    只有绝对坐标（G90）、不在固定循环和刀具半径补偿中、且只含插补、暂停、主轴和冷却液指令的程序段
+    才能放进子程序；换刀、坐标系、长度补偿、G28/G53/G92等程序段和宏程序行把程序分隔开。
+    比较程序段时同时比较其执行时的模态（插补方式、进给、平面），保证各处调用的运动完全相同
+
+    Args:
+        config: 覆盖 SUBPROGRAM_CONFIG 中的部分参数
+    """
+
+    # 可以放进增量子程序的G、M代码
+    MOVABLE_G = (0, 1, 2, 3, 4)
+    MOVABLE_M = (3, 4, 5, 7, 8, 9)
+    # 除G/M和坐标外可以出现的地址（P只能是G04的暂停时间）
+    DATA_ADDRESSES = 'IJKRFSP'
+    CYCLES = (73, 74, 76, 81, 82, 83, 84, 85, 86, 87, 88, 89)
+    # 执行后坐标无法按程序段推算的G代码
+    POSITION_RESETS = (10, 28, 29, 30, 52, 53, 92)
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(SUBPROGRAM_CONFIG)
+        self.config.update(config or {})
+        self.logger = logging.getLogger(__name__)
+
+    def extract(self, nc_program: ProgramLike) -> Tuple[str, Dict]:
+        """
+        提取重复程序段为子程序
+
+        Args:
+            nc_program: NC程序（文本或已切分好的地址字表）
+
+        Returns:
+            Tuple[str, Dict]: 改写后的程序（子程序附在主程序之后），以及统计信息
+                subprograms、calls、lines_before、lines_after、bytes_before、bytes_after、reduction、verified、seconds
+        """
+        began = time.perf_counter()
+        table = as_table(nc_program)
+        tokens, bodies, completions, filler = self._signatures(table)
+        patterns = self._find_repeats(tokens, filler)
+        result = self._emit(table.lines, bodies, completions, patterns) if patterns else table.text
+
+        verified = None
+        if patterns and self.config['verify']:
+            from .nc_interpreter import same_motion
+
+            tolerance = 10.0 ** -int(self.config['decimal_places']) + 1e-9
+            try:
+                verified = same_motion(table, expand_subprograms(result), tolerance)
+            except Exception as e:
+                self.logger.warning(f"重放NC程序失败: {str(e)}")
+                verified = False
+            if not verified:
+                self.logger.warning("提取子程序后的运动轨迹与原程序不一致，返回原程序")
+                result, patterns = table.text, []
+
+        bytes_before = len(table.data)
+        bytes_after = len(result.encode('utf-8'))
+        report = {
+            'subprograms': len(patterns),
+            'calls': sum(len(pattern['runs']) for pattern in patterns),
+            'lines_before': table.n_lines,
+            'lines_after': result.count('\n') + 1,
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'reduction': (bytes_before - bytes_after) / bytes_before if bytes_before else 0.0,
+            'verified': verified,
+            'seconds': time.perf_counter() - began
+        }
+        self.logger.debug(f"子程序提取: {len(patterns)} 个子程序，{table.n_lines} -> {report['lines_after']} 行")
+        return result, report
+
+    # ---- 程序段的增量形式 ----
+
+    def _signatures(self, table: NCProgramTable) -> Tuple[np.ndarray, List[Optional[str]], Dict, np.ndarray]:
+        """
+        把每行换算成增量形式
+
+        Returns:
+            tokens: 每行的编号，增量形式和执行模态都相同的行编号相同，不能提取的行为负数（各不相同）
+            bodies: 可提取行在子程序中的文本
+            completions: 可提取的移动程序段作为子程序第一个移动时需要补上的 (01组代码, 进给)，不需要的为None
+            filler: 空行和只有注释的行
+        """
+        n = table.n_lines
+        places = int(self.config['decimal_places'])
+        ignore_comments = self.config['ignore_comments']
+        ends = np.flatnonzero(table.lines_with(['M02', 'M30']))
+        stop = int(ends[0]) if ends.size else n
+
+        letters = table.word_letter.tolist()
+        values = table.word_value.tolist()
+        bounds = table.line_word_start.tolist()
+        invalid = table.invalid.tolist()
+        comment_start = table.comment_start.tolist()
+        comment_end = table.comment_end.tolist()
+        data = table.data
+        texts = [chr(letter) + "".join(data[begin:stop_].decode('ascii', 'ignore').split())
+                 for letter, begin, stop_ in zip(letters, table.word_num_start.tolist(), table.word_num_end.tolist())]
+
+        keys: Dict[str, int] = {}
+        tokens = -1 - np.arange(n, dtype=np.int64)
+        filler = np.zeros(n, dtype=bool)
+        bodies: List[Optional[str]] = [None] * n
+        completions: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+
+        absolute = True
+        motion: Optional[int] = None
+        feed: Optional[str] = None
+        plane = 17
+        cycle = False
+        cutter_comp = 40
+        position: List[Optional[float]] = [None, None, None]
+
+        for line in range(stop):
+            start, end = bounds[line], bounds[line + 1]
+            if invalid[line]:
+                # 宏程序等无法识别的行之后状态未知
+                absolute, motion, feed, cycle, cutter_comp = None, None, None, None, None
+                position = [None, None, None]
+                continue
+            comment = ''
+            if comment_start[line] >= 0 and not ignore_comments:
+                offset = int(table.line_offsets[line])
+                comment = data[offset + comment_start[line]:offset + comment_end[line]].decode('utf-8', 'replace')
+            if start == end:
+                filler[line] = True
+                tokens[line] = keys.setdefault(comment, len(keys))
+                bodies[line] = comment
+                continue
+
+            words = list(zip(letters[start:end], values[start:end], texts[start:end]))
+            g_codes = [value for letter, value, _ in words if letter == _G]
+            m_codes = [value for letter, value, _ in words if letter == _M]
+            dwell = 4 in g_codes
+            movable = (all(code in self.MOVABLE_G for code in g_codes)
+                       and all(code in self.MOVABLE_M for code in m_codes))
+
+            for code in g_codes:
+                if code in (0, 1, 2, 3):
+                    motion, cycle = int(code), False
+                elif code in self.CYCLES:
+                    cycle = True
+                elif code == 80:
+                    cycle = False
+                elif code in (90, 91):
+                    absolute = code == 90
+                elif code in (17, 18, 19):
+                    plane = int(code)
+                elif code in (40, 41, 42):
+                    cutter_comp = int(code)
+            for letter, _, text in words:
+                if letter == _F:
+                    feed = text
+
+            axes = [(_AXES[letter], value, text) for letter, value, text in words
+                    if letter in _AXES and not dwell]
+            movable = (movable and absolute is True and cycle is False and cutter_comp == 40
+                       and all(chr(letter) in self.DATA_ADDRESSES + 'GMXYZ' for letter, _, _ in words)
+                       and (dwell or not any(letter == _P for letter, _, _ in words))
+                       and all(position[axis] is not None and '.' in text for axis, _, text in axes))
+            if axes:
+                movable = movable and motion is not None and (motion == 0 or feed is not None)
+
+            if movable:
+                parts = []
+                for letter, value, text in words:
+                    axis = _AXES.get(letter) if not dwell else None
+                    if axis is None:
+                        parts.append(text)
+                    else:
+                        delta = round(value, places) - round(position[axis], places)
+                        parts.append(f"{text[0]}{delta + 0.0:.{places}f}")
+                body = ' '.join(parts)
+                if comment:
+                    body = f"{body} {comment}"
+                context = ''
+                if axes:
+                    context = f"G{motion:02d}" + (f" {feed}" if motion else '') + (f" G{plane}" if motion > 1 else '')
+                    has_motion = any(code in (0, 1, 2, 3) for code in g_codes)
+                    has_feed = any(letter == _F for letter, _, _ in words)
+                    completions[line] = (None if has_motion else f"G{motion:02d}",
+                                         feed if motion and not has_feed else None)
+                tokens[line] = keys.setdefault(f"{body}|{context}", len(keys))
+                bodies[line] = body
+
+            # 更新坐标
+            if any(code in self.POSITION_RESETS for code in g_codes) or any(code in (98, 99) for code in m_codes):
+                position = [None, None, None]
+            elif cycle:
+                for axis, value, _ in axes:
+                    position[axis] = None if axis == 2 or not absolute else value
+            else:
+                for axis, value, _ in axes:
+                    if absolute:
+                        position[axis] = value
+                    elif absolute is False and position[axis] is not None:
+                        position[axis] += value
+                    else:
+                        position[axis] = None
+        return tokens, bodies, completions, filler
+
+    # ---- 查找重复序列 ----
+
+    def _find_repeats(self, tokens: np.ndarray, filler: np.ndarray) -> List[Dict]:
+        """
+        贪心地查找节省行数最多的重复序列，直到节省不足 min_saved_lines 或子程序数达到上限
+
+        Returns:
+            List[Dict]: 每个子程序的 number、length（程序段数）、starts（各出现位置的起始行）、
+                        runs（调用列表，每项为 (起始行, 连续重复次数)）
+        """
+        ids = tokens.copy()
+        patterns: List[Dict] = []
+        number = int(self.config['first_program_number'])
+        while len(patterns) < int(self.config['max_subprograms']):
+            candidate = self._best_repeat(ids, filler)
+            if candidate is None:
+                break
+            length, starts = self._extend(ids, *candidate)
+            runs = self._runs(starts, length)
+            saved = len(starts) * length - len(runs) - (length + 5)
+            if len(starts) < 2 or saved < int(self.config['min_saved_lines']):
+                break
+            patterns.append({'number': number, 'length': length, 'starts': starts, 'runs': runs})
+            number += 1
+            # 已替换的行不再参与后续查找
+            for start in starts:
+                ids[start:start + length] = -1 - np.arange(start, start + length)
+        return patterns
+
+    def _best_repeat(self, ids: np.ndarray, filler: np.ndarray) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        对一组几何增长的长度计算所有窗口的滚动哈希，按哈希分组估算每组不重叠出现的次数和节省的行数，
+        返回节省最多的 (长度, 出现位置)；每个长度只需一次排序，百万行程序也能在数秒内完成
+        """
+        n = ids.size
+        min_length = max(int(self.config['min_block_lines']), 1)
+        max_length = min(int(self.config['max_block_lines']), n // 2)
+        if max_length < min_length:
+            return None
+
+        valid = ids >= 0
+        broken = np.concatenate(([0], np.cumsum(~valid)))
+        values = np.where(valid, ids, 0).astype(np.uint64) + np.uint64(1)
+        base = np.uint64(_HASH_BASE)
+        inverse = np.uint64(pow(_HASH_BASE, -1, 1 << 64))
+        powers = np.cumprod(np.concatenate(([np.uint64(1)], np.full(n - 1, base, dtype=np.uint64))), dtype=np.uint64)
+        inverse_powers = np.cumprod(np.concatenate(([np.uint64(1)], np.full(n - 1, inverse, dtype=np.uint64))),
+                                    dtype=np.uint64)
+        # prefix[i] = Σ_{j<i} values[j]·base^-j，窗口 [i, i+L) 的哈希 (prefix[i+L]-prefix[i])·base^i 与位置无关
+        prefix = np.concatenate(([np.uint64(0)], np.cumsum(values * inverse_powers, dtype=np.uint64)))
+
+        best = None
+        best_saved = 0
+        length = min_length
+        while length <= max_length:
+            starts = np.flatnonzero((broken[length:] - broken[:-length] == 0) & ~filler[:n - length + 1])
+            if starts.size >= 2:
+                hashes = (prefix[starts + length] - prefix[starts]) * powers[starts]
+                order = np.lexsort((starts, hashes))
+                hashes, starts = hashes[order], starts[order]
+                new_group = np.concatenate(([True], hashes[1:] != hashes[:-1]))
+                # 同组内与上一个出现位置不重叠的才计数（贪心计数的近似）
+                apart = np.concatenate(([False], starts[1:] - starts[:-1] >= length))
+                group = np.cumsum(new_group) - 1
+                counts = np.bincount(group, weights=(new_group | apart).astype(np.float64))
+                saved = counts * (length - 1) - (length + 5)
+                top = int(np.argmax(saved))
+                if saved[top] > best_saved:
+                    best_saved = saved[top]
+                    best = (length, starts[group == top])
+            length = max(length + 1, int(length * 1.5))
+        return best
+
+    @staticmethod
+    def _extend(ids: np.ndarray, length: int, starts: np.ndarray) -> Tuple[int, np.ndarray]:
+        """核对各出现位置（排除哈希冲突）、选出互不重叠的位置，再向前后扩展到最长的共同序列"""
+        reference = ids[starts[0]:starts[0] + length]
+        chosen = []
+        last_end = -1
+        for start in np.sort(starts):
+            if start >= last_end and np.array_equal(ids[start:start + length], reference):
+                chosen.append(int(start))
+                last_end = start + length
+        starts = np.array(chosen, dtype=np.int64)
+        if starts.size < 2:
+            return length, starts
+
+        n = ids.size
+        while True:
+            following = starts + length
+            if following[-1] >= n or ids[following[0]] < 0 or np.any(ids[following] != ids[following[0]]):
+                break
+            if np.any(following[:-1] >= starts[1:]):
+                break
+            length += 1
+        while True:
+            previous = starts - 1
+            if previous[0] < 0 or ids[previous[0]] < 0 or np.any(ids[previous] != ids[previous[0]]):
+                break
+            if np.any(previous[1:] < starts[:-1] + length):
+                break
+            starts = previous
+            length += 1
+        return length, starts
+
+    @staticmethod
+    def _runs(starts: np.ndarray, length: int) -> List[Tuple[int, int]]:
+        """首尾相接的出现位置合并为一次 M98 ... L 调用"""
+        runs: List[List[int]] = []
+        for start in starts.tolist():
+            if runs and runs[-1][0] + runs[-1][1] * length == start:
+                runs[-1][1] += 1
+            else:
+                runs.append([start, 1])
+        return [(start, count) for start, count in runs]
+
+    # ---- 输出 ----
+
+    def _emit(self, lines: List[str], bodies: List[Optional[str]], completions: Dict,
+              patterns: List[Dict]) -> str:
+        """主程序中的重复序列替换为M98调用，子程序附在主程序之后（末尾的%之前）"""
+        calls = {}
+        for pattern in patterns:
+            for start, count in pattern['runs']:
+                calls[start] = (pattern['number'], count, pattern['length'] * count)
+
+        output = []
+        line = 0
+        while line < len(lines):
+            if line in calls:
+                number, count, span = calls[line]
+                output.append(f"M98 P{number}" + (f" L{count}" if count > 1 else ''))
+                line += span
+            else:
+                output.append(lines[line])
+                line += 1
+
+        tail = []
+        while output and output[-1].strip() in ('', '%'):
+            tail.insert(0, output.pop())
+        for pattern in patterns:
+            output.extend(self._subprogram(bodies, completions, pattern))
+        return '\n'.join(output + tail)
+
+    @staticmethod
+    def _subprogram(bodies: List[Optional[str]], completions: Dict, pattern: Dict) -> List[str]:
+        """
+        增量子程序的文本
+
+        第一个移动程序段补上执行时的插补方式和进给（各调用位置相同），使子程序不依赖调用前的模态
+        """
+        start, length = int(pattern['starts'][0]), pattern['length']
+        calls = sum(count for _, count in pattern['runs'])
+        lines = ["", f"O{pattern['number']:04d} (SUBPROGRAM - {length} BLOCKS, {calls} CALLS)", "G91"]
+        completed = False
+        for line in range(start, start + length):
+            body = bodies[line]
+            if not body:
+                continue
+            if not completed and line in completions:
+                motion, feed = completions[line]
+                body = ' '.join(word for word in (motion, body, feed) if word)
+                completed = True
+            lines.append(body)
+        lines.extend(["G90", "M99"])
+        return lines
+
+
+def expand_subprograms(nc_program: ProgramLike, max_depth: int = 4) -> str:
+    """
+    把主程序中的 M98 调用展开为子程序的程序段（子程序取自同一文件中主程序之后的O程序）
+
+    支持 M98 Pxxxx Lnn 和 M98 Pnnnxxxx 两种重复次数写法；调用行中含有其他地址字、
+    或调用的子程序不在文件中时保留原行
+
+    Args:
+        nc_program: 带子程序的NC程序
+        max_depth: 子程序嵌套展开的最大层数
+
+    Returns:
+        str: 展开后的主程序（不含子程序定义）
+    """
+    table = as_table(nc_program)
+    lines = table.lines
+    main_stop = table.main_stop
+    letters = table.word_letter.tolist()
+    values = table.word_value.tolist()
+    bounds = table.line_word_start.tolist()
+
+    subprograms: Dict[int, List[int]] = {}
+    number = None
+    for line in range(main_stop, table.n_lines):
+        words = list(zip(letters[bounds[line]:bounds[line + 1]], values[bounds[line]:bounds[line + 1]]))
+        if words and words[0][0] == _O and not np.isnan(words[0][1]):
+            number = int(words[0][1])
+            subprograms[number] = []
+        elif number is not None:
+            if (_M, 99) in words:
+                number = None
+            else:
+                subprograms[number].append(line)
+
+    calls: Dict[int, Tuple[int, int]] = {}
+    for line in np.flatnonzero(table.lines_with(['M98'])).tolist():
+        words = dict(zip(letters[bounds[line]:bounds[line + 1]], values[bounds[line]:bounds[line + 1]]))
+        if set(words) - {_M, _P, _L} or np.isnan(words.get(_P, np.nan)):
+            continue
+        target, count = int(words[_P]), words.get(_L)
+        if count is None and target > 9999:
+            target, count = target % 10000, target // 10000
+        if target in subprograms:
+            calls[line] = (target, 1 if count is None or np.isnan(count) else int(count))
+
+    def expand(line_numbers, depth: int) -> List[str]:
+        out = []
+        for line in line_numbers:
+            target = calls.get(line) if depth < max_depth else None
+            if target is None:
+                out.append(lines[line])
+            else:
+                out.extend(expand(subprograms[target[0]], depth + 1) * target[1])
+        return out
+
+    return '\n'.join(expand(range(main_stop), 0))
+
+
+# 创建全局子程序提取器实例
+subprogram_extractor = SubprogramExtractor()
+
+
+def extract_subprograms(nc_program: ProgramLike, config: Optional[Dict] = None) -> Tuple[str, Dict]:
+    """
+    把NC程序中重复的程序段序列提取为增量子程序
+
+    Args:
+        nc_program: NC程序代码
+        config: 覆盖 SUBPROGRAM_CONFIG 中的部分参数
+
+    Returns:
+        Tuple[str, Dict]: (改写后的程序, 子程序数、调用次数、前后行数和字节数等统计信息)
+    """
+    extractor = SubprogramExtractor(config) if config else subprogram_extractor
+    return extractor.extract(nc_program)
@@ -0,0 +1,369 @@
+"""
+图纸文本获取模块
+优先用 page.get_text("dict") 读取PDF自带文本层中带位置的文本行，只对没有文本层的页面或页面中
+没有文本覆盖的位图区域渲染后OCR（默认只识别其中检测出的文字区域，见 text_regions 模块）。CAD导出的图纸全部文字都在文本层中，不需要渲染和Tesseract；
+OCR识别出的文本行同样带外接框，坐标统一为未旋转页面坐标系下的PDF单位（pt）。
+OCR先按较低的DPI识别，只把置信度低的单词从PDF按高DPI重新渲染后再识别
+"""
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import fitz
+import numpy as np
+
+from src.config import OCR_CONFIG, PDF_PROCESSING_CONFIG, TEXT_ACQUISITION_CONFIG, TEXT_REGION_CONFIG
+from src.job_queue import report_progress, with_current_job
+from .pdf_parsing_process import _resolve_worker_count, ocr_buffer_lines
+from .text_regions import text_region_detector
+
+
+class TextAcquirer:
+    """
+    图纸文本获取器
+
+    每页先读取文本层的文本行，按非空白字符数判断文本层是否可用：字符过少的页面（扫描件、
+    文字转曲的图纸）整页OCR；有文本层时只OCR其中没有文本覆盖的位图区域（如贴入的扫描视图）。
+    页面覆盖率为不需要OCR的面积占页面面积的比例。OCR结果中置信度低于 OCR_CONFIG['confidence_threshold']
+    的单词（小号公差、细小标注）按 refine_dpi 只渲染该单词的外接框重新识别，置信度提高时替换，
+    不必整页按高DPI渲染识别
+
+    Args:
+        config: 覆盖 TEXT_ACQUISITION_CONFIG 中的部分参数
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(TEXT_ACQUISITION_CONFIG)
+        self.config.update(config or {})
+        self.logger = logging.getLogger(__name__)
+
+    def acquire(self, pdf_path: str, dpi: Optional[int] = None, lang: str = 'chi_sim+eng',
+                run_ocr: bool = True, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        获取整个PDF的文本
+
+        文本层在主线程中读取（fitz文档不是线程安全的），需要OCR的区域渲染后在线程池中识别
+
+        Args:
+            pdf_path (str): PDF文件路径
+            dpi (int): OCR渲染DPI，默认取配置值
+            lang (str): OCR语言
+            run_ocr (bool): 是否对缺少文本层的区域执行OCR，False时只读取文本层
+            max_workers (int): OCR线程数，None表示使用 PDF_PROCESSING_CONFIG
+
+        Returns:
+            dict: text（全部文本）、layer_text（文本层文本）、ocr_text（OCR文本）、
+                lines（带位置的文本行）和 pages（每页的来源、字符数、覆盖率和OCR区域）
+        """
+        dpi = self._resolve_dpi(dpi)
+        pages, lines, tasks = [], [], []
+        with fitz.open(pdf_path) as document:
+            for page_num in range(len(document)):
+                page = document[page_num]
+                page_info, page_lines, regions = self._plan_page(page, page_num)
+                pages.append(page_info)
+                lines.append(page_lines)
+                if run_ocr:
+                    tasks.extend((page, page_num, region) for region in regions)
+
+            results = self._run_ocr(tasks, dpi, lang, max_workers, len(pages)) if tasks else []
+
+        # OCR文本行按区域顺序排在该页文本层之后
+        for (_, page_num, _), region_lines in zip(tasks, results):
+            lines[page_num].extend(region_lines)
+        return self._assemble(pages, lines)
+
+    def acquire_page(self, page: Any, page_num: int = 0, dpi: Optional[int] = None,
+                     lang: str = 'chi_sim+eng', run_ocr: bool = True) -> Dict[str, Any]:
+        """
+        获取单页文本
+
+        Args:
+            page: fitz.Page 页面对象
+            page_num (int): 页码，写入文本行的 page_number
+            dpi (int): OCR渲染DPI，默认取配置值
+            lang (str): OCR语言
+            run_ocr (bool): 是否对缺少文本层的区域执行OCR
+
+        Returns:
+            dict: 与 acquire 返回值相同，pages 只包含这一页
+        """
+        dpi = self._resolve_dpi(dpi)
+        page_info, lines, regions = self._plan_page(page, page_num)
+        if run_ocr and regions:
+            tasks = [(page, page_num, region) for region in regions]
+            for region_lines in self._run_ocr(tasks, dpi, lang, None, page_num + 1):
+                lines.extend(region_lines)
+        return self._assemble([page_info], [lines])
+
+    def text_lines(self, page: Any, page_num: int = 0) -> List[Dict[str, Any]]:
+        """
+        读取页面文本层的文本行
+
+        同一行中字体不同的片段（如φ符号和数字）合并为一行
+
+        Returns:
+            list: 文本行，包含 page_number、text、bbox（x0, y0, x1, y1）、source（text）和 confidence
+        """
+        lines = []
+        for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+            for line in block.get("lines", ()):
+                text = "".join(span["text"] for span in line["spans"]).strip()
+                if text:
+                    lines.append({
+                        "page_number": page_num,
+                        "text": text,
+                        "bbox": tuple(line["bbox"]),
+                        "source": "text",
+                        "confidence": 1.0
+                    })
+        return lines
+
+    def _resolve_dpi(self, dpi: Optional[int]) -> int:
+        """显式参数优先，其次是本模块配置，最后是页面流水线的默认DPI"""
+        return dpi or self.config['dpi'] or PDF_PROCESSING_CONFIG['default_dpi']
+
+    def _plan_page(self, page: Any, page_num: int) -> Tuple[Dict[str, Any], List[Dict], List[fitz.Rect]]:
+        """读取文本层并确定需要OCR的区域（未旋转页面坐标），返回 (页面信息, 文本行, OCR区域)"""
+        lines = self.text_lines(page, page_num)
+        char_count = sum(len("".join(line["text"].split())) for line in lines)
+        page_rect = page.rect * page.derotation_matrix
+        page_area = page_rect.get_area() or 1.0
+
+        if char_count < self.config['min_page_chars']:
+            regions = [page_rect]
+        else:
+            regions = []
+            for image in page.get_image_info():
+                region = fitz.Rect(image["bbox"]) & page_rect
+                if region.is_empty or region.get_area() < self.config['min_region_area'] * page_area:
+                    continue
+                if any(region in other for other in regions):
+                    continue
+                # 中心落在位图区域内的文本行视为覆盖该区域（可检索的扫描件自带OCR文本层）
+                inside = sum(len("".join(line["text"].split())) for line in lines
+                             if region.contains(fitz.Point((line["bbox"][0] + line["bbox"][2]) / 2,
+                                                           (line["bbox"][1] + line["bbox"][3]) / 2)))
+                if inside < self.config['min_region_chars']:
+                    regions.append(region)
+
+        ocr_area = min(sum(region.get_area() for region in regions), page_area)
+        if not regions:
+            source = "text"
+        elif regions[0] == page_rect:
+            source = "ocr"
+        else:
+            source = "mixed"
+        page_info = {
+            "page_number": page_num,
+            "source": source,
+            "char_count": char_count,
+            "coverage": 1.0 - ocr_area / page_area,
+            "ocr_regions": [tuple(region) for region in regions]
+        }
+        return page_info, lines, regions
+
+    @staticmethod
+    def _render_region(page: Any, region: fitz.Rect, dpi: int) -> Tuple[bytes, int, int, fitz.Point, fitz.Matrix]:
+        """
+        渲染区域为灰度像素，返回 (像素, 宽, 高, 像素原点, 像素到页面坐标的变换)
+
+        clip按页面旋转后的坐标给出，像素坐标先换算回旋转后的页面坐标再去除旋转
+        """
+        zoom = dpi / 72
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=region * page.rotation_matrix,
+                              colorspace=fitz.csGRAY)
+        to_page = fitz.Matrix(1 / zoom, 1 / zoom) * page.derotation_matrix
+        return pix.samples, pix.width, pix.height, fitz.Point(pix.x, pix.y), to_page
+
+    def _run_ocr(self, tasks: List[Tuple[Any, int, fitz.Rect]], dpi: int, lang: str,
+                 max_workers: Optional[int], page_count: int) -> List[List[Dict[str, Any]]]:
+        """
+        识别 (页面, 页码, 区域) 任务，返回每个任务换算为页面坐标的文本行
+
+        区域在主线程中依次渲染（fitz文档不是线程安全的），拆成的OCR作业在线程池中执行，
+        在途作业数有上限以限制内存。识别完成后在同一线程池中重新识别低置信度单词
+        """
+        if TEXT_REGION_CONFIG['enabled']:
+            # 每个区域拆成多个文字区域作业，线程数不受区域数限制
+            workers = _resolve_worker_count(max_workers, os.cpu_count() or 1)
+        else:
+            workers = _resolve_worker_count(max_workers, len(tasks))
+        frames = []
+        slots = [[] for _ in tasks]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+            for index, (page, page_num, region) in enumerate(tasks):
+                report_progress('ocr', page=page_num + 1, pages=page_count)
+                samples, width, height, origin, to_page = self._render_region(page, region, dpi)
+                frames.append((origin, to_page, page_num))
+                for function, args in self._ocr_jobs(samples, width, height, dpi, lang):
+                    if len(pending) >= workers * PDF_PROCESSING_CONFIG['max_pending_pages']:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            task, slot = pending.pop(future)
+                            slots[task][slot] = future.result()
+                    pending[executor.submit(with_current_job(function), *args)] = (index, len(slots[index]))
+                    slots[index].append([])
+            for future, (task, slot) in pending.items():
+                slots[task][slot] = future.result()
+
+            results = []
+            for (origin, to_page, page_num), jobs in zip(frames, slots):
+                results.append([self._to_page_line(line, origin, to_page, page_num, dpi)
+                                for lines in jobs for line in lines])
+            if self.config['refine_dpi'] and self.config['refine_dpi'] > dpi:
+                self._refine(executor, tasks, results, lang)
+        return results
+
+    def _refine(self, executor: ThreadPoolExecutor, tasks: List[Tuple[Any, int, fitz.Rect]],
+                results: List[List[Dict[str, Any]]], lang: str) -> None:
+        """
+        按 refine_dpi 重新识别低置信度单词，原地更新文本行
+
+        只渲染单词外接框（加留白，限制在原OCR区域内），按原文字区域类型识别；重新识别的置信度更高时
+        替换单词，文本行的文本和置信度由单词重新拼接
+        """
+        refine_dpi = self.config['refine_dpi']
+        padding = self.config['refine_padding']
+        refined = []
+        for (page, _, region), lines in zip(tasks, results):
+            for line in lines:
+                for word in line["words"]:
+                    if word["confidence"] >= OCR_CONFIG['confidence_threshold']:
+                        continue
+                    clip = (fitz.Rect(word["bbox"]) + (-padding, -padding, padding, padding)) & region
+                    if clip.is_empty:
+                        continue
+                    samples, width, height, _, _ = self._render_region(page, clip, refine_dpi)
+                    future = executor.submit(with_current_job(self._recognize_word), samples, width, height, lang,
+                                             line.get("kind"), line.get("vertical", False))
+                    refined.append((future, line, word))
+
+        for future, line, word in refined:
+            words = future.result()
+            if not words:
+                continue
+            confidence = sum(result["confidence"] for result in words) / len(words)
+            if confidence > word["confidence"]:
+                word.update(text=" ".join(result["text"] for result in words), confidence=confidence,
+                            dpi=refine_dpi)
+                line.update(text=" ".join(item["text"] for item in line["words"]),
+                            confidence=sum(item["confidence"] for item in line["words"]) / len(line["words"]),
+                            dpi=refine_dpi)
+
+    def _recognize_word(self, samples: bytes, width: int, height: int, lang: str, kind: Optional[str],
+                        vertical: bool) -> List[Dict[str, Any]]:
+        """识别一个重新渲染的单词：有文字区域类型时沿用该类型的识别参数，否则按单行识别"""
+        if kind:
+            gray = np.frombuffer(samples, np.uint8).reshape(height, width)
+            region = {"bbox": (0, 0, width, height), "kind": kind, "vertical": vertical}
+            return text_region_detector.ocr_region(gray, region, lang)
+        return self._ocr_buffer(samples, width, height, lang, psm=self.config['refine_psm'])
+
+    def _ocr_jobs(self, samples: bytes, width: int, height: int, dpi: int,
+                  lang: str) -> List[Tuple[Callable, tuple]]:
+        """
+        一个渲染区域的OCR作业 (函数, 参数)，函数返回像素坐标的文本行
+
+        开启文字区域检测（TEXT_REGION_CONFIG）时只识别检测出的尺寸标注、注释和标题栏，每个文字区域一个作业；
+        否则整个区域作为一个作业
+        """
+        if not TEXT_REGION_CONFIG['enabled']:
+            return [(self._ocr_buffer, (samples, width, height, lang))]
+        gray = np.frombuffer(samples, np.uint8).reshape(height, width)
+        return [(text_region_detector.ocr_region, (gray, region, lang))
+                for region in text_region_detector.detect(gray, dpi)]
+
+    def _ocr_buffer(self, samples: bytes, width: int, height: int, lang: str,
+                    psm: Optional[int] = None) -> List[Dict[str, Any]]:
+        """整块识别一个渲染区域；OCR失败时返回空列表"""
+        try:
+            if psm is not None:
+                return ocr_buffer_lines(samples, width, height, 1, lang=lang, psm=psm)
+            return ocr_buffer_lines(samples, width, height, 1, lang=lang)
+        except Exception as e:
+            self.logger.warning(f"OCR处理失败: {str(e)}。请确保已安装Tesseract OCR引擎并添加到系统PATH中。")
+            return []
+
+    @staticmethod
+    def _to_page_line(result: Dict[str, Any], origin: fitz.Point, to_page: fitz.Matrix,
+                      page_num: int, dpi: int) -> Dict[str, Any]:
+        """像素坐标的OCR文本行换算为页面坐标；没有单词信息的结果整行作为一个单词"""
+        def to_page_bbox(pixel_bbox):
+            x0, y0, x1, y1 = pixel_bbox
+            return tuple(fitz.Rect(origin.x + x0, origin.y + y0, origin.x + x1, origin.y + y1) * to_page)
+
+        words = result.get("words") or [result]
+        line = {
+            "page_number": page_num,
+            "text": result["text"],
+            "bbox": to_page_bbox(result["bbox"]),
+            "source": "ocr",
+            "confidence": result["confidence"],
+            "dpi": dpi,
+            "words": [{"text": word["text"], "bbox": to_page_bbox(word["bbox"]), "confidence": word["confidence"]}
+                      for word in words]
+        }
+        for key in ("kind", "vertical"):
+            if key in result:
+                line[key] = result[key]
+        return line
+
+    @staticmethod
+    def _assemble(pages: List[Dict], lines: List[List[Dict]]) -> Dict[str, Any]:
+        """按页拼接文本行，分别给出全部文本、文本层文本和OCR文本"""
+        all_lines = [line for page_lines in lines for line in page_lines]
+        return {
+            "text": "\n".join(line["text"] for line in all_lines),
+            "layer_text": "\n".join(line["text"] for line in all_lines if line["source"] == "text"),
+            "ocr_text": "\n".join(line["text"] for line in all_lines if line["source"] == "ocr"),
+            "lines": all_lines,
+            "pages": pages
+        }
+
+
+# 全局文本获取器实例
+text_acquirer = TextAcquirer()
+
+
+def acquire_pdf_text(pdf_path: str, dpi: Optional[int] = None, lang: str = 'chi_sim+eng',
+                     run_ocr: bool = True, max_workers: Optional[int] = None,
+                     config: Optional[Dict] = None) -> Dict[str, Any]:
+    """
+    获取PDF图纸文本的便捷函数：文本层优先，只OCR缺少文本层的页面或区域
+
+    Args:
+        pdf_path (str): PDF文件路径
+        dpi (int): OCR渲染DPI，默认取配置值
+        lang (str): OCR语言
+        run_ocr (bool): 是否对缺少文本层的区域执行OCR
+        max_workers (int): OCR线程数
+        config (dict): 覆盖 TEXT_ACQUISITION_CONFIG 的参数（可选）
+
+    Returns:
+        dict: text、layer_text、ocr_text、lines（带位置的文本行）和 pages
+    """
+    acquirer = TextAcquirer(config) if config else text_acquirer
+    return acquirer.acquire(pdf_path, dpi=dpi, lang=lang, run_ocr=run_ocr, max_workers=max_workers)
+
+
+def acquire_page_text(page: Any, page_num: int = 0, dpi: Optional[int] = None, lang: str = 'chi_sim+eng',
+                      run_ocr: bool = True, config: Optional[Dict] = None) -> Dict[str, Any]:
+    """
+    获取单个页面文本的便捷函数
+
+    Args:
+        page: fitz.Page 页面对象
+        page_num (int): 页码
+        dpi (int): OCR渲染DPI，默认取配置值
+        lang (str): OCR语言
+        run_ocr (bool): 是否对缺少文本层的区域执行OCR
+        config (dict): 覆盖 TEXT_ACQUISITION_CONFIG 的参数（可选）
+
+    Returns:
+        dict: text、layer_text、ocr_text、lines 和只含这一页的 pages
+    """
+    acquirer = TextAcquirer(config) if config else text_acquirer
+    return acquirer.acquire_page(page, page_num=page_num, dpi=dpi, lang=lang, run_ocr=run_ocr)
@@ -0,0 +1,267 @@
+"""
+文字区域检测模块
+扫描图纸的大部分面积是图形，整页OCR把时间都花在线条上。本模块按连通域的尺寸找出字符，
+形态学膨胀合并为文本行（横排和竖排），并从表格线中找出右下角的标题栏；只把这些区域裁剪出来
+并行OCR：尺寸标注按单行模式、尺寸字符白名单识别，汉字注释和标题栏按完整语言识别
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.config import TEXT_REGION_CONFIG
+from .pdf_parsing_process import _resolve_worker_count, ocr_buffer_lines
+
+
+class TextRegionDetector:
+    """
+    文字区域检测与区域OCR
+
+    区域类型：
+    - dimension：数字、符号为主的文本行（尺寸、公差、螺纹标注），单行模式 + 白名单
+    - note：字符接近方形或高低不一的文本行（汉字技术要求等），单行模式、完整语言
+    - title_block：右下角由表格线围成的标题栏，整块识别
+
+    Args:
+        config: 覆盖 TEXT_REGION_CONFIG 中的部分参数
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(TEXT_REGION_CONFIG)
+        self.config.update(config or {})
+        self.logger = logging.getLogger(__name__)
+
+    def detect(self, gray: np.ndarray, dpi: int) -> List[Dict[str, Any]]:
+        """
+        检测文字区域
+
+        Args:
+            gray (np.ndarray): 灰度图像（深色文字、浅色背景）
+            dpi (int): 图像分辨率，用于把毫米阈值换算为像素
+
+        Returns:
+            list: 区域列表，包含 bbox（像素 x0, y0, x1, y1，已含留白）、kind 和 vertical（竖排文字）
+        """
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        pixels_per_mm = dpi / 25.4
+        title_block = self._title_block(binary, pixels_per_mm)
+
+        boxes = self._character_boxes(binary, pixels_per_mm)
+        if title_block is not None and len(boxes):
+            # 标题栏内的字符随标题栏整块识别
+            x0, y0, x1, y1 = title_block
+            centers_x = boxes[:, 0] + boxes[:, 2] / 2
+            centers_y = boxes[:, 1] + boxes[:, 3] / 2
+            boxes = boxes[~((centers_x >= x0) & (centers_x < x1) & (centers_y >= y0) & (centers_y < y1))]
+
+        regions = []
+        rest = boxes
+        for vertical in (False, True):
+            lines, rest = self._group_lines(rest, binary.shape, vertical)
+            regions.extend(self._line_region(line, binary.shape, vertical) for line in lines)
+        # 两个方向都没有合并的单个字符（孔号、序号等单字标注）也按尺寸标注识别
+        regions.extend(dict(self._line_region(box[None], binary.shape, False), kind="dimension") for box in rest)
+        if title_block is not None:
+            regions.append({"bbox": title_block, "kind": "title_block", "vertical": False})
+        return regions
+
+    def ocr(self, gray: np.ndarray, dpi: int, lang: str = 'chi_sim+eng',
+            max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        检测文字区域后只对这些区域并行OCR
+
+        Args:
+            gray (np.ndarray): 灰度图像
+            dpi (int): 图像分辨率
+            lang (str): 注释和标题栏的OCR语言
+            max_workers (int): OCR线程数，None表示使用配置
+
+        Returns:
+            list: 文本行，包含 text、bbox（图像像素坐标）、confidence 和 kind
+        """
+        regions = self.detect(gray, dpi)
+        if not regions:
+            return []
+        if max_workers is None:
+            max_workers = self.config['max_workers']
+        workers = _resolve_worker_count(max_workers, len(regions))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda region: self.ocr_region(gray, region, lang), regions)
+            return [line for lines in results for line in lines]
+
+    def ocr_region(self, gray: np.ndarray, region: Dict[str, Any], lang: str = 'chi_sim+eng') -> List[Dict[str, Any]]:
+        """
+        按区域类型选择语言、页面分割模式和白名单识别一个区域
+
+        Returns:
+            list: 文本行，bbox和单词外接框为整幅图像的像素坐标；竖排文字旋转后识别，外接框取整个区域，
+                整行作为一个单词
+        """
+        x0, y0, x1, y1 = region["bbox"]
+        crop = np.ascontiguousarray(gray[y0:y1, x0:x1])
+        if region["vertical"]:
+            # 竖排尺寸从下往上书写，顺时针旋转90°后变为横排
+            crop = np.ascontiguousarray(cv2.rotate(crop, cv2.ROTATE_90_CLOCKWISE))
+        kind = region["kind"]
+        results = self._recognize(crop, kind, lang)
+        if kind == "dimension" and min((r["confidence"] for r in results), default=0.0) < \
+                self.config['dimension_min_confidence']:
+            # 白名单之外的字符（被误判为尺寸的汉字注释）按注释重新识别，取置信度较高的结果
+            retry = self._recognize(crop, "note", lang)
+            if min((r["confidence"] for r in retry), default=0.0) > min((r["confidence"] for r in results), default=0.0):
+                results, kind = retry, "note"
+
+        lines = []
+        for result in results:
+            if region["vertical"]:
+                bbox = (x0, y0, x1, y1)
+                words = [{"text": result["text"], "bbox": bbox, "confidence": result["confidence"]}]
+            else:
+                bbox = self._offset(result["bbox"], x0, y0)
+                words = [dict(word, bbox=self._offset(word["bbox"], x0, y0)) for word in result.get("words", ())]
+            lines.append({"text": result["text"], "bbox": bbox, "confidence": result["confidence"], "kind": kind,
+                          "vertical": region["vertical"], "words": words})
+        return lines
+
+    @staticmethod
+    def _offset(bbox: Tuple[int, int, int, int], x: int, y: int) -> Tuple[int, int, int, int]:
+        """裁剪图像中的外接框平移回整幅图像坐标"""
+        left, top, right, bottom = bbox
+        return (x + left, y + top, x + right, y + bottom)
+
+    def _recognize(self, crop: np.ndarray, kind: str, lang: str) -> List[Dict[str, Any]]:
+        """按区域类型设置语言、页面分割模式和白名单识别裁剪图像，失败时返回空列表"""
+        if kind == "dimension":
+            options = {"lang": self.config['dimension_lang'], "psm": self.config['dimension_psm'],
+                       "whitelist": self.config['dimension_whitelist']}
+        elif kind == "note":
+            options = {"lang": lang, "psm": self.config['dimension_psm']}
+        else:
+            options = {"lang": lang, "psm": self.config['title_block_psm']}
+        try:
+            return ocr_buffer_lines(crop.tobytes(), crop.shape[1], crop.shape[0], 1, **options)
+        except Exception as e:
+            self.logger.warning(f"文字区域OCR失败: {str(e)}。请确保已安装Tesseract OCR引擎并添加到系统PATH中。")
+            return []
+
+    def _character_boxes(self, binary: np.ndarray, pixels_per_mm: float) -> np.ndarray:
+        """尺寸在字符范围内的连通域外接框，返回 (N, 4) 的 x, y, w, h"""
+        _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        x, y, w, h, area = (stats[1:, k] for k in range(5))
+        low = self.config['min_char_height'] * pixels_per_mm
+        high = self.config['max_char_height'] * pixels_per_mm
+        size = np.maximum(w, h)
+        fill = area / (w * h)
+        # 字符的长边在字高范围内、短边不会太细长（排除线段），且不是实心块
+        keep = (size >= low) & (size <= high) & (np.minimum(w, h) * 8 >= size) & (fill > 0.08) & (fill < 0.9)
+        return np.column_stack([x, y, w, h])[keep]
+
+    def _group_lines(self, boxes: np.ndarray, shape: Tuple[int, int],
+                     vertical: bool) -> Tuple[List[np.ndarray], np.ndarray]:
+        """
+        沿书写方向膨胀字符框，合并为文本行
+
+        Returns:
+            tuple: (至少两个字符的文本行列表, 未归入任何文本行的字符框，由调用方作为单字符区域)
+        """
+        if len(boxes) == 0:
+            return [], boxes
+        heights = boxes[:, 2] if vertical else boxes[:, 3]
+        gap = max(1, int(round(self.config['merge_gap'] * float(np.median(heights)))))
+        mask = np.zeros(shape, np.uint8)
+        for x, y, w, h in boxes.tolist():
+            mask[y:y + h, x:x + w] = 255
+        kernel = np.ones((gap, 1) if vertical else (1, gap), np.uint8)
+        count, labels = cv2.connectedComponents(cv2.dilate(mask, kernel), connectivity=8)
+        groups = labels[boxes[:, 1] + boxes[:, 3] // 2, boxes[:, 0] + boxes[:, 2] // 2]
+        sizes = np.bincount(groups, minlength=count)
+        lines = [boxes[groups == label] for label in np.flatnonzero(sizes >= 2)]
+        return lines, boxes[sizes[groups] < 2]
+
+    def _line_region(self, line: np.ndarray, shape: Tuple[int, int], vertical: bool) -> Dict[str, Any]:
+        """文本行加留白后的裁剪区域；字符接近方形或高低不一（汉字部首）的按注释识别"""
+        x0, y0 = line[:, 0].min(), line[:, 1].min()
+        x1, y1 = (line[:, 0] + line[:, 2]).max(), (line[:, 1] + line[:, 3]).max()
+        widths, heights = (line[:, 3], line[:, 2]) if vertical else (line[:, 2], line[:, 3])
+        char_height = float(np.median(heights))
+        pad = int(round(self.config['padding'] * char_height))
+        if float(np.median(widths / heights)) >= self.config['note_aspect'] or \
+                float(heights.std() / heights.mean()) >= self.config['note_height_variation']:
+            kind = "note"
+        else:
+            kind = "dimension"
+        bbox = (int(max(0, x0 - pad)), int(max(0, y0 - pad)),
+                int(min(shape[1], x1 + pad)), int(min(shape[0], y1 + pad)))
+        return {"bbox": bbox, "kind": kind, "vertical": vertical}
+
+    def _title_block(self, binary: np.ndarray, pixels_per_mm: float) -> Optional[Tuple[int, int, int, int]]:
+        """
+        由右下角的表格单元格确定标题栏
+
+        开运算提取长的横线和竖线，表格线围成的孔洞即单元格；完全位于图纸右下部、高度不超过
+        title_cell_max_height 的单元格至少3个时，取它们的外接框
+        """
+        height, width = binary.shape
+        # 只需检查右下部，先裁掉其余部分再做开运算
+        left, top = width // 2, height * 3 // 5
+        corner = binary[top:, left:]
+        length = max(3, int(self.config['title_line_length'] * pixels_per_mm))
+        horizontal = cv2.morphologyEx(corner, cv2.MORPH_OPEN, np.ones((1, length), np.uint8))
+        vertical = cv2.morphologyEx(corner, cv2.MORPH_OPEN, np.ones((length, 1), np.uint8))
+        contours, hierarchy = cv2.findContours(horizontal | vertical, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+        if hierarchy is None:
+            return None
+
+        max_cell_height = self.config['title_cell_max_height'] * pixels_per_mm
+        cells = []
+        for contour, (_, _, _, parent) in zip(contours, hierarchy[0]):
+            if parent < 0:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            if h <= max_cell_height and w * h >= length:
+                cells.append((left + x, top + y, left + x + w, top + y + h))
+        if len(cells) < 3:
+            return None
+        cells = np.array(cells)
+        return (int(cells[:, 0].min()), int(cells[:, 1].min()), int(cells[:, 2].max()), int(cells[:, 3].max()))
+
+
+# 全局文字区域检测器实例
+text_region_detector = TextRegionDetector()
+
+
+def detect_text_regions(gray: np.ndarray, dpi: int, config: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    """
+    检测扫描图纸中文字区域的便捷函数
+
+    Args:
+        gray (np.ndarray): 灰度图像
+        dpi (int): 图像分辨率
+        config (dict): 覆盖 TEXT_REGION_CONFIG 的参数（可选）
+
+    Returns:
+        list: 区域列表，包含 bbox、kind（dimension / note / title_block）和 vertical
+    """
+    detector = TextRegionDetector(config) if config else text_region_detector
+    return detector.detect(gray, dpi)
+
+
+def ocr_text_regions(gray: np.ndarray, dpi: int, lang: str = 'chi_sim+eng', max_workers: Optional[int] = None,
+                     config: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    """
+    只对检测出的文字区域并行OCR的便捷函数
+
+    Args:
+        gray (np.ndarray): 灰度图像
+        dpi (int): 图像分辨率
+        lang (str): 注释和标题栏的OCR语言
+        max_workers (int): OCR线程数
+        config (dict): 覆盖 TEXT_REGION_CONFIG 的参数（可选）
+
+    Returns:
+        list: 文本行，包含 text、bbox（像素坐标）、confidence 和 kind
+    """
+    detector = TextRegionDetector(config) if config else text_region_detector
+    return detector.ocr(gray, dpi, lang=lang, max_workers=max_workers)
@@ -0,0 +1,302 @@
+"""
+分块特征检测模块
+把超大图纸栅格切成相互重叠的分块，逐块做边缘检测和轮廓查找，并拼接跨越分块边界的轮廓，
+使边缘检测阶段的峰值工作内存不超过配置的预算（例如600 DPI的A0图纸）
+"""
+import logging
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.config import TILED_DETECTION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 矩形 (x0, y0, x1, y1)，右、下边界为开区间
+Rect = Tuple[int, int, int, int]
+
+
+def _budget_bytes(memory_budget_mb: Optional[float]) -> int:
+    if memory_budget_mb is None:
+        memory_budget_mb = TILED_DETECTION_CONFIG['memory_budget_mb']
+    return int(memory_budget_mb * 1024 * 1024)
+
+
+def should_use_tiles(shape: Tuple[int, ...], memory_budget_mb: Optional[float] = None) -> bool:
+    """
+    判断是否需要分块检测
+
+    Args:
+        shape: 图像形状 (高, 宽[, 通道])
+        memory_budget_mb: 内存预算（MB），None时使用配置
+
+    Returns:
+        bool: 整图处理的预计工作内存超出预算时返回True
+    """
+    mode = TILED_DETECTION_CONFIG['mode']
+    if mode == 'always':
+        return True
+    if mode == 'never':
+        return False
+    height, width = shape[:2]
+    return height * width * TILED_DETECTION_CONFIG['bytes_per_pixel'] > _budget_bytes(memory_budget_mb)
+
+
+def _edge_halo(gaussian_kernel: tuple, morph_kernel: tuple) -> int:
+    """边缘图在分块内保持与整图一致所需读取的额外边距"""
+    # 高斯核半径 + Sobel与非极大值抑制各1像素 + 闭运算（膨胀后腐蚀）+ 配置的余量
+    return max(gaussian_kernel) // 2 + 2 + 2 * max(morph_kernel) + TILED_DETECTION_CONFIG['edge_halo']
+
+
+class TileGrid:
+    """
+    分块网格
+
+    每个分块由核心区和向四周扩展overlap像素的扩展区组成。轮廓的边界框严格位于某个分块的扩展区
+    内部（不接触扩展区边界，图像边界除外）时，该分块看到的是完整轮廓；按行优先顺序第一个看到
+    完整轮廓的分块负责输出它，保证每个轮廓只输出一次。
+    """
+
+    def __init__(self, width: int, height: int, tile_size: int, overlap: int):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.cols = max(1, math.ceil(width / tile_size))
+        self.rows = max(1, math.ceil(height / tile_size))
+
+    def __len__(self) -> int:
+        return self.rows * self.cols
+
+    def padded_rect(self, index: int) -> Rect:
+        """分块扩展区（含重叠）"""
+        row, col = divmod(index, self.cols)
+        return (max(0, col * self.tile_size - self.overlap),
+                max(0, row * self.tile_size - self.overlap),
+                min(self.width, (col + 1) * self.tile_size + self.overlap),
+                min(self.height, (row + 1) * self.tile_size + self.overlap))
+
+    def _first_complete(self, lo: np.ndarray, hi: np.ndarray, limit: int, count: int) -> np.ndarray:
+        """单一坐标轴上第一个完整包含区间 [lo, hi) 的分块序号，没有则为-1"""
+        size, overlap = self.tile_size, self.overlap
+        first = np.full(len(lo), -1, dtype=np.int64)
+        base = np.maximum(0, (hi - overlap) // size - 1)
+        # 能完整包含区间的分块必须满足 i*size - overlap < lo，候选范围只有少数几个
+        span = int(np.max((lo + overlap) // size + 1 - base, initial=0))
+        for step in range(span):
+            i = base + step
+            start = np.maximum(0, i * size - overlap)
+            end = np.minimum(limit, (i + 1) * size + overlap)
+            ok = ((i < count) & (start <= lo) & (hi <= end) &
+                  ((lo > start) | (start == 0)) & ((hi < end) | (end == limit)))
+            first = np.where((first < 0) & ok, i, first)
+        return first
+
+    def owners(self, bboxes: np.ndarray) -> np.ndarray:
+        """
+        每个边界框对应轮廓的负责分块序号
+
+        Args:
+            bboxes: (n, 4) 全图坐标的边界框 (x0, y0, x1, y1)
+
+        Returns:
+            np.ndarray: 分块序号，没有任何分块能看到完整轮廓时为-1
+        """
+        bboxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)
+        col = self._first_complete(bboxes[:, 0], bboxes[:, 2], self.width, self.cols)
+        row = self._first_complete(bboxes[:, 1], bboxes[:, 3], self.height, self.rows)
+        return np.where((col < 0) | (row < 0), -1, row * self.cols + col)
+
+
+def _plan_tiles(width: int, height: int, budget: int, overlap: int, halo: int,
+                max_workers: Optional[int]) -> Tuple[int, int]:
+    """根据内存预算确定分块边长和并发线程数"""
+    if max_workers is None:
+        max_workers = TILED_DETECTION_CONFIG['max_workers']
+    if not max_workers or max_workers < 0:
+        max_workers = os.cpu_count() or 1
+    bytes_per_pixel = TILED_DETECTION_CONFIG['bytes_per_pixel']
+    min_tile_size = TILED_DETECTION_CONFIG['min_tile_size']
+
+    # 并发的分块共享预算；预算不足时减少线程数，而不是把分块切得过小
+    workers = int(max_workers)
+    while True:
+        side = int(math.sqrt(budget / workers / bytes_per_pixel)) - 2 * (overlap + halo)
+        if side >= min_tile_size or workers == 1:
+            break
+        workers -= 1
+    if side < min_tile_size:
+        logger.warning(f"内存预算 {budget / 1024 / 1024:.0f}MB 过小，使用最小分块边长 {min_tile_size}")
+        side = min_tile_size
+
+    tile_count = math.ceil(width / side) * math.ceil(height / side)
+    return side, max(1, min(workers, tile_count))
+
+
+def _process_tile(image: np.ndarray, grid: TileGrid, index: int, halo: int, edge_params: tuple):
+    """
+    处理单个分块
+
+    Returns:
+        tuple: (本分块负责输出的完整轮廓（全图坐标）,
+                接触扩展区边界的连通域像素 [(边界框, xs, ys), ...]（全图坐标）)
+    """
+    from src.modules.feature_definition import detect_edges
+
+    px0, py0, px1, py1 = grid.padded_rect(index)
+    hx0, hy0 = max(0, px0 - halo), max(0, py0 - halo)
+    hx1, hy1 = min(grid.width, px1 + halo), min(grid.height, py1 + halo)
+
+    edges = detect_edges(image[hy0:hy1, hx0:hx1], *edge_params)
+    edges = np.ascontiguousarray(edges[py0 - hy0:py1 - hy0, px0 - hx0:px1 - hx0])
+    offset = np.array([px0, py0], dtype=np.int32)
+
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return [], []
+    rects = np.array([cv2.boundingRect(contour) for contour in contours], dtype=np.int64)
+    bboxes = np.column_stack((rects[:, 0] + px0, rects[:, 1] + py0,
+                              rects[:, 0] + rects[:, 2] + px0, rects[:, 1] + rects[:, 3] + py0))
+    owned = [contours[i] + offset for i in np.flatnonzero(grid.owners(bboxes) == index).tolist()]
+
+    # 接触扩展区边界（且不是图像边界）的连通域可能延伸到其他分块，收集其像素留待拼接
+    crossing = (((bboxes[:, 0] == px0) & (px0 > 0)) | ((bboxes[:, 1] == py0) & (py0 > 0)) |
+                ((bboxes[:, 2] == px1) & (px1 < grid.width)) | ((bboxes[:, 3] == py1) & (py1 < grid.height)))
+    pieces = []
+    crossing_ids = np.flatnonzero(crossing).tolist()
+    if crossing_ids:
+        # floodFill的掩码比图像大一圈；复用同一掩码，已填充的连通域不会被再次填充
+        mask = np.zeros((edges.shape[0] + 2, edges.shape[1] + 2), dtype=np.uint8)
+        flags = 8 | cv2.FLOODFILL_MASK_ONLY | (1 << 8)
+    for i in crossing_ids:
+        seed_x, seed_y = (int(v) for v in contours[i][0, 0])
+        if mask[seed_y + 1, seed_x + 1]:
+            continue  # 所属连通域已经收集过
+        # 从轮廓起点做8连通填充，在掩码中把该连通域标记为1，返回其边界框
+        _, _, _, (x, y, w, h) = cv2.floodFill(edges, mask, (seed_x, seed_y), 0, flags=flags)
+        region = mask[y + 1:y + 1 + h, x + 1:x + 1 + w]
+        ys, xs = np.nonzero(region == 1)
+        region[ys, xs] = 2  # 标记为已收集
+        pieces.append(((px0 + x, py0 + y, px0 + x + w, py0 + y + h),
+                       (xs + px0 + x).astype(np.int32), (ys + py0 + y).astype(np.int32)))
+
+    return owned, pieces
+
+
+def _group_pieces(pieces: List[tuple]) -> List[List[int]]:
+    """按边界框重叠把跨块连通域片段合并成组（同一全局连通域的片段在重叠区共享像素）"""
+    parent = list(range(len(pieces)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # 按x0扫描，只与x区间仍然相交的片段比较
+    order = sorted(range(len(pieces)), key=lambda i: pieces[i][0][0])
+    active = []
+    for i in order:
+        x0, y0, x1, y1 = pieces[i][0]
+        active = [j for j in active if pieces[j][0][2] > x0]
+        for j in active:
+            _, oy0, _, oy1 = pieces[j][0]
+            if oy0 < y1 and y0 < oy1:
+                parent[find(i)] = find(j)
+        active.append(i)
+
+    groups = {}
+    for i in range(len(pieces)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def _stitch_group(pieces: List[tuple], grid: TileGrid, budget: int) -> List[np.ndarray]:
+    """把一组跨块片段的像素画到区域栅格上重新查找轮廓，只保留没有分块能完整看到的轮廓"""
+    x0 = min(bbox[0] for bbox, _, _ in pieces)
+    y0 = min(bbox[1] for bbox, _, _ in pieces)
+    x1 = max(bbox[2] for bbox, _, _ in pieces)
+    y1 = max(bbox[3] for bbox, _, _ in pieces)
+
+    # 区域栅格加上findContours内部副本约2字节/像素；超出预算时降采样（如贯穿整张图纸的图框）
+    scale = 1
+    area = (x1 - x0) * (y1 - y0)
+    if area * 2 > budget:
+        scale = math.ceil(math.sqrt(area * 2 / budget))
+        logger.warning(f"跨块轮廓区域 {x1 - x0}x{y1 - y0} 超出内存预算，按 1/{scale} 分辨率拼接")
+
+    raster = np.zeros(((y1 - y0 + scale - 1) // scale, (x1 - x0 + scale - 1) // scale), dtype=np.uint8)
+    for _, xs, ys in pieces:
+        raster[(ys - y0) // scale, (xs - x0) // scale] = 255
+
+    stitched = []
+    contours, _ = cv2.findContours(raster, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in contours:
+        contour = (contour * scale + np.array([x0, y0], dtype=np.int32)).astype(np.int32)
+        x, y, w, h = cv2.boundingRect(contour)
+        stitched.append((contour, (x, y, x + w, y + h)))
+    if not stitched:
+        return []
+    owners = grid.owners([bbox for _, bbox in stitched])
+    return [contour for (contour, _), owner in zip(stitched, owners.tolist()) if owner < 0]
+
+
+def find_contours_tiled(image: np.ndarray, canny_low: int, canny_high: int,
+                        gaussian_kernel: tuple, morph_kernel: tuple,
+                        memory_budget_mb: Optional[float] = None, overlap: Optional[int] = None,
+                        max_workers: Optional[int] = None) -> List[np.ndarray]:
+    """
+    分块执行边缘检测和轮廓查找
+
+    每个分块额外读取足够的边距使边缘图与整图处理一致（Canny滞后阈值沿弱边缘链传播，
+    链长超过边距时结果可能有细微差异）。完全落在某个分块内的轮廓由该分块直接输出；
+    跨越分块边界的连通域以稀疏像素形式收集，合并后重新查找轮廓。
+
+    Args:
+        image (numpy.ndarray): 输入灰度图像
+        canny_low (int): Canny边缘检测低阈值
+        canny_high (int): Canny边缘检测高阈值
+        gaussian_kernel (tuple): 高斯模糊核大小
+        morph_kernel (tuple): 形态学操作核大小
+        memory_budget_mb (float): 工作内存预算（MB），None时使用配置
+        overlap (int): 分块重叠宽度，None时使用配置
+        max_workers (int): 并发线程数，None时使用配置
+
+    Returns:
+        list: 轮廓列表（全图坐标，格式与cv2.findContours一致）
+    """
+    height, width = image.shape[:2]
+    budget = _budget_bytes(memory_budget_mb)
+    if overlap is None:
+        overlap = TILED_DETECTION_CONFIG['tile_overlap']
+    halo = _edge_halo(gaussian_kernel, morph_kernel)
+    tile_size, workers = _plan_tiles(width, height, budget, overlap, halo, max_workers)
+    grid = TileGrid(width, height, tile_size, overlap)
+    edge_params = (canny_low, canny_high, gaussian_kernel, morph_kernel)
+
+    logger.info(f"分块特征检测: {width}x{height} 像素, {grid.rows}x{grid.cols} 块 "
+                f"(边长 {tile_size}, 重叠 {overlap}), {workers} 个线程")
+
+    def run(index):
+        return _process_tile(image, grid, index, halo, edge_params)
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run, range(len(grid))))
+    else:
+        results = [run(index) for index in range(len(grid))]
+
+    contours = [contour for owned, _ in results for contour in owned]
+    pieces = [piece for _, tile_pieces in results for piece in tile_pieces]
+    del results
+
+    for group in _group_pieces(pieces):
+        contours.extend(_stitch_group([pieces[i] for i in group], grid, budget))
+
+    # 与cv2.findContours相近的输出顺序（按起点的光栅扫描逆序）
+    contours.sort(key=lambda contour: (-int(contour[0, 0, 1]), -int(contour[0, 0, 0])))
+    return contours
@@ -3,9 +3,14 @@
 用于验证生成的NC代码的正确性
 """
 import re
-from typing import List, Dict
+from typing import Any, List, Dict
 import os
 
+import numpy as np
+
+# 程序段允许的起始地址字母
+NC_LINE_START_CHARS = 'GTMNFXYZIJRKLPQSEWABCDHUV'
+
 def validate_features(features: List[Dict]) -> List[str]:
     """
     验证识别出的特征的合理性
@@ -133,50 +138,96 @@ def validate_parameters(description_analysis: Dict) -> List[str]:
     
     return errors
 
+def validate_geometry_elements(geometry_elements: List[Dict]) -> Dict[str, Any]:
+    """
+    验证PDF解析得到的几何元素（pdf_parsing_process 子模块的结果）
+    
+    缺少类型或结构错误的元素记为错误；尺寸非正数、缺少编号等可以继续处理的问题记为警告
+    
+    Args:
+        geometry_elements: 几何元素列表，每项包含 id、type，以及可选的 bounds、center、radius
+    
+    Returns:
+        包含 valid、errors 和 warnings 的字典
+    """
+    errors = []
+    warnings = []
+    
+    if not isinstance(geometry_elements, list):
+        return {'valid': False, 'errors': ["几何元素列表必须是list类型"], 'warnings': []}
+    
+    for i, element in enumerate(geometry_elements):
+        if not isinstance(element, dict):
+            errors.append(f"几何元素 {i} 必须是字典类型")
+            continue
+        if not element.get('type'):
+            errors.append(f"几何元素 {i} 缺少类型")
+        if 'id' not in element:
+            warnings.append(f"几何元素 {i} 缺少编号")
+        
+        bounds = element.get('bounds')
+        if bounds is not None:
+            if not isinstance(bounds, dict) or not all(isinstance(bounds.get(k), (int, float))
+                                                       for k in ('x', 'y', 'width', 'height')):
+                errors.append(f"几何元素 {i} 的边界格式错误: {bounds}")
+            elif bounds['width'] <= 0 or bounds['height'] <= 0:
+                warnings.append(f"几何元素 {i} 的边界尺寸不合理: ({bounds['width']}, {bounds['height']})")
+        
+        radius = element.get('radius')
+        if radius is not None and (not isinstance(radius, (int, float)) or radius <= 0):
+            warnings.append(f"几何元素 {i} 的半径不合理: {radius}")
+    
+    return {'valid': not errors, 'errors': errors, 'warnings': warnings}
+
 def validate_nc_program(nc_program: str) -> List[str]:
     """
     验证NC程序的基本语法
     
     Args:
-        nc_program: NC程序代码
+        nc_program: NC程序代码（也可以是已切分好的地址字表）
     
     Returns:
         错误信息列表
     """
+    from .nc_tokenizer import NCProgramTable, as_table
+    
     errors = []
     
-    if not isinstance(nc_program, str):
+    if not isinstance(nc_program, (str, NCProgramTable)):
         return ["NC程序必须是字符串类型"]
     
-    lines = nc_program.split('\n')
-    
-    # 检查程序头
-    has_program_number = any(re.match(r'^O\d+', line.strip()) for line in lines)
+    table = as_table(nc_program)
+    lines = table.lines
+    first_char = table.first_char
+    
+    # 检查程序头（行首为O且第一个地址字是带数值的O）
+    first_word = table.line_word_start[:-1]
+    has_words = first_word < table.line_word_start[1:]
+    first_word = np.minimum(first_word, max(table.word_letter.size - 1, 0))
+    has_program_number = table.word_letter.size > 0 and bool(np.any(
+        (first_char == 'O') & has_words & (table.word_letter[first_word] == ord('O'))
+        & ~np.isnan(table.word_value[first_word])))
     if not has_program_number:
         errors.append("缺少程序号 (Oxxxx)")
     
+    present = table.present_codes(['G20', 'G21', 'G90', 'G91', 'M02', 'M30', 'M98', 'G65', 'G66', 'G67'])
+    
     # 检查单位设置
-    has_unit_setting = any('G20' in line or 'G21' in line for line in lines)
-    if not has_unit_setting:
+    if not present & {'G20', 'G21'}:
         errors.append("缺少单位设置 (G20/G21)")
     
     # 检查坐标系统
-    has_coord_setting = any('G90' in line or 'G91' in line for line in lines)
-    if not has_coord_setting:
+    if not present & {'G90', 'G91'}:
         errors.append("缺少坐标系统设置 (G90/G91)")
     
     # 检查程序结束
-    has_program_end = any('M02' in line or 'M30' in line for line in lines)
-    if not has_program_end:
+    if not present & {'M02', 'M30'}:
         errors.append("缺少程序结束指令 (M02/M30)")
     
-    # 检查是否有明显的语法错误
-    for i, line in enumerate(lines):
-        line = line.strip()
-        if line and not re.match(r'^[GTMNFXYZIJRKLPQSEWABCDHUVWM]+', line, re.IGNORECASE):
-            # 检查是否是注释或空行
-            if not line.startswith(';') and not line.startswith('%'):
-                errors.append(f"第 {i+1} 行可能存在语法错误: {line}")
+    # 检查是否有明显的语法错误（行首不是地址字母，且不是注释或空行）
+    allowed = list(NC_LINE_START_CHARS) + list(NC_LINE_START_CHARS.lower()) + [';', '%', '']
+    for i in np.flatnonzero(~np.isin(first_char, allowed)):
+        errors.append(f"第 {i+1} 行可能存在语法错误: {lines[i].strip()}")
     
     # 检查潜在的安全问题
     dangerous_sequences = [
@@ -187,7 +238,7 @@ def validate_nc_program(nc_program: str) -> List[str]:
     ]
     
     for seq in dangerous_sequences:
-        if any(seq in line.upper() for line in lines):
+        if seq in present:
             errors.append(f"NC程序包含潜在危险指令: {seq}")
     
     return errors
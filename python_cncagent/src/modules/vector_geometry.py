@@ -0,0 +1,483 @@
+"""
+矢量几何特征提取模块
+CAD导出的PDF图纸中，轮廓本身就是矢量路径。本模块直接读取 page.get_cdrawings() 中的直线、
+三次贝塞尔曲线、矩形和四边形，按端点拼接成闭合环后识别形状，输出与 identify_features 相同格式的
+特征字典（像素坐标系，坐标为精确浮点数，与渲染DPI无关）；扫描图纸没有可用的矢量路径，
+返回None由调用方回退到栅格识别
+"""
+import logging
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.config import FEATURE_RECOGNITION_CONFIG, IMAGE_PROCESSING_CONFIG, PDF_PROCESSING_CONFIG, \
+    VECTOR_GEOMETRY_CONFIG
+from .feature_definition import (filter_duplicate_features_advanced, identify_counterbore_features,
+                                 identify_pocket_features, identify_shape_advanced)
+
+# 判断两条相邻边共线（不构成拐角）的转角正弦值
+_COLLINEAR_SINE = 1e-3
+# 判断矩形直角的夹角余弦值
+_RIGHT_ANGLE_COSINE = 1e-3
+
+
+def _bezier(control: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """批量计算三次贝塞尔曲线上的点，control形状为 (边数, 4, 2)，返回 (边数, len(t), 2)"""
+    t = t[None, :, None]
+    s = 1.0 - t
+    p0, p1, p2, p3 = (control[:, None, k] for k in range(4))
+    return s ** 3 * p0 + 3 * s * s * t * p1 + 3 * s * t * t * p2 + t ** 3 * p3
+
+
+def _grid_keys(points: np.ndarray, size: float) -> np.ndarray:
+    """点按边长为size的网格取整，两个坐标合成一个int64键"""
+    cells = np.round(points / size).astype(np.int64)
+    cells -= cells.min(axis=0) if len(cells) else 0
+    return cells[:, 0] * (int(cells[:, 1].max()) + 1 if len(cells) else 1) + cells[:, 1]
+
+
+class VectorGeometryExtractor:
+    """
+    PDF矢量路径的几何特征提取器
+
+    直线和贝塞尔曲线作为图的边，端点按 snap_tolerance 合并为节点；反复删去悬空的边（尺寸线、
+    中心线、剖面线等）后，所有节点度数为2的连通分量就是一个闭合轮廓。圆弧拼成的整圆直接拟合
+    出圆心和半径，只由直线组成的三角形和四边形按顶点精确分类，其余轮廓交给
+    identify_shape_advanced 按栅格识别相同的规则分类
+
+    Args:
+        config: 覆盖 VECTOR_GEOMETRY_CONFIG 中的部分参数
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(VECTOR_GEOMETRY_CONFIG)
+        self.config.update(config or {})
+        self.logger = logging.getLogger(__name__)
+
+    def extract(self, page: Any, dpi: Optional[int] = None, drawing_text: str = "",
+                min_area: Optional[float] = None, min_perimeter: Optional[float] = None) -> Optional[List[Dict]]:
+        """
+        从PDF页面的矢量路径中识别几何特征
+
+        Args:
+            page: fitz.Page 页面对象
+            dpi (int): 特征坐标对应的渲染DPI（与栅格识别的像素坐标一致），默认取配置值
+            drawing_text (str): 图纸文本，用于辅助识别沉孔和腔槽
+            min_area (float): 最小面积阈值（像素²），默认取 IMAGE_PROCESSING_CONFIG
+            min_perimeter (float): 最小周长阈值（像素），默认取 IMAGE_PROCESSING_CONFIG
+
+        Returns:
+            list: 特征列表；页面不是矢量图纸时返回None
+        """
+        if dpi is None:
+            dpi = PDF_PROCESSING_CONFIG['default_dpi']
+        if min_area is None:
+            min_area = IMAGE_PROCESSING_CONFIG['default_min_area']
+        if min_perimeter is None:
+            min_perimeter = IMAGE_PROCESSING_CONFIG['default_min_perimeter']
+
+        drawings = page.get_cdrawings() if hasattr(page, 'get_cdrawings') else page.get_drawings()
+        if not self.is_vector_page(page, drawings):
+            return None
+
+        loops = self._closed_loops(drawings)
+        if not loops[1] and page.get_images():
+            # 有矢量路径但拼不出任何闭合轮廓，图形可能在嵌入的位图中
+            return None
+
+        # 页面坐标（含页面旋转）换算为渲染图像的像素坐标
+        zoom = dpi / 72
+        matrix = page.rotation_matrix
+        transform = np.array([[matrix.a, matrix.b], [matrix.c, matrix.d]]) * zoom
+        offset = np.array([matrix.e, matrix.f]) * zoom
+        points, starts, curved = loops
+        features = self._loop_features(points @ transform + offset, starts, curved, min_area, min_perimeter)
+
+        features = filter_duplicate_features_advanced(features)
+        features = identify_counterbore_features(features, "", drawing_text)
+        return identify_pocket_features(features, "", drawing_text)
+
+    def is_vector_page(self, page: Any, drawings: Optional[List[Dict]] = None) -> bool:
+        """
+        判断页面是否为矢量图纸：矢量绘图元素足够多，且没有覆盖大半页面的位图（扫描件）
+
+        Args:
+            page: fitz.Page 页面对象
+            drawings: 已读取的 get_cdrawings() 结果（可选）
+
+        Returns:
+            bool: 是否可以直接使用矢量路径
+        """
+        if drawings is None:
+            drawings = page.get_cdrawings() if hasattr(page, 'get_cdrawings') else page.get_drawings()
+        if sum(len(path['items']) for path in drawings) < self.config['min_drawing_items']:
+            return False
+
+        page_rect = page.rect
+        page_area = page_rect.width * page_rect.height
+        if page_area <= 0:
+            return False
+        image_area = 0.0
+        for info in page.get_image_info():
+            x0, y0, x1, y1 = info['bbox']
+            width = min(x1, page_rect.x1) - max(x0, page_rect.x0)
+            height = min(y1, page_rect.y1) - max(y0, page_rect.y0)
+            if width > 0 and height > 0:
+                image_area += width * height
+        return image_area / page_area <= self.config['max_image_coverage']
+
+    def _edges(self, drawings: List[Dict]) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray]]:
+        """
+        把路径拆成边：直线和曲线统一存成三次贝塞尔控制点 (边数, 4, 2)，直线的控制点取两端点的三等分点；
+        矩形和四边形本身就是闭合轮廓，直接返回顶点
+
+        Returns:
+            tuple: (控制点数组，每条边是否为曲线，矩形/四边形的顶点列表)
+        """
+        controls, is_curve, polygons = [], [], []
+        for path in drawings:
+            subpath_start = previous_end = None
+            for item in path['items']:
+                kind = item[0]
+                if kind == 'l':
+                    start, end = tuple(item[1]), tuple(item[2])
+                    controls.append((start, start, end, end))
+                    is_curve.append(False)
+                elif kind == 'c':
+                    start, end = tuple(item[1]), tuple(item[4])
+                    controls.append((start, tuple(item[2]), tuple(item[3]), end))
+                    is_curve.append(True)
+                elif kind == 're':
+                    x0, y0, x1, y1 = tuple(item[1])
+                    polygons.append(np.array([(x0, y0), (x1, y0), (x1, y1), (x0, y1)], dtype=np.float64))
+                    continue
+                elif kind == 'qu':
+                    upper_left, upper_right, lower_left, lower_right = (tuple(point) for point in item[1])
+                    polygons.append(np.array([upper_left, upper_right, lower_right, lower_left], dtype=np.float64))
+                    continue
+                else:
+                    continue
+                if previous_end is None or math.dist(start, previous_end) > self.config['snap_tolerance']:
+                    subpath_start = start
+                previous_end = end
+            if path.get('closePath') and previous_end is not None and \
+                    math.dist(subpath_start, previous_end) > self.config['snap_tolerance']:
+                controls.append((previous_end, previous_end, subpath_start, subpath_start))
+                is_curve.append(False)
+
+        control = np.array(controls, dtype=np.float64).reshape(-1, 4, 2)
+        # 直线的控制点改为三等分点，使曲线公式对直线同样成立
+        lines = ~np.array(is_curve, dtype=bool)
+        control[lines, 1] = (2 * control[lines, 0] + control[lines, 3]) / 3
+        control[lines, 2] = (control[lines, 0] + 2 * control[lines, 3]) / 3
+        return control, np.array(is_curve, dtype=bool), polygons
+
+    def _closed_loops(self, drawings: List[Dict]) -> Tuple[np.ndarray, List[int], np.ndarray]:
+        """
+        把路径的边拼接成闭合轮廓
+
+        Returns:
+            tuple: (全部轮廓顶点 (N, 2)，每个轮廓在顶点数组中的起始位置，每个顶点后面的边是否为曲线)
+        """
+        control, is_curve, polygons = self._edges(drawings)
+        snap = self.config['snap_tolerance']
+
+        edges, ahead, loop_starts = [], [], []
+        if len(control):
+            # 端点按网格合并为节点
+            ends = np.concatenate([control[:, 0], control[:, 3]])
+            _, nodes = np.unique(_grid_keys(ends, snap), return_inverse=True)
+            nodes = nodes.reshape(-1)
+            u, v = nodes[:len(control)], nodes[len(control):]
+            keep = u != v
+            # 两条边端点相同且中点也相同视为重复绘制，只保留一条；端点相同、中点不同的（如两段半圆）都保留
+            pair = np.minimum(u, v) * (int(nodes.max()) + 1) + np.maximum(u, v)
+            _, group, shared = np.unique(pair, return_inverse=True, return_counts=True)
+            repeated = np.flatnonzero(shared[group.reshape(-1)] > 1)
+            if len(repeated):
+                middle = _grid_keys(_bezier(control[repeated], np.array([0.5]))[:, 0], snap)
+                seen = set()
+                for edge, key in zip(repeated.tolist(), zip(pair[repeated].tolist(), middle.tolist())):
+                    if key in seen:
+                        keep[edge] = False
+                    seen.add(key)
+            edges, ahead, loop_starts = self._cycles(u, v, keep)
+
+        # 按环内顺序收集顶点：曲线沿经过方向取 curve_samples 个点，直线只取起点
+        samples = self.config['curve_samples']
+        t = np.arange(samples) / samples
+        table = np.concatenate([_bezier(control, t).reshape(-1, 2), _bezier(control, 1.0 - t).reshape(-1, 2)])
+        edges = np.array(edges, dtype=np.int64)
+        counts = np.where(is_curve[edges], samples, 1)
+        offsets = np.cumsum(counts) - counts
+        first = (edges + np.where(ahead, 0, len(control))) * samples
+        within = np.arange(counts.sum()) - np.repeat(offsets, counts)
+        parts = [table[np.repeat(first, counts) + within]]
+        curved = [np.repeat(is_curve[edges], counts)]
+        starts = offsets[loop_starts].tolist()
+
+        count = len(parts[0])
+        for polygon in polygons:
+            starts.append(count)
+            parts.append(polygon)
+            curved.append(np.zeros(len(polygon), dtype=bool))
+            count += len(polygon)
+        return np.concatenate(parts), starts, np.concatenate(curved)
+
+    @staticmethod
+    def _cycles(u: np.ndarray, v: np.ndarray, keep: np.ndarray) -> Tuple[List[int], List[bool], List[int]]:
+        """
+        删去悬空的边后，找出所有节点度数都为2的连通分量
+
+        Returns:
+            tuple: (按环内顺序排列的边号，是否沿正向经过，每个环的第一条边在前两个列表中的位置)
+        """
+        node_count = int(max(u.max(), v.max())) + 1
+
+        def incidence(alive: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            """每个节点关联的边，按节点排序后的边号和各节点的起始位置"""
+            live = np.flatnonzero(alive)
+            half_nodes = np.concatenate([u[live], v[live]])
+            order = np.argsort(half_nodes, kind='stable')
+            bounds = np.searchsorted(half_nodes[order], np.arange(node_count + 1))
+            return np.concatenate([live, live])[order], bounds
+
+        # 逐层剥掉度数为1的节点上的边（尺寸线、引出线、剖面线等）
+        alive = keep.copy()
+        incident, bounds = incidence(alive)
+        degree = np.diff(bounds)
+        stack = np.flatnonzero(degree == 1).tolist()
+        if stack:
+            u_list, v_list = u.tolist(), v.tolist()
+            incident, bounds, degree = incident.tolist(), bounds.tolist(), degree.tolist()
+            alive_list = alive.tolist()
+            while stack:
+                node = stack.pop()
+                for edge in incident[bounds[node]:bounds[node + 1]]:
+                    if alive_list[edge]:
+                        alive_list[edge] = False
+                        for end in (u_list[edge], v_list[edge]):
+                            degree[end] -= 1
+                            if degree[end] == 1:
+                                stack.append(end)
+            alive = np.array(alive_list, dtype=bool)
+            incident, bounds = incidence(alive)
+            degree = np.diff(bounds)
+
+        # 度数为2的节点上的两条边
+        two = (degree == 2)
+        pair_a = np.where(two, incident[np.minimum(bounds[:-1], len(incident) - 1)], -1).tolist()
+        pair_b = np.where(two, incident[np.minimum(bounds[:-1] + 1, len(incident) - 1)], -1).tolist()
+        two = two.tolist()
+        u_list, v_list = u.tolist(), v.tolist()
+
+        edges, ahead, starts = [], [], []
+        visited = [False] * len(u_list)
+        for first in np.flatnonzero(alive).tolist():
+            if visited[first]:
+                continue
+            begin, closed = len(edges), True
+            edge, node = first, u_list[first]
+            while not visited[edge]:
+                visited[edge] = True
+                forward = u_list[edge] == node
+                edges.append(edge)
+                ahead.append(forward)
+                node = v_list[edge] if forward else u_list[edge]
+                if not two[node]:
+                    # 分支节点（多个轮廓共用顶点或边），无法唯一确定轮廓，整个分量跳过
+                    closed = False
+                    break
+                edge = pair_b[node] if pair_a[node] == edge else pair_a[node]
+            if closed and node == u_list[first]:
+                starts.append(begin)
+            else:
+                del edges[begin:], ahead[begin:]
+        return edges, ahead, starts
+
+    def _loop_features(self, points: np.ndarray, starts: List[int], curved: np.ndarray,
+                       min_area: float, min_perimeter: float) -> List[Dict]:
+        """按轮廓批量计算描述子并分类，生成与栅格识别格式相同的特征字典"""
+        if not starts:
+            return []
+        starts = np.array(starts, dtype=np.int64)
+        lengths = np.diff(np.append(starts, len(points)))
+        loop_of = np.repeat(np.arange(len(starts)), lengths)
+        index = np.arange(len(points))
+        following = np.where(index + 1 == starts[loop_of] + lengths[loop_of], starts[loop_of], index + 1)
+        preceding = np.where(index == starts[loop_of], starts[loop_of] + lengths[loop_of] - 1, index - 1)
+        x, y = points[:, 0], points[:, 1]
+        next_x, next_y = x[following], y[following]
+
+        # 鞋带公式面积、周长、边界框和多边形重心
+        cross = x * next_y - next_x * y
+        signed = np.add.reduceat(cross, starts) * 0.5
+        area = np.abs(signed)
+        perimeter = np.add.reduceat(np.hypot(next_x - x, next_y - y), starts)
+        x_min, x_max = np.minimum.reduceat(x, starts), np.maximum.reduceat(x, starts)
+        y_min, y_max = np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)
+        safe = np.where(signed != 0, signed, 1.0)
+        center_x = np.add.reduceat((x + next_x) * cross, starts) / (6 * safe)
+        center_y = np.add.reduceat((y + next_y) * cross, starts) / (6 * safe)
+        circularity = np.divide(4 * math.pi * area, perimeter * perimeter,
+                                out=np.zeros(len(starts)), where=perimeter > 0)
+
+        # 代数法拟合圆，用顶点和各边中点到圆的最大半径偏差判断是否为圆
+        circle_x, circle_y, radius = self._fit_circles(points, starts, loop_of, area > 0)
+        middle = (points + points[following]) / 2
+        deviation = np.maximum(
+            np.abs(np.hypot(x - circle_x[loop_of], y - circle_y[loop_of]) - radius[loop_of]),
+            np.abs(np.hypot(middle[:, 0] - circle_x[loop_of], middle[:, 1] - circle_y[loop_of]) - radius[loop_of]))
+        is_circle = (lengths >= self.config['min_circle_vertices']) & \
+            (np.maximum.reduceat(deviation, starts) <= self.config['circle_tolerance'] * radius)
+
+        # 只由直线组成的轮廓按拐角数分类
+        incoming = points - points[preceding]
+        outgoing = points[following] - points
+        norms = np.hypot(*incoming.T) * np.hypot(*outgoing.T)
+        safe_norms = np.where(norms > 0, norms, 1.0)
+        sine = np.abs(incoming[:, 0] * outgoing[:, 1] - incoming[:, 1] * outgoing[:, 0]) / safe_norms
+        cosine = (incoming * outgoing).sum(axis=1) / safe_norms
+        corner = (norms > 0) & ((sine > _COLLINEAR_SINE) | (cosine < 0))
+        corners = np.add.reduceat(corner.astype(np.int64), starts)
+        has_curve = np.add.reduceat(curved.astype(np.int64), starts) > 0
+
+        candidates = np.flatnonzero((area >= min_area) & (perimeter >= min_perimeter))
+        # 幸存轮廓的描述子一次性转为Python列表，避免逐个访问numpy标量
+        rounded = np.round(points).astype(np.int32)
+        begins, ends = starts[candidates].tolist(), (starts + lengths)[candidates].tolist()
+        lefts, tops = x_min[candidates].tolist(), y_min[candidates].tolist()
+        widths = (x_max - x_min)[candidates].tolist()
+        heights = (y_max - y_min)[candidates].tolist()
+        areas, perimeters = area[candidates].tolist(), perimeter[candidates].tolist()
+        centers = np.column_stack([center_x, center_y])[candidates].tolist()
+        circles = np.column_stack([circle_x, circle_y, radius, circularity])[candidates].tolist()
+        kinds = np.where(is_circle, 0, np.where(~has_curve & ((corners == 3) | (corners == 4)), 1, 2))[candidates]
+
+        features = []
+        for k, kind in enumerate(kinds.tolist()):
+            begin, end = begins[k], ends[k]
+            w, h = widths[k], heights[k]
+            aspect_ratio = w / h if h > 0 else 0
+            contour = rounded[begin:end].reshape(-1, 1, 2)
+            feature = {
+                "contour": contour,
+                "bounding_box": (lefts[k], tops[k], w, h),
+                "area": areas[k],
+                "center": tuple(centers[k]),
+                "dimensions": (w, h),
+                "confidence": 1.0,
+                "aspect_ratio": aspect_ratio
+            }
+            if kind == 0:
+                circle_x_k, circle_y_k, radius_k, circularity_k = circles[k]
+                feature.update({
+                    "shape": "circle",
+                    "center": (circle_x_k, circle_y_k),
+                    "radius": radius_k,
+                    "circularity": circularity_k
+                })
+            elif kind == 1:
+                vertices = points[begin:end][corner[begin:end]]
+                self._classify_polygon(feature, vertices, cosine[begin:end][corner[begin:end]])
+            else:
+                circle_area = math.pi * float(cv2.minEnclosingCircle(points[begin:end].astype(np.float32))[1]) ** 2
+                shape, confidence = identify_shape_advanced(contour, areas[k], circle_area, aspect_ratio,
+                                                            perimeter=perimeters[k],
+                                                            bounding_rect=feature["bounding_box"])
+                if not shape or confidence <= IMAGE_PROCESSING_CONFIG['min_confidence_threshold']:
+                    continue
+                feature.update({"shape": shape, "confidence": float(confidence)})
+                self._shape_details(feature, points[begin:end], circles[k][3])
+            features.append(feature)
+        return features
+
+    @staticmethod
+    def _fit_circles(points: np.ndarray, starts: np.ndarray, loop_of: np.ndarray,
+                     valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """按轮廓批量做代数法（Kasa）圆拟合，坐标先减去各轮廓均值以保证数值稳定"""
+        counts = np.diff(np.append(starts, len(points))).astype(np.float64)
+        mean = np.add.reduceat(points, starts) / counts[:, None]
+        local = points - mean[loop_of]
+        x, y = local[:, 0], local[:, 1]
+        z = x * x + y * y
+        sxx, syy, sxy = (np.add.reduceat(value, starts) for value in (x * x, y * y, x * y))
+        sx, sy = np.add.reduceat(x, starts), np.add.reduceat(y, starts)
+        normal = np.stack([np.stack([sxx, sxy, sx], -1), np.stack([sxy, syy, sy], -1),
+                           np.stack([sx, sy, counts], -1)], -2)
+        rhs = -np.stack([np.add.reduceat(z * x, starts), np.add.reduceat(z * y, starts),
+                         np.add.reduceat(z, starts)], -1)
+        # 退化轮廓（面积为0）换成单位矩阵，避免奇异
+        normal[~valid] = np.eye(3)
+        solution = np.linalg.solve(normal, rhs[..., None])[..., 0]
+        center = -solution[:, :2] / 2
+        radius = np.sqrt(np.maximum((center ** 2).sum(axis=1) - solution[:, 2], 0.0))
+        radius[~valid] = 0.0
+        return center[:, 0] + mean[:, 0], center[:, 1] + mean[:, 1], radius
+
+    @staticmethod
+    def _classify_polygon(feature: Dict, vertices: np.ndarray, cosine: np.ndarray) -> None:
+        """直线组成的三角形、四边形按精确顶点分类"""
+        if len(vertices) == 3:
+            feature["shape"] = "triangle"
+            feature["vertices"] = [tuple(point) for point in vertices.tolist()]
+            return
+        sides = np.hypot(*(np.roll(vertices, -1, axis=0) - vertices).T)
+        if np.all(np.abs(cosine) < _RIGHT_ANGLE_COSINE):
+            tolerance = FEATURE_RECOGNITION_CONFIG['aspect_ratio_tolerance']
+            ratio = sides[0] / sides[1] if sides[1] > 0 else 0
+            feature["shape"] = "square" if 1.0 - tolerance <= ratio <= 1.0 + tolerance else "rectangle"
+        else:
+            feature["shape"] = "parallelogram"
+        feature["length"] = float(max(sides[0], sides[1]))
+        feature["width"] = float(min(sides[0], sides[1]))
+
+    @staticmethod
+    def _shape_details(feature: Dict, points: np.ndarray, circularity: float) -> None:
+        """按 identify_shape_advanced 的分类结果补充与栅格识别相同的形状参数"""
+        shape = feature["shape"]
+        w, h = feature["dimensions"]
+        if shape == "circle":
+            (cx, cy), radius = cv2.minEnclosingCircle(points.astype(np.float32))
+            feature["radius"] = float(radius)
+            feature["circularity"] = circularity
+        elif shape in ["rectangle", "square", "parallelogram"]:
+            feature["length"] = max(w, h)
+            feature["width"] = min(w, h)
+        elif shape == "triangle":
+            approx = cv2.approxPolyDP(points.astype(np.float32), 0.03 * cv2.arcLength(points.astype(np.float32), True),
+                                      True)
+            feature["vertices"] = [tuple(point[0]) for point in approx.tolist()]
+        elif shape == "ellipse" and len(points) >= 5:
+            center, axes, angle = cv2.fitEllipse(points.astype(np.float32))
+            feature["ellipse_params"] = {"center": center, "axes": axes, "angle": angle}
+            feature["major_axis"] = max(axes)
+            feature["minor_axis"] = min(axes)
+
+
+# 全局矢量几何提取器实例
+vector_extractor = VectorGeometryExtractor()
+
+
+def extract_vector_features(page: Any, dpi: Optional[int] = None, drawing_text: str = "",
+                            min_area: Optional[float] = None, min_perimeter: Optional[float] = None,
+                            config: Optional[Dict] = None) -> Optional[List[Dict]]:
+    """
+    从PDF页面的矢量路径中识别几何特征的便捷函数
+
+    Args:
+        page: fitz.Page 页面对象
+        dpi (int): 特征坐标对应的渲染DPI，默认取配置值
+        drawing_text (str): 图纸文本，用于辅助识别沉孔和腔槽
+        min_area (float): 最小面积阈值（像素²）
+        min_perimeter (float): 最小周长阈值（像素）
+        config (dict): 覆盖 VECTOR_GEOMETRY_CONFIG 的参数（可选）
+
+    Returns:
+        list: 特征列表；页面不是矢量图纸（扫描件）时返回None
+    """
+    extractor = VectorGeometryExtractor(config) if config else vector_extractor
+    return extractor.extract(page, dpi=dpi, drawing_text=drawing_text, min_area=min_area,
+                             min_perimeter=min_perimeter)
@@ -0,0 +1,308 @@
+"""
+结果缓存
+按输入文件内容（SHA-256）和规范化的加工参数缓存流水线各阶段结果，
+相同图纸、相同描述的重复提交可直接命中缓存
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from src.config import RESULT_CACHE_CONFIG
+
+
+def default_cache_dir() -> str:
+    """当前用户的缓存目录（XDG_CACHE_HOME 或 ~/.cache 下的 cnc_agent）"""
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'cnc_agent')
+
+
+class ResultCache:
+    """
+    内容寻址的磁盘结果缓存
+
+    缓存分层存放（OCR文本、二维特征、三维特征、最终NC程序、大模型回复），
+    每个条目是一个文件，文件的修改时间即最近访问时间；
+    总大小超过上限时按最近最少使用顺序淘汰。
+
+    条目以pickle保存，读取即执行其中的构造代码，缓存目录只允许当前用户访问：
+    默认位于用户缓存目录下，首次读写时以0o700创建；目录属于其他用户时禁用缓存。
+    """
+
+    LAYERS = ('ocr_text', 'features', 'features_3d', 'nc_program', 'llm_response', 'llm_template')
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: Optional[float] = None,
+                 enabled: Optional[bool] = None):
+        self.logger = logging.getLogger(__name__)
+        if cache_dir is None:
+            cache_dir = (os.getenv('CNC_AGENT_CACHE_DIR') or RESULT_CACHE_CONFIG['cache_dir']
+                         or default_cache_dir())
+        if max_size_mb is None:
+            max_size_mb = RESULT_CACHE_CONFIG['max_size_mb']
+        if enabled is None:
+            enabled = RESULT_CACHE_CONFIG['enabled']
+
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._total_size = None  # 首次写入时扫描磁盘得到
+        self._dir_checked = False
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+        self.hits = {layer: 0 for layer in self.LAYERS}
+        self.misses = {layer: 0 for layer in self.LAYERS}
+
+    def file_digest(self, file_path: Optional[str]) -> Optional[str]:
+        """
+        计算文件内容的SHA-256
+
+        同一进程内按 (路径, 大小, 修改时间) 记忆结果，同一作业的多个阶段只读一次文件
+        """
+        if not file_path:
+            return None
+        stat = os.stat(file_path)
+        memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(memo_key)
+        if digest is None:
+            sha256 = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha256.update(chunk)
+            digest = sha256.hexdigest()
+            self._digests[memo_key] = digest
+        return digest
+
+    @staticmethod
+    def normalize_text(text: Optional[str]) -> str:
+        """规范化描述文本：全角转半角、统一大小写、合并空白"""
+        if not text:
+            return ""
+        text = unicodedata.normalize('NFKC', text).lower()
+        return " ".join(text.split())
+
+    def make_key(self, layer: str, file_digests: Iterable[Optional[str]], **params: Any) -> str:
+        """
+        生成缓存键
+
+        Args:
+            layer: 缓存层名称
+            file_digests: 输入文件的SHA-256列表（缺失的输入用None占位）
+            **params: 影响结果的其他参数，必须可JSON序列化
+
+        Returns:
+            str: 十六进制缓存键
+        """
+        if layer not in self.LAYERS:
+            raise ValueError(f"未知的缓存层: {layer}")
+        payload = json.dumps(
+            {'version': RESULT_CACHE_CONFIG['version'], 'layer': layer,
+             'files': list(file_digests), 'params': params},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _check_dir(self) -> bool:
+        """
+        确认缓存目录只有当前用户可以写入，首次调用时检查并记住结果
+
+        目录不存在时以0o700创建；属于当前用户但权限过宽时收紧为0o700；
+        属于其他用户（他人预先创建或指向他人目录的符号链接）时禁用缓存，避免加载他人写入的条目
+        """
+        if self._dir_checked:
+            return self.enabled
+        with self._lock:
+            if self._dir_checked:
+                return self.enabled
+            try:
+                self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+                if hasattr(os, 'getuid'):
+                    stat = os.stat(self.cache_dir)
+                    if stat.st_uid != os.getuid():
+                        self.logger.warning(f"缓存目录 {self.cache_dir} 不属于当前用户，已禁用结果缓存")
+                        self.enabled = False
+                    elif stat.st_mode & 0o077:
+                        os.chmod(self.cache_dir, 0o700)
+            except OSError as e:
+                self.logger.warning(f"无法创建缓存目录 {self.cache_dir}，已禁用结果缓存: {e}")
+                self.enabled = False
+            self._dir_checked = True
+            return self.enabled
+
+    def _entry_path(self, layer: str, key: str) -> Path:
+        return self.cache_dir / layer / key[:2] / f"{key}.pkl"
+
+    def get(self, layer: str, key: str) -> Optional[Any]:
+        """
+        读取缓存条目，未命中返回None
+
+        Args:
+            layer: 缓存层名称
+            key: make_key生成的缓存键
+
+        Returns:
+            缓存的值，未命中时为None
+        """
+        if not self.enabled or not self._check_dir():
+            return None
+        path = self._entry_path(layer, key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)  # 刷新访问时间，供LRU淘汰使用
+        except FileNotFoundError:
+            with self._lock:
+                self.misses[layer] += 1
+            return None
+        except Exception as e:
+            self.logger.warning(f"读取缓存条目失败，将其丢弃 {path}: {e}")
+            self._remove(path)
+            with self._lock:
+                self.misses[layer] += 1
+            return None
+
+        with self._lock:
+            self.hits[layer] += 1
+        return value
+
+    def put(self, layer: str, key: str, value: Any) -> None:
+        """
+        写入缓存条目（先写临时文件再原子替换），必要时触发淘汰
+
+        Args:
+            layer: 缓存层名称
+            key: make_key生成的缓存键
+            value: 要缓存的值，必须可pickle
+        """
+        if not self.enabled or not self._check_dir():
+            return
+        path = self._entry_path(layer, key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            old_size = path.stat().st_size if path.exists() else 0
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception as e:
+            self.logger.warning(f"写入缓存条目失败 {path}: {e}")
+            return
+
+        with self._lock:
+            if self._total_size is None:
+                self._total_size = self._scan_size()
+            else:
+                self._total_size += len(data) - old_size
+            if self._total_size > self.max_size_bytes:
+                self._evict()
+
+    def delete(self, layer: str, key: str) -> None:
+        """
+        删除缓存条目（如调用方判定已过期的条目）
+
+        Args:
+            layer: 缓存层名称
+            key: make_key生成的缓存键
+        """
+        path = self._entry_path(layer, key)
+        with self._lock:
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                return
+            self._remove(path)
+            if self._total_size is not None:
+                self._total_size -= size
+
+    def _iter_entries(self):
+        if not self.cache_dir.exists():
+            return
+        for layer in self.LAYERS:
+            layer_dir = self.cache_dir / layer
+            if layer_dir.exists():
+                yield from layer_dir.glob('*/*.pkl')
+
+    def _scan_size(self) -> int:
+        total = 0
+        for path in self._iter_entries():
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _evict(self) -> None:
+        """按最近访问时间淘汰条目，直到总大小降到上限的90%以下（调用方持有锁）"""
+        entries = []
+        for path in self._iter_entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort(key=lambda entry: entry[0])
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_size_bytes * 0.9)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+            evicted += 1
+        self._total_size = total
+        if evicted:
+            self.logger.info(f"结果缓存淘汰 {evicted} 个条目，当前大小 {total / 1024 / 1024:.1f}MB")
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        """清空所有缓存条目并重置计数"""
+        with self._lock:
+            for path in list(self._iter_entries()):
+                self._remove(path)
+            self._total_size = 0
+            self.hits = {layer: 0 for layer in self.LAYERS}
+            self.misses = {layer: 0 for layer in self.LAYERS}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            Dict: 各层命中/未命中次数、命中率和当前磁盘占用
+        """
+        with self._lock:
+            if self._total_size is None:
+                self._total_size = self._scan_size()
+            layers = {}
+            for layer in self.LAYERS:
+                hits, misses = self.hits[layer], self.misses[layer]
+                layers[layer] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+                }
+            return {
+                'enabled': self.enabled,
+                'cache_dir': str(self.cache_dir),
+                'size_bytes': self._total_size,
+                'max_size_bytes': self.max_size_bytes,
+                'layers': layers
+            }
+
+
+# 创建全局结果缓存实例
+result_cache = ResultCache()
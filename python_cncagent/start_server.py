@@ -22,7 +22,7 @@ import json
 from flask import Flask, request, jsonify, send_file, render_template_string
 from flask_cors import CORS
 import tempfile
-from src.main import generate_nc_from_pdf
+from src.main import generate_nc_from_pdf, stream_nc_from_pdf
 
 # 导入新的HTML模板
 from src.modules.cnc_ui_template import HTML_TEMPLATE
@@ -41,159 +41,295 @@ def index():
 @app.route('/health', methods=['GET'])
 def health_check():
     """健康检查接口"""
-    return jsonify({"status": "healthy", "service": "CNC Agent API"})
+    from src.result_cache import result_cache
+    from src.job_queue import job_queue
+    from src.modules.llm_client import llm_client_pool
+    from src.modules.ai_driven_generator import llm_response_cache
+    return jsonify({"status": "healthy", "service": "CNC Agent API", "cache": result_cache.stats(),
+                    "jobs": job_queue.stats(), "llm": llm_client_pool.stats(),
+                    "llm_cache": llm_response_cache.stats()})
+
+
+ALLOWED_2D_EXTENSIONS = {'.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+ALLOWED_3D_EXTENSIONS = {'.stl', '.step', '.stp', '.igs', '.iges', '.obj', '.ply', '.off', '.gltf', '.glb'}
+
+
+def _save_upload(field, allowed_extensions, label):
+    """
+    将上传文件保存到临时文件
+
+    Returns:
+        tuple: (临时文件路径或None, 错误信息或None)
+    """
+    import logging
+    upload = request.files.get(field)
+    if upload is None or upload.filename == '':
+        return None, None
+    file_ext = os.path.splitext(upload.filename.lower())[1]
+    if file_ext not in allowed_extensions:
+        logging.error(f"不支持的{label}格式: {file_ext}")
+        return None, f"不支持的{label}格式: {file_ext}。支持的格式: {', '.join(allowed_extensions)}"
+    with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
+        upload.save(temp_file.name)
+        logging.info(f"已保存{label}到临时路径: {temp_file.name}")
+        return temp_file.name, None
+
+
+def _remove_temp_files(*paths):
+    """删除上传的临时文件"""
+    import logging
+    for path in paths:
+        if path and os.path.exists(path):
+            try:
+                os.unlink(path)
+                logging.info(f"已删除临时文件: {path}")
+            except Exception as e:
+                logging.error(f"删除临时文件失败 {path}: {str(e)}")
+
+
+def _parse_generate_form():
+    """
+    解析生成NC程序的表单（/generate_nc 与 /jobs 共用），上传文件保存为临时文件
+
+    Returns:
+        tuple: (generate_nc_from_pdf的参数字典, 错误响应)，二者有且只有一个不为None；
+               返回参数字典时，调用方负责删除其中的临时文件
+    """
+    import logging
+    # 检查是否提供了用户描述（这是必须的）
+    if 'description' not in request.form:
+        logging.error("缺少用户描述")
+        return None, (jsonify({"error": "缺少用户描述"}), 400)
+
+    # 获取用户描述并确保正确处理中文字符
+    user_description = request.form['description']
+    if isinstance(user_description, bytes):
+        user_description = user_description.decode('utf-8')
+    logging.info(f"收到用户描述: {user_description[:100]}...")  # 只记录前100个字符
+
+    # 获取比例尺
+    scale = float(request.form.get('scale', 1.0))
+
+    # 从环境变量获取API配置
+    api_key = os.getenv('DEEPSEEK_API_KEY') or os.getenv('OPENAI_API_KEY')
+    model = os.getenv('DEEPSEEK_MODEL', os.getenv('OPENAI_MODEL', 'deepseek-chat'))
+    logging.info(f"使用模型: {model}, API密钥设置: {'已设置' if api_key else '未设置'}")
+    if not api_key:
+        logging.warning("未检测到API密钥，生成可能失败")
+        return None, (jsonify({"error": "未配置API密钥，请设置DEEPSEEK_API_KEY或OPENAI_API_KEY环境变量"}), 500)
+
+    # 处理2D文件（PDF或图像）和3D模型文件
+    pdf_path, error = _save_upload('pdf', ALLOWED_2D_EXTENSIONS, "2D文件")
+    if error:
+        return None, (jsonify({"error": error}), 400)
+    model_3d_path, error = _save_upload('model_3d', ALLOWED_3D_EXTENSIONS, "3D模型")
+    if error:
+        _remove_temp_files(pdf_path)
+        return None, (jsonify({"error": error}), 400)
+
+    # 没有提供任何图纸文件时，只用用户描述
+    if not pdf_path and not model_3d_path and not user_description.strip():
+        logging.error("没有提供文件且描述为空")
+        return None, (jsonify({"error": "必须提供2D图纸、3D模型或加工描述之一"}), 400)
+
+    return {
+        "pdf_path": pdf_path,  # 可能为None
+        "user_description": user_description,
+        "scale": scale,
+        "coordinate_strategy": request.form.get('coordinate_strategy', 'highest_y'),
+        "model_3d_path": model_3d_path,  # 可能为None
+        "model": model,
+        "material": request.form.get('material', 'Aluminum')
+    }, None
+
+
+def _run_generate_job(**params):
+    """作业队列中执行的NC生成任务，API密钥在执行时从环境变量读取，不写入作业存储"""
+    from src.main import generate_nc_from_pdf
+    api_key = os.getenv('DEEPSEEK_API_KEY') or os.getenv('OPENAI_API_KEY')
+    nc_program = generate_nc_from_pdf(api_key=api_key, **params)
+    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.nc') as temp_nc:
+        temp_nc.write(nc_program)
+    return {"nc_program": nc_program, "nc_file_path": temp_nc.name}
+
+
+def _submit_generate_job():
+    """解析表单并提交异步作业，返回202和作业地址；队列已满时返回429"""
+    import logging
+    from src.config import JOB_QUEUE_CONFIG
+    from src.job_queue import job_queue, QueueFullError
+
+    params, error = _parse_generate_form()
+    if error:
+        return error
+    try:
+        job_id = job_queue.submit(
+            _run_generate_job, params,
+            cleanup=lambda: _remove_temp_files(params['pdf_path'], params['model_3d_path'])
+        )
+    except QueueFullError as e:
+        _remove_temp_files(params['pdf_path'], params['model_3d_path'])
+        logging.warning(str(e))
+        response = jsonify({"error": "作业队列已满，请稍后重试"})
+        response.headers['Retry-After'] = str(JOB_QUEUE_CONFIG['retry_after_seconds'])
+        return response, 429
+
+    response = jsonify({"status": "queued", "job_id": job_id, "status_url": f"/jobs/{job_id}"})
+    response.headers['Location'] = f"/jobs/{job_id}"
+    return response, 202
+
+
+def _nc_stream_response(program):
+    """把NC程序（文本或逐行的迭代器）按 GCODE_GENERATION_CONFIG['streaming']['chunk_size'] 分块返回"""
+    from flask import Response
+    from src.modules.gcode_generation import iter_nc_chunks
+    return Response(iter_nc_chunks(program), mimetype='text/plain',
+                    headers={'Content-Disposition': 'attachment; filename=program.nc',
+                             'Cache-Control': 'no-cache'})
 
 
 @app.route('/generate_nc', methods=['POST'])
 def generate_nc():
-    """根据上传的2D/3D文件和用户描述生成NC程序"""
+    """
+    根据上传的2D/3D文件和用户描述生成NC程序
+
+    带 ?async=1 参数时改为提交异步作业（同 POST /jobs）；
+    带 ?stream=1 参数时生成的NC程序以分块传输直接返回（text/plain），不写临时文件；
+    ?mode=features 时不调用大模型，按图纸识别的特征由 stream_fanuc_nc 逐行生成并以分块传输返回，
+    程序不在内存中拼成完整文本（默认 mode=llm）
+    """
     import logging
-    import os  # 在函数开始处导入os模块
     logging.info("收到生成NC程序请求")
-    
+
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return _submit_generate_job()
+
+    params = None
     try:
-        # 检查是否提供了用户描述（这是必须的）
-        if 'description' not in request.form:
-            logging.error("缺少用户描述")
-            return jsonify({"error": "缺少用户描述"}), 400
-        
-        # 获取用户描述并确保正确处理中文字符
-        user_description = request.form['description']
-        if isinstance(user_description, bytes):
-            user_description = user_description.decode('utf-8')
-        
-        logging.info(f"收到用户描述: {user_description[:100]}...")  # 只记录前100个字符
-        
-        # 获取比例尺
-        scale = float(request.form.get('scale', 1.0))
-        coordinate_strategy = request.form.get('coordinate_strategy', 'highest_y')
-        
-        # 初始化文件路径
-        pdf_path = None
-        model_3d_path = None
-        
-        # 处理2D文件（PDF或图像）
-        if 'pdf' in request.files:
-            pdf_file = request.files['pdf']
-            if pdf_file.filename != '':  # 如果文件名不为空
-                # 验证文件类型
-                allowed_extensions = {'.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
-                file_ext = os.path.splitext(pdf_file.filename.lower())[1]
-                if file_ext not in allowed_extensions:
-                    logging.error(f"不支持的2D文件格式: {file_ext}")
-                    return jsonify({"error": f"不支持的2D文件格式: {file_ext}。支持的格式: {', '.join(allowed_extensions)}"}), 400
-                
-                # 创建临时文件保存上传的2D文件
-                with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-                    pdf_file.save(temp_file.name)
-                    pdf_path = temp_file.name
-                    logging.info(f"已保存2D文件到临时路径: {pdf_path}")
-        
-        # 处理3D模型文件
-        if 'model_3d' in request.files:
-            model_3d_file = request.files['model_3d']
-            if model_3d_file.filename != '':  # 如果文件名不为空
-                # 验证3D模型文件类型
-                allowed_extensions = {'.stl', '.step', '.stp', '.igs', '.iges', '.obj', '.ply', '.off', '.gltf', '.glb'}
-                file_ext = os.path.splitext(model_3d_file.filename.lower())[1]
-                if file_ext not in allowed_extensions:
-                    logging.error(f"不支持的3D模型格式: {file_ext}")
-                    return jsonify({"error": f"不支持的3D模型格式: {file_ext}。支持的格式: {', '.join(allowed_extensions)}"}), 400
-                
-                # 创建临时文件保存上传的3D模型
-                with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-                    model_3d_file.save(temp_file.name)
-                    model_3d_path = temp_file.name
-                    logging.info(f"已保存3D模型到临时路径: {model_3d_path}")
-        
-        # 检查是否至少提供了2D文件、3D文件或用户描述中的信息
-        if not pdf_path and not model_3d_path:
-            # 如果没有提供任何图纸文件，只用用户描述
-            if not user_description.strip():
-                logging.error("没有提供文件且描述为空")
-                return jsonify({"error": "必须提供2D图纸、3D模型或加工描述之一"}), 400
-        
-        # 从环境变量获取API配置
-        import os
+        params, error = _parse_generate_form()
+        if error:
+            return error
+
+        mode = request.args.get('mode', 'llm').lower()
+        if mode not in ('llm', 'features'):
+            return jsonify({"error": f"不支持的生成模式: {mode}"}), 400
+        if mode == 'features':
+            if not params['pdf_path']:
+                return jsonify({"error": "按特征生成需要上传2D图纸"}), 400
+            # 特征识别在返回响应前完成（之后即可删除临时文件），程序行边生成边发送
+            lines = stream_nc_from_pdf(params['pdf_path'], params['user_description'], params['scale'],
+                                       params['coordinate_strategy'])
+            return _nc_stream_response(lines)
+
+        # 生成NC程序 - 使用main模块中的函数
         api_key = os.getenv('DEEPSEEK_API_KEY') or os.getenv('OPENAI_API_KEY')
-        model = os.getenv('DEEPSEEK_MODEL', os.getenv('OPENAI_MODEL', 'deepseek-chat'))
-        
-        logging.info(f"使用模型: {model}, API密钥设置: {'已设置' if api_key else '未设置'}")
-        
-        if not api_key:
-            logging.warning("未检测到API密钥，生成可能失败")
-            return jsonify({"error": "未配置API密钥，请设置DEEPSEEK_API_KEY或OPENAI_API_KEY环境变量"}), 500
-        
-        try:
-            # 生成NC程序 - 使用main模块中的函数
-            from src.main import generate_nc_from_pdf
-            
-            logging.info("开始调用generate_nc_from_pdf函数")
-            
-            nc_program = generate_nc_from_pdf(
-                pdf_path=pdf_path,  # 可能为None
-                user_description=user_description,
-                scale=scale,
-                coordinate_strategy=coordinate_strategy,  # 添加坐标策略
-                model_3d_path=model_3d_path,  # 可能为None
-                api_key=api_key,
-                model=model,
-                material=request.form.get('material', 'Aluminum')  # 添加材料参数
-            )
-            
-            logging.info("NC程序生成完成")
-            
-            # 创建临时文件保存NC程序
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.nc') as temp_nc:
-                temp_nc.write(nc_program)
-                temp_nc_path = temp_nc.name
-                logging.info(f"NC程序已保存到临时文件: {temp_nc_path}")
-            
-            # 返回NC程序内容和下载链接
-            response_data = {
-                "status": "success",
-                "nc_program": nc_program,
-                "nc_file_path": temp_nc_path,
-                "message": "NC程序生成成功"
-            }
-            
-            logging.info("成功返回响应")
-            return jsonify(response_data)
-            
-        finally:
-            # 删除临时文件
-            if pdf_path and os.path.exists(pdf_path):
-                try:
-                    os.unlink(pdf_path)
-                    logging.info(f"已删除临时2D文件: {pdf_path}")
-                except Exception as e:
-                    logging.error(f"删除临时2D文件失败 {pdf_path}: {str(e)}")
-            if model_3d_path and os.path.exists(model_3d_path):
-                try:
-                    os.unlink(model_3d_path)
-                    logging.info(f"已删除临时3D文件: {model_3d_path}")
-                except Exception as e:
-                    logging.error(f"删除临时3D文件失败 {model_3d_path}: {str(e)}")
-    
+        logging.info("开始调用generate_nc_from_pdf函数")
+        nc_program = generate_nc_from_pdf(api_key=api_key, **params)
+        logging.info("NC程序生成完成")
+
+        if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+            return _nc_stream_response(nc_program)
+
+        # 创建临时文件保存NC程序
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.nc') as temp_nc:
+            temp_nc.write(nc_program)
+            temp_nc_path = temp_nc.name
+            logging.info(f"NC程序已保存到临时文件: {temp_nc_path}")
+
+        # 返回NC程序内容和下载链接
+        response_data = {
+            "status": "success",
+            "nc_program": nc_program,
+            "nc_file_path": temp_nc_path,
+            "message": "NC程序生成成功"
+        }
+
+        logging.info("成功返回响应")
+        return jsonify(response_data)
+
     except Exception as e:
         logging.error(f"生成NC程序时发生异常: {str(e)}", exc_info=True)
-        # 确保临时文件被清理 - 检查变量是否存在
-        temp_pdf_path = locals().get('pdf_path')
-        temp_model_3d_path = locals().get('model_3d_path')
-        
-        if temp_pdf_path and os.path.exists(temp_pdf_path):
-            try:
-                os.unlink(temp_pdf_path)
-                logging.info(f"异常清理: 已删除临时2D文件: {temp_pdf_path}")
-            except:
-                pass
-        if temp_model_3d_path and os.path.exists(temp_model_3d_path):
-            try:
-                os.unlink(temp_model_3d_path)
-                logging.info(f"异常清理: 已删除临时3D文件: {temp_model_3d_path}")
-            except:
-                pass
         return jsonify({"error": f"生成NC程序时发生错误: {str(e)}"}), 500
+    finally:
+        # 删除临时文件
+        if params:
+            _remove_temp_files(params['pdf_path'], params['model_3d_path'])
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """提交异步NC生成作业（表单字段与/generate_nc相同）"""
+    return _submit_generate_job()
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """查询作业状态和当前进度阶段"""
+    from src.job_queue import job_queue
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "作业不存在"}), 404
+    return jsonify(status)
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    以Server-Sent Events推送作业状态变化，作业结束后关闭连接
+
+    默认事件的数据为作业状态；nc_line事件的数据为流式生成中新到达的一行NC代码
+    """
+    from flask import Response, stream_with_context
+    from src.config import JOB_QUEUE_CONFIG
+    from src.job_queue import job_queue, FINISHED_STATES
+
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "作业不存在"}), 404
+
+    def stream(status):
+        sent_lines = 0
+        while True:
+            # 新的中间输出行（流式生成中的NC代码）作为nc_line事件推送
+            if status['output_lines'] > sent_lines:
+                for line in job_queue.output(job_id, sent_lines):
+                    yield f"event: nc_line\ndata: {json.dumps({'line': line}, ensure_ascii=False)}\n\n"
+                    sent_lines += 1
+            yield f"data: {json.dumps(status, ensure_ascii=False)}\n\n"
+            if status['status'] in FINISHED_STATES:
+                return
+            latest = job_queue.wait_for_change(job_id, status['version'], JOB_QUEUE_CONFIG['event_poll_seconds'])
+            while latest is not None and latest['version'] == status['version']:
+                yield ": keep-alive\n\n"  # 心跳，防止代理断开空闲连接
+                latest = job_queue.wait_for_change(job_id, status['version'], JOB_QUEUE_CONFIG['event_poll_seconds'])
+            if latest is None:
+                return
+            status = latest
+
+    return Response(stream_with_context(stream(status)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """获取已完成作业的NC程序；作业未结束时返回409"""
+    from src.job_queue import job_queue, SUCCEEDED
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "作业不存在"}), 404
+    if status['status'] != SUCCEEDED:
+        return jsonify({"error": f"作业尚未成功完成（{status['status']}）", "job": status}), 409
+    return jsonify({"status": "success", "message": "NC程序生成成功", **job_queue.result(job_id)})
+
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """取消作业"""
+    from src.job_queue import job_queue
+    status = job_queue.cancel(job_id)
+    if status is None:
+        return jsonify({"error": "作业不存在"}), 404
+    return jsonify(status)
 
 
 @app.route('/download_nc/<path:file_path>')
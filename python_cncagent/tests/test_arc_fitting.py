@@ -0,0 +1,112 @@
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+from src.modules.arc_fitting import fit_arcs
+from src.modules.nc_interpreter import KIND_ARC_CCW, KIND_ARC_CW, interpret_nc_program
+
+HEADER = "O0001 (TEST)\nG21 G90 G17 G40 G80\nG54\nT1 M06\nM03 S3000\n"
+
+
+def contour(points, comment=""):
+    """沿给定点加工的轮廓程序，第一个程序段写出G01和进给，其余只写坐标"""
+    body = "".join(f"{'G01 ' if k == 0 else ''}X{x:.3f} Y{y:.3f}{' F600.' if k == 0 else ''}{comment}\n"
+                   for k, (x, y) in enumerate(points[1:]))
+    return (HEADER + f"G00 X{points[0][0]:.3f} Y{points[0][1]:.3f}\nZ2.\nG01 Z-2. F200.\n"
+            + body + "G00 Z50.\nM05\nM30")
+
+
+def circle(count, radius=25.0, center=(50.0, 40.0), turns=1.0):
+    angles = np.linspace(0.0, 2 * np.pi * turns, count + 1)
+    return np.column_stack([center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)])
+
+
+def distance_to_arcs(points, program):
+    """各点到改写后程序中最近的运动段的距离"""
+    segments = interpret_nc_program(program)['segments']
+    arcs = segments[np.isin(segments['kind'], (KIND_ARC_CW, KIND_ARC_CCW))]
+    radius = np.hypot(*(arcs['start'][:, :2] - arcs['center'][:, :2]).T)
+    offset = np.hypot(*(points[:, None, :] - arcs['center'][None, :, :2]).transpose(2, 0, 1))
+    return np.abs(offset - radius).min(axis=1)
+
+
+class TestArcFitting:
+    """测试G01程序段拟合为G02/G03圆弧"""
+
+    def test_fine_polyline_becomes_single_arc(self):
+        points = circle(360)
+        program = contour(points, " (CONTOUR)")
+
+        result, report = fit_arcs(program)
+
+        assert report['verified'] is True
+        assert report['segments_before'] == 361 and report['arcs'] == 1
+        assert report['segments_after'] < 10 and report['reduction'] > 0.95
+        assert report['max_deviation'] <= 0.01
+        lines = result.split('\n')
+        arc = next(line for line in lines if line.startswith("G03"))
+        assert " I-25.000 J" in arc and arc.endswith(" F600. (CONTOUR)")
+        # 圆弧之后剩下的直线程序段补上G01
+        assert lines[lines.index(arc) + 1].startswith("G01 X")
+        assert distance_to_arcs(points[:300], result).max() < 0.01
+
+    def test_coarse_polyline_is_kept(self):
+        # 72边形的弦高约0.024mm，超过公差
+        program = contour(circle(72))
+
+        result, report = fit_arcs(program)
+
+        assert report['arcs'] == 0 and report['verified'] is None
+        assert result == program
+
+    def test_corners_and_straight_lines_are_kept(self):
+        hexagon = contour(circle(6, radius=10.0))
+        straight = contour([(float(x), 0.0) for x in range(50)])
+
+        assert fit_arcs(hexagon)[0] == hexagon
+        assert fit_arcs(straight)[1]['arcs'] == 0
+
+    def test_s_curve_in_r_format(self):
+        x = np.linspace(0.0, 60.0, 200)
+        points = np.column_stack([x, 20.0 * np.sin(x / 10.0)])
+
+        result, report = fit_arcs(contour(points), {'arc_format': 'r'})
+
+        assert report['verified'] is True and report['max_deviation'] <= 0.01
+        arcs = [line for line in result.split('\n') if line.startswith(("G02", "G03"))]
+        assert any(line.startswith("G02") for line in arcs) and any(line.startswith("G03") for line in arcs)
+        assert all(" R" in line and " I" not in line for line in arcs)
+        assert report['segments_after'] < report['segments_before'] / 5
+
+    def test_tolerance_bounds_deviation(self):
+        points = circle(400)
+        tight = fit_arcs(contour(points), {'tolerance': 0.002})[1]
+        loose = fit_arcs(contour(points), {'tolerance': 0.05})[1]
+
+        assert tight['max_deviation'] <= 0.002 and loose['max_deviation'] <= 0.05
+        assert loose['segments_after'] <= tight['segments_after']
+
+    def test_state_dependent_blocks_are_not_fitted(self):
+        compensated = contour(circle(360)).replace("G01 Z-2. F200.", "G41 D1 G01 Z-2. F200.")
+        incremental = HEADER + "G91 G01 X1. Y0.1 F100.\n" * 50 + "G90\nM30"
+
+        assert fit_arcs(compensated)[0] == compensated
+        assert fit_arcs(incremental)[0] == incremental
+        # 打开后也拟合刀具半径补偿中的程序段
+        assert fit_arcs(compensated, {'cutter_comp': True})[1]['arcs'] == 1
+
+    def test_scales_to_long_programs(self):
+        points = np.round(circle(200000, radius=100.0, turns=200.0), 3)
+
+        result, report = fit_arcs(contour(points))
+
+        assert report['verified'] is True
+        assert report['reduction'] > 0.99
+        assert report['seconds'] < 20.0
@@ -0,0 +1,127 @@
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+from src.modules.cycle_time_estimator import CycleTimeEstimator, estimate_cycle_time
+from src.modules.nc_interpreter import interpret_nc_program
+
+# 各轴100 mm/s、1000 mm/s²，便于手算
+MACHINE = {
+    'rapid_rates': [6000.0, 6000.0, 6000.0],
+    'accelerations': [1000.0, 1000.0, 1000.0],
+    'max_cutting_feed': 6000.0,
+    'feed_override': 1.0,
+    'rapid_override': 1.0,
+    'tool_change_seconds': 4.0,
+    'spindle_acceleration': 2000.0
+}
+
+
+def estimate(program: str, **config):
+    return CycleTimeEstimator({**MACHINE, **config}).estimate(program)
+
+
+class TestMotionTime:
+    """测试运动段时间"""
+
+    def test_trapezoidal_and_triangular_profiles(self):
+        # 100mm：加速到100mm/s需要10mm（含减速），t = L/v + v/a
+        assert estimate("G00 X100.")['breakdown']['rapid'] == pytest.approx(1.1)
+        # 1mm：达不到快速速度，三角形速度曲线 t = 2√(L/a)
+        assert estimate("G00 X1.")['breakdown']['rapid'] == pytest.approx(2 * np.sqrt(0.001))
+
+    def test_per_axis_rapid_rate_limits_diagonal_moves(self):
+        result = estimate("G00 X100. Y100.", rapid_rates=[6000.0, 3000.0, 6000.0])
+
+        # Y轴50mm/s走100mm需要2秒，合成速度为 50/cos45°
+        speed = 50.0 / np.sqrt(0.5)
+        assert result['breakdown']['rapid'] == pytest.approx(2.0 + speed / (1000.0 / np.sqrt(0.5)))
+
+    def test_feed_override_and_max_cutting_feed(self):
+        assert estimate("G01 X100. F600")['breakdown']['cutting'] == pytest.approx(10.01)
+        assert estimate("G01 X100. F600", feed_override=0.5)['breakdown']['cutting'] == pytest.approx(20.005)
+        assert estimate("G01 X100. F60000")['breakdown']['cutting'] == pytest.approx(1.1)
+
+    def test_arc_speed_limited_by_centripetal_acceleration(self):
+        result = estimate("G01 X1. F6000\nG02 I-1. J0")
+
+        speed = np.sqrt(1000.0 * 1.0)
+        arc_time = result['breakdown']['cutting'] - estimate("G01 X1. F6000")['breakdown']['cutting']
+        assert arc_time == pytest.approx(2 * np.pi / speed + speed / 1000.0)
+
+
+class TestNonMotionTime:
+    """测试暂停、主轴和换刀时间"""
+
+    def test_g04_and_g82_dwell(self):
+        program = "G00 Z10.\nG04 P500\nG82 X0 Y0 Z-5. R2. P1000 F100\nG80"
+        assert estimate(program)['breakdown']['dwell'] == pytest.approx(1.5)
+
+    def test_spindle_ramp_includes_reversal(self):
+        program = "M03 S1000\nG04 P0\nM04 S1000\nG04 P0\nM05\nG04 P0"
+        # 0->1000、1000->-1000、-1000->0
+        assert estimate(program)['breakdown']['spindle'] == pytest.approx(2.0)
+
+    def test_tool_change_time_per_tool(self):
+        program = "T1 M06\nG00 X10.\nT2 M06\nG00 X0\nM30"
+        result = estimate(program)
+
+        assert result['breakdown']['tool_change'] == pytest.approx(8.0)
+        assert set(result['by_tool']) == {1, 2}
+        assert result['by_tool'][1] == pytest.approx(4.0 + estimate("G00 X10.")['total_seconds'])
+
+
+class TestBreakdown:
+    """测试按工序汇总和批量估算"""
+
+    def test_operations_from_step_comments(self):
+        program = ("G00 Z100.\n"
+                   "(STEP 1: PILOT DRILLING OPERATION)\nT1 M06\nM03 S1000\nG81 X0 Y0 Z-1. R2. F100\nG80\n"
+                   "(STEP 2: DRILLING OPERATION)\nT2 M06\nM03 S800\nG83 X0 Y0 Z-10. R2. Q2. F100\nG80\nM30")
+        result = estimate(program)
+
+        assert [op['name'] for op in result['by_operation']] == ['程序准备', 'PILOT DRILLING', 'DRILLING']
+        assert [op['tool'] for op in result['by_operation']] == [0, 1, 2]
+        assert sum(op['seconds'] for op in result['by_operation']) == pytest.approx(result['total_seconds'])
+        assert result['total_seconds'] == pytest.approx(sum(result['breakdown'].values()))
+
+    def test_operations_fall_back_to_tool_blocks(self):
+        result = estimate("T1 M06\nG00 X10.\nT3 M06\nG01 X0 F500\nM30")
+
+        assert [op['name'] for op in result['by_operation']] == ['T1', 'T3']
+
+    def test_batch_matches_single_estimates(self):
+        programs = ["T1 M06\nM03 S1000\nG00 X10.\nG01 Z-5. F200\nM30", "", "G00 X100.\nM30"]
+        estimator = CycleTimeEstimator(MACHINE)
+        segments = interpret_nc_program(programs[0])['segments']
+
+        totals = estimator.estimate_batch(programs + [segments])
+
+        expected = [estimator.estimate(program)['total_seconds'] for program in programs]
+        assert totals.tolist() == pytest.approx(expected + expected[:1])
+
+    def test_generated_program_and_report(self, tmp_path):
+        from src.modules.gcode_generation import generate_fanuc_nc
+        from src.modules.material_tool_matcher import analyze_user_description
+        from src.modules.simulation_output import generate_simulation_report
+
+        features = [{'shape': 'circle', 'center': (10.0 * i, 20.0), 'radius': 5, 'area': 78,
+                     'dimensions': (10, 10), 'confidence': 0.9} for i in range(1, 4)]
+        analysis = analyze_user_description('加工3个M10螺纹孔，深度12mm')
+        program = generate_fanuc_nc(features, analysis)
+
+        result = estimate_cycle_time(program)
+        names = [op['name'] for op in result['by_operation']]
+        assert {'DRILLING', 'TAPPING'} <= set(names)
+        assert result['breakdown']['tool_change'] > 0 and result['breakdown']['dwell'] > 0
+
+        report_path = tmp_path / "report.txt"
+        generate_simulation_report(features, analysis, program, str(report_path))
+        assert "预计加工时间" in report_path.read_text(encoding='utf-8')
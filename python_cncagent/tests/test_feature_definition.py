@@ -11,27 +11,52 @@ project_root = Path(__file__).parent.parent
 src_path = project_root / "src"
 sys.path.insert(0, str(src_path))
 
-from modules.feature_definition import identify_features, identify_shape_advanced, filter_duplicate_features_advanced, identify_counterbore_features, identify_pocket_features, extract_depth_from_description, adjust_coordinate_system, select_coordinate_reference, extract_highest_y_center_point, extract_lowest_y_center_point, extract_leftmost_x_point, extract_rightmost_x_point, calculate_geometric_center, estimate_corner_radius, extract_dimensions
+from modules.feature_definition import identify_features, identify_shape_advanced, filter_duplicate_features_advanced, compute_contour_descriptors, extract_contour_features, identify_counterbore_features, identify_pocket_features, extract_depth_from_description, adjust_coordinate_system, select_coordinate_reference, extract_highest_y_center_point, extract_lowest_y_center_point, extract_leftmost_x_point, extract_rightmost_x_point, calculate_geometric_center, estimate_corner_radius, extract_dimensions
 
 
 class TestFeatureDefinition:
     """测试特征定义模块"""
     
     def test_identify_features_empty_image(self):
-        """测试识别空图像的特征 - 跳过，因为源代码有bug"""
-        pytest.skip("跳过此测试，因为identify_features函数存在bug，会返回None导致后续处理出错")
+        """测试识别空图像的特征"""
+        image = np.full((400, 400), 255, np.uint8)
+        assert identify_features(image) == []
     
     def test_identify_features_single_circle(self):
-        """测试识别单个圆形特征 - 跳过，因为源代码有bug"""
-        pytest.skip("跳过此测试，因为identify_features函数存在bug，会返回None导致后续处理出错")
+        """测试识别单个圆形特征"""
+        image = np.full((400, 400), 255, np.uint8)
+        cv2.circle(image, (200, 200), 50, 0, 2)
+        
+        features = identify_features(image)
+        
+        assert [f["shape"] for f in features] == ["circle"]
+        assert features[0]["center"] == pytest.approx((200, 200), abs=2)
+        assert features[0]["radius"] == pytest.approx(50, abs=3)
     
     def test_identify_features_single_rectangle(self):
-        """测试识别单个矩形特征 - 跳过，因为源代码有bug"""
-        pytest.skip("跳过此测试，因为identify_features函数存在bug，会返回None导致后续处理出错")
+        """测试识别单个矩形特征"""
+        image = np.full((400, 400), 255, np.uint8)
+        cv2.rectangle(image, (100, 120), (300, 260), 0, 2)
+        
+        features = identify_features(image)
+        
+        assert features
+        assert all(f["center"] == pytest.approx((200, 190), abs=12) for f in features)
+        assert "circle" not in [f["shape"] for f in features]
     
     def test_identify_features_multiple_shapes(self):
-        """测试识别多种形状 - 跳过，因为源代码有bug"""
-        pytest.skip("跳过此测试，因为identify_features函数存在bug，会返回None导致后续处理出错")
+        """测试识别多种形状"""
+        image = np.full((400, 400), 255, np.uint8)
+        cv2.circle(image, (200, 200), 50, 0, 2)
+        cv2.rectangle(image, (20, 20), (120, 90), 0, 2)
+        cv2.circle(image, (320, 320), 30, 0, 2)
+        
+        features = identify_features(image)
+        
+        centers = [f["center"] for f in features]
+        assert any(f["shape"] == "circle" and f["center"] == pytest.approx((200, 200), abs=2) for f in features)
+        assert any(center == pytest.approx((70, 55), abs=5) for center in centers)
+        assert any(center == pytest.approx((320, 320), abs=3) for center in centers)
     
     def test_identify_shape_advanced_circle(self):
         """测试高级形状识别 - 圆形"""
@@ -104,8 +129,78 @@ class TestFeatureDefinition:
         
         # 应该过滤掉重复的圆形，保留一个高置信度的和矩形
         assert isinstance(filtered, list)
-        # 验证返回的是列表，即使过滤逻辑可能不完全按预期工作
+        assert [f["confidence"] for f in filtered] == [0.9, 0.85]
+
+    @staticmethod
+    def _box_feature(bounding_box, confidence, shape="rectangle"):
+        x, y, w, h = bounding_box
+        return {"shape": shape, "center": (x + w / 2, y + h / 2), "bounding_box": bounding_box,
+                "dimensions": (w, h), "confidence": confidence}
+
+    def test_filter_duplicate_union_uses_both_heights(self):
+        """回归：并集面积曾对两个框都使用curr_h，高框与矮框的IoU被算错"""
+        # 正确IoU = 100 / 200 = 0.5，旧公式得到0.25而漏判重复
+        tall = self._box_feature((0, -6, 10, 20), 0.9)
+        short = self._box_feature((0, 0, 10, 10), 0.8)
+        assert filter_duplicate_features_advanced([tall, short]) == [tall]
+
+        # 正确IoU = 20 / 100 = 0.2，旧公式得到0.43而误判重复
+        wide = self._box_feature((0, 0, 10, 10), 0.9)
+        flat = self._box_feature((0, 4, 10, 2), 0.8)
+        assert filter_duplicate_features_advanced([wide, flat]) == [wide, flat]
+
+    def test_filter_duplicate_replaces_lower_confidence(self):
+        """后出现的重复特征置信度更高时，原位替换已保留的特征"""
+        first = self._box_feature((90, 90, 20, 20), 0.6, "circle")
+        other = self._box_feature((300, 300, 20, 20), 0.7, "circle")
+        better = self._box_feature((91, 91, 20, 20), 0.95, "circle")
+
+        assert filter_duplicate_features_advanced([first, other, better]) == [better, other]
+
+    def test_filter_duplicate_matches_pairwise_reference(self):
+        """空间索引实现与逐对比较的参考实现输出一致"""
+        from benchmarks.bench_duplicate_filter import build_synthetic_features, reference_filter
+
+        for seed in range(3):
+            features = build_synthetic_features(600, seed=seed)
+            expected = reference_filter(features)
+            filtered = filter_duplicate_features_advanced(features)
+            assert [id(f) for f in filtered] == [id(f) for f in expected]
     
+    def test_compute_contour_descriptors_matches_opencv(self):
+        """批量描述子与逐轮廓调用OpenCV的结果一致"""
+        image = np.zeros((300, 300), np.uint8)
+        cv2.circle(image, (80, 80), 40, 255, 2)
+        cv2.rectangle(image, (150, 40), (260, 120), 255, 1)
+        cv2.ellipse(image, (200, 220), (60, 25), 30, 0, 360, 255, 2)
+        cv2.line(image, (20, 280), (120, 180), 255, 1)
+        contours, _ = cv2.findContours(image, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        contours = list(contours) + [np.array([[[5, 5]]], dtype=np.int32)]  # 单点轮廓
+
+        descriptors = compute_contour_descriptors(contours)
+
+        assert len(descriptors) == len(contours)
+        for row, contour in zip(descriptors, contours):
+            x, y, w, h = cv2.boundingRect(contour)
+            m = cv2.moments(contour)
+            center = (int(m["m10"] / m["m00"]), int(m["m01"] / m["m00"])) if m["m00"] != 0 else (x + w // 2, y + h // 2)
+            assert row["area"] == cv2.contourArea(contour)
+            assert row["perimeter"] == pytest.approx(cv2.arcLength(contour, True))
+            assert (row["x"], row["y"], row["w"], row["h"]) == (x, y, w, h)
+            assert (row["cx"], row["cy"]) == center
+        assert len(compute_contour_descriptors([])) == 0
+
+    def test_extract_contour_features_matches_per_contour_loop(self):
+        """数组掩码过滤后的特征与逐轮廓循环的输出一致"""
+        from benchmarks.bench_contour_descriptors import build_synthetic_scan, find_contours, legacy_contour_features, core_fields
+
+        contours = find_contours(build_synthetic_scan("A3", 100))
+        features = extract_contour_features(contours, 100, 10)
+        expected = legacy_contour_features(contours, 100, 10)
+
+        assert features
+        assert core_fields(features) == core_fields(expected)
+
     def test_identify_counterbore_features(self):
         """测试沉孔特征识别"""
         # 创建模拟的圆形特征，用于测试沉孔识别
@@ -131,8 +226,9 @@ class TestFeatureDefinition:
         # 测试沉孔识别函数
         result = identify_counterbore_features(features, "加工沉孔", "")
         
-        # 结果应该包含原始特征（可能被重新分类），即使函数有bug返回None
-        assert result is None or isinstance(result, list)
+        # 未识别为沉孔的同心圆仍作为圆特征返回
+        assert isinstance(result, list)
+        assert sorted(f["radius"] for f in result if f["shape"] == "circle") == [8, 10]
     
     def test_identify_pocket_features(self):
         """测试腔槽特征识别"""
@@ -0,0 +1,141 @@
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+from src.modules.hole_patterns import (detect_hole_pattern, format_pattern_comment, format_pattern_cycle,
+                                       pattern_positions)
+
+
+def bolt_circle(count, radius=60.0, center=(50.0, 20.0), start=10.0, step=None):
+    angles = np.radians(start + np.arange(count) * (360.0 / count if step is None else step))
+    return [(center[0] + radius * np.cos(a), center[1] + radius * np.sin(a)) for a in angles]
+
+
+def drilling_features(positions):
+    return [{'shape': 'circle', 'center': position, 'radius': 3.0, 'dimensions': (6.0, 6.0)}
+            for position in positions]
+
+
+class TestHolePatterns:
+    """测试孔阵列识别与宏程序/极坐标输出"""
+
+    def test_detects_grid_from_shuffled_positions(self):
+        points = np.array([(5.0 + 10.0 * i, -3.0 + 12.5 * j) for i in range(40) for j in range(25)])
+        shuffled = points[np.random.default_rng(0).permutation(len(points))]
+
+        pattern = detect_hole_pattern(shuffled)
+
+        assert pattern['type'] == 'grid'
+        assert pattern['origin'] == (5.0, -3.0) and pattern['pitch'] == (10.0, 12.5)
+        assert pattern['counts'] == (40, 25) and pattern['count'] == 1000
+        # 循环的加工顺序覆盖所有孔，逐行蛇形
+        expanded = pattern_positions(pattern)
+        assert sorted(map(tuple, expanded.round(3))) == sorted(map(tuple, points.round(3)))
+        assert tuple(expanded[40]) == (395.0, 9.5)
+
+    def test_detects_full_and_partial_bolt_circles(self):
+        full = detect_hole_pattern(bolt_circle(7), min_holes=6)
+        partial = detect_hole_pattern(bolt_circle(9, start=200.0, step=15.0)[::-1])
+
+        assert full['type'] == 'bolt_circle'
+        assert full['center'] == (50.0, 20.0) and full['radius'] == 60.0
+        assert full['step_angle'] == pytest.approx(360.0 / 7, abs=1e-3)
+        # 整圆从0度起逆时针的第一个孔开始，圆弧上的孔从最大间隔之后开始
+        assert full['start_angle'] == pytest.approx(10.0)
+        assert partial['start_angle'] == pytest.approx(200.0) and partial['step_angle'] == pytest.approx(15.0)
+        assert np.allclose(pattern_positions(partial)[0], bolt_circle(1, start=200.0)[0], atol=1e-3)
+
+    def test_irregular_positions_are_not_patterns(self):
+        rng = np.random.default_rng(1)
+        grid = [(10.0 * i, 10.0 * j) for i in range(5) for j in range(4)]
+        uneven_circle = bolt_circle(10, step=30.0)[:8] + bolt_circle(2, start=260.0, step=50.0)
+
+        assert detect_hole_pattern(rng.uniform(0, 100, size=(50, 2))) is None
+        assert detect_hole_pattern(grid[1:]) is None
+        assert detect_hole_pattern([(0.0, 0.0), (10.0, 0.0), (25.0, 0.0)] * 3) is None
+        assert detect_hole_pattern(uneven_circle) is None
+        assert detect_hole_pattern(grid[:4]) is None
+
+    def test_macro_grid_loop(self):
+        pattern = detect_hole_pattern([(10.0 * i, 8.0 * j) for i in range(4) for j in range(3)])
+
+        lines = format_pattern_cycle(pattern, "G99 G81 Z-5.000 R2.0 F100.0", first_variable=500)
+
+        assert lines[0] == "#500=0.000 (GRID ORIGIN X)" and lines[4] == "#504=4 (COLUMNS)"
+        assert "G99 G81 Z-5.000 R2.0 F100.0 K0 (CYCLE DATA ONLY)" in lines
+        assert "WHILE [#506 LT #505] DO1" in lines and "WHILE [#507 LT #504] DO2" in lines
+        assert "X[#500+#508*#502] Y[#501+#506*#503]" in lines
+        assert lines[-2:] == ["#506=#506+1", "END1"]
+
+    def test_polar_bolt_circle_blocks(self):
+        pattern = detect_hole_pattern(bolt_circle(12, start=0.0))
+
+        lines = format_pattern_cycle(pattern, "G99 G83 Z-12.000 R2.0 Q1.0 F80.0", mode='polar')
+
+        assert [line.split(' (')[0] for line in lines] == [
+            "G52 X50.000 Y20.000", "G16", "G99 G83 X60.000 Y0.000 Z-12.000 R2.0 Q1.0 F80.0",
+            "G91 Y30.000 K11", "G80 G15 G90", "G52 X0 Y0"]
+        assert "BOLT CIRCLE R60.000, 12 HOLES" in format_pattern_comment(pattern, "DRILLING")
+
+    def test_repeat_address_follows_interpreter_config(self, monkeypatch):
+        from src.modules.hole_patterns import NC_INTERPRETER_CONFIG
+
+        monkeypatch.setitem(NC_INTERPRETER_CONFIG, 'cycle_repeat_address', 'L')
+        polar = format_pattern_cycle(detect_hole_pattern(bolt_circle(8)), "G99 G81 Z-5.000 R2.0 F100.0", mode='polar')
+        grid = format_pattern_cycle(detect_hole_pattern([(10.0 * i, 8.0 * j) for i in range(4) for j in range(3)]),
+                                    "G99 G81 Z-5.000 R2.0 F100.0")
+
+        assert any(line.startswith("G91 Y45.000 L7") for line in polar)
+        assert "G99 G81 Z-5.000 R2.0 F100.0 L0 (CYCLE DATA ONLY)" in grid
+
+    def test_drilling_program_uses_macro_loop_for_grid(self):
+        from src.modules.gcode_generation import generate_fanuc_nc
+
+        features = drilling_features([(10.0 * i, 12.0 * j) for i in range(40) for j in range(25)])
+        analysis = {'processing_type': 'drilling', 'depth': 10.0}
+
+        expanded = generate_fanuc_nc(features, analysis)
+        compact = generate_fanuc_nc(features, dict(analysis, pattern_mode='macro'))
+
+        assert "WHILE" not in expanded and len(expanded.split('\n')) > 1000
+        assert len(compact.split('\n')) < 80
+        assert "(HOLE PATTERN - DRILLING: GRID 40 X 25, PITCH X10.000 Y12.000, 1000 HOLES)" in compact
+        assert "G99 G83 Z-10.000 R2.0 Q3.0" in compact and compact.count("END1") == 1
+
+    def test_macro_program_validates_and_interpreter_flags_loop(self):
+        from src.modules.gcode_generation import generate_fanuc_nc
+        from src.modules.nc_code_validator import NCCodeValidator
+        from src.modules.nc_interpreter import interpret_nc_program
+
+        features = drilling_features([(10.0 * i, 12.0 * j) for i in range(6) for j in range(4)])
+        program = generate_fanuc_nc(features, {'processing_type': 'drilling', 'depth': 10.0,
+                                               'pattern_mode': 'macro'})
+        lines = program.split('\n')
+
+        # 宏变量赋值和WHILE/END行符合语法
+        syntax = NCCodeValidator()._check_syntax_validity(lines)
+        assert syntax['passed'] is True, syntax['details']
+        # 解释器不展开宏循环，在第一条宏语句处给出UNSUPPORTED报警，而不是静默跳过
+        alarms = interpret_nc_program(program)['alarms']
+        macro_line = next(i for i, line in enumerate(lines, 1) if line.startswith('#'))
+        assert any(alarm['code'] == 'UNSUPPORTED' and alarm['line'] == macro_line for alarm in alarms)
+
+    def test_tapping_program_uses_polar_bolt_circle(self):
+        from src.modules.gcode_generation import generate_fanuc_nc
+
+        features = drilling_features(bolt_circle(8, start=0.0))
+        program = generate_fanuc_nc(features, {'processing_type': 'tapping', 'thread_size': 'M8',
+                                               'depth': 12.0, 'pattern_mode': 'polar'})
+
+        lines = program.split('\n')
+        assert lines.count("G16 (POLAR COORDINATES - X RADIUS, Y ANGLE)") == 3
+        assert lines.count("G91 Y45.000 K7 (REMAINING 7 HOLES)") == 3
+        assert any(line.startswith("G84 X60.000 Y0.000 Z-12.000") for line in lines)
+        assert "(HOLE 2: POSITION" not in program
@@ -0,0 +1,107 @@
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+from src.modules.hole_sequencing import (HoleSequencer, _nearest_neighbor_order, _nearest_neighbors, path_length,
+                                         sequence_holes)
+
+
+class TestHoleSequencer:
+    """测试孔加工顺序优化"""
+
+    def test_random_holes_return_shorter_permutation(self):
+        points = np.random.default_rng(0).uniform(0, 300, size=(400, 2))
+
+        order, stats = HoleSequencer().order(points)
+
+        assert sorted(order.tolist()) == list(range(400))
+        assert stats['optimized_distance'] == pytest.approx(path_length(points, order))
+        nearest = path_length(points, _nearest_neighbor_order(points, points.min(axis=0)))
+        assert stats['optimized_distance'] < nearest < stats['original_distance']
+        assert 0 < stats['reduction'] < 1
+
+    def test_crossing_path_is_uncrossed(self):
+        points = [(0, 0), (10, 10), (10, 0), (0, 10)]
+
+        order, stats = HoleSequencer().order(points, start=(0, 0))
+
+        assert stats['optimized_distance'] == pytest.approx(30.0)
+        assert order[0] == 0
+
+    def test_grid_uses_serpentine(self):
+        points = np.array([(x * 5.0, y * 8.0) for y in range(12) for x in range(20)])
+        shuffled = points[np.random.default_rng(1).permutation(len(points))]
+
+        order, stats = HoleSequencer().order(shuffled)
+
+        assert stats['method'].startswith('serpentine')
+        # 行内间距5mm，换行8mm
+        assert stats['optimized_distance'] == pytest.approx(19 * 5.0 * 12 + 11 * 8.0)
+
+    def test_start_position_picks_nearest_end(self):
+        points = [(float(x), 0.0) for x in range(10)]
+
+        order, _ = HoleSequencer().order(points[::-1], start=(-5.0, 0.0))
+
+        # 原顺序从X9走到X0，从X-5出发时应先到X0
+        assert [points[::-1][i][0] for i in order] == [float(x) for x in range(10)]
+
+    def test_neighbor_table_respects_time_limit(self):
+        # 20簇几乎重合的孔：网格候选对过多，近邻表退化为n²的距离矩阵
+        rng = np.random.default_rng(0)
+        points = np.repeat(rng.uniform(0, 500, (20, 2)), 1000, axis=0) + rng.normal(0, 1e-4, (20000, 2))
+
+        assert _nearest_neighbors(points, 8, deadline=0.0) is None
+        order, stats = HoleSequencer({'time_limit_seconds': 0.5}).order(points)
+
+        assert sorted(order.tolist()) == list(range(20000))
+        assert stats['seconds'] < 1.5
+        assert '2opt' not in stats['method']
+
+    def test_keeps_order_when_not_improved_or_too_few(self):
+        line = [(float(x), 0.0) for x in range(6)]
+        assert HoleSequencer().order(line)[1]['method'] == 'original'
+        assert HoleSequencer().order([(10.0, 0.0), (0.0, 0.0)])[0].tolist() == [0, 1]
+        assert HoleSequencer({'enabled': False}).order([(0, 0), (9, 9), (1, 1)])[0].tolist() == [0, 1, 2]
+
+    def test_sequence_holes_reorders_feature_dicts(self):
+        features = [{'shape': 'circle', 'center': center} for center in [(0, 0), (50, 0), (1, 0), (49, 0)]]
+
+        ordered, _ = sequence_holes(features)
+
+        assert [f['center'][0] for f in ordered] in ([0, 1, 49, 50], [50, 49, 1, 0])
+
+
+class TestGeneratedPrograms:
+    """测试NC生成中的孔位排序"""
+
+    def test_drilling_program_reports_reduction_in_header(self):
+        from src.modules.gcode_generation import generate_fanuc_nc
+
+        centers = [(0.0, 0.0), (100.0, 0.0), (10.0, 0.0), (90.0, 0.0), (20.0, 0.0), (80.0, 0.0)]
+        features = [{'shape': 'circle', 'center': center, 'radius': 3.0, 'dimensions': (6.0, 6.0), 'confidence': 0.9}
+                    for center in centers]
+        program = generate_fanuc_nc(features, {'processing_type': 'drilling', 'depth': 5.0})
+
+        header = program.split("(PROGRAM PREPARATION)")[0]
+        assert "(HOLE SEQUENCING - DRILLING: 6 HOLES, RAPID XY 400.0 -> 100.0 MM" in header
+        for x, y in centers:
+            assert f"X{x:.3f} Y{y:.3f}" in program
+
+    def test_fanuc_optimization_cycles(self):
+        from src.modules.fanuc_optimization import optimize_drilling_cycle, optimize_tapping_cycle
+
+        holes = [(0.0, 0.0), (30.0, 0.0), (10.0, 0.0), (20.0, 0.0)]
+        drilling = optimize_drilling_cycle(holes, 10.0)
+        assert drilling[0].startswith("(HOLE SEQUENCING - DRILLING")
+        assert [line.split()[0] for line in drilling[2:]] == ["X10.000", "X20.000", "X30.000"]
+
+        tapping = optimize_tapping_cycle(holes, 10.0, 300, "M10", optimize_order=False)
+        assert len(tapping) == 4 and tapping[0].startswith("G84 X0.000")
@@ -0,0 +1,196 @@
+import pytest
+import io
+import json
+import sys
+import threading
+from pathlib import Path
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import src.job_queue as job_queue_module
+from src.job_queue import JobQueue, QueueFullError, report_output, report_progress, with_current_job
+
+
+@pytest.fixture
+def queue(tmp_path):
+    """使用临时数据库的作业队列"""
+    queue = JobQueue(db_path=str(tmp_path / "jobs.sqlite3"), max_workers=1, max_queued=2)
+    yield queue
+    queue.shutdown()
+
+
+def wait_finished(queue, job_id, timeout=5):
+    status = queue.status(job_id)
+    while status['status'] not in job_queue_module.FINISHED_STATES:
+        latest = queue.wait_for_change(job_id, status['version'], timeout)
+        assert latest['version'] > status['version'], "作业未在超时前结束"
+        status = latest
+    return status
+
+
+class TestJobQueue:
+    """测试作业队列的执行、进度、取消和背压"""
+
+    def test_job_reports_stages_and_result(self, queue):
+        def job(value):
+            report_progress('render', page=1, pages=1)
+            report_progress('llm')
+            return {"doubled": value * 2}
+
+        job_id = queue.submit(job, {"value": 21})
+        status = wait_finished(queue, job_id)
+
+        assert status['status'] == 'succeeded'
+        assert status['stage'] == 'llm'
+        assert status['params'] == {"value": 21}
+        assert queue.result(job_id) == {"doubled": 42}
+
+    def test_output_is_read_incrementally(self, queue):
+        def job():
+            for k in range(5):
+                report_output(f"N{k + 1} G01 X{k}.")
+            return {}
+
+        job_id = queue.submit(job)
+        status = wait_finished(queue, job_id)
+
+        assert status['output_lines'] == 5
+        assert queue.output(job_id) == [f"N{k + 1} G01 X{k}." for k in range(5)]
+        assert queue.output(job_id, 3) == ["N4 G01 X3.", "N5 G01 X4."]
+        assert queue.output(job_id, 5) == []
+
+        # 过期作业的输出行随作业一起删除
+        queue.retention_seconds = -1
+        queue.submit(lambda: {})
+        assert queue.output(job_id) == []
+
+    def test_failure_is_recorded(self, queue):
+        def job():
+            raise ValueError("解析失败")
+
+        status = wait_finished(queue, queue.submit(job))
+
+        assert status['status'] == 'failed'
+        assert "解析失败" in status['error']
+
+    def test_queue_full_and_cancel_queued(self, queue):
+        started, release = threading.Event(), threading.Event()
+        cleaned = []
+
+        running = queue.submit(lambda: started.set() or release.wait(5))
+        assert started.wait(5)
+        queued = [queue.submit(lambda: None, cleanup=lambda i=i: cleaned.append(i)) for i in range(2)]
+        with pytest.raises(QueueFullError):
+            queue.submit(lambda: None)
+
+        # 取消排队中的作业立即结束并释放名额
+        assert queue.cancel(queued[0])['status'] == 'cancelled'
+        assert cleaned == [0]
+        queue.submit(lambda: None)
+
+        release.set()
+        assert wait_finished(queue, running)['status'] == 'succeeded'
+        assert wait_finished(queue, queued[1])['status'] == 'succeeded'
+        assert sorted(cleaned) == [0, 1]
+
+    def test_cancel_running_job_at_progress_point(self, queue):
+        started, proceed = threading.Event(), threading.Event()
+
+        def job():
+            report_progress('ocr', page=1)
+            started.set()
+            proceed.wait(5)
+            # 在工作线程池中上报进度也能感知取消
+            with_current_job(report_progress)('detect', page=1)
+            return "unreachable"
+
+        job_id = queue.submit(job)
+        assert started.wait(5)
+        assert queue.cancel(job_id)['cancel_requested']
+        proceed.set()
+
+        status = wait_finished(queue, job_id)
+        assert status['status'] == 'cancelled'
+        assert queue.result(job_id) is None
+
+    def test_unfinished_jobs_marked_failed_after_restart(self, tmp_path):
+        db_path = str(tmp_path / "jobs.sqlite3")
+        release = threading.Event()
+        first = JobQueue(db_path=db_path, max_workers=1, max_queued=2)
+        job_id = first.submit(lambda: release.wait(5))
+
+        second = JobQueue(db_path=db_path)
+        status = second.status(job_id)
+        release.set()
+        first.shutdown()
+
+        assert status['status'] == 'failed'
+
+    def test_report_progress_outside_job_is_noop(self):
+        report_progress('render', page=1)
+
+
+class TestJobEndpoints:
+    """测试异步作业HTTP接口"""
+
+    @pytest.fixture
+    def client(self, queue, monkeypatch):
+        start_server = pytest.importorskip("start_server")
+        monkeypatch.setattr(job_queue_module, "job_queue", queue)
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+        return start_server.app.test_client(), start_server
+
+    def test_submit_poll_and_fetch_result(self, client, monkeypatch):
+        app, start_server = client
+        seen = {}
+
+        def fake_job(**params):
+            seen.update(params)
+            report_output("G21 G90")
+            report_progress('validate')
+            return {"nc_program": "O0001\nM30", "nc_file_path": ""}
+
+        monkeypatch.setattr(start_server, "_run_generate_job", fake_job)
+        response = app.post('/jobs', data={
+            'description': '加工φ22沉孔',
+            'pdf': (io.BytesIO(b"%PDF-1.4"), 'part.pdf'),
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 202
+        job_id = response.get_json()['job_id']
+        events = app.get(f'/jobs/{job_id}/events').get_data(as_text=True)
+        statuses = [json.loads(line[len("data: "):]) for line in events.splitlines() if line.startswith("data: ")]
+
+        assert statuses[-1]['status'] == 'succeeded'
+        assert 'event: nc_line\ndata: {"line": "G21 G90"}' in events
+        assert app.get(f'/jobs/{job_id}').get_json()['stage'] == 'validate'
+        assert app.get(f'/jobs/{job_id}/result').get_json()['nc_program'] == "O0001\nM30"
+        assert 'api_key' not in seen
+        # 作业结束后上传的临时文件被删除
+        assert not Path(seen['pdf_path']).exists()
+
+    def test_full_queue_returns_429(self, client, queue, monkeypatch):
+        app, start_server = client
+        started, release = threading.Event(), threading.Event()
+
+        def fake_job(**params):
+            started.set()
+            release.wait(5)
+
+        monkeypatch.setattr(start_server, "_run_generate_job", fake_job)
+        assert app.post('/generate_nc?async=1', data={'description': '钻孔'}).status_code == 202
+        assert started.wait(5)
+
+        responses = [app.post('/jobs', data={'description': '钻孔'}) for _ in range(3)]
+        release.set()
+
+        assert [r.status_code for r in responses] == [202, 202, 429]
+        assert responses[2].headers['Retry-After']
+
+    def test_unknown_job_returns_404(self, client):
+        app, _ = client
+        assert app.get('/jobs/missing').status_code == 404
+        assert app.delete('/jobs/missing').status_code == 404
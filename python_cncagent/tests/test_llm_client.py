@@ -0,0 +1,172 @@
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import src.modules.llm_client as llm_client
+from src.modules.llm_client import LatencyHistogram, LLMClientPool
+from benchmarks.mock_openai_server import MockOpenAIServer
+
+
+class StatusError(Exception):
+    """带状态码的模拟API错误"""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = None
+
+
+@pytest.fixture
+def pool():
+    pool = LLMClientPool(max_concurrency=2, max_retries=3, backoff_base=0)  # 退避时间为0
+    yield pool
+    pool.close()
+
+
+class TestLatencyHistogram:
+    """测试延迟直方图"""
+
+    def test_quantiles_and_cumulative_buckets(self):
+        histogram = LatencyHistogram([0.1, 1, 10])
+        for seconds in (0.05, 0.5, 0.5, 5, 50):
+            histogram.observe(seconds)
+
+        snapshot = histogram.snapshot()
+
+        assert snapshot['count'] == 5
+        assert snapshot['buckets'] == {'0.1': 1, '1': 3, '10': 4, '+Inf': 5}
+        assert snapshot['p50_seconds'] == 1
+        assert snapshot['p95_seconds'] == 10
+
+
+class TestLLMClientPool:
+    """测试重试、并发限制和延迟统计"""
+
+    def test_retries_rate_limit_and_server_errors(self, pool):
+        outcomes = [StatusError(429), StatusError(503), "G01 X10"]
+
+        def request():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        assert pool.call("deepseek-chat", request) == "G01 X10"
+        stats = pool.stats()['models']['deepseek-chat']
+        assert stats['count'] == 3
+        assert stats['retries'] == 2
+        assert stats['errors'] == 0
+
+    def test_client_errors_are_not_retried(self, pool):
+        calls = []
+
+        def request():
+            calls.append(1)
+            raise StatusError(401)
+
+        with pytest.raises(StatusError):
+            pool.call("deepseek-chat", request)
+        assert len(calls) == 1
+        assert pool.stats()['models']['deepseek-chat']['errors'] == 1
+
+    def test_gives_up_after_max_retries(self, pool):
+        calls = []
+
+        def request():
+            calls.append(1)
+            raise StatusError(500)
+
+        with pytest.raises(StatusError):
+            pool.call("deepseek-chat", request)
+        assert len(calls) == pool.max_retries + 1
+
+    def test_concurrency_is_capped(self, pool):
+        def request():
+            time.sleep(0.02)
+            return "ok"
+
+        threads = [threading.Thread(target=pool.call, args=("m", request)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert pool.stats()['peak_in_flight'] == 2
+
+
+class TestMockServer:
+    """通过本地OpenAI兼容模拟服务测试真实客户端"""
+
+    @pytest.fixture(autouse=True)
+    def require_openai(self):
+        if not llm_client.HAS_OPENAI:
+            pytest.skip("未安装openai库")
+
+    def test_pooled_client_reuses_connection_and_retries(self, pool):
+        with MockOpenAIServer(failures=[429, 502], retry_after=0) as server:
+            replies = [pool.chat_completion(api_key="test", base_url=server.base_url, model="mock",
+                                            messages=[{"role": "user", "content": "钻孔"}])
+                       for _ in range(3)]
+
+        assert all("O0001" in reply for reply in replies)
+        assert server.requests == 5
+        assert server.connections == 1
+        assert pool.stats()['clients'] == 1
+
+    def test_generator_uses_shared_pool(self, pool, monkeypatch):
+        import src.modules.ai_driven_generator as ai_driven_generator
+
+        monkeypatch.setattr(ai_driven_generator, "llm_client_pool", pool)
+        monkeypatch.setitem(ai_driven_generator.LLM_CLIENT_CONFIG, "stream", False)
+        with MockOpenAIServer() as server:
+            monkeypatch.setenv("DEEPSEEK_API_BASE", server.base_url)
+            generator = ai_driven_generator.AIDrivenCNCGenerator(api_key="test", model="deepseek-chat")
+            first = generator._call_large_language_model("加工4个φ10通孔")
+            second = generator._call_large_language_model("加工4个φ10通孔")
+
+        assert first == second == "O0001\nG21 G90 G40\nM30"
+        assert server.connections == 1
+
+    def test_streamed_lines_are_reported_as_they_arrive(self, pool, monkeypatch):
+        import src.modules.ai_driven_generator as ai_driven_generator
+
+        reported = []
+        monkeypatch.setattr(ai_driven_generator, "llm_client_pool", pool)
+        monkeypatch.setattr(ai_driven_generator, "report_output", reported.append)
+        monkeypatch.setitem(ai_driven_generator.LLM_CLIENT_CONFIG, "stream", True)
+        reply = "下面是程序：\n```gcode\nO0001\nG21 G90 G40\nM30\n```\n说明：G21表示公制"
+        with MockOpenAIServer(reply=reply, chunk_size=5) as server:
+            monkeypatch.setenv("DEEPSEEK_API_BASE", server.base_url)
+            generator = ai_driven_generator.AIDrivenCNCGenerator(api_key="test", model="deepseek-chat")
+            program = generator._call_large_language_model("加工4个φ10通孔")
+
+        assert program == "O0001\nG21 G90 G40\nM30"
+        assert reported == ["O0001", "G21 G90 G40", "M30"]
+        assert pool.stats()['first_token']['deepseek-chat']['count'] == 1
+
+    def test_stream_aborts_on_critical_prefix_failure(self, pool, monkeypatch):
+        import src.modules.ai_driven_generator as ai_driven_generator
+
+        monkeypatch.setattr(ai_driven_generator, "llm_client_pool", pool)
+        monkeypatch.setitem(ai_driven_generator.LLM_CLIENT_CONFIG, "stream", True)
+        # 缺少初始化指令的长程序：第20行即可判定失败
+        body = "\n".join(f"G01 X{i}.0 Y{i}.0 F300.0" for i in range(200))
+        reply = f"```gcode\nO0001\nG54\n{body}\nM30\n```"
+        with MockOpenAIServer(reply=reply, chunk_size=16, chunk_delay=0.002) as server:
+            monkeypatch.setenv("DEEPSEEK_API_BASE", server.base_url)
+            generator = ai_driven_generator.AIDrivenCNCGenerator(api_key="test", model="deepseek-chat")
+            program = generator._call_large_language_model("加工4个φ10通孔")
+            deadline = time.monotonic() + 5
+            while not server.aborted_streams and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        assert "FALLBACK MODE" in program
+        assert server.aborted_streams == 1
+        assert server.stream_chunks < len(reply) // 16
@@ -0,0 +1,164 @@
+import pytest
+import sys
+import time
+from pathlib import Path
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import src.modules.ai_driven_generator as ai_driven_generator
+from src.modules.ai_driven_generator import LLMResponseCache, canonicalize_prompt
+from src.result_cache import ResultCache
+
+PROMPT = """# 图纸信息
+
+## 几何特征:
+特征1: circle, 位置[10.0, 20.0], 尺寸[5.0], 置信度0.90
+特征2: circle, 位置[30.0, 40.0], 尺寸[5.0], 置信度0.90
+
+# 用户加工需求
+加工2个φ5通孔，深度8mm"""
+
+PROGRAM = """O0001
+G21 G90 G40 G49 G80
+G54
+M03 S1000
+G00 Z100.0
+G81 X10.0 Y20.0 Z-8.0 R2.0 F100.0
+X30.0 Y40.0
+G80
+G00 Z100.0
+M05
+M30"""
+
+
+@pytest.fixture
+def result_cache(tmp_path):
+    """使用临时目录的结果缓存"""
+    return ResultCache(cache_dir=str(tmp_path / "cache"), max_size_mb=1, enabled=True)
+
+
+@pytest.fixture
+def cache(result_cache):
+    return LLMResponseCache(cache=result_cache, ttl_hours=1, template_mode=True, enabled=True)
+
+
+class TestCanonicalizePrompt:
+    """测试提示词规范化"""
+
+    def test_whitespace_numbers_and_feature_order_do_not_matter(self):
+        variant = """# 图纸信息
+## 几何特征:
+
+特征1: circle,  位置[30, 40], 尺寸[5.0], 置信度0.9
+特征2: circle, 位置[10.0001, 20.0], 尺寸[5], 置信度0.90
+# 用户加工需求
+  加工２个φ5通孔，深度8.0mm  """
+
+        assert canonicalize_prompt(variant) == canonicalize_prompt(PROMPT)
+
+    def test_different_values_give_different_keys(self):
+        assert canonicalize_prompt(PROMPT) != canonicalize_prompt(PROMPT.replace("深度8mm", "深度9mm"))
+
+
+class TestLLMResponseCache:
+    """测试大模型回复缓存"""
+
+    def test_exact_hit_survives_restart(self, cache, result_cache):
+        cache.put(PROMPT, PROGRAM, model="deepseek-chat")
+
+        restarted = LLMResponseCache(cache=ResultCache(cache_dir=str(result_cache.cache_dir), enabled=True),
+                                     ttl_hours=1, template_mode=False, enabled=True)
+
+        assert restarted.get(PROMPT, model="deepseek-chat") == PROGRAM
+        assert restarted.get(PROMPT, model="gpt-4") is None
+        stats = restarted.stats()
+        assert stats['exact_hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+
+    def test_invalid_program_is_not_cached(self, cache):
+        """缺少初始化指令和程序结束的回复不缓存"""
+        bad = PROGRAM.replace("G21 G90 G40 G49 G80\n", "").replace("M30", "")
+
+        cache.put(PROMPT, bad, model="deepseek-chat")
+
+        assert cache.get(PROMPT, model="deepseek-chat") is None
+        assert cache.stats()['invalid'] == 1 and cache.stats()['stores'] == 0
+
+    def test_generator_calls_model_again_after_invalid_response(self, cache, monkeypatch):
+        calls = []
+        bad = PROGRAM.replace("G21 G90 G40 G49 G80\n", "")
+
+        def fake_stream(self, messages, base_url=None):
+            calls.append(messages)
+            return f"```gcode\n{bad}\n```"
+
+        monkeypatch.setattr(ai_driven_generator, "llm_response_cache", cache)
+        monkeypatch.setitem(ai_driven_generator.LLM_CLIENT_CONFIG, "stream", True)
+        monkeypatch.setattr(ai_driven_generator.AIDrivenCNCGenerator, "_stream_large_language_model", fake_stream)
+        generator = ai_driven_generator.AIDrivenCNCGenerator(api_key="test", model="deepseek-chat")
+
+        generator._call_large_language_model(PROMPT)
+        generator._call_large_language_model(PROMPT)
+
+        assert len(calls) == 2
+
+    def test_expired_entries_are_dropped(self, cache, result_cache, monkeypatch):
+        cache.put(PROMPT, PROGRAM)
+        real_time = time.time
+        monkeypatch.setattr(ai_driven_generator.time, "time", lambda: real_time() + 2 * 3600)
+
+        assert cache.get(PROMPT) is None
+        assert cache.stats()['expired'] == 2  # 精确条目和模板条目
+        assert result_cache.stats()['size_bytes'] == 0
+
+    def test_template_hit_reparameterizes_coordinates_and_depth(self, cache):
+        cache.put(PROMPT, PROGRAM)
+        moved = PROMPT.replace("[30.0, 40.0]", "[35.5, 40.0]").replace("深度8mm", "深度12mm")
+
+        program = cache.get(moved)
+
+        assert "X35.5 Y40.0" in program
+        assert "Z-12.0" in program
+        assert "X10.0 Y20.0" in program
+        assert cache.stats()['template_hits'] == 1
+
+    def test_ambiguous_template_is_rejected(self, cache):
+        cache.put(PROMPT, PROGRAM)
+        # 旧值5.0在两个特征中出现，只改其中一个无法确定程序中对应的字
+        changed = PROMPT.replace("位置[30.0, 40.0], 尺寸[5.0]", "位置[30.0, 40.0], 尺寸[6.0]")
+
+        assert cache.get(changed) is None
+        assert cache.stats()['template_rejected'] == 1
+
+    def test_value_missing_from_program_is_rejected(self, cache):
+        cache.put(PROMPT, PROGRAM)
+
+        assert cache.get(PROMPT.replace("φ5", "φ7")) is None
+
+    def test_format_like_keeps_decimal_style(self):
+        assert LLMResponseCache._format_like("10.", 12) == "12."
+        assert LLMResponseCache._format_like("10", 12) == "12"
+        assert LLMResponseCache._format_like("10.000", 12.5) == "12.500"
+        assert LLMResponseCache._format_like("10.0", 12.25) == "12.25"
+
+    def test_generator_skips_model_call_on_hit(self, cache, monkeypatch):
+        calls = []
+
+        def fake_stream(self, messages, base_url=None):
+            calls.append(messages)
+            return f"```gcode\n{PROGRAM}\n```"
+
+        monkeypatch.setattr(ai_driven_generator, "llm_response_cache", cache)
+        monkeypatch.setitem(ai_driven_generator.LLM_CLIENT_CONFIG, "stream", True)
+        monkeypatch.setattr(ai_driven_generator.AIDrivenCNCGenerator, "_stream_large_language_model", fake_stream)
+        generator = ai_driven_generator.AIDrivenCNCGenerator(api_key="test", model="deepseek-chat")
+
+        first = generator._call_large_language_model(PROMPT)
+        second = generator._call_large_language_model(PROMPT)
+
+        assert first == second == PROGRAM
+        assert len(calls) == 1
@@ -207,6 +207,25 @@ M30"""
         lines_invalid_syntax = ["INVALID_COMMAND", "G01 Z-5.0"]
         result = validator._check_syntax_validity(lines_invalid_syntax)
         assert result['passed'] is False
+
+    @pytest.mark.parametrize("line", [
+        "O1234", "N10 G00 X0", "T1 M06", "S1000 M03", "X10. Y20.", "%",
+        "G01 X10 (COMMENT)", "G81X10.Y-5.Z-3.R2.F100", "M98 P1001 L3", "G01 X10 Y20 F100 ; EOB",
+        "#1=10", "N20 #500=[#500+1]", "WHILE [#506 LT #505] DO1", "END1", "IF [#1 GT 0] GOTO5",
+        "X[#500+#502*COS[#503]] Y-#101"
+    ])
+    def test_syntax_accepts_address_words(self, line):
+        """由地址字或宏程序B语句组成的行都有效，不要求以G/M代码开头（程序号、顺序号、换刀、续行坐标）"""
+        assert NCCodeValidator()._check_syntax_validity([line])['passed'] is True
+
+    @pytest.mark.parametrize("line", [
+        "INVALID_COMMAND", "G01 X", "G01 X1.2.3", "G01 X--5", "12.5", "#1=", "X[#1+", "WHILE [#1 LT 2 DO1"
+    ])
+    def test_syntax_rejects_unparsable_content(self, line):
+        """没有数值的地址字母、不合法的数值、未依附地址的数值和不完整的宏程序语句无效"""
+        result = NCCodeValidator()._check_syntax_validity([line])
+        assert result['passed'] is False
+        assert result['severity'] == 'high' and line in result['details']
     
     def test_check_coordinate_system(self):
         """测试坐标系统检查"""
@@ -292,6 +311,21 @@ M30"""
         assert any('Rule 2' in fix for fix in fixes)
         assert any('Rule 3' in fix for fix in fixes)
         assert any('Rule 5' in fix for fix in fixes)
+    
+    def test_incremental_validation_decides_prefix_rules_early(self):
+        """增量验证在收满开头窗口时给出结论，完成后与整体验证结果一致"""
+        validator = NCCodeValidator()
+        lines = ["O1234", "G21 G90", "M03 S1000", "G00 Z100.0"] + [f"G01 X{i}.0 Y0 F200.0" for i in range(20)] + ["M05", "M30"]
+        
+        validation = validator.start_incremental()
+        decided_at = {}
+        for number, line in enumerate(lines, 1):
+            for result in validation.add_line(line):
+                decided_at[result['rule']] = number
+        
+        # 前10行没有坐标系、前20行缺少G40/G49/G80，分别在第10、20行确定
+        assert decided_at == {'Coordinate system': 10, 'Required initialization codes': 20}
+        assert validation.finish() == validator.validate_nc_code("\n".join(lines))
 
 
 class TestNCCodeValidatorIntegration:
@@ -0,0 +1,103 @@
+import pytest
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import src.modules.nc_validator_optimizer as nc_validator_optimizer
+from src.modules.nc_validator_optimizer import NCOptimizer, compact_nc_program
+
+HEADER = "O0001 (TEST)\nG21 G90 G40 G49 G80\nG54 G17\n"
+
+
+class TestCompaction:
+    """测试NC程序的模态压缩"""
+
+    def test_redundant_modal_codes_feeds_and_coordinates(self):
+        program = HEADER + ("G00 X0.000 Y0.000 Z5.000\n"
+                            "G01 Z-1.000 F200.0\n"
+                            "G01 X10.000 Y0.000 F200.0\n"
+                            "G01 X10.000 Y10.000 F200.0\n"
+                            "G90 G17\n"
+                            "M30")
+
+        compacted, report = compact_nc_program(program, {'comments': 'strip'})
+
+        assert compacted.split('\n') == ["O0001", "G21 G90 G40 G49 G80", "G54 G17", "G00 X0. Y0. Z5.",
+                                         "G01 Z-1. F200.", "X10.", "Y10.", "M30"]
+        assert report['verified'] is True
+        assert report['bytes_before'] == len(program.encode('utf-8'))
+        assert report['bytes_after'] == len(compacted.encode('utf-8')) < report['bytes_before']
+        assert report['words_removed'] == 8 and report['comments_removed'] == 1
+
+    def test_number_formatting(self):
+        compacted, _ = compact_nc_program(HEADER + "G01 X-0.0004 Y10 Z1.2500 F100\nM03 S1000.\nG04 P500\nM30")
+
+        lines = compacted.split('\n')
+        # 没有小数点的坐标保留原文（未设定小数点输入时单位为最小设定单位）
+        assert "G01 X0. Y10 Z1.25 F100" in lines
+        assert "M03 S1000" in lines and "G04 P500" in lines
+
+        short, _ = compact_nc_program(HEADER + "G01 X1.0 F100.\nM30", {'short_codes': True, 'word_separator': ''})
+        assert short.split('\n')[-2] == "G1X1.F100."
+
+    def test_comments_shortened(self):
+        compacted, _ = compact_nc_program(HEADER + "G00 Z100.0 (RAPID MOVE TO UNIFIED SAFE HEIGHT)\nM30",
+                                          {'comments': 'shorten', 'max_comment_length': 10})
+
+        assert "G00 Z100. (RAPID MOVE)" in compacted.split('\n')
+        assert compacted.startswith("O0001 (TEST)")
+
+    def test_cycles_dwell_and_cutter_compensation_keep_coordinates(self):
+        program = HEADER + ("G00 X0. Y0. Z50.\n"
+                            "G99 G81 X0. Y0. Z-5. R2. F100.\n"
+                            "X10. Y0.\n"
+                            "G80\n"
+                            "G04 X1.\n"
+                            "G00 X10. Y0. Z50.\n"
+                            "G41 D1 G01 X20. F300.\n"
+                            "X20. Y5.\n"
+                            "G40 G00 X30.\n"
+                            "M30")
+
+        compacted, report = compact_nc_program(program)
+
+        lines = compacted.split('\n')
+        assert "G99 G81 X0. Y0. Z-5. R2. F100." in lines
+        assert "X10. Y0." in lines and "G04 X1." in lines
+        assert "Z50." in lines               # 固定循环后Z位置不确定，X/Y为最后一个孔位，G80后仍为G00
+        assert "X20. Y5." in lines           # 刀具半径补偿中不删除坐标
+        assert report['verified'] is True
+
+    def test_motion_only_block_is_merged_into_next_move(self):
+        program = HEADER + "G00 X0. Y0. Z5.\nG01 Z-1. F100.\nG00 Z-1.\nG01 X5. Z-1.\nM30"
+
+        compacted, report = compact_nc_program(program)
+
+        # "G00 Z-1." 不移动，只剩G00后被下一段的G01覆盖
+        assert compacted.split('\n')[-3:] == ["G01 Z-1. F100.", "X5.", "M30"]
+        assert report['verified'] is True
+
+    def test_macro_lines_reset_modal_state(self):
+        program = HEADER + "G01 X1. F100.\n#1=5\nG01 X1. F100.\nM30"
+
+        compacted, _ = compact_nc_program(program)
+
+        assert compacted.split('\n')[-3:] == ["#1=5", "G01 X1. F100.", "M30"]
+
+    def test_returns_original_when_motion_changes(self, monkeypatch):
+        original_format = nc_validator_optimizer._ModalCompactor._format
+
+        def broken_format(self, letter, value, raw):
+            return original_format(self, letter, value + 1.0 if chr(letter) == 'X' else value, raw)
+
+        monkeypatch.setattr(nc_validator_optimizer._ModalCompactor, '_format', broken_format)
+        program = HEADER + "G00 X1. Y1. Z5.\nM30"
+
+        compacted, report = NCOptimizer().compact_nc_program(program)
+
+        assert compacted == program
+        assert report['verified'] is False and report['bytes_after'] == report['bytes_before']
@@ -0,0 +1,134 @@
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+from src.modules.nc_interpreter import (FANUCInterpreter, KIND_ARC_CCW, KIND_ARC_CW, KIND_DWELL,
+                                        KIND_LINEAR, KIND_RAPID, interpret_nc_program)
+from src.modules.nc_tokenizer import tokenize
+
+
+def run(program: str, **config):
+    return FANUCInterpreter(config).run(program)
+
+
+class TestModalMotion:
+    """测试模态运动和坐标"""
+
+    def test_modal_motion_and_incremental_positions(self):
+        result = run("G90 G00 X10. Y5.\nG01 Z-2. F300\nG91 X5.\nY-5.\nG90 X0")
+        segments = result['segments']
+
+        assert segments['kind'].tolist() == [KIND_RAPID, KIND_LINEAR, KIND_LINEAR, KIND_LINEAR, KIND_LINEAR]
+        assert segments['end'].tolist() == [[10, 5, 0], [10, 5, -2], [15, 5, -2], [15, 0, -2], [0, 0, -2]]
+        assert segments['feed'].tolist() == [0, 300, 300, 300, 300]
+        assert result['final_position'] == [0, 0, -2]
+
+    def test_work_offset_tool_length_and_inch_units(self):
+        result = run("G20 G90 G55 G43 H2 G00 X1. Z1.", work_offsets={'G55': [100.0, 0.0, -50.0]},
+                     tool_lengths={2: 10.0})
+
+        assert result['segments']['end'][0].tolist() == pytest.approx([125.4, 0.0, -14.6])
+        assert result['segments']['wcs'][0] == 55
+        assert result['segments']['length_offset'][0] == 2
+
+    def test_lines_after_program_end_are_not_executed(self):
+        result = run("G00 X1.\nM30\nG00 X99.")
+
+        assert result['executed_lines'] == 2
+        assert result['segments'].size == 1
+
+    def test_spindle_tool_and_coolant_state(self):
+        segments = run("T3 M06\nM03 S1200\nM08\nG01 X5. F100\nM05 M09\nG00 Z50.")['segments']
+
+        assert segments['tool'].tolist() == [3, 3]
+        assert segments['spindle'].tolist() == [1200, 0]
+        assert segments['coolant'].tolist() == [True, False]
+
+
+class TestArcs:
+    """测试圆弧插补"""
+
+    def test_radius_and_center_formats(self):
+        segments = run("G17 G90 G00 X10. Y0\nG03 X0 Y10. R10. F100\nG02 X10. Y0 I0 J-10.\nG02 I-10. J0")['segments']
+        arcs = segments[1:]
+
+        assert arcs['kind'].tolist() == [KIND_ARC_CCW, KIND_ARC_CW, KIND_ARC_CW]
+        assert arcs['center'].ravel() == pytest.approx(np.zeros(9))
+        assert arcs['length'] == pytest.approx([5 * np.pi, 5 * np.pi, 20 * np.pi])
+
+    def test_negative_radius_is_major_arc(self):
+        arc = run("G00 X10. Y0\nG03 X0 Y10. R-10. F100")['segments'][1]
+
+        assert arc['center'].tolist() == pytest.approx([10, 10, 0])
+        assert arc['sweep'] == pytest.approx(1.5 * np.pi)
+
+    def test_end_point_off_circle_raises_alarm(self):
+        result = run("G00 X10. Y0\nG03 X0 Y12. I-10. J0 F100")
+
+        assert [alarm['code'] for alarm in result['alarms']] == ['PS0020']
+        assert result['alarms'][0]['line'] == 2
+
+
+class TestCannedCycles:
+    """测试固定循环展开"""
+
+    def test_g81_returns_to_initial_or_r_level(self):
+        segments = run("G90 G00 Z50.\nG99 G81 X10. Y0 Z-5. R2. F80\nG98 X20.\nG80")['segments']
+        z_path = [(row['kind'], row['start'][2], row['end'][2]) for row in segments[1:]]
+
+        assert z_path == [(KIND_RAPID, 50, 50), (KIND_RAPID, 50, 2), (KIND_LINEAR, 2, -5), (KIND_RAPID, -5, 2),
+                          (KIND_RAPID, 2, 2), (KIND_LINEAR, 2, -5), (KIND_RAPID, -5, 50)]
+
+    def test_g83_pecks_and_g82_dwell(self):
+        segments = run("G00 Z10.\nG98 G83 X0 Y0 Z-10. R0 Q4. F50\nG82 X5. Z-3. R0 P500\nG80")['segments']
+        peck = segments[segments['cycle'] == 83]
+        feeds = peck[peck['kind'] == KIND_LINEAR]
+
+        assert feeds['end'][:, 2].tolist() == [-4, -8, -10]
+        assert feeds['start'][1:, 2].tolist() == pytest.approx([-3.9, -7.9])
+        dwell = segments[segments['dwell'] > 0]
+        assert dwell['cycle'].tolist() == [82]
+        assert dwell['dwell'].tolist() == [0.5]
+
+    def test_incremental_repeat_with_l(self):
+        segments = run("G00 X0 Y0 Z5.\nG91 G99 G81 X10. Z-5. R-3. L3 F100\nG80")['segments']
+        holes = segments[segments['kind'] == KIND_LINEAR]
+
+        assert holes['end'].tolist() == [[10, 0, -3], [20, 0, -3], [30, 0, -3]]
+
+    def test_incremental_repeat_with_k(self):
+        """FS0i格式的重复次数地址为K，K0只设定循环数据"""
+        segments = run("G00 X0 Y0 Z5.\nG91 G99 G81 X10. Z-5. R-3. K3 F100\nG80")['segments']
+        holes = segments[segments['kind'] == KIND_LINEAR]
+
+        assert holes['end'].tolist() == [[10, 0, -3], [20, 0, -3], [30, 0, -3]]
+        segments = run("G00 X0 Y0 Z5.\nG99 G81 X10. Z-5. R2. K0 F100\nX20.\nG80")['segments']
+        assert segments[segments['kind'] == KIND_LINEAR]['end'][:, 0].tolist() == [20]
+
+    def test_g28_and_dwell(self):
+        segments = run("G00 Z5.\nG91 G28 Z10.\nG04 P250")['segments']
+
+        assert segments['end'][:, 2].tolist() == [5, 15, 0, 0]
+        assert segments['kind'][-1] == KIND_DWELL
+        assert segments['dwell'][-1] == 0.25
+
+
+class TestLargePrograms:
+    """测试表格复用和大程序"""
+
+    def test_accepts_shared_table(self):
+        table = tokenize("G00 X1.\nG01 X2. F100")
+
+        assert interpret_nc_program(table)['segments'].size == 2
+
+    def test_unsupported_codes_are_reported(self):
+        result = run("G00 X1.\nG92 X0\nM30")
+
+        assert result['alarms'][0]['code'] == 'UNSUPPORTED'
@@ -0,0 +1,161 @@
+import io
+import pytest
+import sys
+import tracemalloc
+from pathlib import Path
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+from src.exceptions import NCGenerationError
+from src.modules.gcode_generation import (generate_fanuc_nc, iter_nc_chunks, stream_fanuc_nc, write_fanuc_nc,
+                                          write_nc_program)
+
+
+def holes(columns, rows, pitch=(5.0, 7.0)):
+    return [{'shape': 'circle', 'center': (pitch[0] * i, pitch[1] * j), 'radius': 1.0, 'dimensions': (2.0, 2.0)}
+            for i in range(columns) for j in range(rows)]
+
+
+RECTANGLE = [{'shape': 'rectangle', 'center': (50.0, 40.0), 'dimensions': (80.0, 60.0), 'length': 80.0,
+              'width': 60.0, 'contour': [], 'bounding_box': (10, 10, 80, 60), 'area': 4800.0}]
+
+
+class TestNCStreaming:
+    """测试NC程序的流式生成和分块输出"""
+
+    def test_stream_matches_generated_program(self):
+        analysis = {'processing_type': 'milling', 'depth': 3.0, 'description': ''}
+
+        assert "\n".join(stream_fanuc_nc(RECTANGLE, analysis)) == generate_fanuc_nc(RECTANGLE, analysis)
+
+    def test_header_notes_precede_their_operation(self):
+        features = holes(4, 3)
+        analysis = {'processing_type': 'drilling', 'depth': 5.0}
+
+        generated = generate_fanuc_nc(features, analysis).split('\n')
+        streamed = list(stream_fanuc_nc(features, analysis))
+
+        note = next(line for line in generated if line.startswith("(HOLE SEQUENCING - DRILLING"))
+        # 程序段相同，只有程序头注释移到了对应工序的第一个循环程序段之前
+        assert sorted(streamed) == sorted(generated)
+        assert generated.index(note) == 4
+        assert streamed[streamed.index(note) + 1].startswith("G99 G83")
+
+    def test_chunks_reassemble_program(self):
+        lines = ["O0001", "G21 G90", "", "M30"] * 1000
+        text = "\n".join(lines)
+
+        chunks = list(iter_nc_chunks(iter(lines), chunk_size=100))
+        text_chunks = list(iter_nc_chunks(text, chunk_size=100))
+
+        assert "".join(chunks) == text and "".join(text_chunks) == text
+        assert len(chunks) > 10 and all(len(chunk) < 110 for chunk in chunks)
+        assert all(len(chunk) == 100 for chunk in text_chunks[:-1])
+        assert list(iter_nc_chunks(iter([]))) == []
+
+    def test_write_to_path_and_stream(self, tmp_path):
+        features = holes(6, 5)
+        analysis = {'processing_type': 'tapping', 'thread_size': 'M8', 'depth': 10.0}
+        target = tmp_path / "program.nc"
+        buffer = io.StringIO()
+
+        written = write_fanuc_nc(features, analysis, target)
+        write_nc_program(stream_fanuc_nc(features, analysis), buffer)
+
+        assert written == len(target.read_text(encoding="utf-8"))
+        assert target.read_text(encoding="utf-8") == buffer.getvalue()
+        assert buffer.getvalue().endswith("M30 (PROGRAM END)")
+
+    def test_invalid_input_raises_before_iteration(self):
+        with pytest.raises(NCGenerationError):
+            stream_fanuc_nc("not a list", {})
+        with pytest.raises(NCGenerationError):
+            stream_fanuc_nc([{'shape': 'circle'}], {})
+
+    def test_emission_memory_does_not_grow_with_program_length(self):
+        lines = stream_fanuc_nc(holes(100, 100), {'processing_type': 'drilling', 'depth': 5.0})
+        # 前几十行之后孔位已经规划完成，剩下的逐孔程序段不应再占用内存
+        for _ in range(40):
+            next(lines)
+
+        tracemalloc.start()
+        try:
+            base = tracemalloc.get_traced_memory()[0]
+            count = sum(1 for _ in lines)
+            peak = tracemalloc.get_traced_memory()[1] - base
+        finally:
+            tracemalloc.stop()
+
+        assert count > 9900
+        assert peak < 64 * 1024
+
+    @pytest.fixture
+    def recognized_holes(self, monkeypatch, tmp_path):
+        """图纸识别结果替换为1000个孔，返回 (PDF路径, 特征列表)"""
+        import src.main as main_module
+
+        features = [dict(f, confidence=0.9, contour=[], area=3.14,
+                         bounding_box=(f['center'][0] - 1, f['center'][1] - 1, 2, 2)) for f in holes(40, 25)]
+        monkeypatch.setattr(main_module, "extract_text_from_pdf", lambda path: "")
+        monkeypatch.setattr(main_module, "process_pdf_pages",
+                            lambda path, **kwargs: iter([{'page_number': 1, 'features': features}]))
+        pdf_path = tmp_path / "part.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4")
+        return str(pdf_path), features
+
+    def test_pdf_features_streamed_lazily(self, recognized_holes):
+        import inspect
+        import src.main as main_module
+
+        pdf_path, _ = recognized_holes
+        lines = main_module.stream_nc_from_pdf(pdf_path, "钻孔 深5mm")
+
+        assert inspect.isgenerator(lines)
+        program = list(lines)
+        assert sum(line.startswith("X") for line in program) == 999
+        assert program[-1] == "M30 (PROGRAM END)"
+
+    def test_generate_endpoint_streams_program(self, monkeypatch):
+        start_server = pytest.importorskip("start_server")
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+        program = "\n".join(["O0001"] + [f"X{k}.0 Y0." for k in range(20000)] + ["M30"])
+        monkeypatch.setattr(start_server, "generate_nc_from_pdf", lambda **params: program)
+
+        response = start_server.app.test_client().post('/generate_nc?stream=1', data={'description': '钻孔'})
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert response.is_streamed
+        assert response.get_data(as_text=True) == program
+
+    def test_generate_endpoint_streams_features(self, recognized_holes, monkeypatch):
+        start_server = pytest.importorskip("start_server")
+        import src.main as main_module
+
+        pdf_path, _ = recognized_holes
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+
+        def no_llm(**params):
+            raise AssertionError("流式生成不应调用大模型")
+
+        monkeypatch.setattr(start_server, "generate_nc_from_pdf", no_llm)
+        response = start_server.app.test_client().post('/generate_nc?mode=features', data={
+            'description': '钻孔 深5mm', 'pdf': (io.BytesIO(b"%PDF-1.4"), 'part.pdf')},
+            content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert response.is_streamed
+        assert response.get_data(as_text=True) == "\n".join(main_module.stream_nc_from_pdf(pdf_path, "钻孔 深5mm"))
+
+    @pytest.mark.parametrize("query", ["mode=features", "mode=unknown"])
+    def test_generate_endpoint_rejects_bad_feature_request(self, query, monkeypatch):
+        start_server = pytest.importorskip("start_server")
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+
+        response = start_server.app.test_client().post(f'/generate_nc?{query}', data={'description': '钻孔'})
+
+        assert response.status_code == 400
@@ -0,0 +1,109 @@
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import src.modules.nc_tokenizer as nc_tokenizer
+from src.modules.nc_tokenizer import as_table, tokenize
+from src.modules.nc_validator_optimizer import NCOptimizer, NCValidator
+
+SAMPLE = "O1234 (主程序)\n\nG21 G90 ; 注释\n  G01  X 10. Y-5.25 F200\nT1 M06\nINVALID_COMMAND\n123456\nX1-2\n%"
+
+
+class TestNCProgramTable:
+    """测试地址字表的切分结果"""
+
+    def test_words_and_lines(self):
+        table = tokenize(SAMPLE)
+
+        assert table.n_lines == 9
+        assert table.word_texts(3) == ['G01', 'X10.', 'Y-5.25', 'F200']
+        assert table.values('Y').tolist() == [-5.25]
+        assert table.word_line[table.letter_mask('T')].tolist() == [4]
+        assert np.flatnonzero(table.blank).tolist() == [1]
+        assert np.flatnonzero(table.invalid).tolist() == [5, 6, 7]
+        assert table.first_char.tolist() == ['O', '', 'G', 'G', 'T', 'I', '1', 'X', '%']
+
+    def test_comments_are_not_tokenized(self):
+        table = tokenize("G00 X1 (M30 X5)\n(T2 M06)\nG01 Y2 ; G43 H1")
+
+        assert table.codes() == {'G00', 'G01'}
+        assert (table.comment_start[:2].tolist(), table.comment_end[:2].tolist()) == ([7, 0], [15, 8])
+        assert not table.blank.any()
+        assert not table.invalid.any()
+
+    def test_codes_compare_by_value(self):
+        table = tokenize("G0 Z100.\nG1 X5 F100\nM6 T1\nM30")
+
+        assert table.present_codes(['G00', 'G01', 'M06', 'M30']) == {'G00', 'G01', 'M06', 'M30'}
+        assert table.lines_with(['M06']).tolist() == [False, False, True, False]
+
+    def test_head_and_tail_skip_blank_lines(self):
+        table = tokenize("O1\n\n\nG21\nG90\n\nM30\n")
+
+        assert table.head_stop(2) == 4
+        assert table.tail_start(2) == 4
+
+    def test_chunked_scan_matches_single_pass(self, monkeypatch):
+        program = "\n".join(f"G01 X{i}.5 Y-{i} (P{i})" for i in range(200))
+        whole = tokenize(program)
+        monkeypatch.setattr(nc_tokenizer, "CHUNK_BYTES", 64)
+        chunked = tokenize(program)
+
+        assert chunked.n_lines == whole.n_lines == 200
+        assert np.array_equal(chunked.word_value, whole.word_value)
+        assert np.array_equal(chunked.word_line, whole.word_line)
+        assert np.array_equal(chunked.comment_start, whole.comment_start)
+        assert chunked.word_texts(199) == ['G01', 'X199.5', 'Y-199']
+
+    def test_as_table_accepts_lines_and_tables(self):
+        table = tokenize("G21\nM30")
+
+        assert as_table(table) is table
+        assert as_table(["G21", "M30"]).codes() == {'G21', 'M30'}
+        assert tokenize("").n_lines == 1
+
+
+class TestValidatorOnTable:
+    """测试NCValidator基于地址字表的检查"""
+
+    def test_syntax_errors_use_code_line_numbers(self):
+        result = NCValidator().validate_nc_program("O1\n\nG21 G90\nG01 X1 X2 Z1 Z2 F0\nS-5\nM30")
+
+        assert result['errors'] == ["第3行: X坐标重复定义", "第3行: Z坐标重复定义",
+                                    "第3行: 进给率F值应为正数", "第4行: 主轴转速S值应为正数"]
+
+    def test_end_code_in_comment_is_ignored(self):
+        result = NCValidator().validate_nc_program("G21 G90\nG01 X1 (M30)")
+
+        assert "程序缺少结束指令 (M30 或 M02)" in result['errors']
+
+
+class TestOptimizerOnTable:
+    """测试NCOptimizer基于地址字表的优化"""
+
+    def test_whitespace_and_blank_lines(self):
+        optimized = NCOptimizer().optimize_nc_program("G21  G90\n\n\n\n  G01   X10.0 F100  \nM30")
+
+        assert optimized == "G21 G90\n\nG01 X10.0 F100\nM30"
+
+    def test_merges_rapids_with_disjoint_axes(self):
+        optimized = NCOptimizer().optimize_nc_program("G00 Z50.\nG00 Y2.\nG00 X1.\nG00 X3.\nG00 X4. (保留注释)")
+
+        assert optimized == "G00 X1. Y2. Z50.\nG00 X3.\nG00 X4. (保留注释)"
+
+    def test_moves_g43_after_tool_change(self):
+        optimized = NCOptimizer().optimize_nc_program("T1 M06\nM03 S1000\nG43 H1 Z100.\nG00 X0 Y0")
+
+        assert optimized == "T1 M06\nG43 H1 Z100.\nM03 S1000\nG00 X0 Y0"
+
+    def test_duplicates_removed_until_next_move(self):
+        optimized = NCOptimizer().optimize_nc_program("M08\nM8\nG01 X1 F100\nM08\nG81 Z-5 R2\nG81 X5")
+
+        assert optimized == "M08\nG01 X1 F100\nM08\nG81 Z-5 R2\nG81 X5"
@@ -0,0 +1,158 @@
+import pytest
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+from src.modules.operation_scheduler import OperationScheduler, count_tool_changes, feature_process, schedule_operations
+
+
+def _mixed_part(count: int, seed: int = 0):
+    """钻孔、攻丝、沉孔随机混合的孔位，外加一个铣削特征"""
+    rng = np.random.default_rng(seed)
+    features = []
+    for index in range(count):
+        process = ('drilling', 'tapping', 'counterbore')[index % 3]
+        feature = {'shape': 'circle', 'center': tuple(rng.uniform(0, 300, 2)), 'dimensions': (6.0, 6.0),
+                   'process': process}
+        if process == 'tapping':
+            feature['thread_size'] = ('M6', 'M8')[index % 2]
+        features.append(feature)
+    features.append({'shape': 'rectangle', 'center': (150.0, 150.0), 'dimensions': (40.0, 20.0), 'process': 'milling'})
+    return features
+
+
+class TestOperationScheduler:
+    """测试工序调度"""
+
+    def test_feature_process_classification(self):
+        assert feature_process({'shape': 'circle', 'thread_size': 'M6'}) == 'tapping'
+        assert feature_process({'shape': 'counterbore'}) == 'counterbore'
+        assert feature_process({'shape': 'circle'}) == 'drilling'
+        assert feature_process({'shape': 'circle'}, 'tapping') == 'tapping'
+        assert feature_process({'shape': 'circle', 'operation': 'circular_pocket_milling'}) == 'milling'
+        assert feature_process({'shape': 'rectangle'}) == 'milling'
+        assert feature_process({'shape': 'rectangle', 'process': 'drilling'}) == 'drilling'
+
+    def test_each_tool_loaded_once_and_precedence_kept(self):
+        scheduler = OperationScheduler()
+        operations = scheduler.collect(_mixed_part(300))
+        blocks, stats = scheduler.schedule(operations)
+
+        tools = [block['tool'] for block in blocks]
+        assert len(tools) == len(set(tools)) == stats['tools'] == stats['tool_changes']
+        assert stats['original_tool_changes'] == count_tool_changes(operations)
+        assert stats['saved'] == stats['original_tool_changes'] - stats['tool_changes'] > 0
+        assert [block['kind'] for block in blocks][0] == 'spot_drill'
+        assert blocks[-1]['kind'] == 'mill'
+
+        finished = {}
+        for position, block in enumerate(blocks):
+            for operation in block['operations']:
+                assert operation['tool'] == block['tool']
+                # 同一特征的上一道工序必须在更早的刀具块中完成
+                assert finished.get(operation['feature'], (-1, -1))[1] == operation['step'] - 1
+                assert finished.get(operation['feature'], (-1, -1))[0] < position
+                finished[operation['feature']] = (position, operation['step'])
+        assert sum(len(block['operations']) for block in blocks) == len(operations)
+
+    def test_tool_numbers(self):
+        blocks, _ = schedule_operations(_mixed_part(30))
+        numbers = {block['tool']: block['tool_number'] for block in blocks}
+
+        assert numbers[('spot_drill', None)] == 1
+        assert numbers[('mill', None)] == 5
+        taps = sorted(number for tool, number in numbers.items() if tool[0] == 'tap')
+        assert taps[0] == 3 and taps[1] >= 11
+        assert len(set(numbers.values())) == len(numbers)
+
+    def test_tapping_and_counterbore_parameters(self):
+        operations = OperationScheduler().collect([
+            {'shape': 'circle', 'center': (0.0, 0.0), 'dimensions': (6.0, 6.0), 'thread_size': 'M6', 'depth': 9.0},
+            {'shape': 'counterbore', 'center': (10.0, 0.0), 'dimensions': (22.0, 22.0),
+             'outer_diameter': 20.0, 'inner_diameter': 11.0, 'counterbore_depth': 11.0, 'through_depth': 30.0},
+        ])
+
+        assert [(op['kind'], op['size'], op['depth']) for op in operations] == [
+            ('spot_drill', None, 1.0), ('drill', 5.0, pytest.approx(9.0 + 5.0 / 3 + 1.5)), ('tap', 'M6', 9.0),
+            ('spot_drill', None, 1.0), ('drill', 11.0, 30.0), ('counterbore', 20.0, 11.0)]
+
+    def test_counterbore_sizes_from_description_analysis(self):
+        operations = OperationScheduler().collect([
+            {'shape': 'circle', 'center': (0.0, 0.0), 'radius': 5.0, 'process': 'counterbore'},
+            {'shape': 'counterbore', 'center': (30.0, 0.0), 'outer_diameter': 20.0, 'inner_diameter': 11.0},
+        ], {'outer_diameter': 16.0, 'inner_diameter': 10.0, 'depth': 8.0})
+
+        assert [(op['kind'], op['size']) for op in operations if op['kind'] != 'spot_drill'] == [
+            ('drill', 10.0), ('counterbore', 16.0), ('drill', 11.0), ('counterbore', 20.0)]
+
+    def test_drill_size_from_recognized_radius(self):
+        operations = OperationScheduler().collect([
+            {'shape': 'circle', 'center': (0.0, 0.0), 'radius': 3.0},
+            {'shape': 'circle', 'center': (10.0, 0.0), 'radius': 4.26},
+            {'shape': 'circle', 'center': (20.0, 0.0)},
+        ], {'tool_diameter': 10.0})
+
+        assert [op['size'] for op in operations if op['kind'] == 'drill'] == [6.0, 8.5, 10.0]
+
+    def test_thousands_of_operations_are_fast(self):
+        scheduler = OperationScheduler()
+        operations = scheduler.collect(_mixed_part(3000))
+
+        start = time.perf_counter()
+        blocks, stats = scheduler.schedule(operations)
+
+        assert time.perf_counter() - start < 0.5
+        assert stats['operations'] == len(operations) > 8000
+        assert stats['tool_changes'] == 9
+
+
+class TestScheduledProgram:
+    """测试混合零件的NC生成"""
+
+    def test_mixed_program_groups_tool_changes(self):
+        from src.modules.gcode_generation import generate_fanuc_nc
+
+        program = generate_fanuc_nc(_mixed_part(12), {'processing_type': 'mixed', 'description': ''})
+
+        header = program.split("(PROGRAM PREPARATION)")[0]
+        assert "(OPERATION SCHEDULE: 33 OPERATIONS, 9 TOOLS, TOOL CHANGES 33 -> 9, SAVED 24)" in header
+        tool_changes = [line.split()[0] for line in program.splitlines() if "M06" in line and not line.startswith("(")]
+        assert tool_changes == ['T1', 'T2', 'T11', 'T12', 'T13', 'T3', 'T14', 'T4', 'T5']
+        assert program.index("G82 X") < program.index("G83 X") < program.index("G84 X") < program.index("G81 X")
+        assert program.rstrip().endswith("M30 (PROGRAM END)")
+
+    def test_recognized_hole_drilled_at_its_size(self):
+        from src.modules.gcode_generation import generate_fanuc_nc
+
+        program = generate_fanuc_nc([
+            {'shape': 'circle', 'center': (5.0, 5.0), 'dimensions': (6.0, 6.0), 'radius': 3.0},
+            {'shape': 'rectangle', 'center': (150.0, 150.0), 'dimensions': (40.0, 20.0)},
+        ], {'processing_type': 'mixed', 'description': ''})
+
+        assert "DRILL BIT φ6.0mm" in program
+        assert "φ12.0mm" not in program
+
+    @pytest.mark.parametrize('stage_order', [
+        ['spot_drill', 'drill', 'tap', 'counterbore', 'mill'],
+        ['mill', 'spot_drill', 'drill', 'tap', 'counterbore'],
+    ])
+    def test_spindle_and_coolant_stopped_before_tool_change(self, stage_order, monkeypatch):
+        from src.modules.gcode_generation import generate_fanuc_nc
+        from src.modules.operation_scheduler import operation_scheduler
+
+        # 铣削块排在钻孔工序之前时，换刀前同样要停主轴和切削液
+        monkeypatch.setitem(operation_scheduler.config, 'stage_order', stage_order)
+        program = generate_fanuc_nc(_mixed_part(12), {'processing_type': 'mixed', 'description': ''})
+
+        lines = [line for line in program.splitlines() if line and not line.startswith("(")]
+        changes = [index for index, line in enumerate(lines) if "M06" in line]
+        for previous, current in zip(changes, changes[1:]):
+            between = [line.split()[0] for line in lines[previous:current]]
+            assert "M09" in between and between[-1] == "M05"
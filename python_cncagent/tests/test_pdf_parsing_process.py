@@ -0,0 +1,180 @@
+import pytest
+import sys
+from pathlib import Path
+
+import fitz
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import modules.pdf_parsing_process as pdf_parsing_process
+from modules.pdf_parsing_process import iter_pdf_pages, pdf_to_images, process_pdf_pages, ocr_image, _encode_pnm
+
+
+@pytest.fixture
+def multi_page_pdf(tmp_path):
+    """生成一个4页的测试PDF，每页画一个不同半径的圆"""
+    pdf_path = tmp_path / "multi_page.pdf"
+    doc = fitz.open()
+    for i in range(4):
+        page = doc.new_page(width=200, height=150)
+        page.draw_circle((100, 75), 20 + i * 5, color=(0, 0, 0), width=2)
+        page.insert_text((10, 20), f"PAGE {i + 1}")
+    doc.save(str(pdf_path))
+    doc.close()
+    return str(pdf_path)
+
+
+class TestPagePipeline:
+    """测试流式页面渲染流水线"""
+
+    def test_iter_pdf_pages_serial(self, multi_page_pdf):
+        """单进程模式按页码顺序产出全部页面"""
+        pages = list(iter_pdf_pages(multi_page_pdf, dpi=72, max_workers=1))
+
+        assert [page_num for page_num, _ in pages] == [0, 1, 2, 3]
+        assert all(image.size == (200, 150) for _, image in pages)
+
+    def test_iter_pdf_pages_parallel_matches_serial(self, multi_page_pdf):
+        """进程池渲染结果应与串行渲染逐像素一致"""
+        serial = dict(iter_pdf_pages(multi_page_pdf, dpi=72, max_workers=1))
+        parallel = dict(iter_pdf_pages(multi_page_pdf, dpi=72, max_workers=2))
+
+        assert sorted(parallel) == sorted(serial)
+        for page_num, image in parallel.items():
+            assert image.tobytes() == serial[page_num].tobytes()
+
+    def test_pdf_to_images_keeps_page_order(self, multi_page_pdf):
+        """pdf_to_images 在并行渲染时仍按页码顺序返回"""
+        images = pdf_to_images(multi_page_pdf, dpi=144, max_workers=2)
+
+        assert len(images) == 4
+        assert images[0].size == (400, 300)
+
+    def test_process_pdf_pages_without_analysis(self, multi_page_pdf):
+        """关闭OCR和特征识别时，每页仍产出一条结果"""
+        results = list(process_pdf_pages(multi_page_pdf, dpi=72, max_workers=2,
+                                         run_ocr=False, detect_features=False))
+
+        assert sorted(r["page_number"] for r in results) == [0, 1, 2, 3]
+        assert all(r["ocr_text"] == "" and r["features"] == [] for r in results)
+        assert all(r["image_size"] == (200, 150) for r in results)
+
+
+class TestBufferOCR:
+    """测试无临时文件的OCR输入路径"""
+
+    def test_encode_pnm_header(self):
+        """PGM/PPM头只在原始像素前拼接，不做任何编码"""
+        assert _encode_pnm(b"\x00" * 6, 3, 2, 1) == b"P5\n3 2\n255\n" + b"\x00" * 6
+        assert _encode_pnm(b"\x00" * 18, 3, 2, 3).startswith(b"P6\n3 2\n")
+
+    def test_ocr_image_pipes_buffer_to_stdin(self, monkeypatch):
+        """命令行后端通过stdin传入图像，不创建临时文件"""
+        from PIL import Image
+        import subprocess
+        import tempfile
+
+        captured = {}
+
+        def fake_run(command, input=None, **kwargs):
+            captured["command"] = command
+            captured["input"] = input
+            return subprocess.CompletedProcess(command, 0, stdout="φ22 深20".encode("utf-8"), stderr=b"")
+
+        def no_temp_files(*args, **kwargs):
+            raise AssertionError("OCR不应创建临时文件")
+
+        monkeypatch.setitem(pdf_parsing_process.OCR_CONFIG, "backend", "cli")
+        monkeypatch.setattr(pdf_parsing_process.subprocess, "run", fake_run)
+        monkeypatch.setattr(tempfile, "NamedTemporaryFile", no_temp_files)
+
+        text = ocr_image(Image.new("RGB", (4, 2), "white"), lang="eng")
+
+        assert text == "φ22 深20"
+        assert captured["command"][1:] == ["stdin", "stdout", "-l", "eng"]
+        assert captured["input"] == b"P5\n4 2\n255\n" + b"\xff" * 8
+
+    def test_tesseract_apis_end_when_thread_exits(self, monkeypatch):
+        """线程内缓存的tesserocr引擎在线程结束和进程退出时 End()"""
+        import gc
+        import threading
+        import types
+
+        ended = []
+
+        class FakeAPI:
+            def __init__(self, lang):
+                self.lang = lang
+
+            def SetPageSegMode(self, psm):
+                pass
+
+            def SetVariable(self, name, value):
+                pass
+
+            def End(self):
+                ended.append(self.lang)
+
+        monkeypatch.setattr(pdf_parsing_process, "tesserocr",
+                            types.SimpleNamespace(PyTessBaseAPI=FakeAPI, PSM=types.SimpleNamespace(AUTO=3)),
+                            raising=False)
+
+        def worker():
+            assert pdf_parsing_process._get_tesseract_api("eng") is pdf_parsing_process._get_tesseract_api("eng")
+            pdf_parsing_process._get_tesseract_api("chi_sim")
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        del thread
+        gc.collect()
+        assert sorted(ended) == ["chi_sim", "eng"]
+
+        pdf_parsing_process._get_tesseract_api("eng")
+        pdf_parsing_process._close_all_tesseract_apis()
+        assert ended[2:] == ["eng"]
+
+    def test_cached_tesseract_api_resets_mode_and_whitelist(self, monkeypatch):
+        """复用的引擎不沿用上一次 ocr_buffer_lines 设置的页面分割模式和白名单"""
+        import types
+
+        settings = []
+
+        class FakeAPI:
+            def __init__(self, lang):
+                self.psm, self.whitelist = 3, ''
+
+            def SetPageSegMode(self, psm):
+                self.psm = psm
+
+            def SetVariable(self, name, value):
+                self.whitelist = value
+
+            def SetImageBytes(self, *args):
+                settings.append((self.psm, self.whitelist))
+
+            def GetUTF8Text(self):
+                return "技术要求"
+
+            def GetTSVText(self, page):
+                return ""
+
+            def End(self):
+                pass
+
+        monkeypatch.setattr(pdf_parsing_process, "tesserocr",
+                            types.SimpleNamespace(PyTessBaseAPI=FakeAPI, PSM=types.SimpleNamespace(AUTO=3)),
+                            raising=False)
+        monkeypatch.setitem(pdf_parsing_process.OCR_CONFIG, "backend", "tesserocr")
+        pixels = b"\xff" * 8
+        try:
+            pdf_parsing_process.ocr_buffer_lines(pixels, 4, 2, lang="eng", psm=7, whitelist="0123456789")
+            assert pdf_parsing_process.ocr_buffer(pixels, 4, 2, lang="eng") == "技术要求"
+            pdf_parsing_process.ocr_buffer_lines(pixels, 4, 2, lang="eng")
+        finally:
+            pdf_parsing_process.close_tesseract_apis()
+
+        assert settings == [(7, "0123456789"), (3, ""), (3, "")]
@@ -0,0 +1,73 @@
+import pytest
+import sys
+from pathlib import Path
+
+import fitz
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import src.modules.text_acquisition as text_acquisition
+from src.modules.subprocesses.pdf_parsing_process import extract_geometric_info_from_lines, pdf_parsing_process
+
+OCR_LINES = [
+    {'text': '圆心: (50, 50), 半径R10', 'bbox': (100.0, 80.0, 220.0, 92.0), 'page_number': 0, 'source': 'ocr'},
+    {'text': 'Ra3.2', 'bbox': (300.0, 40.0, 330.0, 50.0), 'page_number': 1, 'source': 'ocr'},
+    {'text': '技术要求', 'bbox': (20.0, 20.0, 60.0, 30.0), 'page_number': 1, 'source': 'ocr'},
+]
+
+
+@pytest.fixture
+def scanned_pdf(tmp_path):
+    """没有文本层的两页PDF"""
+    path = tmp_path / "scan.pdf"
+    document = fitz.open()
+    for _ in range(2):
+        document.new_page().draw_rect(fitz.Rect(50, 50, 200, 150))
+    document.save(str(path))
+    document.close()
+    return str(path)
+
+
+class TestExtractFromLines:
+    """测试逐行提取几何信息并保留文本行位置"""
+
+    def test_items_carry_line_position(self):
+        result = extract_geometric_info_from_lines(OCR_LINES)
+
+        assert result['geometry_elements'] and result['dimensions'] and result['surface_finishes']
+        for item in result['geometry_elements'] + result['dimensions']:
+            assert (item['page_number'], item['bbox'], item['text_source']) == (0, OCR_LINES[0]['bbox'], 'ocr')
+        assert [(item['page_number'], item['bbox']) for item in result['surface_finishes']] == \
+            [(1, OCR_LINES[1]['bbox'])]
+
+    def test_empty_lines(self):
+        assert extract_geometric_info_from_lines([]) == \
+            {'geometry_elements': [], 'dimensions': [], 'tolerances': [], 'surface_finishes': []}
+
+
+class TestScannedDrawingFallback:
+    """测试没有文本层时改用文字区域识别的结果"""
+
+    def test_ocr_lines_replace_default_geometry(self, scanned_pdf, monkeypatch):
+        monkeypatch.setattr(text_acquisition, "acquire_pdf_text",
+                            lambda path: {'text': "\n".join(line['text'] for line in OCR_LINES), 'lines': OCR_LINES})
+
+        result = pdf_parsing_process(scanned_pdf)
+
+        assert 'default_rectangle' not in [element['id'] for element in result['geometry_elements']]
+        assert any(item.get('text_source') == 'ocr' for item in result['dimensions'])
+        assert result['surface_finishes'][0]['bbox'] == OCR_LINES[1]['bbox']
+
+    def test_acquisition_failure_is_logged(self, scanned_pdf, monkeypatch, caplog):
+        def fail(path):
+            raise RuntimeError("tesseract not found")
+
+        monkeypatch.setattr(text_acquisition, "acquire_pdf_text", fail)
+
+        result = pdf_parsing_process(scanned_pdf)
+
+        assert result['geometry_elements']
+        assert "图纸文字区域识别失败: tesseract not found" in caplog.text
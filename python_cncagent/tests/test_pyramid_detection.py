@@ -0,0 +1,175 @@
+import pytest
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import src.modules.pyramid_detection as pyramid_detection
+from src.modules.feature_definition import detect_edges, extract_contour_features
+from src.modules.geometric_reasoning_engine import GeometricReasoningEngine
+from src.modules.ocr_ai_inference import PDFFeatureExtractor
+from src.modules.pyramid_detection import (
+    get_image_pyramid, find_contours_pyramid, find_edge_contours_pyramid, should_use_pyramid
+)
+
+EDGE_PARAMS = (50, 150, (5, 5), (2, 2))
+ALWAYS = {'mode': 'always', 'max_workers': 2}
+
+
+@pytest.fixture
+def drawing():
+    """带图框、零件外轮廓、矩形槽、小孔和零散噪点的合成图纸"""
+    rng = np.random.default_rng(0)
+    image = np.full((1754, 2480), 255, np.uint8)
+    cv2.rectangle(image, (15, 15), (2465, 1739), 0, 3)
+    cv2.rectangle(image, (300, 300), (1500, 1300), 0, 2)
+    holes = []
+    for row in range(4):
+        for column in range(6):
+            center = (400 + column * 180, 400 + row * 220)
+            radius = int(rng.integers(8, 30))
+            cv2.circle(image, center, radius, 0, 2)
+            holes.append((center, radius))
+    for k in range(5):
+        cv2.rectangle(image, (1700, 200 + k * 250), (1900 + k * 40, 320 + k * 250), 0, 2)
+    # 构不成特征的噪点
+    for _ in range(400):
+        x, y = int(rng.integers(20, 2460)), int(rng.integers(20, 1730))
+        image[y:y + 2, x:x + 2] = 0
+    return image, holes
+
+
+def small(contours):
+    """外接框不超过 max_refine_size 的轮廓（按原分辨率细化）"""
+    limit = pyramid_detection.PYRAMID_DETECTION_CONFIG['max_refine_size']
+    return [contour for contour in contours if max(cv2.boundingRect(contour)[2:]) <= limit]
+
+
+def feature_keys(contours):
+    features = extract_contour_features(contours, 100, 10)
+    return sorted((feature['shape'], tuple(int(v) for v in feature['bounding_box'])) for feature in features)
+
+
+class TestImagePyramid:
+    """测试页面图像金字塔的生成与缓存"""
+
+    def test_levels_are_built_lazily_from_gray(self):
+        image = np.full((403, 601, 3), 255, np.uint8)
+
+        pyramid = get_image_pyramid(image)
+
+        assert pyramid.base.shape == (403, 601)
+        assert pyramid.level(2).shape == (101, 151)
+        assert pyramid.level(1).shape == (202, 301)
+
+    def test_same_image_reuses_cached_pyramid(self):
+        image = np.zeros((64, 64), np.uint8)
+
+        pyramid = get_image_pyramid(image)
+
+        assert get_image_pyramid(image) is pyramid
+        assert get_image_pyramid(image.copy()) is not pyramid
+
+    def test_cache_size_limits_cached_pages(self, monkeypatch):
+        monkeypatch.setitem(pyramid_detection.PYRAMID_DETECTION_CONFIG, 'cache_size', 1)
+        first, second = np.zeros((32, 32), np.uint8), np.zeros((32, 32), np.uint8)
+
+        pyramid = get_image_pyramid(first)
+        get_image_pyramid(second)
+
+        assert get_image_pyramid(first) is not pyramid
+
+
+class TestPyramidContours:
+    """测试由粗到精的轮廓查找与整图结果一致"""
+
+    def test_should_use_by_pixel_count(self):
+        assert should_use_pyramid((7017, 9934))
+        assert not should_use_pyramid((1754, 2480))
+        assert should_use_pyramid((100, 100), {'mode': 'always'})
+        assert not should_use_pyramid((7017, 9934), {'mode': 'never'})
+
+    def test_features_match_whole_image(self, drawing):
+        image, _ = drawing
+        expected, _ = cv2.findContours(detect_edges(image, *EDGE_PARAMS), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+        contours = find_edge_contours_pyramid(image, *EDGE_PARAMS, min_area=100, config=ALWAYS)
+
+        # 图框超过 max_refine_size，由候选层放大，不参与逐像素比较
+        assert feature_keys(small(contours)) == feature_keys(small(expected))
+
+    def test_small_holes_are_refined_at_full_resolution(self, drawing):
+        image, holes = drawing
+
+        contours = find_edge_contours_pyramid(image, *EDGE_PARAMS, min_area=100, config=ALWAYS)
+
+        boxes = [cv2.boundingRect(contour) for contour in contours]
+        for (x, y), radius in holes:
+            assert any(abs(bx + w / 2 - x) < 2 and abs(by + h / 2 - y) < 2 and abs(w - 2 * radius) < 5
+                       for bx, by, w, h in boxes)
+
+    def test_large_outlines_are_scaled_from_coarse_level(self, drawing):
+        image, _ = drawing
+        scale = 2 ** pyramid_detection.PYRAMID_DETECTION_CONFIG['level']
+        expected, _ = cv2.findContours(detect_edges(image, *EDGE_PARAMS), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+        contours = find_edge_contours_pyramid(image, *EDGE_PARAMS, min_area=100, config=ALWAYS)
+
+        frame = max((cv2.boundingRect(c) for c in contours), key=lambda box: box[2] * box[3])
+        assert frame[2] > pyramid_detection.PYRAMID_DETECTION_CONFIG['max_refine_size']
+        assert frame == pytest.approx(max((cv2.boundingRect(c) for c in expected),
+                                          key=lambda box: box[2] * box[3]), abs=scale)
+
+    def test_returns_none_when_candidates_cover_the_image(self):
+        rng = np.random.default_rng(1)
+        image = np.full((800, 800), 255, np.uint8)
+        for y in range(0, 800, 24):
+            for x in range(0, 800, 24):
+                size = int(rng.integers(8, 16))
+                cv2.rectangle(image, (x, y), (x + size, y + size), 0, 1)
+
+        assert find_edge_contours_pyramid(image, *EDGE_PARAMS, min_area=50, config=ALWAYS) is None
+
+    def test_binary_threshold_contours_match_whole_image(self, drawing):
+        image, _ = drawing
+
+        def binarize(gray):
+            return cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)[1]
+
+        expected, _ = cv2.findContours(binarize(image), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contours = find_contours_pyramid(image, binarize, mode=cv2.RETR_EXTERNAL, min_area=100, config=ALWAYS)
+
+        def boxes(found):
+            return sorted(cv2.boundingRect(c) for c in small(found) if cv2.contourArea(c) >= 100)
+
+        assert boxes(contours) == boxes(expected)
+
+
+class TestPyramidCallers:
+    """测试几何推理和图像特征提取在金字塔检测下结果不变"""
+
+    def test_cavity_features_match(self, drawing, monkeypatch):
+        image = cv2.cvtColor(drawing[0], cv2.COLOR_GRAY2BGR)
+        engine = GeometricReasoningEngine()
+        results = {}
+        for mode in ('never', 'always'):
+            monkeypatch.setitem(pyramid_detection.PYRAMID_DETECTION_CONFIG, 'mode', mode)
+            results[mode] = engine.analyze_cavity_features(image)
+
+        assert len(results['always']) == len(results['never'])
+
+    def test_image_features_match(self, drawing, monkeypatch):
+        image = cv2.cvtColor(drawing[0], cv2.COLOR_GRAY2BGR)
+        extractor = PDFFeatureExtractor()
+        results = {}
+        for mode in ('never', 'always'):
+            monkeypatch.setitem(pyramid_detection.PYRAMID_DETECTION_CONFIG, 'mode', mode)
+            results[mode] = extractor._extract_image_features(image, 0)
+
+        assert [f['bbox'] for f in results['always']] == [f['bbox'] for f in results['never']]
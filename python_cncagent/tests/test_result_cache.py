@@ -0,0 +1,157 @@
+import pytest
+import os
+import sys
+import time
+from pathlib import Path
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+from src.result_cache import ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """使用临时目录的缓存实例"""
+    return ResultCache(cache_dir=str(tmp_path / "cache"), max_size_mb=1, enabled=True)
+
+
+@pytest.fixture
+def drawing_file(tmp_path):
+    path = tmp_path / "drawing.pdf"
+    path.write_bytes(b"%PDF-1.4 fake drawing")
+    return str(path)
+
+
+class TestResultCache:
+    """测试内容寻址结果缓存"""
+
+    def test_file_digest_is_content_addressed(self, cache, tmp_path, drawing_file):
+        """相同内容的不同文件得到相同摘要"""
+        copy_path = tmp_path / "copy.pdf"
+        copy_path.write_bytes(Path(drawing_file).read_bytes())
+
+        assert cache.file_digest(drawing_file) == cache.file_digest(str(copy_path))
+        assert cache.file_digest(None) is None
+
+    def test_normalized_description_shares_key(self, cache):
+        """全角字符、大小写和空白差异不影响缓存键"""
+        key_a = cache.make_key('nc_program', ['abc'], description=cache.normalize_text("加工  φ22沉孔 ＤＥＰＴＨ 20"))
+        key_b = cache.make_key('nc_program', ['abc'], description=cache.normalize_text(" 加工 φ22沉孔 depth 20 "))
+        key_c = cache.make_key('features', ['abc'], description=cache.normalize_text("加工 φ22沉孔 depth 20"))
+
+        assert key_a == key_b
+        assert key_a != key_c
+
+    def test_unknown_layer_rejected(self, cache):
+        with pytest.raises(ValueError):
+            cache.make_key('unknown', [])
+
+    def test_get_put_counts_hits_and_misses(self, cache):
+        key = cache.make_key('ocr_text', ['abc'], dpi=150)
+
+        assert cache.get('ocr_text', key) is None
+        cache.put('ocr_text', key, "φ22 深20")
+        assert cache.get('ocr_text', key) == "φ22 深20"
+
+        stats = cache.stats()
+        assert stats['layers']['ocr_text'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+        assert stats['size_bytes'] > 0
+
+    def test_lru_eviction_keeps_recently_used(self, cache):
+        """超过大小上限时淘汰最久未访问的条目"""
+        payload = b"x" * (300 * 1024)
+        keys = [cache.make_key('features', [str(i)]) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put('features', key, payload)
+            entry = cache._entry_path('features', key)
+            os.utime(entry, (time.time() - 100 + i, time.time() - 100 + i))
+
+        # 访问最早写入的条目，使其成为最近使用
+        assert cache.get('features', keys[0]) == payload
+        cache.put('features', cache.make_key('features', ['3']), payload)
+
+        assert cache.get('features', keys[0]) == payload
+        assert cache.get('features', keys[1]) is None
+        assert cache.stats()['size_bytes'] <= cache.max_size_bytes
+
+    def test_disabled_cache_is_noop(self, tmp_path):
+        cache = ResultCache(cache_dir=str(tmp_path / "off"), enabled=False)
+        key = cache.make_key('nc_program', [])
+        cache.put('nc_program', key, "O0001")
+
+        assert cache.get('nc_program', key) is None
+        assert not (tmp_path / "off").exists()
+
+    @pytest.mark.skipif(not hasattr(os, 'getuid'), reason="需要POSIX文件所有者")
+    def test_cache_dir_is_private(self, tmp_path, monkeypatch):
+        """缓存目录以0o700创建，已存在的宽松权限被收紧"""
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "xdg"))
+        cache = ResultCache(max_size_mb=1, enabled=True)
+        key = cache.make_key('nc_program', [])
+        cache.put('nc_program', key, "O0001")
+
+        assert cache.cache_dir == tmp_path / "xdg" / "cnc_agent"
+        assert cache.cache_dir.stat().st_mode & 0o777 == 0o700
+
+        shared = tmp_path / "shared"
+        shared.mkdir()
+        os.chmod(shared, 0o777)
+        ResultCache(cache_dir=str(shared), enabled=True).get('nc_program', key)
+        assert shared.stat().st_mode & 0o777 == 0o700
+
+    @pytest.mark.skipif(not hasattr(os, 'getuid'), reason="需要POSIX文件所有者")
+    def test_foreign_cache_dir_is_not_loaded(self, cache, monkeypatch):
+        """其他用户的缓存目录中的条目不被反序列化"""
+        key = cache.make_key('nc_program', [])
+        cache.put('nc_program', key, "O0001")
+        monkeypatch.setattr(os, 'getuid', lambda: os.stat(cache.cache_dir).st_uid + 1)
+
+        other = ResultCache(cache_dir=str(cache.cache_dir), enabled=True)
+
+        assert other.get('nc_program', key) is None
+        assert not other.enabled
+
+
+class TestGenerateNCCache:
+    """测试generate_nc_from_pdf的NC程序缓存层"""
+
+    def test_repeated_job_served_from_cache(self, cache, drawing_file, monkeypatch):
+        import src.main as main_module
+
+        calls = []
+
+        def fake_generate(**kwargs):
+            calls.append(kwargs)
+            return "O0001\nG90 G54\nM30"
+
+        monkeypatch.setattr(main_module, "result_cache", cache)
+        monkeypatch.setattr(main_module, "generate_cnc_with_unified_approach", fake_generate)
+        monkeypatch.setattr(main_module, "generate_simulation_report", lambda *args, **kwargs: None)
+
+        first = main_module.generate_nc_from_pdf(drawing_file, "加工φ22沉孔，深20mm")
+        second = main_module.generate_nc_from_pdf(drawing_file, " 加工φ22沉孔，深20MM ")
+
+        assert first == second
+        assert len(calls) == 1
+        assert cache.stats()['layers']['nc_program']['hits'] == 1
+
+    def test_fallback_program_not_cached(self, cache, drawing_file, monkeypatch):
+        import src.main as main_module
+
+        calls = []
+
+        def fake_generate(**kwargs):
+            calls.append(kwargs)
+            return "O0001 (AI-GENERATED CNC PROGRAM)\n(GENERATED BY ADVANCED AI MODEL - FALLBACK MODE)\nM30"
+
+        monkeypatch.setattr(main_module, "result_cache", cache)
+        monkeypatch.setattr(main_module, "generate_cnc_with_unified_approach", fake_generate)
+        monkeypatch.setattr(main_module, "generate_simulation_report", lambda *args, **kwargs: None)
+
+        main_module.generate_nc_from_pdf(drawing_file, "钻孔")
+        main_module.generate_nc_from_pdf(drawing_file, "钻孔")
+
+        assert len(calls) == 2
@@ -0,0 +1,116 @@
+import pytest
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import src.modules.subprogram_extraction as subprogram_extraction
+from src.modules.nc_interpreter import same_motion
+from src.modules.nc_tokenizer import tokenize
+from src.modules.nc_validator_optimizer import validate_nc_program
+from src.modules.subprogram_extraction import expand_subprograms, extract_subprograms
+
+HEADER = "O0001 (TEST)\nG21 G90 G40 G49 G80\nG54 G17\nT1 M06\nM03 S1000\nG00 Z50.\n"
+
+
+def pocket(x: float, y: float) -> str:
+    """在(x, y)处加工一个10x10的方槽"""
+    return (f"G00 X{x:.3f} Y{y:.3f} (MOVE TO POCKET)\n"
+            f"Z2.\n"
+            f"G01 Z-3. F100.\n"
+            f"X{x + 10:.3f} F300.\n"
+            f"Y{y + 10:.3f}\n"
+            f"X{x:.3f}\n"
+            f"Y{y:.3f}\n"
+            f"G02 X{x + 5:.3f} Y{y - 5:.3f} I5. J0.\n"
+            f"G00 Z50.\n")
+
+
+class TestSubprogramExtraction:
+    """测试重复程序段提取为增量子程序"""
+
+    def test_repeated_pockets_become_incremental_subprogram(self):
+        program = HEADER + "".join(pocket(x, y) for x, y in [(0, 0), (40, 0), (80, 20), (0, 60)]) + "M05\nM30"
+
+        result, report = extract_subprograms(program)
+
+        assert report['subprograms'] == 1 and report['calls'] == 4
+        assert report['verified'] is True
+        assert report['lines_after'] < report['lines_before'] and report['bytes_after'] < report['bytes_before']
+        main, sub = result.split("M30")
+        assert main.count("M98 P1001") == 4
+        sub_lines = sub.strip().split('\n')
+        assert sub_lines[0].startswith("O1001") and sub_lines[1] == "G91"
+        assert sub_lines[-2:] == ["G90", "M99"]
+        # 各处起点不同的定位程序段留在主程序；第一个移动程序段补上模态，其余坐标为增量
+        assert sub_lines[2:5] == ["G00 Z-48.000", "G01 Z-5.000 F100.", "X10.000 F300."]
+        assert sub_lines[-4:-2] == ["G02 X5.000 Y-5.000 I5. J0.", "G00 Z53.000"]
+        assert main.count("(MOVE TO POCKET)") == 4
+        assert same_motion(program, expand_subprograms(result), 1e-6)
+
+    def test_consecutive_repeats_use_l_count(self):
+        steps = "".join(f"G01 X{10.0 * k + 5:.3f} F200.\nY10.\nX{10.0 * k + 10:.3f}\nY0.\n" for k in range(6))
+        program = HEADER + "G00 X0. Y0.\nG01 Z-1. F200.\n" + steps + "G00 Z50.\nM30"
+
+        result, report = extract_subprograms(program, {'min_saved_lines': 1})
+
+        assert report['verified'] is True
+        assert "M98 P1001 L6" in result.split('\n')
+        assert same_motion(program, expand_subprograms(result), 1e-6)
+
+    def test_state_dependent_blocks_are_not_extracted(self):
+        # 固定循环、刀具半径补偿和增量坐标中的程序段不提取
+        holes = "".join(f"G99 G81 X{x:.1f} Y0. Z-5. R2. F100.\nX{x:.1f} Y10.\nX{x:.1f} Y20.\nG80\n"
+                        for x in (0.0, 30.0, 60.0, 90.0))
+        compensated = "".join(f"G00 X{x:.1f} Y0.\nG41 D1 G01 X{x + 5:.1f} F100.\nY10.\nX{x:.1f}\nG40 Y0.\n"
+                              for x in (0.0, 30.0, 60.0, 90.0))
+        program = HEADER + holes + compensated + "G91\n" + "G01 X10. F100.\nY10.\nX-10.\nY-10.\n" * 4 + "G90\nM30"
+
+        result, report = extract_subprograms(program, {'min_saved_lines': 1})
+
+        assert report['subprograms'] == 0 and report['verified'] is None
+        assert result == program
+
+    def test_expand_subprograms_call_formats(self):
+        program = ("O0001\nG90 G00 X0. Y0.\nM98 P1002 L2\nM98 P21002\nX5. M98 P1002\nM30\n"
+                   "O1002\nG91 G01 X1. F100.\nG90\nM99\n%")
+
+        expanded = expand_subprograms(program).split('\n')
+
+        assert expanded.count("G91 G01 X1. F100.") == 4
+        # 调用行中含有其他地址字时不展开
+        assert "X5. M98 P1002" in expanded
+        assert expanded[-1] == "M30" and "M99" not in expanded
+
+    def test_validation_sees_main_program_end(self):
+        program = HEADER + "".join(pocket(x, 0) for x in (0, 40, 80, 120)) + "M05\nM30\n%"
+
+        result, report = extract_subprograms(program)
+
+        assert result.rstrip().endswith("M99\n%")
+        assert tokenize(result).main_stop == result.split('\n').index("M30") + 2
+        assert not [error for error in validate_nc_program(result)['errors'] if 'M30' in error]
+
+    def test_scales_to_long_programs(self):
+        positions = [(40.0 * i, 40.0 * j) for i in range(50) for j in range(40)]
+        program = HEADER + "".join(pocket(x, y) for x, y in positions) + "M30"
+
+        result, report = extract_subprograms(program)
+
+        assert report['verified'] is True
+        # 同一列中间距相同的方槽首尾相接，合并为一次带L的调用
+        assert report['calls'] < len(positions)
+        assert report['reduction'] > 0.6
+        assert report['seconds'] < 10.0
+
+    def test_falls_back_when_verification_fails(self, monkeypatch):
+        program = HEADER + "".join(pocket(x, 0) for x in (0, 40, 80)) + "M30"
+        monkeypatch.setattr(subprogram_extraction, 'expand_subprograms', lambda text: text.replace("M98", "M09"))
+
+        result, report = extract_subprograms(program)
+
+        assert result == program
+        assert report['verified'] is False and report['subprograms'] == 0
@@ -0,0 +1,236 @@
+import pytest
+import sys
+from pathlib import Path
+
+import fitz
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import src.modules.pdf_parsing_process as pdf_parsing_process
+import src.modules.text_acquisition as text_acquisition
+from src.modules.ocr_ai_inference import PDFFeatureExtractor
+from src.modules.prompt_builder import PromptBuilder
+from src.modules.pdf_parsing_process import _parse_tsv_lines
+from src.modules.text_acquisition import acquire_page_text, acquire_pdf_text
+from src.result_cache import ResultCache
+
+LABELS = [((60, 40), "PHI 20 H7"), ((200, 40), "R5"), ((60, 280), "MATERIAL 45 STEEL")]
+
+
+def cad_page(document):
+    """CAD导出的图纸：轮廓为矢量路径，文字都在文本层中"""
+    page = document.new_page(width=400, height=300)
+    page.draw_circle((100, 120), 20, color=(0, 0, 0))
+    for position, text in LABELS:
+        page.insert_text(position, text, fontsize=10)
+    return page
+
+
+def scanned_page(document, rect=(0, 0, 400, 300), width=400, height=300):
+    """把一个带黑色方块(20, 40, 60, 50)的100x100位图拉伸贴到rect处"""
+    page = document.new_page(width=width, height=height)
+    scan = fitz.open()
+    scan_page = scan.new_page(width=100, height=100)
+    scan_page.draw_rect(fitz.Rect(20, 40, 60, 50), color=None, fill=(0, 0, 0))
+    page.insert_image(fitz.Rect(rect), pixmap=scan_page.get_pixmap(dpi=288), keep_proportion=False)
+    return page
+
+
+def dark_box(samples, width, height):
+    """渲染区域中黑色像素的外接框，没有黑色像素时返回None"""
+    pixels = np.frombuffer(samples, np.uint8).reshape(height, width)
+    rows, columns = np.nonzero(pixels < 128)
+    if not len(rows):
+        return None
+    return (int(columns.min()), int(rows.min()), int(columns.max()) + 1, int(rows.max()) + 1)
+
+
+def dark_box_ocr(calls):
+    """模拟OCR：把渲染区域中黑色像素的外接框作为一行文本返回"""
+    def ocr(samples, width, height, channels=1, lang='chi_sim+eng'):
+        calls.append((width, height))
+        box = dark_box(samples, width, height)
+        return [{"text": "φ22", "bbox": box, "confidence": 0.9}] if box else []
+    return ocr
+
+
+def resolution_ocr(calls):
+    """
+    模拟OCR：黑色方块在低分辨率下识别为低置信度的"φ2?"，后面跟一个高置信度单词"H7"；
+    方块高度达到100像素时识别为高置信度的"φ22"
+    """
+    def ocr(samples, width, height, channels=1, lang='chi_sim+eng', psm=None):
+        calls.append((width, height, psm))
+        box = dark_box(samples, width, height)
+        if box[3] - box[1] >= 100:
+            return [{"text": "φ22", "bbox": box, "confidence": 0.95,
+                     "words": [{"text": "φ22", "bbox": box, "confidence": 0.95}]}]
+        suffix = (box[2] + 5, box[1], box[2] + 25, box[3])
+        words = [{"text": "φ2?", "bbox": box, "confidence": 0.4}, {"text": "H7", "bbox": suffix, "confidence": 0.9}]
+        return [{"text": "φ2? H7", "bbox": box[:2] + suffix[2:], "confidence": 0.65, "words": words}]
+    return ocr
+
+
+def no_ocr(*args, **kwargs):
+    raise AssertionError("有文本层的页面不应OCR")
+
+
+@pytest.fixture(autouse=True)
+def whole_region_ocr(monkeypatch):
+    """这里的位图只有色块没有文字，关闭文字区域检测，整块识别需要OCR的区域"""
+    monkeypatch.setitem(text_acquisition.TEXT_REGION_CONFIG, "enabled", False)
+
+
+class TestTextAcquisition:
+    """测试文本层优先的图纸文本获取"""
+
+    def test_cad_page_reads_text_layer_without_ocr(self, monkeypatch):
+        monkeypatch.setattr(text_acquisition, "ocr_buffer_lines", no_ocr)
+        page = cad_page(fitz.open())
+
+        result = acquire_page_text(page)
+
+        assert result["pages"][0]["source"] == "text" and result["pages"][0]["coverage"] == 1.0
+        assert [line["text"] for line in result["lines"]] == [text for _, text in LABELS]
+        assert result["ocr_text"] == "" and result["layer_text"] == result["text"]
+        # 外接框是文字的位置（基线在insert_text的y处）
+        for line, ((x, y), _) in zip(result["lines"], LABELS):
+            x0, y0, x1, y1 = line["bbox"]
+            assert x0 == pytest.approx(x, abs=0.5) and y0 < y < y1
+            assert line["source"] == "text" and line["confidence"] == 1.0
+
+    def test_scanned_page_ocr_boxes_in_page_coordinates(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(text_acquisition, "ocr_buffer_lines", dark_box_ocr(calls))
+        page = scanned_page(fitz.open())
+
+        result = acquire_page_text(page, dpi=144)
+
+        assert result["pages"][0]["source"] == "ocr" and result["pages"][0]["coverage"] == 0.0
+        assert calls == [(800, 600)]
+        line, = result["lines"]
+        # 位图拉伸到整页后横向放大4倍、纵向放大3倍
+        assert line["bbox"] == pytest.approx((80, 120, 240, 150), abs=1.5)
+        assert (line["source"], line["confidence"], result["ocr_text"]) == ("ocr", 0.9, "φ22")
+
+    def test_rotated_page_boxes_match_text_layer_frame(self, monkeypatch):
+        monkeypatch.setattr(text_acquisition, "ocr_buffer_lines", dark_box_ocr([]))
+        page = scanned_page(fitz.open())
+        page.set_rotation(90)
+
+        line, = acquire_page_text(page, dpi=144)["lines"]
+
+        assert line["bbox"] == pytest.approx((80, 120, 240, 150), abs=1.5)
+
+    def test_only_uncovered_image_region_is_ocred(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(text_acquisition, "ocr_buffer_lines", dark_box_ocr(calls))
+        document = fitz.open()
+        page = scanned_page(document, rect=(200, 100, 300, 200))
+        for position, text in LABELS:
+            page.insert_text(position, text, fontsize=10)
+
+        result = acquire_page_text(page, dpi=72)
+
+        info = result["pages"][0]
+        assert info["source"] == "mixed" and info["ocr_regions"] == [(200, 100, 300, 200)]
+        assert info["coverage"] == pytest.approx(1 - 100 * 100 / (400 * 300))
+        assert calls == [(100, 100)]
+        assert result["lines"][-1]["bbox"] == pytest.approx((220, 140, 260, 150), abs=1.5)
+        assert result["layer_text"].split("\n") == [text for _, text in LABELS]
+
+    def test_pdf_ocrs_only_pages_without_text(self, tmp_path, monkeypatch):
+        calls = []
+        monkeypatch.setattr(text_acquisition, "ocr_buffer_lines", dark_box_ocr(calls))
+        document = fitz.open()
+        cad_page(document)
+        scanned_page(document)
+        cad_page(document)
+        pdf_path = str(tmp_path / "drawing.pdf")
+        document.save(pdf_path)
+
+        result = acquire_pdf_text(pdf_path, dpi=72, max_workers=2)
+
+        assert [page["source"] for page in result["pages"]] == ["text", "ocr", "text"]
+        assert len(calls) == 1
+        assert [line["page_number"] for line in result["lines"] if line["source"] == "ocr"] == [1]
+        assert acquire_pdf_text(pdf_path, run_ocr=False)["ocr_text"] == ""
+
+    def test_low_confidence_words_are_rerendered_at_high_dpi(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(text_acquisition, "ocr_buffer_lines", resolution_ocr(calls))
+        page = scanned_page(fitz.open())
+
+        line, = acquire_page_text(page, dpi=72)["lines"]
+
+        # 整页按72 DPI识别一次，只有低置信度单词的外接框（加1.5pt留白）按400 DPI重新渲染
+        assert calls[0] == (400, 300, None) and len(calls) == 2
+        width, height, psm = calls[1]
+        assert (width, height) == pytest.approx((163 * 400 / 72, 33 * 400 / 72), abs=3) and psm == 7
+        assert line["text"] == "φ22 H7" and line["confidence"] == pytest.approx((0.95 + 0.9) / 2)
+        assert line["dpi"] == 400 and line["words"][0]["dpi"] == 400 and "dpi" not in line["words"][1]
+        # 外接框保持低分辨率识别时换算的页面坐标
+        assert line["bbox"] == pytest.approx((80, 120, 265, 150), abs=1.5)
+        assert line["words"][0]["bbox"] == pytest.approx((80, 120, 240, 150), abs=1.5)
+
+    def test_refinement_can_be_disabled(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(text_acquisition, "ocr_buffer_lines", resolution_ocr(calls))
+        page = scanned_page(fitz.open())
+
+        line, = acquire_page_text(page, dpi=72, config={"refine_dpi": 0})["lines"]
+
+        assert len(calls) == 1
+        assert (line["text"], line["dpi"]) == ("φ2? H7", 72)
+
+    def test_parse_tsv_lines(self):
+        tsv = "\n".join([
+            "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext",
+            "4\t1\t1\t1\t1\t0\t10\t20\t80\t12\t-1\t",
+            "5\t1\t1\t1\t1\t1\t10\t20\t30\t12\t96\tφ22",
+            "5\t1\t1\t1\t1\t2\t50\t21\t40\t11\t90\tH7",
+            "5\t1\t1\t1\t2\t1\t10\t40\t20\t10\t80\tR5",
+            "5\t1\t1\t1\t2\t2\t40\t40\t5\t10\t-1\t ",
+        ])
+
+        lines = _parse_tsv_lines(tsv)
+
+        assert [line["text"] for line in lines] == ["φ22 H7", "R5"]
+        assert lines[0]["bbox"] == (10, 20, 90, 32)
+        assert lines[0]["confidence"] == pytest.approx(0.93)
+        assert [word["text"] for word in lines[0]["words"]] == ["φ22", "H7"]
+        assert lines[0]["words"][1]["bbox"] == (50, 21, 90, 32)
+        assert lines[0]["words"][1]["confidence"] == pytest.approx(0.9)
+
+    def test_prompt_builder_skips_ocr_for_cad_drawing(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(text_acquisition, "ocr_buffer_lines", no_ocr)
+        monkeypatch.setattr(pdf_parsing_process, "ocr_buffer", no_ocr)
+        monkeypatch.setattr(sys.modules[PromptBuilder.__module__], "result_cache",
+                            ResultCache(cache_dir=str(tmp_path / "cache")))
+        document = fitz.open()
+        cad_page(document)
+        pdf_path = str(tmp_path / "drawing.pdf")
+        document.save(pdf_path)
+
+        drawing_info = PromptBuilder()._extract_drawing_info(pdf_path)
+
+        assert "PHI 20 H7" in drawing_info["pdf_text"] and "ocr_text" not in drawing_info
+        assert [line["text"] for line in drawing_info["text_lines"]] == [text for _, text in LABELS]
+        assert [f for f in drawing_info["geometric_features"] if "radius" in f]
+
+    def test_feature_extractor_keeps_dimension_positions(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(text_acquisition, "ocr_buffer_lines", no_ocr)
+        document = fitz.open()
+        cad_page(document)
+        pdf_path = str(tmp_path / "drawing.pdf")
+        document.save(pdf_path)
+
+        page, = PDFFeatureExtractor().extract_features_from_pdf(pdf_path)["pages"]
+
+        assert page["text_source"] == "text"
+        dimensions = {d["text"]: d["bbox"] for d in page["dimensions"]}
+        assert dimensions["R5"][0] == pytest.approx(200, abs=0.5)
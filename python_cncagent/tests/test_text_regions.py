@@ -0,0 +1,162 @@
+import pytest
+import sys
+from pathlib import Path
+
+import fitz
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import src.modules.text_regions as text_regions
+from src.modules.text_acquisition import acquire_page_text
+from src.modules.text_regions import detect_text_regions, ocr_text_regions
+
+DPI = 150
+SCALE = DPI / 72
+TITLE_BLOCK = (562, 475, 822, 575)
+
+
+def drawing_page(document):
+    """A4横向图纸：图框、圆和尺寸线，横排和竖排尺寸、单字符孔号、汉字技术要求和右下角标题栏"""
+    page = document.new_page(width=842, height=595)
+    page.draw_rect(fitz.Rect(20, 20, 822, 575), color=(0, 0, 0), width=1.5)
+    page.draw_circle((200, 250), 60, color=(0, 0, 0))
+    page.draw_line((140, 150), (260, 150), color=(0, 0, 0), width=0.5)
+    page.insert_text((180, 145), "Φ120 H7", fontsize=10)
+    page.insert_text((300, 260), "R5", fontsize=10)
+    page.insert_text((300, 300), "100±0.1", fontsize=10)
+    page.insert_text((110, 300), "50", fontsize=10, rotate=90)
+    page.insert_text((420, 180), "8", fontsize=10)
+    page.insert_text((60, 480), "技术要求", fontsize=10, fontname="china-s")
+    x0, y0, x1, y1 = TITLE_BLOCK
+    for k in range(5):
+        page.draw_line((x0, y0 + k * 25), (x1, y0 + k * 25), color=(0, 0, 0), width=1)
+    for x in (x0, 642, 722):
+        page.draw_line((x, y0), (x, y1), color=(0, 0, 0), width=1)
+    page.insert_text((570, 492), "材料 45钢", fontsize=9, fontname="china-s")
+    page.insert_text((730, 517), "CNC-001", fontsize=9)
+    return page
+
+
+def rendered_drawing():
+    pixmap = drawing_page(fitz.open()).get_pixmap(dpi=DPI, colorspace=fitz.csGRAY)
+    return np.frombuffer(pixmap.samples, np.uint8).reshape(pixmap.height, pixmap.width)
+
+
+def in_points(region):
+    return tuple(value / SCALE for value in region["bbox"])
+
+
+def contains(bbox, point):
+    return bbox[0] <= point[0] <= bbox[2] and bbox[1] <= point[1] <= bbox[3]
+
+
+def fake_ocr(calls, confidence=0.95):
+    """模拟OCR：记录每个裁剪的尺寸和识别参数，整块返回一行"""
+    def ocr(samples, width, height, channels=1, lang='chi_sim+eng', psm=None, whitelist=None):
+        assert len(samples) == width * height
+        calls.append({"size": (width, height), "lang": lang, "psm": psm, "whitelist": whitelist})
+        return [{"text": "R5", "bbox": (0, 0, width, height), "confidence": confidence}]
+    return ocr
+
+
+class TestTextRegions:
+    """测试扫描图纸的文字区域检测和区域OCR"""
+
+    def test_detects_labels_notes_and_title_block(self):
+        regions = detect_text_regions(rendered_drawing(), DPI)
+
+        kinds = {}
+        for region in regions:
+            kinds.setdefault(region["kind"], []).append(region)
+        title_block, = kinds["title_block"]
+        assert in_points(title_block) == pytest.approx(TITLE_BLOCK, abs=2)
+        # 每个尺寸标注一个区域，竖排尺寸单独标出，单字符标注也保留
+        labels = [(200, 141), (305, 256), (320, 296), (106, 290), (423, 176)]
+        for point in labels:
+            matches = [r for r in kinds["dimension"] if contains(in_points(r), point)]
+            assert len(matches) == 1
+        assert [r["vertical"] for r in kinds["dimension"] if contains(in_points(r), (106, 290))] == [True]
+        note, = kinds["note"]
+        assert contains(in_points(note), (80, 476))
+        # 圆、图框和尺寸线不是文字
+        assert len(regions) == 7
+        assert not any(contains(in_points(r), (200, 190)) for r in regions)
+
+    def test_crops_use_region_specific_ocr_options(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(text_regions, "ocr_buffer_lines", fake_ocr(calls))
+        gray = rendered_drawing()
+
+        lines = ocr_text_regions(gray, DPI, max_workers=4)
+
+        assert len(calls) == len(lines) == 7
+        dimension_calls = [c for c in calls if c["whitelist"]]
+        assert len(dimension_calls) == 5
+        assert all(c["lang"] == "eng" and c["psm"] == 7 and "φ" in c["whitelist"] for c in dimension_calls)
+        assert sorted(c["psm"] for c in calls if not c["whitelist"]) == [6, 7]
+        # 只识别文字区域，裁剪面积远小于整页
+        assert sum(c["size"][0] * c["size"][1] for c in calls) < gray.size * 0.15
+        # 竖排尺寸旋转后识别，外接框取整个区域
+        vertical, = [line for line in lines if contains(tuple(v / SCALE for v in line["bbox"]), (106, 290))]
+        assert vertical["bbox"][3] - vertical["bbox"][1] > vertical["bbox"][2] - vertical["bbox"][0]
+
+    def test_low_confidence_dimension_is_retried_as_note(self, monkeypatch):
+        calls = []
+
+        def ocr(samples, width, height, channels=1, lang='chi_sim+eng', psm=None, whitelist=None):
+            calls.append(whitelist)
+            return [{"text": "未注倒角", "bbox": (0, 0, width, height), "confidence": 0.3 if whitelist else 0.9}]
+
+        monkeypatch.setattr(text_regions, "ocr_buffer_lines", ocr)
+        gray = rendered_drawing()
+        region, = [r for r in detect_text_regions(gray, DPI) if contains(in_points(r), (305, 256))]
+
+        line, = text_regions.text_region_detector.ocr_region(gray, region)
+
+        assert line["kind"] == "note" and line["confidence"] == 0.9
+        assert calls[0] and calls[1] is None
+
+    def test_scanned_pdf_page_ocrs_only_text_regions(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(text_regions, "ocr_buffer_lines", fake_ocr(calls))
+        document = fitz.open()
+        scan = document.new_page(width=842, height=595)
+        scan.insert_image(scan.rect, pixmap=drawing_page(fitz.open()).get_pixmap(dpi=DPI))
+
+        result = acquire_page_text(scan, dpi=DPI)
+
+        assert result["pages"][0]["source"] == "ocr" and len(calls) == 7
+        r5, = [line for line in result["lines"] if contains(line["bbox"], (305, 256))]
+        assert r5["source"] == "ocr" and r5["kind"] == "dimension"
+        assert r5["bbox"][2] - r5["bbox"][0] < 40
+
+    def test_low_confidence_dimension_is_rerendered_at_high_dpi(self, monkeypatch):
+        calls = []
+
+        def ocr(samples, width, height, channels=1, lang='chi_sim+eng', psm=None, whitelist=None):
+            # 字高不足40像素时识别不清
+            confidence = 0.95 if height >= 40 else 0.5
+            calls.append({"size": (width, height), "psm": psm, "whitelist": whitelist})
+            return [{"text": "R5" if confidence > 0.9 else "R?", "bbox": (0, 0, width, height),
+                     "confidence": confidence}]
+
+        monkeypatch.setattr(text_regions, "ocr_buffer_lines", ocr)
+        document = fitz.open()
+        scan = document.new_page(width=842, height=595)
+        scan.insert_image(scan.rect, pixmap=drawing_page(fitz.open()).get_pixmap(dpi=400))
+
+        result = acquire_page_text(scan, dpi=DPI)
+
+        r5, = [line for line in result["lines"] if contains(line["bbox"], (305, 256))]
+        assert (r5["text"], r5["kind"], r5["dpi"]) == ("R5", "dimension", 400)
+        assert r5["confidence"] == 0.95
+        # 重新渲染的尺寸标注沿用尺寸的白名单和单行模式
+        refined = [c for c in calls if c["size"][1] >= 40 and c["whitelist"]]
+        assert refined and all(c["psm"] == 7 for c in refined)
+        # 高置信度的标题栏不重新识别
+        title_block, = [line for line in result["lines"] if line["kind"] == "title_block"]
+        assert title_block["dpi"] == DPI
@@ -0,0 +1,112 @@
+import pytest
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import modules.tiled_detection as tiled_detection
+from modules.tiled_detection import TileGrid, find_contours_tiled, should_use_tiles
+from modules.feature_definition import detect_edges
+
+
+EDGE_PARAMS = (50, 150, (5, 5), (2, 2))
+
+
+@pytest.fixture
+def drawing():
+    """带图框、跨越分块边界的长线条和大量小孔的合成图纸"""
+    rng = np.random.default_rng(0)
+    image = np.full((1754, 2480), 255, np.uint8)
+    cv2.rectangle(image, (15, 15), (2465, 1739), 0, 3)
+    cv2.line(image, (100, 900), (2300, 950), 0, 2)
+    cv2.circle(image, (1240, 877), 600, 0, 2)
+    for _ in range(300):
+        x, y = int(rng.integers(50, 2430)), int(rng.integers(50, 1700))
+        cv2.circle(image, (x, y), int(rng.integers(5, 40)), 0, 2)
+    return image
+
+
+def contour_set(contours):
+    return {contour.tobytes() for contour in contours}
+
+
+class TestTileGrid:
+    """测试分块网格的轮廓归属规则"""
+
+    def test_each_bbox_has_at_most_one_owner(self):
+        grid = TileGrid(1000, 700, 256, 32)
+        rng = np.random.default_rng(1)
+        x0, y0 = rng.integers(0, 990, 500), rng.integers(0, 690, 500)
+        sizes = rng.integers(1, 200, (500, 2))
+        bboxes = np.column_stack((x0, y0, np.minimum(x0 + sizes[:, 0], 1000), np.minimum(y0 + sizes[:, 1], 700)))
+
+        owners = grid.owners(bboxes)
+
+        for bbox, owner in zip(bboxes, owners):
+            x0, y0, x1, y1 = bbox
+            if owner >= 0:
+                px0, py0, px1, py1 = grid.padded_rect(owner)
+                assert px0 <= x0 and x1 <= px1 and py0 <= y0 and y1 <= py1
+        # 小于重叠宽度的框一定能被某个分块完整看到
+        small = (bboxes[:, 2] - bboxes[:, 0] < 32) & (bboxes[:, 3] - bboxes[:, 1] < 32)
+        assert (owners[small] >= 0).all()
+
+
+class TestTiledContours:
+    """测试分块轮廓查找与整图结果一致"""
+
+    def test_matches_whole_image(self, drawing):
+        edges = detect_edges(drawing, *EDGE_PARAMS)
+        expected, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+        contours = find_contours_tiled(drawing, *EDGE_PARAMS, memory_budget_mb=10, max_workers=2)
+
+        assert len(contours) == len(expected)
+        assert contour_set(contours) == contour_set(expected)
+
+    def test_tiles_fit_budget(self, drawing, monkeypatch):
+        """分块边长（含重叠和边距）满足内存预算"""
+        seen = []
+        original = tiled_detection._process_tile
+
+        def spy(image, grid, index, halo, edge_params):
+            seen.append(grid)
+            return original(image, grid, index, halo, edge_params)
+
+        monkeypatch.setattr(tiled_detection, "_process_tile", spy)
+        find_contours_tiled(drawing, *EDGE_PARAMS, memory_budget_mb=10, max_workers=1)
+
+        grid = seen[0]
+        assert len(grid) > 1
+        side = grid.tile_size + 2 * (grid.overlap + tiled_detection._edge_halo((5, 5), (2, 2)))
+        assert side * side * tiled_detection.TILED_DETECTION_CONFIG['bytes_per_pixel'] <= 10 * 1024 * 1024
+
+    def test_oversized_group_is_downsampled(self, drawing):
+        """跨块区域超出预算时降采样拼接，图框仍被找到"""
+        edges = detect_edges(drawing, *EDGE_PARAMS)
+        expected, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+        contours = find_contours_tiled(drawing, *EDGE_PARAMS, memory_budget_mb=4)
+
+        def frame_boxes(found):
+            return sorted(cv2.boundingRect(c) for c in found if cv2.boundingRect(c)[2] > 2400)
+
+        frames, expected_frames = frame_boxes(contours), frame_boxes(expected)
+        assert len(frames) == len(expected_frames)
+        for box, expected_box in zip(frames, expected_frames):
+            # 1/2分辨率拼接，坐标误差在两个像素以内
+            assert all(abs(a - b) <= 2 for a, b in zip(box, expected_box))
+
+    def test_should_use_tiles_modes(self, monkeypatch):
+        monkeypatch.setitem(tiled_detection.TILED_DETECTION_CONFIG, "mode", "auto")
+        assert should_use_tiles((14043, 9933), memory_budget_mb=512)
+        assert not should_use_tiles((1754, 2480), memory_budget_mb=512)
+
+        monkeypatch.setitem(tiled_detection.TILED_DETECTION_CONFIG, "mode", "never")
+        assert not should_use_tiles((14043, 9933), memory_budget_mb=512)
@@ -7,7 +7,7 @@ project_root = Path(__file__).parent.parent
 src_path = project_root / "src"
 sys.path.insert(0, str(src_path))
 
-from modules.validation import validate_features, validate_user_description, validate_parameters, validate_nc_program, validate_file_path
+from modules.validation import validate_features, validate_user_description, validate_parameters, validate_nc_program, validate_file_path, validate_geometry_elements
 
 
 class TestValidateFeatures:
@@ -393,6 +393,31 @@ M30"""
         assert "O1234" in syntax_errors[0]  # 确认是O1234被标记
 
 
+class TestValidateGeometryElements:
+    """测试PDF解析几何元素的验证"""
+    
+    def test_valid_elements(self):
+        """测试有效的几何元素"""
+        result = validate_geometry_elements([
+            {'id': 'rect_1', 'type': 'rectangle', 'bounds': {'x': 10, 'y': 10, 'width': 80, 'height': 60}},
+            {'id': 'circle_1', 'type': 'circle', 'center': {'x': 0, 'y': 0}, 'radius': 5.0},
+        ])
+        assert result == {'valid': True, 'errors': [], 'warnings': []}
+    
+    def test_invalid_elements(self):
+        """测试缺少类型、格式错误和尺寸不合理的元素"""
+        result = validate_geometry_elements([
+            {'id': 'e1'},
+            "rectangle",
+            {'id': 'e3', 'type': 'rectangle', 'bounds': {'x': 0, 'y': 0, 'width': 0, 'height': 5}},
+            {'type': 'circle', 'radius': -1},
+        ])
+        assert not result['valid']
+        assert result['errors'] == ["几何元素 0 缺少类型", "几何元素 1 必须是字典类型"]
+        assert len(result['warnings']) == 3
+        assert validate_geometry_elements("not a list")['errors'] == ["几何元素列表必须是list类型"]
+
+
 class TestValidateFilePath:
     """测试文件路径验证功能"""
     
@@ -0,0 +1,139 @@
+import math
+import pytest
+import sys
+from pathlib import Path
+
+import fitz
+import numpy as np
+
+# 添加src目录到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+import modules.pdf_parsing_process as pdf_parsing_process
+from modules.pdf_parsing_process import process_pdf_pages
+from src.modules.ocr_ai_inference import PDFFeatureExtractor
+from src.modules.vector_geometry import extract_vector_features, vector_extractor
+
+SCALE = 150 / 72
+
+
+def by_shape(features, shape):
+    return sorted((f for f in features if f["shape"] == shape), key=lambda f: f["center"])
+
+
+def round_features(features):
+    """圆和由圆判定的圆形腔槽"""
+    return sorted((f for f in features if "radius" in f), key=lambda f: f["center"])
+
+
+def vector_page(document):
+    """一个圆、一个三角形、一条与轮廓无关的尺寸线和一个由72段直线组成的圆"""
+    page = document.new_page(width=400, height=300)
+    page.draw_circle((100, 75), 20, color=(0, 0, 0), width=1)
+    page.draw_polyline([(50, 200), (150, 200), (100, 260), (50, 200)], color=(0, 0, 0))
+    page.draw_line((0, 150), (400, 150), color=(0, 0, 0))
+    angles = np.linspace(0, 2 * math.pi, 73)
+    page.draw_polyline([(300 + 15 * math.cos(a), 225 + 15 * math.sin(a)) for a in angles], color=(0, 0, 0))
+    return page
+
+
+@pytest.fixture
+def mixed_pdf(tmp_path):
+    """第1页为矢量图纸，第2页为整页位图（扫描件）"""
+    pdf_path = tmp_path / "mixed.pdf"
+    document = fitz.open()
+    vector_page(document)
+    scan = fitz.open()
+    vector_page(scan)
+    pixmap = scan[0].get_pixmap()
+    document.new_page(width=400, height=300).insert_image(fitz.Rect(0, 0, 400, 300), pixmap=pixmap)
+    document.save(str(pdf_path))
+    document.close()
+    return str(pdf_path)
+
+
+class TestVectorGeometry:
+    """测试从PDF矢量路径直接提取几何特征"""
+
+    def test_exact_coordinates_from_paths(self):
+        page = vector_page(fitz.open())
+
+        features = extract_vector_features(page, dpi=150)
+
+        hole, polyline_circle = round_features(features)
+        assert hole["center"] == pytest.approx((100 * SCALE, 75 * SCALE), abs=1e-4)
+        assert hole["radius"] == pytest.approx(20 * SCALE, rel=1e-3)
+        assert hole["confidence"] == 1.0 and hole["contour"].dtype == np.int32
+        # 足够细分的多段线也按圆识别
+        assert polyline_circle["radius"] == pytest.approx(15 * SCALE, rel=1e-3)
+        triangle, = by_shape(features, "triangle")
+        assert sorted(triangle["vertices"]) == pytest.approx(
+            sorted([(50 * SCALE, 200 * SCALE), (150 * SCALE, 200 * SCALE), (100 * SCALE, 260 * SCALE)]))
+        # 悬空的尺寸线不构成轮廓
+        assert all(f["dimensions"][0] < 400 * SCALE * 0.9 for f in features)
+
+    def test_rectangles_and_polygons(self):
+        page = fitz.open().new_page(width=400, height=300)
+        page.draw_rect(fitz.Rect(20, 20, 120, 60), color=(0, 0, 0))
+        page.draw_polyline([(200, 20), (260, 20), (260, 80), (200, 80), (200, 20)], color=(0, 0, 0))
+        octagon = [(330 + 30 * math.cos(k * math.pi / 4), 150 + 30 * math.sin(k * math.pi / 4)) for k in range(9)]
+        page.draw_polyline(octagon, color=(0, 0, 0))
+
+        features = extract_vector_features(page, dpi=72, min_area=10)
+
+        # 粗糙的八边形不是圆，按栅格识别相同的规则分类
+        assert len(features) == 3 and "circle" not in [f["shape"] for f in features]
+        rectangle, square = sorted((f for f in features if "length" in f), key=lambda f: f["center"])
+        assert rectangle["center"] == (70.0, 40.0) and (rectangle["length"], rectangle["width"]) == (100.0, 40.0)
+        assert square["center"] == (230.0, 50.0) and (square["length"], square["width"]) == (60.0, 60.0)
+
+    def test_rotated_page_matches_rendering(self):
+        page = fitz.open().new_page(width=400, height=300)
+        page.draw_circle((100, 75), 20, color=(0, 0, 0), width=1)
+        page.set_rotation(90)
+
+        circle, = extract_vector_features(page, dpi=72)
+        pixmap = page.get_pixmap()
+        pixels = np.frombuffer(pixmap.samples, np.uint8).reshape(pixmap.height, pixmap.width, pixmap.n)[..., 0]
+        rows, columns = np.nonzero(pixels < 128)
+
+        assert circle["center"] == pytest.approx((columns.mean() + 0.5, rows.mean() + 0.5), abs=0.5)
+
+    def test_scanned_page_returns_none(self, mixed_pdf):
+        with fitz.open(mixed_pdf) as document:
+            assert vector_extractor.is_vector_page(document[0])
+            assert extract_vector_features(document[1]) is None
+
+    def test_pipeline_skips_rendering_vector_pages(self, mixed_pdf, monkeypatch):
+        rendered = []
+        original = pdf_parsing_process.iter_pdf_pages
+
+        def tracking(*args, **kwargs):
+            for page_num, image in original(*args, **kwargs):
+                rendered.append(page_num)
+                yield page_num, image
+
+        monkeypatch.setattr(pdf_parsing_process, "iter_pdf_pages", tracking)
+
+        results = {r["page_number"]: r for r in process_pdf_pages(mixed_pdf, dpi=150, max_workers=1, run_ocr=False)}
+
+        assert rendered == [1]
+        assert results[0]["feature_source"] == "vector" and results[1]["feature_source"] == "raster"
+        assert results[0]["image_size"] == results[1]["image_size"] == (834, 625)
+        assert len(round_features(results[0]["features"])) == 2
+
+    def test_vector_mode_can_be_disabled(self, mixed_pdf):
+        results = list(process_pdf_pages(mixed_pdf, dpi=72, max_workers=1, run_ocr=False, use_vector=False))
+
+        assert sorted(r["feature_source"] for r in results) == ["raster", "raster"]
+
+    def test_pdf_feature_extractor_uses_paths(self, mixed_pdf):
+        result = PDFFeatureExtractor().extract_features_from_pdf(mixed_pdf)
+
+        vector, scanned = result["pages"]
+        assert vector["feature_source"] == "vector" and scanned["feature_source"] == "raster"
+        circles = [f for f in vector["geometric_features"] if f["is_circle"]]
+        assert sorted(f["diameter_approx"] for f in circles) == pytest.approx([30.0, 40.0], rel=1e-3)
+        assert all(f["source"] == "vector" for f in vector["geometric_features"])